@@ -1,9 +1,14 @@
 #!/bin/bash
 # DIS: セッション統計をSQLiteに記録 (Stop hook)
 DB="$HOME/.claude/intelligence/dev.db"
+# 他の DIS プロセスが書き込み中ならロック解除を待つ (dev.db の WAL 化は dis_db.py が行う)
+sqlite3() { command sqlite3 -cmd ".timeout 5000" "$@"; }
 [ ! -f "$DB" ] && exit 0
 
 input=$(cat)
+
+# capture-error.sh がスプールしたイベントを events へ書き込んでから集計する
+python3 "$HOME/.claude/intelligence/scripts/ingest.py" --drain >/dev/null 2>&1
 cwd=$(echo "$input" | jq -r '.cwd // ""')
 project=$(basename "$cwd")
 
@@ -256,15 +256,14 @@ lookup_review_solutions() {
   python3 - "$issues_json" << 'PYEOF'
 import json, sys, os
 sys.path.insert(0, os.path.expanduser("~/.claude/intelligence/scripts"))
-from similarity import find_similar
+# 全指摘を1回の find_similar_many で検索する (dis_daemon が起動していればそこで、未起動ならプロセス内で)
+from dis_daemon import similar_many
 
-issues = json.loads(sys.argv[1])
+issues = [i for i in json.loads(sys.argv[1]) if i.get("description", "")]
+found = similar_many([i["description"] for i in issues], threshold=0.4, limit=2)
 results = []
-for issue in issues:
-    desc = issue.get("description", "")
-    if not desc:
-        continue
-    similar = find_similar(desc, threshold=0.4, limit=2)
+for issue, similar in zip(issues, found):
+    desc = issue["description"]
     if similar:
         results.append({
             "issue": desc[:100],
@@ -313,7 +312,7 @@ insert_review_session() {
   # NOTE: zsh では "status" は読み取り専用変数のため review_status を使用
   local review_status="${13}" models_used="${14}" duration="${15}"
 
-  sqlite3 "$DIS_DB" << SQL
+  sqlite3 -cmd ".timeout 5000" "$DIS_DB" << SQL
 INSERT INTO review_sessions(
   project, mode, initial_score, final_score, iterations, score_history,
   issues_found, issues_fixed, critical_count, high_count, medium_count, low_count,
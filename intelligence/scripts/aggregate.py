@@ -1,86 +1,98 @@
 #!/usr/bin/env python3
 """DIS: events → solutions への集計。エラーメッセージを正規化し、同一パターンをカウント。"""
-import re
 import sqlite3
 import os
 from datetime import datetime
 
+import dis_db
+import migrate
+from ingest import drain
+from normalize import normalize_error, normalize_many  # noqa: F401 (normalize_error は互換用に再export)
+from similarity import ensure_index, refresh_index
+
 DB = os.path.expanduser("~/.claude/intelligence/dev.db")
 
 
-def normalize_error(error: str) -> str:
-    """エラーメッセージからパス・行番号・一時的な値を除去して正規化。"""
-    s = error
-    # ファイルパスを除去 (/Users/xxx/... → <path>)
-    s = re.sub(r"/[\w/.-]+\.(ts|tsx|js|jsx|py|rs|go)", "<path>", s)
-    # 行番号・カラム番号を除去
-    s = re.sub(r":\d+:\d+", ":<line>", s)
-    s = re.sub(r"line \d+", "line <n>", s, flags=re.IGNORECASE)
-    # ハッシュ値・UUIDを除去
-    s = re.sub(r"[0-9a-f]{8,}", "<hash>", s)
-    # 連続空白を圧縮
-    s = re.sub(r"\s+", " ", s).strip()
-    # 先頭200文字に制限
-    return s[:200]
+# 1回の SELECT / UPSERT で扱うイベント数 (メモリ使用量の上限)
+CHUNK_SIZE = 2000
 
 
-def aggregate():
-    conn = sqlite3.connect(DB)
-    cur = conn.cursor()
+def _aggregate_chunk(conn: sqlite3.Connection, last_id: int) -> tuple[int, int, dict]:
+    """last_id より後の未集計イベントを最大 CHUNK_SIZE 件 solutions に UPSERT し、集計済みの印を付ける。
 
-    # 未集計のイベントを取得（resolved=0のもの）
-    cur.execute("""
-        SELECT id, error, project FROM events
-        WHERE error IS NOT NULL AND error != ''
-        ORDER BY ts DESC LIMIT 500
-    """)
+    (処理件数, 新しい last_id, {(pattern, project): 集計}) を返す。
+    sync で取り込んだイベントは別端末が数えているので、最初から集計済み (migrations/0014_events_aggregated.py)。
+    """
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT id, error, project FROM events WHERE aggregated = 0 AND id > ? ORDER BY id LIMIT ?",
+        (last_id, CHUNK_SIZE),
+    )
     events = cur.fetchall()
-
     if not events:
-        print("No events to aggregate.")
-        conn.close()
-        return
+        return 0, last_id, {}
 
+    with_error = [e for e in events if e[1]]
     pattern_counts = {}
-    for eid, error, project in events:
-        pattern = normalize_error(error)
+    for (eid, error, project), pattern in zip(with_error, normalize_many([e[1] for e in with_error])):
         key = (pattern, project or "unknown")
         if key not in pattern_counts:
             pattern_counts[key] = {"count": 0, "sample_error": error[:500]}
         pattern_counts[key]["count"] += 1
 
-    # solutions テーブルへ UPSERT
     now = datetime.utcnow().isoformat()
-    upserted = 0
-    for (pattern, project), info in pattern_counts.items():
-        if info["count"] < 1:
-            continue
-        cur.execute(
-            "SELECT id, success_count FROM solutions WHERE error_pattern = ? AND project = ?",
-            (pattern, project),
-        )
-        row = cur.fetchone()
-        if row:
-            cur.execute(
-                "UPDATE solutions SET success_count = success_count + ?, last_used = ? WHERE id = ?",
-                (info["count"], now, row[0]),
-            )
-        else:
-            cur.execute(
-                """INSERT INTO solutions(error_pattern, solution, project, success_count, last_used)
-                   VALUES(?, ?, ?, ?, ?)""",
-                (pattern, f"[auto] Observed {info['count']}x: {info['sample_error'][:200]}", project, info["count"], now),
-            )
-        upserted += 1
+    cur.executemany(
+        """INSERT INTO solutions(error_pattern, solution, project, success_count, last_used)
+           VALUES(?, ?, ?, ?, ?)
+           ON CONFLICT(error_pattern, project) DO UPDATE SET
+             success_count = success_count + excluded.success_count,
+             last_used = excluded.last_used""",
+        [(pattern, f"[auto] Observed {info['count']}x: {info['sample_error'][:200]}", project, info["count"], now)
+         for (pattern, project), info in pattern_counts.items()],
+    )
+
+    cur.executemany("UPDATE events SET aggregated = 1 WHERE id = ?", [(e[0],) for e in events])
+    last_id = events[-1][0]
+    cur.execute(
+        """INSERT INTO aggregate_meta(table_name, last_id, last_run) VALUES('events', ?, ?)
+           ON CONFLICT(table_name) DO UPDATE SET last_id = excluded.last_id, last_run = excluded.last_run""",
+        (last_id, now),
+    )
+    return len(events), last_id, pattern_counts
 
-    conn.commit()
+
+def aggregate():
+    conn = migrate.ensure(dis_db.connect(DB))
+    ensure_index(conn)
+    drain(conn)  # スプール中のイベントも集計対象にする
+
+    # 未集計のイベント (部分索引 idx_events_unaggregated) だけを id 順にチャンク処理する。
+    # 各チャンクの UPSERT と集計済みの印は同一トランザクションなので、再実行しても二重計上しない。
+    # aggregate_meta.last_id は最後に処理した id の記録 (表示用) で、sync で移された行もあるので起点にはしない。
+    last_id = 0
+    total_events = 0
+    patterns = set()
+    while True:
+        n, last_id, pattern_counts = dis_db.write(conn, _aggregate_chunk, last_id)
+        if not n:
+            break
+        total_events += n
+        patterns.update(pattern_counts)
+
+    if not total_events:
+        print("No events to aggregate.")
+        conn.close()
+        return
+
+    # 新規・更新 solutions の posting list を差分更新
+    refresh_index(conn)
     conn.close()
-    print(f"Aggregated: {len(events)} events → {upserted} solution patterns")
+    print(f"Aggregated: {total_events} events → {len(patterns)} solution patterns (up to event #{last_id})")
 
 
 def promote_feedback():
     """stability >= 4 のフィードバックを patterns テーブルに昇格。"""
-    conn = sqlite3.connect(DB)
+    conn = migrate.ensure(dis_db.connect(DB))
     cur = conn.cursor()
 
     cur.execute("""
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""DIS: 減衰した行の退避先 (dev-archive.db) と、その検索・復元。
+
+decay.py はスコアが ARCHIVE_THRESHOLD を下回った行を削除せず、ATTACH した dev-archive.db の同名テーブルへ
+INSERT ... SELECT で写してから dev.db から DELETE する (同じトランザクション)。dev.db は小さいまま、履歴は残る。
+
+  - 退避テーブルは dev.db のテーブルと同じ列 (制約なし) + archived_at。dev.db に列が増えたら追加する。
+  - TEXT 列は COMPRESS_MIN 文字以上なら zlib で圧縮した BLOB で持つ (pack / unpack)。
+  - dev.db に fts_<table> がある表は、退避側にも本文を持たない (content='') FTS5 索引を作る (search 用)。
+  - solutions は語の posting list (solution_terms) も退避側に作る (similarity.find_similar(archive=True) 用)。
+
+WAL では ATTACH した DB をまたぐ commit は DB ごとにしか原子的でないので、途中で落ちると同じ (table, id) が
+両方に残りうる。move / restore はその状態からやり直しても収束する (どちらも (table, id) について冪等):
+  - move: 退避側に既にある id は、退避側の古い写しを消して dev.db の今の行で写し直す (dev.db 側が新しい)。
+  - restore: dev.db に同じ行 (同じ id・ts) が既にあれば、退避側を片付けるだけで戻したことにする。
+
+Usage:
+  archive.py stats                                          # 退避テーブルの行数・サイズ
+  archive.py search [--tables fts_feedback,...] [--project P] [--limit 5] <text>   # 退避分の全文検索 (JSON)
+  archive.py restore <table> <id> [<id> ...]                # dev.db に戻す
+"""
+import json
+import os
+import sqlite3
+import sys
+import zlib
+from datetime import datetime
+
+import dis_db
+import migrate
+
+DB = os.path.expanduser("~/.claude/intelligence/dev.db")
+
+# これより長い TEXT は圧縮して持つ (短い文は zlib のヘッダ分かえって大きくなる)
+COMPRESS_MIN = 200
+# 復元した行のスコア (すぐに次の減衰で退避し直されないように)
+RESTORE_SCORE = 1.0
+# search の既定の索引
+SEARCH_TABLES = ("fts_feedback", "fts_patterns", "fts_questions", "fts_test_sessions")
+
+
+def path_for(db: str) -> str:
+    """dev.db と同じディレクトリの dev-archive.db。"""
+    return os.path.join(os.path.dirname(os.path.abspath(db)), "dev-archive.db")
+
+
+def pack(value):
+    if isinstance(value, str) and len(value) >= COMPRESS_MIN:
+        data = value.encode("utf-8")
+        packed = zlib.compress(data, 9)
+        if len(packed) < len(data):
+            return packed
+    return value
+
+
+def unpack(value):
+    return zlib.decompress(value).decode("utf-8") if isinstance(value, bytes) else value
+
+
+def _register(conn: sqlite3.Connection):
+    conn.create_function("arc_pack", 1, pack, deterministic=True)
+    conn.create_function("arc_unpack", 1, unpack, deterministic=True)
+
+
+def _ensure_common(conn: sqlite3.Connection, schema: str):
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {schema}.archive_meta (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {schema}.solution_terms "
+                 "(term TEXT NOT NULL, solution_id INTEGER NOT NULL, tf REAL NOT NULL, "
+                 "PRIMARY KEY (term, solution_id)) WITHOUT ROWID")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_solution_terms_sid ON solution_terms(solution_id)")
+
+
+def attach(conn: sqlite3.Connection, path: str | None = None) -> sqlite3.Connection:
+    """conn (dev.db) に退避先を archive として ATTACH する。ATTACH はトランザクションの外で呼ぶ。"""
+    if not any(r[1] == "archive" for r in conn.execute("PRAGMA database_list")):
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("ATTACH DATABASE ? AS archive", (path or path_for(DB),))
+        conn.execute("PRAGMA archive.journal_mode = WAL")
+        conn.execute("PRAGMA archive.synchronous = NORMAL")
+    _register(conn)
+    _ensure_common(conn, "archive")
+    conn.commit()
+    return conn
+
+
+def _columns(cur: sqlite3.Cursor, schema: str, table: str) -> list[tuple[str, str]]:
+    return [(r[1], r[2].upper()) for r in cur.execute(f"PRAGMA {schema}.table_info({table})").fetchall()]
+
+
+def _ensure_table(cur: sqlite3.Cursor, table: str) -> list[tuple[str, str]]:
+    """archive.<table> (と archive.fts_<table>) を dev.db の定義に合わせる。dev.db 側の列を返す。"""
+    cols = _columns(cur, "main", table)
+    have = {name for name, _ in _columns(cur, "archive", table)}
+    if not have:
+        defs = ", ".join("id INTEGER PRIMARY KEY" if name == "id" else f"{name} {decl}".strip()
+                         for name, decl in cols)
+        cur.execute(f"CREATE TABLE archive.{table} ({defs}, archived_at TEXT NOT NULL)")
+    else:
+        for name, decl in cols:
+            if name not in have:
+                cur.execute(f"ALTER TABLE archive.{table} ADD COLUMN {name} {decl}".strip())
+    fts = _fts_columns(cur, "main", table)
+    if fts and not _fts_columns(cur, "archive", table):
+        import fts as fts_query
+
+        # dev.db 側と同じ tokenize にする (古い SQLite では unicode61、migrations/0012_fts_search.py)
+        cur.execute(f"CREATE VIRTUAL TABLE archive.fts_{table} USING fts5({', '.join(fts)}, "
+                    f"content='', tokenize='{fts_query.tokenizer(cur.connection, f'fts_{table}')}')")
+    return cols
+
+
+def _fts_columns(cur: sqlite3.Cursor, schema: str, table: str) -> list[str]:
+    return [name for name, _ in _columns(cur, schema, f"fts_{table}")]
+
+
+def _index_terms(cur: sqlite3.Cursor, rows: list[tuple]):
+    """(id, error_pattern) を archive.solution_terms に書く (similarity と同じ tokenize)。"""
+    import similarity
+
+    postings = [(t, sid, tf) for sid, pattern in rows
+                for t, tf in similarity.compute_tf(similarity.tokenize(pattern or "")).items()]
+    cur.executemany("INSERT OR REPLACE INTO archive.solution_terms(term, solution_id, tf) VALUES(?, ?, ?)", postings)
+
+
+def _drop_archived(cur: sqlite3.Cursor, table: str, ids: list[int]):
+    """archive.<table> の ids を退避側の索引 (fts_<table>・solution_terms) ごと消す。"""
+    fts = _fts_columns(cur, "archive", table)
+    for rid in ids:
+        if fts:
+            cur.execute(f"SELECT {', '.join(f'arc_unpack({c})' for c in fts)} FROM archive.{table} WHERE id = ?",
+                        (rid,))
+            row = cur.fetchone()
+            if row is not None:
+                # content='' の索引は元の値を渡して消す
+                cur.execute(f"INSERT INTO archive.fts_{table}(fts_{table}, rowid, {', '.join(fts)}) "
+                            f"VALUES('delete', ?, {','.join('?' * len(fts))})", [rid, *row])
+        if table == "solutions":
+            cur.execute("DELETE FROM archive.solution_terms WHERE solution_id = ?", (rid,))
+        cur.execute(f"DELETE FROM archive.{table} WHERE id = ?", (rid,))
+
+
+def move(cur: sqlite3.Cursor, table: str, where: str, params: tuple = ()) -> int:
+    """main.<table> の where に当たる行を archive.<table> に写して消す。消した行数を返す。
+
+    attach 済みの接続で、呼び出し側のトランザクションの中で呼ぶ。DELETE なので dev.db のトリガー
+    (fts_*・solution_terms・rollup_*・sync_changelog) はいつも通り発火する。
+    """
+    cols = _ensure_table(cur, table)
+    names = [name for name, _ in cols]
+    values = [f"arc_pack({name})" if decl == "TEXT" else name for name, decl in cols]
+
+    # 前回の move が退避側だけ commit して落ちた行: 古い写しを消して今の行で写し直す
+    cur.execute(f"SELECT id FROM main.{table} WHERE ({where}) AND id IN (SELECT id FROM archive.{table})", params)
+    _drop_archived(cur, table, [r[0] for r in cur.fetchall()])
+
+    fts = _fts_columns(cur, "main", table)
+    if fts:
+        cur.execute(f"INSERT INTO archive.fts_{table}(rowid, {', '.join(fts)}) "
+                    f"SELECT id, {', '.join(fts)} FROM main.{table} WHERE {where}", params)
+    if table == "solutions":
+        cur.execute(f"SELECT id, error_pattern FROM main.solutions WHERE {where}", params)
+        _index_terms(cur, cur.fetchall())
+        # 古い版の posting list が残っている時は上書きしない (find_similar が全件作り直す)
+        import similarity
+        cur.execute("INSERT OR IGNORE INTO archive.archive_meta(key, value) VALUES('tokenizer_version', ?)",
+                    (similarity.TOKENIZER_VERSION,))
+    cur.execute(f"INSERT INTO archive.{table}({', '.join(names)}, archived_at) "
+                f"SELECT {', '.join(values)}, datetime('now') FROM main.{table} WHERE {where}", params)
+    cur.execute(f"DELETE FROM main.{table} WHERE {where}", params)
+    return cur.rowcount
+
+
+def restore(conn: sqlite3.Connection, table: str, ids: list[int]) -> tuple[list[int], list[int]]:
+    """archive.<table> の ids を dev.db に戻す。(戻した id, 戻せなかった id) を返す。
+
+    スコアは RESTORE_SCORE 以上にし、減衰の起点が last_used / last_seen の表はそれを今にする
+    (ts 起点の表は ts を変えない。rollup_* の日付がずれるため)。一意制約にぶつかる行 (同じ error_pattern の
+    solution が新しくできている等) は戻さずに退避側に残す。dev.db に同じ id・ts の行が既にあれば
+    (前回の restore が dev.db 側だけ commit して落ちた)、退避側を片付けて戻したことにする。
+    """
+    from decay import DECAY_TABLES
+
+    decay_ts = {t: (score_col, ts_col) for t, score_col, ts_col, *_ in DECAY_TABLES}
+    if table not in decay_ts:
+        raise ValueError(f"not an archived table: {table} (one of {', '.join(decay_ts)})")
+
+    def run(conn):
+        cur = conn.cursor()
+        cols = _ensure_table(cur, table)
+        have = {name for name, _ in _columns(cur, "archive", table)}
+        names = [name for name, _ in cols if name in have]
+        score_col, ts_col = decay_ts.get(table, (None, None))
+        now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        restored, skipped = [], []
+        for rid in ids:
+            cur.execute(f"SELECT {', '.join(f'arc_unpack({n})' for n in names)} FROM archive.{table} WHERE id = ?",
+                        (rid,))
+            row = cur.fetchone()
+            if row is None:
+                skipped.append(rid)
+                continue
+            values = dict(zip(names, row))
+            cur.execute(f"SELECT ts FROM main.{table} WHERE id = ?", (rid,))
+            present = cur.fetchone()
+            if present is not None and present[0] != values.get("ts"):
+                skipped.append(rid)  # 同じ id の別の行
+                continue
+            if present is None:
+                if score_col in values:
+                    values[score_col] = max(values[score_col] or 0, RESTORE_SCORE)
+                if ts_col in values and ts_col.startswith("last_"):
+                    values[ts_col] = now
+                try:
+                    cur.execute(f"INSERT INTO main.{table}({', '.join(names)}) "
+                                f"VALUES({','.join('?' * len(names))})", [values[n] for n in names])
+                except sqlite3.IntegrityError:
+                    skipped.append(rid)
+                    continue
+            _drop_archived(cur, table, [rid])
+            restored.append(rid)
+        return restored, skipped
+
+    return dis_db.write(conn, run)
+
+
+# ── 検索 (退避側だけを開く) ──────────────────────────────
+
+
+def open_archive(path: str | None = None) -> sqlite3.Connection | None:
+    """dev-archive.db を直接開く (テーブル名はそのまま退避側を指す)。なければ None。"""
+    path = path or path_for(DB)
+    if not os.path.exists(path):
+        return None
+    conn = dis_db.connect(path)
+    _register(conn)
+    return conn
+
+
+def _has_table(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+
+def _refresh_terms(conn: sqlite3.Connection):
+    """similarity.TOKENIZER_VERSION が変わっていたら退避側の posting list を作り直す。"""
+    import similarity
+
+    row = conn.execute("SELECT value FROM archive_meta WHERE key = 'tokenizer_version'").fetchone()
+    if row and row[0] == similarity.TOKENIZER_VERSION:
+        return
+
+    def run(conn):
+        cur = conn.cursor()
+        cur.execute("DELETE FROM solution_terms")
+        rows = cur.execute("SELECT id, arc_unpack(error_pattern) FROM solutions").fetchall()
+        postings = [(t, sid, tf) for sid, pattern in rows
+                    for t, tf in similarity.compute_tf(similarity.tokenize(pattern or "")).items()]
+        cur.executemany("INSERT INTO solution_terms(term, solution_id, tf) VALUES(?, ?, ?)", postings)
+        cur.execute("INSERT OR REPLACE INTO archive_meta(key, value) VALUES('tokenizer_version', ?)",
+                    (similarity.TOKENIZER_VERSION,))
+
+    dis_db.write(conn, run)
+
+
+def find_similar(error_text: str, threshold: float = 0.5, limit: int = 5, path: str | None = None) -> list[dict]:
+    """退避した solutions から similarity.find_similar と同じ形で引く (tfidf のみ、"archived": True 付き)。"""
+    import similarity
+
+    conn = open_archive(path)
+    if conn is None:
+        return []
+    try:
+        if not _has_table(conn, "solutions"):
+            return []
+        _refresh_terms(conn)
+        cur = conn.cursor()
+        scored = [(sid, sim) for sid, sim in similarity._rank_tfidf(cur, error_text) if sim >= threshold]
+        results = []
+        for chunk in similarity._chunks([sid for sid, _ in scored]):
+            cur.execute(f"SELECT id, arc_unpack(error_pattern), arc_unpack(solution), score FROM solutions "
+                        f"WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+            rows = {r[0]: r for r in cur.fetchall()}
+            results.extend({"id": sid, "pattern": rows[sid][1], "solution": rows[sid][2], "score": rows[sid][3],
+                            "similarity": round(sim, 3), "archived": True}
+                           for sid, sim in scored if sid in rows)
+    finally:
+        conn.close()
+    results.sort(key=lambda x: (x["similarity"], x["score"] or 0), reverse=True)
+    return results[:limit]
+
+
+def search(text: str, tables: list[str] = SEARCH_TABLES, project: str | None = None, limit: int = 5,
+           path: str | None = None) -> dict[str, list[dict]]:
+    """退避した行を fts_* 索引 (fts.py の MATCH 式、bm25 × score の順) で引く。{元テーブル: 行の list}。"""
+    import fts as fts_query
+
+    conn = open_archive(path)
+    out = {}
+    if conn is None:
+        return {t.removeprefix("fts_"): [] for t in tables}
+    try:
+        for index in tables:
+            table = index.removeprefix("fts_")
+            out[table] = []
+            if not _has_table(conn, index):
+                continue
+            expr = fts_query.match_query(text, conn, index)
+            if not expr:
+                continue
+            names = [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+            project_filter = " AND t.project = ?" if project and "project" in names else ""
+            cur = conn.execute(
+                f"SELECT {', '.join(f'arc_unpack(t.{n})' for n in names)} FROM {index} JOIN {table} t "
+                f"ON t.id = {index}.rowid WHERE {index} MATCH ?{project_filter} "
+                f"ORDER BY bm25({index}) * (1.0 + MIN(MAX(t.score, 0), 4) / 4.0) LIMIT ?",
+                (expr, project, limit) if project_filter else (expr, limit))
+            out[table] = [dict(zip(names, row)) for row in cur.fetchall()]
+    finally:
+        conn.close()
+    return out
+
+
+def stats(path: str | None = None) -> dict:
+    conn = open_archive(path)
+    if conn is None:
+        return {}
+    try:
+        tables = [r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'fts_%' "
+            "AND name NOT IN ('archive_meta', 'solution_terms') AND sql NOT LIKE 'CREATE VIRTUAL%' ORDER BY name")]
+        rows = {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in tables}
+        page = conn.execute("PRAGMA page_size").fetchone()[0] * conn.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        conn.close()
+    return {"path": path or path_for(DB), "bytes": page, "rows": rows}
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    cmd = args[0] if args else ""
+    if cmd == "stats":
+        print(json.dumps(stats(), indent=2))
+    elif cmd == "search":
+        rest = args[1:]
+        tables = rest[rest.index("--tables") + 1].split(",") if "--tables" in rest else list(SEARCH_TABLES)
+        project = rest[rest.index("--project") + 1] if "--project" in rest else None
+        limit = int(rest[rest.index("--limit") + 1]) if "--limit" in rest else 5
+        words, skip = [], False
+        for a in rest:
+            if skip:
+                skip = False
+            elif a in ("--tables", "--project", "--limit"):
+                skip = True
+            else:
+                words.append(a)
+        print(json.dumps(search(" ".join(words), tables, project, limit), ensure_ascii=False))
+    elif cmd == "restore" and len(args) >= 3:
+        conn = attach(migrate.ensure(dis_db.connect(DB)))
+        try:
+            restored, skipped = restore(conn, args[1], [int(i) for i in args[2:]])
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+        finally:
+            conn.close()
+        print(f"Restored {len(restored)} {args[1]}" + (f", skipped {skipped} (not archived or conflicting)"
+                                                         if skipped else ""))
+        sys.exit(0 if not skipped else 1)
+    else:
+        print(__doc__.split("Usage:")[1].rstrip(), file=sys.stderr)
+        sys.exit(1)
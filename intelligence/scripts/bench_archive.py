@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""DIS: decay.py の退避 (dev-archive.db への移動) のベンチマーク。
+
+synth_db.py で一時 dev.db を作り、test_sessions には実際のテスト出力に近い長さの error_output / fix_history
+(スタックトレースと修正履歴の JSON) を入れる。各テーブルの --fraction の行のスコアを ARCHIVE_THRESHOLD 未満にして
+decay.apply_decay を1回流し、次を測る。
+
+  1. 減衰 + 退避の時間と移した行数
+  2. dev.db の使用中ページ (freelist を除く) の減り方、dev-archive.db の大きさと本文の圧縮前後の合計
+  3. find_similar の時間 (dev.db だけ / archive=True)、archive.search の時間
+  4. 退避した行を restore で戻し、score と last_* 以外が元の行と一致するか
+  5. move / restore が片方の DB だけ commit して落ちた状態 (同じ行が両方にある) からやり直して、
+     各行が片側だけに収束するか (move は dev.db の新しい値で写し直す)
+
+dev.db が小さくならない、退避した本文が圧縮されていない、戻した行が一致しない、退避した solution が
+退避側の検索で引けない、やり直しで収束しない、のどれかなら exit 1。
+
+Usage:
+  bench_archive.py [--rows 20000] [--fraction 0.3] [--queries 20] [--seed 7] [--json]
+"""
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import archive
+import decay
+import dis_db
+import similarity
+import synth_db
+
+TABLES = ("solutions", "feedback", "test_sessions", "dev_sessions", "questions")
+
+
+def _trace(rng: random.Random, error: str) -> str:
+    frames = "\n".join(f"    at {rng.choice(synth_db._IDENTS)} (/home/dev/app/src/{rng.choice(synth_db._DIRS)}/"
+                       f"{rng.choice(synth_db._IDENTS)}.ts:{rng.randint(1, 400)}:{rng.randint(1, 80)})"
+                       for _ in range(rng.randint(8, 30)))
+    return f"FAIL src/{rng.choice(synth_db._DIRS)}/{rng.choice(synth_db._IDENTS)}.test.ts\n  ● {error}\n\n{frames}"
+
+
+def _prepare(db: str, fraction: float, seed: int):
+    """長い本文を入れ、各テーブルの fraction の行を退避の対象にする。"""
+    rng = random.Random(seed)
+    conn = dis_db.connect(db)
+    rows = conn.execute("SELECT id, error_pattern FROM test_sessions").fetchall()
+    conn.executemany("UPDATE test_sessions SET error_output = ?, fix_history = ? WHERE id = ?",
+                     [(_trace(rng, p or "Error"),
+                       json.dumps([{"iteration": i + 1, "file": f"src/{rng.choice(synth_db._DIRS)}.ts",
+                                    "change": rng.choice(synth_db._IDENTS) + " を修正"} for i in range(rng.randint(1, 5))],
+                                  ensure_ascii=False), sid)
+                      for sid, p in rows])
+    for table in TABLES:
+        ids = [r[0] for r in conn.execute(f"SELECT id FROM {table} ORDER BY id")]
+        # questions は resolved だけが退避対象
+        extra = ", status = 'resolved'" if table == "questions" else ""
+        conn.executemany(f"UPDATE {table} SET score = 0.05{extra} WHERE id = ?",
+                         [(i,) for i in rng.sample(ids, int(len(ids) * fraction))])
+    conn.commit()
+    similarity.rebuild_index(conn)
+    conn.close()
+
+
+def _live_bytes(path: str) -> int:
+    conn = dis_db.connect(path)
+    size, count, free = (conn.execute(f"PRAGMA {p}").fetchone()[0] for p in ("page_size", "page_count",
+                                                                          "freelist_count"))
+    conn.close()
+    return size * (count - free)
+
+
+def _snapshot(db: str) -> dict[str, dict[int, dict]]:
+    conn = dis_db.connect(db)
+    out = {}
+    for table in TABLES:
+        cur = conn.execute(f"SELECT * FROM {table}")
+        names = [d[0] for d in cur.description]
+        out[table] = {r[0]: {n: v for n, v in zip(names, r) if n != "score" and not n.startswith("last_")}
+                      for r in cur.fetchall()}
+    conn.close()
+    return out
+
+
+def _text_bytes(db: str) -> tuple[int, int]:
+    """退避側の TEXT の値の (保存している大きさ, 元に戻した大きさ) の合計 (bytes)。"""
+    conn = archive.open_archive(archive.path_for(db))
+    stored = raw = 0
+    for table in TABLES:
+        for row in conn.execute(f"SELECT * FROM {table}"):
+            for v in row:
+                if isinstance(v, (str, bytes)):
+                    stored += len(v) if isinstance(v, bytes) else len(v.encode("utf-8"))
+                    raw += len(archive.unpack(v).encode("utf-8"))
+    conn.close()
+    return stored, raw
+
+
+def _median_ms(fn, items) -> float:
+    times = []
+    for item in items:
+        t0 = time.perf_counter()
+        fn(item)
+        times.append((time.perf_counter() - t0) * 1000)
+    return round(statistics.median(times), 2)
+
+
+def _interrupted(db: str, ids: list[int]) -> bool:
+    """solutions の ids (dev.db にある) で、途中で落ちた move / restore の状態を作ってやり直す。"""
+    conn = archive.attach(dis_db.connect(db), archive.path_for(db))
+    cols = [r[1] for r in conn.execute("PRAGMA main.table_info(solutions)")]
+    marks = ",".join("?" * len(ids))
+    where = f"id IN ({marks})"
+    insert = f"INSERT INTO main.solutions({', '.join(cols)}) VALUES({','.join('?' * len(cols))})"
+    rows = conn.execute(f"SELECT {', '.join(cols)} FROM main.solutions WHERE {where}", ids).fetchall()
+
+    def lost_main_delete(conn):
+        # 退避側だけ commit された move: 行は dev.db にも残り、その後で更新された
+        cur = conn.cursor()
+        archive.move(cur, "solutions", where, ids)
+        cur.executemany(insert, rows)
+        cur.execute(f"UPDATE main.solutions SET solution = solution || ' (edited)' WHERE {where}", ids)
+
+    dis_db.write(conn, lost_main_delete)
+    dis_db.write(conn, lambda c: archive.move(c.cursor(), "solutions", where, ids))
+    texts = [r[0] for r in conn.execute(f"SELECT arc_unpack(solution) FROM archive.solutions WHERE {where}", ids)]
+    moved = (conn.execute(f"SELECT COUNT(*) FROM main.solutions WHERE {where}", ids).fetchone()[0] == 0
+             and len(texts) == len(ids) and all(t.endswith(" (edited)") for t in texts))
+
+    def lost_archive_delete(conn):
+        # dev.db 側だけ commit された restore: 同じ行が退避側にも残っている
+        conn.cursor().executemany(insert, conn.execute(
+            f"SELECT {', '.join(f'arc_unpack({c})' for c in cols)} FROM archive.solutions WHERE {where}",
+            ids).fetchall())
+
+    dis_db.write(conn, lost_archive_delete)
+    restored, skipped = archive.restore(conn, "solutions", ids)
+    left = conn.execute(f"SELECT COUNT(*) FROM archive.solutions WHERE {where}", ids).fetchone()[0]
+    terms = conn.execute(f"SELECT COUNT(*) FROM archive.solution_terms WHERE solution_id IN ({marks})",
+                         ids).fetchone()[0]
+    conn.close()
+    return moved and sorted(restored) == sorted(ids) and not skipped and not left and not terms
+
+
+def run(rows: int, fraction: float, queries: int, seed: int) -> tuple[dict, dict]:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "dev.db")
+        with contextlib.redirect_stdout(io.StringIO()):
+            synth_db.generate(db, rows, seed)
+        similarity.DB = decay.DB = archive.DB = db
+        _prepare(db, fraction, seed)
+        before = _snapshot(db)
+        live_before = _live_bytes(db)
+
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            decay.apply_decay()
+        decay_secs = time.perf_counter() - t0
+        dis_db.close_shared()
+
+        after = _snapshot(db)
+        moved = {t: sorted(before[t].keys() - after[t].keys()) for t in TABLES}
+        live_after = _live_bytes(db)
+        archive_bytes = os.path.getsize(archive.path_for(db))
+        stored_bytes, text_bytes = _text_bytes(db)
+
+        rng = random.Random(seed)
+        archived_solutions = [before["solutions"][i]["error_pattern"] for i in moved["solutions"]]
+        texts = rng.sample(archived_solutions, min(queries, len(archived_solutions)))
+        hot_ms = _median_ms(lambda t: similarity.find_similar(t, 0.3, 5), texts)
+        with_archive_ms = _median_ms(lambda t: similarity.find_similar(t, 0.3, 5, archive=True), texts)
+        # 同じ文の solution が dev.db にも退避側にも複数あるので、退避側だけの検索で完全一致が先頭に来るかを見る
+        found = sum(bool(hits) and hits[0]["similarity"] == 1.0
+                    for hits in (archive.find_similar(t, 0.3, 5, archive.path_for(db)) for t in texts))
+        search_ms = _median_ms(lambda t: archive.search(t), texts)
+        dis_db.close_shared()
+
+        conn = archive.attach(dis_db.connect(db), archive.path_for(db))
+        t0 = time.perf_counter()
+        restored = {t: archive.restore(conn, t, moved[t]) for t in TABLES}
+        restore_secs = time.perf_counter() - t0
+        conn.close()
+        back = _snapshot(db)
+        skipped = {t: len(s) for t, (_, s) in restored.items() if s}
+        converged = _interrupted(db, moved["solutions"][:10])
+
+    total = sum(len(ids) for ids in moved.values())
+    out = {
+        "moved": {t: len(ids) for t, ids in moved.items()},
+        "decay_seconds": round(decay_secs, 3),
+        "hot_live_bytes": {"before": live_before, "after": live_after},
+        "archive_bytes": archive_bytes,
+        "archived_text_bytes": {"stored": stored_bytes, "raw": text_bytes},
+        "find_similar_ms": {"hot": hot_ms, "hot + archive": with_archive_ms},
+        "archive_search_ms": search_ms,
+        "restore_seconds": round(restore_secs, 3),
+        "restore_skipped": skipped,
+    }
+    checks = {
+        "rows moved": total > 0,
+        "dev.db live pages shrink": live_after < live_before,
+        "archived text stored compressed": stored_bytes < text_bytes,
+        "archived solutions found in archive": found == len(texts),
+        "restored rows match originals": not skipped and all(
+            back[t][i] == before[t][i] for t in TABLES for i in moved[t]),
+        "interrupted move / restore converge on retry": converged,
+    }
+    return out, checks
+
+
+def main():
+    args = sys.argv[1:]
+    rows = int(args[args.index("--rows") + 1]) if "--rows" in args else 20000
+    fraction = float(args[args.index("--fraction") + 1]) if "--fraction" in args else 0.3
+    queries = int(args[args.index("--queries") + 1]) if "--queries" in args else 20
+    seed = int(args[args.index("--seed") + 1]) if "--seed" in args else 7
+
+    out, checks = run(rows, fraction, queries, seed)
+    ok = all(checks.values())
+    if "--json" in args:
+        print(json.dumps({"rows": rows, "fraction": fraction, **out, "checks": checks}, indent=2))
+    else:
+        print(f"archive benchmark: {rows:,} synthetic rows, {fraction:.0%} of each table below the threshold")
+        print(f"  moved         {sum(out['moved'].values()):,} rows in {out['decay_seconds']:.2f}s (decay + archive) "
+              + ", ".join(f"{n} {t}" for t, n in out["moved"].items()))
+        hot = out["hot_live_bytes"]
+        print(f"  dev.db        {hot['before'] / 1e6:.1f} MB -> {hot['after'] / 1e6:.1f} MB live pages")
+        text = out["archived_text_bytes"]
+        print(f"  archive       {out['archive_bytes'] / 1e6:.1f} MB on disk (incl. FTS / posting indexes), "
+              f"text {text['raw'] / 1e6:.2f} MB stored as {text['stored'] / 1e6:.2f} MB")
+        print(f"  find_similar  {out['find_similar_ms']['hot']:.2f} ms hot, "
+              f"{out['find_similar_ms']['hot + archive']:.2f} ms with archive=True")
+        print(f"  search        {out['archive_search_ms']:.2f} ms (archive.search, 4 indexes)")
+        print(f"  restore       {out['restore_seconds']:.2f}s for all moved rows")
+        print()
+        for name, passed in checks.items():
+            print(f"  {'OK  ' if passed else 'FAIL'} {name}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
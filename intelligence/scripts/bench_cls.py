@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""DIS: CLS 解析 (cognitive.py) のスループットベンチマーク。
+
+生成した大きなソース (Python / TypeScript / Go / Rust) を解析し、行/秒を旧実装
+(行ごとの re.match + findall x2、インデント/2 でネスト推定) と比較する。
+Python は measure-quality での実際の処理単位 (ast.parse + SE の識別子抽出 + CLS) でも比較する。
+
+Usage:
+  bench_cls.py [--lines 50000] [--json]
+"""
+import ast
+import json
+import re
+import sys
+import time
+from collections import Counter
+
+import cognitive
+
+# 旧 measure_cls_file (比較用)
+_CONTROL_FLOW = re.compile(r'\b(if|else\s+if|elif|for|while|do|switch|case|catch|except|'
+                           r'try|finally|with|match)\b')
+_FLOW_BREAK = re.compile(r'\b(break|continue|goto|return|throw|raise)\b')
+
+
+def legacy_cls(source: str) -> dict:
+    total_cls = max_cls = func_count = max_nesting = current = 0
+    in_function = False
+    for line in source.split('\n'):
+        stripped = line.strip()
+        if not stripped or stripped.startswith(('#', '//', '/*', '*', '--')):
+            continue
+        indent = len(line) - len(line.lstrip())
+        nesting = indent // 2 if indent > 0 else 0
+        max_nesting = max(max_nesting, nesting)
+        if re.match(r'\s*(def |function |const \w+ = |async |export (default )?function|fn )', line):
+            if in_function:
+                max_cls = max(max_cls, current)
+            func_count += 1
+            in_function = True
+            current = 0
+        structural = len(_CONTROL_FLOW.findall(stripped))
+        line_cls = structural + structural * max(0, nesting - 1) + len(_FLOW_BREAK.findall(stripped))
+        total_cls += line_cls
+        current += line_cls
+    if in_function:
+        max_cls = max(max_cls, current)
+    return {"cls_total": total_cls, "cls_max": max_cls, "functions": func_count, "max_nesting": max_nesting}
+
+
+# 関数1つ分のテンプレート ({i} は通し番号)
+TEMPLATES = {
+    "python": '''
+def handler_{i}(items, limit=10):
+    """Process batch {i}."""
+    total = 0
+    for item in items:
+        if item.get("kind") == "a" and item["value"] > limit:
+            total += item["value"]
+        elif item.get("kind") == "b":
+            try:
+                total += int(item["raw"])
+            except ValueError:
+                continue
+        else:
+            total -= 1 if item else 0
+    return [x for x in items if x] and total
+''',
+    "typescript": '''
+export async function handler{i}(items: Item[], limit = 10): Promise<number> {{
+  let total = 0;
+  for (const item of items) {{
+    if (item.kind === "a" && item.value > limit) {{
+      total += item.value;
+    }} else if (item.kind === "b") {{
+      try {{
+        total += parseInt(`${{item.raw}}`, 10);
+      }} catch (e) {{
+        continue;
+      }}
+    }} else {{
+      total -= item ? 1 : 0;
+    }}
+  }}
+  return items.filter((x) => {{ return x.ok || x.forced; }}).length + total;
+}}
+''',
+    "go": '''
+func (s *Store) Handler{i}(items []Item, limit int) (int, error) {{
+	total := 0
+	for _, item := range items {{
+		if v, err := item.Value(); err != nil {{
+			return 0, err
+		}} else if v > limit && item.Kind == "a" {{
+			total += v
+		}} else {{
+			switch item.Kind {{
+			case "b":
+				total--
+			}}
+		}}
+	}}
+	return total, nil
+}}
+''',
+    "rust": '''
+fn handler_{i}<'a>(items: &'a [Item], limit: i64) -> Result<i64, Error> {{
+    let mut total = 0;
+    for item in items.iter() {{
+        match item.kind {{
+            Kind::A if item.value > limit && item.ok => {{ total += item.value; }}
+            Kind::B => {{
+                if let Some(raw) = &item.raw {{ total += raw.parse::<i64>()?; }} else {{ total -= 1; }}
+            }}
+            _ => {{}}
+        }}
+    }}
+    Ok(total)
+}}
+''',
+}
+
+
+def legacy_python_metrics(source: str):
+    """旧 measure-quality の Python 処理: SE 用に ast.walk、CLS は行ベース。"""
+    ids = []
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Name):
+            ids.append(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            ids.append(node.name)
+        elif isinstance(node, ast.Attribute):
+            ids.append(node.attr)
+    return Counter(ids), legacy_cls(source)
+
+
+def python_metrics(source: str):
+    """新しい処理: ast は1回だけ作り、CLS の走査で識別子も集める。"""
+    ids = []
+    cls = cognitive.analyze_python(source, ast.parse(source), ids)
+    return Counter(ids), cls
+
+
+def make_source(lang: str, lines: int) -> str:
+    tmpl = TEMPLATES[lang]
+    per = tmpl.count("\n")
+    return "".join(tmpl.format(i=i) for i in range(max(1, lines // per)))
+
+
+def bench(label: str, fn, source: str, repeat: int = 3) -> dict:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(source)
+        best = min(best, time.perf_counter() - t0)
+    lines = source.count("\n") + 1
+    return {"name": label, "lines": lines, "seconds": round(best, 4),
+            "lines_per_sec": round(lines / best) if best else 0}
+
+
+def main():
+    args = sys.argv[1:]
+    lines = int(args[args.index("--lines") + 1]) if "--lines" in args else 50000
+
+    results = []
+    for lang in TEMPLATES:
+        source = make_source(lang, lines)
+        results.append({"lang": lang, **bench("legacy", legacy_cls, source)})
+        results.append({"lang": lang, **bench("cognitive", lambda s: cognitive.analyze(s, lang), source)})
+        summary = cognitive.analyze(source, lang)
+        results[-1]["functions"] = summary["functions"]
+        results[-1]["cls_max"] = summary["cls_max"]
+        if lang == "python":
+            results.append({"lang": lang, **bench("legacy SE+CLS", legacy_python_metrics, source)})
+            results.append({"lang": lang, **bench("cognitive SE+CLS", python_metrics, source)})
+
+    if "--json" in args:
+        print(json.dumps({"lines": lines, "results": results}, indent=2))
+        return
+    print(f"CLS benchmark: ~{lines} lines per language")
+    for r in results:
+        extra = f"  functions={r['functions']} cls_max={r['cls_max']}" if "functions" in r else ""
+        print(f"  {r['lang']:<11} {r['name']:<17} {r['seconds'] * 1000:8.1f}ms  {r['lines_per_sec']:>10,} lines/s{extra}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""DIS: dis_daemon.py の検索レイテンシのベンチマーク (起動のたびの python3 とデーモンの比較)。
+
+synth_db.py で一時 dev.db を作り、solutions の error_pattern を少し崩した文で similar と match を計測する。
+
+  1. cold: 従来の record-*.sh と同じ python3 -c "from similarity import find_similar" + python3 fts.py
+  2. client (daemon なし): python3 -S dis_daemon.py similar / match (プロセス内で検索する)
+  3. client → daemon: 同じコマンドをデーモン起動中に (シェルからの呼び出し)
+  4. in-process → daemon: dis_daemon.request の往復だけ (review-utils.sh のように1プロセスで何件も聞く場合)
+
+デーモンの結果がプロセス内の find_similar と一致すること、別の接続で足した solution がすぐ引けること
+(IndexCache が捨てられること)、client → daemon が cold より速いことを確かめ、外れたら exit 1。
+
+Usage:
+  bench_daemon.py [--rows 20000] [--queries 20] [--seed 7] [--json]
+"""
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import dis_daemon
+import dis_db
+import similarity
+import synth_db
+
+SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+TABLES = "fts_feedback,fts_patterns,fts_test_sessions,fts_questions"
+THRESHOLD = 0.3
+LIMIT = 5
+
+
+def _queries(db: str, n: int, seed: int) -> list[str]:
+    """solutions の error_pattern から語を1つ落とし、順番を少し入れ替えた文。"""
+    rng = random.Random(seed)
+    conn = dis_db.connect(db)
+    patterns = [r[0] for r in conn.execute("SELECT error_pattern FROM solutions ORDER BY id")]
+    conn.close()
+    out = []
+    for p in rng.sample(patterns, min(n, len(patterns))):
+        words = p.split()
+        if len(words) > 3:
+            words.pop(rng.randrange(len(words)))
+            i = rng.randrange(len(words) - 1)
+            words[i], words[i + 1] = words[i + 1], words[i]
+        out.append(" ".join(words))
+    return out
+
+
+def _ms(samples: list[float]) -> dict:
+    s = sorted(samples)
+    return {"median_ms": round(statistics.median(s), 2), "p95_ms": round(s[max(0, int(len(s) * 0.95) - 1)], 2)}
+
+
+def _time_commands(commands: list[list[str]], env: dict | None = None) -> tuple[dict, list[str]]:
+    times, outputs = [], []
+    for cmd in commands:
+        t0 = time.perf_counter()
+        out = subprocess.run(cmd, capture_output=True, text=True, cwd=SCRIPTS, env=env).stdout
+        times.append((time.perf_counter() - t0) * 1000)
+        outputs.append(out)
+    return _ms(times), outputs
+
+
+def _cold(text: str) -> list[list[str]]:
+    """従来の record-*.sh の呼び出し (dev.db は HOME から決まる)。"""
+    code = ("import json, sys; sys.path.insert(0, %r); from similarity import find_similar; "
+            "print(json.dumps(find_similar(sys.argv[1], %r, %r)))" % (SCRIPTS, THRESHOLD, LIMIT))
+    return [[sys.executable, "-c", code, text],
+            [sys.executable, os.path.join(SCRIPTS, "fts.py"), "--tables", TABLES, text]]
+
+
+def _client(db: str, sock: str, text: str) -> list[list[str]]:
+    base = [sys.executable, "-S", os.path.join(SCRIPTS, "dis_daemon.py")]
+    return [base + ["similar", "--db", db, "--socket", sock, "--threshold", str(THRESHOLD), "--limit", str(LIMIT),
+                    text],
+            base + ["match", "--db", db, "--socket", sock, "--tables", TABLES, text]]
+
+
+def run(rows: int, n: int, seed: int) -> tuple[dict, dict]:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "dev.db")
+        sock = os.path.join(tmp, "dis.sock")
+        with contextlib.redirect_stdout(io.StringIO()):
+            synth_db.generate(db, rows, seed)
+            similarity.DB = db
+            conn = dis_db.connect(db)
+            similarity.rebuild_index(conn)
+            conn.close()
+        queries = _queries(db, n, seed)
+        expected = [similarity.find_similar(q, THRESHOLD, LIMIT) for q in queries]
+
+        # cold は HOME の dev.db を見るので、一時 HOME に置いたものを使わせる
+        home = os.path.join(tmp, "home")
+        os.makedirs(os.path.join(home, ".claude", "intelligence"))
+        os.symlink(db, os.path.join(home, ".claude", "intelligence", "dev.db"))
+        cold, cold_out = _time_commands([c for q in queries for c in _cold(q)], {**os.environ, "HOME": home})
+        fallback, fallback_out = _time_commands([c for q in queries for c in _client(db, sock, q)])
+
+        if not dis_daemon.start(sock, db):
+            raise RuntimeError("daemon did not start")
+        try:
+            # 1周目は IndexCache を温める分を含む
+            first, _ = _time_commands([c for q in queries for c in _client(db, sock, q)])
+            warm, warm_out = _time_commands([c for q in queries for c in _client(db, sock, q)])
+
+            times, results = [], []
+            for q in queries:
+                t0 = time.perf_counter()
+                results.append(dis_daemon.request("similar", sock, text=q, threshold=THRESHOLD, limit=LIMIT))
+                dis_daemon.request("match", sock, text=q, tables=TABLES.split(","))
+                times.append((time.perf_counter() - t0) * 1000)
+            roundtrip = _ms(times)
+
+            # 別の接続で solution を足すと、次の検索で data_version が変わってキャッシュが捨てられる
+            marker = "zqxmarker failure in quuxwidget loader"
+            conn = dis_db.connect(db)
+            conn.execute("INSERT INTO solutions(error_pattern, solution, score) VALUES(?, 'fixed', 1.0)", (marker,))
+            conn.commit()
+            conn.close()
+            fresh = dis_daemon.request("similar", sock, text=marker, threshold=THRESHOLD, limit=LIMIT)
+            info = dis_daemon.request("ping", sock)
+        finally:
+            dis_daemon.request("shutdown", sock)
+
+    def _similar(outputs: list[str]) -> list:
+        return [json.loads(o) if o.strip() else None for o in outputs[0::2]]
+
+    results_out = {
+        "cold process": cold,
+        "client, no daemon": fallback,
+        "client -> daemon (first)": first,
+        "client -> daemon": warm,
+        "in-process -> daemon": roundtrip,
+    }
+    checks = {
+        "daemon results match in-process find_similar": results == expected,
+        "client results match with and without daemon": _similar(warm_out) == _similar(fallback_out)
+        == _similar(cold_out) == expected and warm_out[1::2] == fallback_out[1::2] == cold_out[1::2],
+        "new solution visible through daemon": bool(fresh) and fresh[0]["pattern"] == marker,
+        "client -> daemon faster than cold process": warm["median_ms"] < cold["median_ms"],
+    }
+    return {"results": results_out, "daemon": info}, checks
+
+
+def main():
+    args = sys.argv[1:]
+    rows = int(args[args.index("--rows") + 1]) if "--rows" in args else 20000
+    queries = int(args[args.index("--queries") + 1]) if "--queries" in args else 20
+    seed = int(args[args.index("--seed") + 1]) if "--seed" in args else 7
+
+    out, checks = run(rows, queries, seed)
+    ok = all(checks.values())
+    if "--json" in args:
+        print(json.dumps({"rows": rows, "queries": queries, **out, "checks": checks}, indent=2))
+    else:
+        print(f"daemon benchmark: {rows:,} synthetic rows, {queries} lookups (similar + match, ms per call)")
+        for name, r in out["results"].items():
+            print(f"  {name:<28} median {r['median_ms']:8.2f} ms   p95 {r['p95_ms']:8.2f} ms")
+        print()
+        for name, passed in checks.items():
+            print(f"  {'OK  ' if passed else 'FAIL'} {name}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
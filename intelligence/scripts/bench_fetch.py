@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""DIS: fetch_sources.py の並行取得・条件付き GET のベンチマーク (オフライン)。
+
+ソースごとに別ポートのローカル HTTP サーバー (応答遅延つき) を立て、一時 DB に対して fetch_all を実行する。
+RSS / HTML と、ETag・Last-Modified・検証子なしのサーバーを混ぜている。
+
+  1. 1 ワーカー (従来の逐次取得)      → 所要時間は遅延の合計
+  2. 並行取得 (新しい DB)            → 最も遅いソース程度。記事の件数は 1 と一致すること
+  3. 同じ DB で再取得                → 検証子のあるソースは 304、ないソースは本文ハッシュ一致でパースなし
+  4. 1 ソースだけ本文を変えて再取得  → そのソースだけパースする
+
+いずれかの期待が外れたら exit 1。
+
+Usage:
+  bench_fetch.py [--delay-scale 1.0] [--json]
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import fetch_sources
+
+# (ソース名, タイプ, 応答遅延 秒, 返す検証子)
+FIXTURES = [
+    ("rss-etag", "rss", 0.3, "etag"),
+    ("rss-lastmod", "rss", 0.2, "last_modified"),
+    ("rss-plain", "rss", 0.1, None),
+    ("html-etag", "html", 0.4, "etag"),
+    ("html-plain", "html", 0.5, None),
+    ("html-slow", "html", 0.8, "etag"),
+]
+# 並行取得の所要時間が「最も遅いソース + これ」以内なら合格 (秒)
+SLACK = 0.5
+ITEMS = 10
+
+
+def _body(name: str, source_type: str, version: int) -> bytes:
+    if source_type == "rss":
+        items = "".join(f"<item><title>{name} update {version}.{i}: release notes</title>"
+                        f"<link>https://{name}.example/blog/{version}-{i}</link>"
+                        f"<description>summary {i}</description></item>" for i in range(ITEMS))
+        return f'<?xml version="1.0"?><rss><channel>{items}</channel></rss>'.encode()
+    links = "".join(f'<li><a href="/blog/{version}-{i}">{name} post {version}.{i} announcement</a></li>'
+                    for i in range(ITEMS))
+    return (f'<html><head><meta name="description" content="{name} blog"></head>'
+            f"<body><ul>{links}</ul></body></html>").encode()
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        f = self.server.fixture
+        time.sleep(f["delay"])
+        with self.server.lock:
+            f["requests"] += 1
+        etag = f'"v{f["version"]}"'
+        if f["validator"] == "etag" and self.headers.get("If-None-Match") == etag:
+            return self._send(304, b"", {"ETag": etag})
+        if f["validator"] == "last_modified" and self.headers.get("If-Modified-Since") == f["modified"]:
+            return self._send(304, b"", {"Last-Modified": f["modified"]})
+        headers = {"ETag": etag} if f["validator"] == "etag" else \
+            {"Last-Modified": f["modified"]} if f["validator"] == "last_modified" else {}
+        self._send(200, f["body"], headers)
+
+    def _send(self, status: int, body: bytes, headers: dict):
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(name: str, source_type: str, delay: float, validator: str | None) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.fixture = {"name": name, "type": source_type, "delay": delay, "validator": validator,
+                      "version": 1, "body": _body(name, source_type, 1), "requests": 0,
+                      "modified": formatdate(usegmt=True)}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bump(server: ThreadingHTTPServer):
+    """本文と検証子を新しい版にする。"""
+    f = server.fixture
+    f["version"] += 1
+    f["body"] = _body(f["name"], f["type"], f["version"])
+    f["modified"] = formatdate(time.time() + f["version"], usegmt=True)
+
+
+def run(label: str, db: str, sources: list[tuple], workers: int) -> dict:
+    fetch_sources.DB = db
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fetched = fetch_sources.fetch_all(sources, workers)
+    secs = time.perf_counter() - t0
+    status = {}
+    for r in fetched:
+        status[r["status"]] = status.get(r["status"], 0) + 1
+    return {"name": label, "workers": workers, "seconds": round(secs, 3), "status": status,
+            "items": sum(len(r["items"]) for r in fetched)}
+
+
+def main():
+    args = sys.argv[1:]
+    scale = float(args[args.index("--delay-scale") + 1]) if "--delay-scale" in args else 1.0
+
+    servers = [serve(name, t, delay * scale, v) for name, t, delay, v in FIXTURES]
+    sources = [(s.fixture["name"], f"http://127.0.0.1:{s.server_address[1]}/blog", s.fixture["type"])
+               for s in servers]
+    slowest = max(s.fixture["delay"] for s in servers)
+    total = sum(s.fixture["delay"] for s in servers)
+    n = len(sources)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            serial = run("1 worker (sequential)", os.path.join(tmp, "serial.db"), sources, 1)
+            db = os.path.join(tmp, "dev.db")
+            cold = run(f"{fetch_sources.WORKERS} workers, cold", db, sources, fetch_sources.WORKERS)
+            warm = run(f"{fetch_sources.WORKERS} workers, warm", db, sources, fetch_sources.WORKERS)
+            bump(servers[0])
+            changed = run(f"{fetch_sources.WORKERS} workers, 1 source changed", db, sources, fetch_sources.WORKERS)
+    finally:
+        for s in servers:
+            s.shutdown()
+            s.server_close()
+
+    validated = sum(1 for _, _, _, v in FIXTURES if v)
+    checks = {
+        "cold items match sequential": cold["items"] == serial["items"] == n * ITEMS,
+        f"cold within slowest + {SLACK}s": cold["seconds"] <= slowest + SLACK,
+        "warm: 304 for sources with validators": warm["status"].get("not_modified", 0) == validated,
+        "warm: body hash skips the rest": warm["status"].get("unchanged", 0) == n - validated,
+        "changed: only that source parsed": changed["status"].get("new", 0) == 1 and changed["items"] == ITEMS,
+    }
+    ok = all(checks.values())
+
+    results = [serial, cold, warm, changed]
+    if "--json" in args:
+        print(json.dumps({"sources": n, "slowest": slowest, "sum_of_delays": total, "results": results,
+                          "checks": checks}, indent=2))
+    else:
+        print(f"fetch benchmark: {n} local sources, slowest {slowest:.2f}s, delays sum to {total:.2f}s")
+        for r in results:
+            status = ", ".join(f"{k}={v}" for k, v in sorted(r["status"].items()))
+            print(f"  {r['name']:<34} {r['seconds']:6.2f}s  items={r['items']:<4} {status}")
+        print()
+        for name, passed in checks.items():
+            print(f"  {'OK  ' if passed else 'FAIL'} {name}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
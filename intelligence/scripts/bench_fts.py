@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""DIS: record-*.sh の lookup を LIKE '%文%' と FTS5 (fts.py + bm25) で比べるベンチマーク。
+
+一時 DB の feedback / dev_sessions / questions に --rows 行ずつ、Zipf 分布の語彙 (英数字の語と日本語の語) で
+文を入れる。クエリごとに「同じ話題の語を3つ含む別の文」を1行ずつ紛れ込ませ (古い行にも新しい行にも置く)、
+クエリはその話題語とよく出る語 (上位 COMMON_TOP 語) を混ぜた新しい文にする。lookup がその行を上位5件に返せたかを recall@5 とする。
+
+LIKE は要件文そのものを部分文字列として探すので、言い回しが違えばまず一致しない (従来の lookup)。
+FTS の時間は fts.match_query (よくある語の除外を含む) と SQL の合計。
+p95 が P95_LIMIT_MS を超えるか、recall@5 が RECALL_MIN を下回れば exit 1。
+
+Usage:
+  bench_fts.py [--rows 100000] [--queries 50] [--seed 7] [--json]
+"""
+import bisect
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import dis_db
+import fts
+import migrate
+
+P95_LIMIT_MS = 50
+RECALL_MIN = 0.9
+VOCAB = 8000
+TOPIC_WORDS = 3
+COMMON_TOP = 300
+
+_KANA = "アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモラリルレロ"
+_KANJI = "認証追加修正表示画面設定機能削除登録検索一覧詳細更新保存取得送信受信変換通知権限"
+
+# (テーブル, 文を入れる列, 従来の LIKE クエリ, FTS クエリ)。? は (needle / MATCH 式, project)
+TABLES = [
+    ("feedback", ("wrong_approach", "correct_approach", "category"),
+     "SELECT id FROM feedback WHERE (wrong_approach LIKE ? OR correct_approach LIKE ? OR category LIKE ?) "
+     "AND score > 0.5 ORDER BY score DESC LIMIT 5",
+     "SELECT f.id FROM fts_feedback JOIN feedback f ON f.id = fts_feedback.rowid "
+     "WHERE fts_feedback MATCH ? AND f.score > 0.5 "
+     "ORDER BY bm25(fts_feedback) * (1.0 + MIN(MAX(f.score, 0), 4) / 4.0) LIMIT 5"),
+    ("dev_sessions", ("requirement",),
+     "SELECT id FROM dev_sessions WHERE project = ? AND (requirement LIKE ? OR files_changed LIKE ?) "
+     "ORDER BY score DESC, ts DESC LIMIT 5",
+     "SELECT d.id FROM fts_dev_sessions JOIN dev_sessions d ON d.id = fts_dev_sessions.rowid "
+     "WHERE fts_dev_sessions MATCH ? AND d.project = ? "
+     "ORDER BY bm25(fts_dev_sessions) * (1.0 + MIN(MAX(d.score, 0), 4) / 4.0), d.ts DESC LIMIT 5"),
+    ("questions", ("question", "context"),
+     "SELECT id FROM questions WHERE (question LIKE ? OR context LIKE ? OR answer LIKE ?) AND score > 0.5 "
+     "ORDER BY score DESC LIMIT 5",
+     "SELECT q.id FROM fts_questions JOIN questions q ON q.id = fts_questions.rowid "
+     "WHERE fts_questions MATCH ? AND q.score > 0.5 "
+     "ORDER BY bm25(fts_questions) * (1.0 + MIN(MAX(q.score, 0), 4) / 4.0) LIMIT 5"),
+]
+PROJECT = "proj-a"
+
+
+class _Corpus:
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        words = set()
+        while len(words) < VOCAB:
+            words.add(self._word())
+        self.vocab = sorted(words, key=lambda _: self.rng.random())
+        self.cum = list(itertools.accumulate(1 / (i + 1) ** 1.07 for i in range(VOCAB)))
+
+    def _word(self) -> str:
+        rng = self.rng
+        if rng.random() < 0.7:
+            return "".join(rng.choice("bcdfghklmnprstvz") + rng.choice("aeiou") for _ in range(rng.randint(2, 5)))
+        return "".join(rng.choice(_KANA) for _ in range(rng.randint(2, 4))) + rng.choice(_KANJI) * rng.randint(1, 2)
+
+    def text(self, n: int, top: int = VOCAB) -> str:
+        """Zipf 分布で n 語。top を渡すとよく出る上位 top 語だけから選ぶ。"""
+        total = self.cum[top - 1]
+        return " ".join(self.vocab[bisect.bisect(self.cum, self.rng.random() * total)] for _ in range(n))
+
+    def topic(self) -> list[str]:
+        """ある程度珍しい (出現順位 COMMON_TOP〜3000 の) 語。"""
+        return self.rng.sample(self.vocab[COMMON_TOP:3000], TOPIC_WORDS)
+
+    def around(self, words: list[str], n: int, top: int = VOCAB) -> str:
+        out = self.text(n, top).split() + words
+        self.rng.shuffle(out)
+        return " ".join(out)
+
+
+def build(path: str, rows: int, queries: int, seed: int) -> tuple[list[dict], float]:
+    """合成 DB を作り、(クエリと正解 id のリスト, 行を入れた秒数) を返す。"""
+    corpus = _Corpus(seed)
+    rng = corpus.rng
+    conn = migrate.ensure(dis_db.connect(path))
+    planted = {rng.randrange(rows): q for q in range(queries)}
+    while len(planted) < queries:
+        planted[rng.randrange(rows)] = len(planted)
+    cases = []
+    t0 = time.perf_counter()
+    for table, cols, _, _ in TABLES:
+        topics = [corpus.topic() for _ in range(queries)]
+        values = []
+        for i in range(rows):
+            q = planted.get(i)
+            texts = [corpus.around(topics[q], 8) if q is not None and c == cols[0]
+                     else corpus.text(1 if c == "category" else 10) for c in cols]
+            values.append((PROJECT if q is not None or rng.random() < 0.3 else f"proj-{rng.randint(1, 9)}",
+                           *texts, round(rng.uniform(0.6, 3.0), 3)))
+        dis_db.write(conn, lambda c, v: c.executemany(
+            f"INSERT INTO {table}(project, {', '.join(cols)}, score) VALUES (?, {', '.join('?' for _ in cols)}, ?)", v),
+            values)
+        for i, q in sorted(planted.items(), key=lambda kv: kv[1]):
+            # 話題語以外はよく出る語 (自然文の助詞・一般語にあたる)
+            cases.append({"table": table, "id": i + 1, "query": corpus.around(topics[q], 6, COMMON_TOP)})
+    secs = time.perf_counter() - t0
+    conn.execute("ANALYZE")
+    conn.close()
+    return cases, secs
+
+
+def run(path: str, cases: list[dict]) -> dict:
+    conn = dis_db.connect(path)
+    out = {}
+    for table, _, like_sql, fts_sql in TABLES:
+        like_ms, fts_ms, like_hits, fts_hits = [], [], 0, 0
+        for case in (c for c in cases if c["table"] == table):
+            needle = f"%{case['query']}%"
+            like_params = (PROJECT, needle, needle) if "project = ?" in like_sql else (needle,) * like_sql.count("?")
+            t0 = time.perf_counter()
+            ids = [r[0] for r in conn.execute(like_sql, like_params)]
+            like_ms.append((time.perf_counter() - t0) * 1000)
+            like_hits += case["id"] in ids
+
+            t0 = time.perf_counter()
+            match = fts.match_query(case["query"], conn, f"fts_{table}")
+            params = (match, PROJECT) if fts_sql.count("?") == 2 else (match,)
+            ids = [r[0] for r in conn.execute(fts_sql, params)] if match else []
+            fts_ms.append((time.perf_counter() - t0) * 1000)
+            fts_hits += case["id"] in ids
+        n = len(like_ms)
+        out[table] = {
+            "like": {"median_ms": round(statistics.median(like_ms), 2), "recall_at_5": round(like_hits / n, 3)},
+            "fts": {"median_ms": round(statistics.median(fts_ms), 2),
+                    "p95_ms": round(sorted(fts_ms)[int(n * 0.95) - 1 if n > 1 else 0], 2),
+                    "recall_at_5": round(fts_hits / n, 3)},
+        }
+    conn.close()
+    return out
+
+
+def main():
+    args = sys.argv[1:]
+    rows = int(args[args.index("--rows") + 1]) if "--rows" in args else 100000
+    queries = int(args[args.index("--queries") + 1]) if "--queries" in args else 50
+    seed = int(args[args.index("--seed") + 1]) if "--seed" in args else 7
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dev.db")
+        cases, build_secs = build(path, rows, queries, seed)
+        results = run(path, cases)
+
+    ok = all(r["fts"]["p95_ms"] <= P95_LIMIT_MS and r["fts"]["recall_at_5"] >= RECALL_MIN for r in results.values())
+    if "--json" in args:
+        print(json.dumps({"rows": rows, "queries": queries, "insert_seconds": round(build_secs, 1),
+                          "results": results}, indent=2))
+    else:
+        print(f"lookup benchmark: {rows:,} rows per table, {queries} queries "
+              f"(inserted with FTS triggers in {build_secs:.1f}s)")
+        print(f"  {'table':<14} {'LIKE ms':>9} {'recall@5':>9}   {'FTS ms':>8} {'p95':>7} {'recall@5':>9}")
+        for table, r in results.items():
+            print(f"  {table:<14} {r['like']['median_ms']:9.2f} {r['like']['recall_at_5']:9.2f}   "
+                  f"{r['fts']['median_ms']:8.2f} {r['fts']['p95_ms']:7.2f} {r['fts']['recall_at_5']:9.2f}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""DIS: capture-error フックの取り込みレイテンシのベンチマーク。
+
+- capture (プロセス内): hook JSON の parse + 分類 + スプール追記 1件あたりの時間
+- hook (プロセス全体): python3 -S ingest.py --capture と旧 capture-error.sh (jq x5 + sqlite3) の実時間を、
+  DB が空いている時と別接続が書き込みロックを握っている時で比較する (旧実装は jq / sqlite3 がある場合のみ)
+- hook (現行): capture-error.sh が実際に起動する python3 -S dis_daemon.py capture と capture-error.sh 全体の
+  実時間を、デーモンなし (プロセス内で追記) とデーモン起動中で比較し、p50 / p95 が HOOK_TARGET_MS を下回るか見る
+- drain: スプール → events の書き込み速度
+
+一時ディレクトリを HOME にして実行するので、実際の dev.db には触れない。
+
+Usage:
+  bench_ingest.py [--n 2000] [--runs 30] [--json]
+"""
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import dis_daemon
+import ingest
+
+SCRIPT = os.path.abspath(ingest.__file__)
+SCRIPTS = os.path.dirname(SCRIPT)
+HOOK = os.path.join(os.path.dirname(os.path.dirname(SCRIPTS)), "hooks", "capture-error.sh")
+# フック1回あたりの目標 (ms)。Bash ツールの実行ごとに走るので、体感できない程度に収める
+HOOK_TARGET_MS = 10
+
+# 旧 capture-error.sh (比較用)
+LEGACY_HOOK = r'''#!/bin/bash
+DB="$HOME/.claude/intelligence/dev.db"
+[ ! -f "$DB" ] && exit 0
+input=$(cat)
+exit_code=$(echo "$input" | jq -r '.tool_result.exit_code // 0')
+[ "$exit_code" = "0" ] && exit 0
+cmd=$(echo "$input" | jq -r '.tool_input.command // ""')
+[ ${#cmd} -lt 5 ] && exit 0
+echo "$cmd" | grep -qE '^(git |ls |pwd|echo |cd )' && exit 0
+error=$(echo "$input" | jq -r '(.tool_result.stderr // .tool_result.stdout // "") | tostring' | head -c 2000)
+[ -z "$error" ] && exit 0
+cwd=$(echo "$input" | jq -r '.cwd // ""')
+project=$(basename "$cwd")
+type="unknown"
+if echo "$error" | grep -qiE 'build|compile|module not found|cannot find'; then
+  type="build_error"
+elif echo "$error" | grep -qiE 'test|expect|assert|FAIL'; then
+  type="test_failure"
+elif echo "$error" | grep -qiE 'lint|eslint|prettier'; then
+  type="lint_error"
+elif echo "$error" | grep -qiE 'type|typescript|tsc|TS[0-9]'; then
+  type="type_error"
+fi
+sqlite3 "$DB" "INSERT INTO events(type,cmd,error,cwd,project) VALUES(
+  '$(echo "$type" | sed "s/'/''/g")',
+  '$(echo "$cmd" | sed "s/'/''/g")',
+  '$(echo "$error" | sed "s/'/''/g")',
+  '$(echo "$cwd" | sed "s/'/''/g")',
+  '$(echo "$project" | sed "s/'/''/g")'
+);" 2>/dev/null
+exit 0
+'''
+
+HOOK_INPUT = json.dumps({
+    "tool_input": {"command": "npx tsc --noEmit -p tsconfig.json"},
+    "tool_result": {"exit_code": 2, "stderr": "src/lib/api/client.ts:118:5 - error TS2322: Type 'Response' is not "
+                                              "assignable to type 'ApiResult<User>'.\n" * 8},
+    "cwd": "/home/dev/work/web-app",
+})
+
+
+def setup_home(tmp: str) -> str:
+    home = os.path.join(tmp, "home")
+    os.makedirs(os.path.join(home, ".claude", "intelligence"))
+    conn = sqlite3.connect(os.path.join(home, ".claude", "intelligence", "dev.db"))
+    conn.execute("""CREATE TABLE events (
+      id INTEGER PRIMARY KEY AUTOINCREMENT, ts TEXT NOT NULL DEFAULT (datetime('now')),
+      type TEXT NOT NULL, cmd TEXT, error TEXT, cwd TEXT, project TEXT, resolved INTEGER DEFAULT 0)""")
+    conn.commit()
+    conn.close()
+    return home
+
+
+def point_to(home: str):
+    base = os.path.join(home, ".claude", "intelligence")
+    ingest.DB = os.path.join(base, "dev.db")
+    ingest.SPOOL_DIR = os.path.join(base, "spool")
+    ingest.SPOOL = os.path.join(ingest.SPOOL_DIR, "events.jsonl")
+
+
+def timed_runs(cmd: list[str], home: str, runs: int) -> list[float]:
+    env = dict(os.environ, HOME=home)
+    out = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, input=HOOK_INPUT.encode(), env=env, check=False,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+def summarize(label: str, samples: list[float], **extra) -> dict:
+    samples = sorted(samples)
+    return {"name": label, "median_ms": round(statistics.median(samples), 2),
+            "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 2), **extra}
+
+
+def hook_runs(home: str, runs: int) -> list[dict]:
+    """現行フックの実時間。デーモンなし → デーモン起動中の順に測る (デーモンは一時 HOME の既定ソケットで起動)。"""
+    # capture-error.sh は $HOME/.claude/intelligence/scripts/ の dis_daemon.py を呼ぶ
+    scripts = os.path.join(home, ".claude", "intelligence", "scripts")
+    if not os.path.exists(scripts):
+        os.symlink(SCRIPTS, scripts)
+    env = dict(os.environ, HOME=home)
+    sock = os.path.join(home, ".claude", "intelligence", "dis.sock")
+    client = [sys.executable, "-S", os.path.join(SCRIPTS, "dis_daemon.py"), "capture"]
+    out = []
+    for state in ("no daemon", "daemon"):
+        if state == "daemon":
+            subprocess.Popen([sys.executable, os.path.join(SCRIPTS, "dis_daemon.py"), "serve"], env=env,
+                             stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                             start_new_session=True)
+            deadline = time.monotonic() + 5
+            while True:
+                try:
+                    dis_daemon.request("ping", sock)
+                    break
+                except (dis_daemon.Unavailable, RuntimeError, OSError, ValueError):
+                    if time.monotonic() > deadline:
+                        raise RuntimeError("daemon did not start")
+                    time.sleep(0.05)
+        try:
+            out.append(summarize(f"hook: dis_daemon.py ({state})", timed_runs(client, home, runs)))
+            if shutil.which("bash") and os.path.exists(HOOK):
+                out.append(summarize(f"hook: capture-error.sh ({state})", timed_runs(["bash", HOOK], home, runs)))
+        finally:
+            if state == "daemon":
+                dis_daemon.request("shutdown", sock)
+    return out
+
+
+def settle(wait: float = 10.0):
+    """スプールが空になるまで drain する (閾値超えで起動された別プロセスの drain が処理中のファイルも待つ)。"""
+    deadline = time.monotonic() + wait
+    while True:
+        ingest.drain()
+        if not os.path.exists(ingest.SPOOL_DIR) or not os.listdir(ingest.SPOOL_DIR) or time.monotonic() > deadline:
+            return
+        time.sleep(0.05)
+
+
+def count_events(home: str) -> int:
+    conn = sqlite3.connect(os.path.join(home, ".claude", "intelligence", "dev.db"))
+    n = conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+    conn.close()
+    return n
+
+
+def main():
+    args = sys.argv[1:]
+    n = int(args[args.index("--n") + 1]) if "--n" in args else 2000
+    runs = int(args[args.index("--runs") + 1]) if "--runs" in args else 30
+    legacy = shutil.which("jq") and shutil.which("sqlite3")
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        home = setup_home(tmp)
+        point_to(home)
+
+        # プロセス内: parse + 分類 + 追記
+        samples = []
+        for _ in range(n):
+            t0 = time.perf_counter()
+            ingest.capture(HOOK_INPUT)
+            samples.append((time.perf_counter() - t0) * 1000)
+        results.append(summarize("capture (in-process)", samples))
+
+        t0 = time.perf_counter()
+        drained = ingest.drain()
+        secs = time.perf_counter() - t0
+        results.append({"name": "drain", "events": drained, "seconds": round(secs, 4),
+                        "per_sec": round(drained / secs) if secs else 0})
+        base = count_events(home)
+
+        legacy_path = os.path.join(tmp, "legacy-capture-error.sh")
+        with open(legacy_path, "w") as f:
+            f.write(LEGACY_HOOK)
+        db = os.path.join(home, ".claude", "intelligence", "dev.db")
+        for busy in (False, True):
+            locker = None
+            if busy:
+                # sync / aggregate が書き込み中の状態を模擬
+                locker = sqlite3.connect(db, isolation_level=None)
+                locker.execute("BEGIN IMMEDIATE")
+            state = "db busy" if busy else "db idle"
+            results.append(summarize(f"hook: ingest.py ({state})",
+                                     timed_runs([sys.executable, "-S", SCRIPT, "--capture"], home, runs)))
+            if legacy:
+                # 書き込みロック中でも読み取りはできるので、旧実装が実際に書けた件数を数える
+                before = count_events(home)
+                samples = timed_runs(["bash", legacy_path], home, runs)
+                results.append(summarize(f"hook: legacy shell ({state})", samples,
+                                         stored=count_events(home) - before, runs=runs))
+            if locker:
+                locker.rollback()
+                locker.close()
+        hooks = hook_runs(home, runs)
+        results.extend(hooks)
+        # フック経由の件数は events で数える (スプールが閾値を超えると途中でも drain される)
+        settle()
+        spooled = count_events(home) - base - sum(r.get("stored", 0) for r in results)
+        spooled_runs = runs * (2 + len(hooks))
+
+    for r in hooks:
+        r["target_met"] = r["median_ms"] < HOOK_TARGET_MS and r["p95_ms"] < HOOK_TARGET_MS
+
+    if "--json" in args:
+        print(json.dumps({"n": n, "runs": runs, "results": results, "spooled_hook_events": spooled,
+                          "hook_target_ms": HOOK_TARGET_MS}, indent=2))
+        return
+    print(f"ingest benchmark: {n} in-process captures, {runs} hook runs per case")
+    for r in results:
+        if "median_ms" in r:
+            stored = f"  stored {r['stored']}/{r['runs']}" if "stored" in r else ""
+            target = ""
+            if "target_met" in r:
+                target = f"  {'<' if r['target_met'] else '>='} {HOOK_TARGET_MS}ms target"
+            print(f"  {r['name']:<38} median {r['median_ms']:7.2f}ms  p95 {r['p95_ms']:7.2f}ms{stored}{target}")
+        else:
+            print(f"  {r['name']:<38} {r['events']} events in {r['seconds'] * 1000:.1f}ms ({r['per_sec']:,}/s)")
+    print(f"  hook events recorded: {spooled}/{spooled_runs}")
+
+
+if __name__ == "__main__":
+    main()
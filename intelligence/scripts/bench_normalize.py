@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""DIS: normalize.normalize_error のマイクロベンチマーク。
+
+実際のコンパイラ/テスト出力コーパスを繰り返し正規化し、旧実装 (5回の re.sub) と比較する。
+出力が旧実装と一致しない場合は exit 1。
+
+Usage:
+  bench_normalize.py [--n 20000] [--json]
+"""
+import json
+import random
+import re
+import sys
+import time
+
+import normalize
+
+# 実運用で capture-error.sh が拾う典型的な出力 (build / test / lint / type)
+CORPUS = [
+    "src/components/LoginForm.tsx:42:17 - error TS2345: Argument of type 'string | undefined' is not assignable to parameter of type 'string'.\n  Type 'undefined' is not assignable to type 'string'.",
+    "/Users/dev/work/app/src/lib/api/client.ts:118:5 - error TS2322: Type 'Response' is not assignable to type 'ApiResult<User>'.",
+    "error TS2307: Cannot find module '@/components/ui/button' or its corresponding type declarations.",
+    "Module not found: Error: Can't resolve 'react-dom/client' in '/home/ci/builds/web/src'",
+    "./src/app/page.tsx\nModule not found: Can't resolve '../hooks/useSession'\n\nhttps://nextjs.org/docs/messages/module-not-found",
+    "error[E0308]: mismatched types\n  --> src/dsp/compressor.rs:87:23\n   |\n87 |         let gain: f32 = self.ratio * db;\n   |                   ---   ^^^^^^^^^^^^^^^^ expected `f32`, found `f64`",
+    "error[E0382]: borrow of moved value: `buffer`\n --> /Users/dev/plugins/gain/src/lib.rs:142:9",
+    "warning: unused variable: `sample_rate`\n  --> src/editor.rs:31:13\n   |\n   = note: `#[warn(unused_variables)]` on by default",
+    "./main.go:27:2: undefined: handleRequest\n./main.go:31:14: cannot use cfg (variable of type *Config) as Config value in argument to NewServer",
+    "# github.com/acme/svc/internal/store\ninternal/store/pg.go:88:31: too many arguments in call to s.db.QueryRow",
+    "FAILED tests/test_aggregate.py::test_upsert_counts - AssertionError: assert 3 == 2\n +  where 3 = <function count at 0x7f3a9c2b1e50>()",
+    "E       KeyError: 'score'\n\ntests/test_similarity.py:54: KeyError",
+    "Traceback (most recent call last):\n  File \"/home/dev/.claude/intelligence/scripts/sync.py\", line 212, in sync\n    cur.execute(sql)\nsqlite3.OperationalError: database is locked",
+    "  File \"/usr/lib/python3.11/json/decoder.py\", line 355, in raw_decode\n    raise JSONDecodeError(\"Expecting value\", s, err.value) from None\njson.decoder.JSONDecodeError: Expecting value: line 1 column 1 (char 0)",
+    "FAIL src/utils/format.test.ts\n  ● formatPrice › rounds to two decimals\n\n    expect(received).toBe(expected) // Object.is equality\n\n    Expected: \"12.35\"\n    Received: \"12.34\"\n\n      at Object.<anonymous> (src/utils/format.test.ts:18:28)",
+    "FAIL  tests/e2e/login.spec.ts > login > shows error on bad password\nTimeoutError: locator.click: Timeout 30000ms exceeded.",
+    "/home/ci/web/src/hooks/useCart.ts\n  12:7   error  'total' is assigned a value but never used  @typescript-eslint/no-unused-vars\n  40:15  error  React Hook useEffect has a missing dependency: 'items'  react-hooks/exhaustive-deps",
+    "[warn] src/pages/index.tsx\n[warn] Code style issues found in the above file. Run Prettier with --write to fix.",
+    "npm ERR! code ERESOLVE\nnpm ERR! ERESOLVE unable to resolve dependency tree\nnpm ERR! Found: react@18.3.1",
+    "error: could not compile `gain-plugin` (lib) due to 2 previous errors; 1 warning emitted",
+    "TypeError: Cannot read properties of undefined (reading 'map')\n    at ProductList (webpack-internal:///./src/components/ProductList.tsx:23:31)",
+    "ReferenceError: window is not defined\n    at /Users/dev/app/.next/server/app/page.js:1:2345",
+    "fatal: bad object 3f9c1e2a7b4d5c6e8f0a1b2c3d4e5f6a7b8c9d0e",
+    "Error: ENOENT: no such file or directory, open '/tmp/review-queue.json'",
+    "SyntaxError: Unexpected token '}' (line 88)",
+    "tsc: Found 14 errors in 6 files.\n\nErrors  Files\n     3  src/api/routes.ts:12\n     5  src/db/schema.ts:40",
+]
+
+
+def legacy_normalize(error: str) -> str:
+    """正規化の旧実装 (比較用)。"""
+    s = error
+    s = re.sub(r"/[\w/.-]+\.(ts|tsx|js|jsx|py|rs|go)", "<path>", s)
+    s = re.sub(r":\d+:\d+", ":<line>", s)
+    s = re.sub(r"line \d+", "line <n>", s, flags=re.IGNORECASE)
+    s = re.sub(r"[0-9a-f]{8,}", "<hash>", s)
+    s = re.sub(r"\s+", " ", s).strip()
+    return s[:200]
+
+
+def make_workload(n: int, unique_ratio: float = 0.2, seed: int = 42) -> list[str]:
+    """コーパスから n 件のエラー列を作る。unique_ratio の割合で行番号を変えた新規文面を混ぜる。"""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        e = rng.choice(CORPUS)
+        if rng.random() < unique_ratio:
+            e = re.sub(r"\d+", lambda m: str(int(m.group()) + rng.randint(1, 999)), e, count=1)
+        out.append(e)
+    return out
+
+
+def bench(label: str, fn, workload: list[str]) -> dict:
+    t0 = time.perf_counter()
+    fn(workload)
+    secs = time.perf_counter() - t0
+    return {"name": label, "seconds": round(secs, 4), "per_sec": round(len(workload) / secs) if secs else 0}
+
+
+def main():
+    args = sys.argv[1:]
+    n = int(args[args.index("--n") + 1]) if "--n" in args else 20000
+    workload = make_workload(n)
+
+    mismatches = [e for e in CORPUS + workload[:2000] if legacy_normalize(e) != normalize.normalize_error(e)]
+
+    results = [bench("legacy re.sub x5", lambda w: [legacy_normalize(e) for e in w], workload)]
+
+    def uncached(w):
+        for e in w:
+            normalize._normalize(e)[:normalize.MAX_LENGTH]
+    results.append(bench("precompiled", uncached, workload))
+
+    normalize.cache_clear()
+    results.append(bench("precompiled + LRU (cold)", lambda w: [normalize.normalize_error(e) for e in w], workload))
+    results.append(bench("precompiled + LRU (warm)", lambda w: [normalize.normalize_error(e) for e in w], workload))
+    normalize.cache_clear()
+    results.append(bench("normalize_many", normalize.normalize_many, workload))
+
+    if "--json" in args:
+        print(json.dumps({"n": n, "results": results, "cache": normalize.cache_info(),
+                          "mismatches": len(mismatches)}, indent=2))
+    else:
+        base = results[0]["seconds"] or 1
+        print(f"normalize benchmark: {n} errors ({len(CORPUS)} corpus entries)")
+        for r in results:
+            print(f"  {r['name']:<24} {r['seconds'] * 1000:8.1f}ms  {r['per_sec']:>10,}/s  x{base / max(r['seconds'], 1e-9):.1f}")
+        print(f"  cache: {normalize.cache_info()}")
+        print(f"  mismatches vs legacy: {len(mismatches)}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
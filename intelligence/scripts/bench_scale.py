@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""DIS: intelligence スクリプトの規模別ベンチマーク (1k〜1M 行)。
+
+サイズごとに synth_db.py で合成 dev.db を一時 HOME に作り、各エントリポイントを実際の CLI として
+子プロセスで順に実行して、実時間とピーク RSS (wait4 の ru_maxrss) を計測する。
+前の手順が DB を変更したまま次に進む (aggregate → decay の順など、実運用と同じ並び)。
+sync はローカルの hrana_server.py に全件を push する (初回同期と同じ)。
+
+サイズを 10 倍にした時の時間の伸びを growth (log10 の比、1.0 なら線形) として出し、
+GROWTH_LIMIT を超えたものを二次的な経路の疑いとして報告する。
+--out の JSON を --baseline に渡すと、コミット間で同じサイズ・手順の時間を比較する。
+
+Usage:
+  bench_scale.py [--sizes 1000,10000,100000] [--seed 7] [--timeout 600] [--out results.json]
+                 [--baseline previous.json] [--only aggregate,report] [--json]
+"""
+import json
+import math
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import hrana_server
+import synth_db
+
+SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+
+# サイズを 10 倍にした時の時間の伸び (log10) がこれを超えたら報告する
+GROWTH_LIMIT = 1.5
+# 時間が短すぎると比がぶれるので、これ未満の計測は growth / 回帰の判定に使わない (秒)
+MIN_SECONDS = 0.2
+# --baseline と比べてこの倍率以上遅くなったら報告する
+REGRESSION_LIMIT = 1.3
+
+# (名前, コマンド)。"{project}" は合成 DB で最も行の多いプロジェクト
+STEPS = [
+    ("aggregate", ["aggregate.py"]),
+    ("aggregate --promote-feedback", ["aggregate.py", "--promote-feedback"]),
+    ("similarity --reindex", ["similarity.py", "--reindex"]),
+    ("similarity query", ["similarity.py", "Cannot find module '@/lib/api' or its corresponding type declarations."]),
+    ("similarity --merge --dry-run", ["similarity.py", "--merge", "--dry-run"]),
+    ("report", ["report.py"]),
+    ("self-improve suggest", ["self-improve.py", "suggest", "{project}"]),
+    ("self-improve trend", ["self-improve.py", "trend", "{project}"]),
+    ("decay", ["decay.py"]),
+    ("sync (initial push)", ["sync.py"]),
+]
+
+
+def _maxrss_mb(rusage) -> float:
+    # Linux は KiB、macOS は bytes
+    kb = rusage.ru_maxrss / 1024 if sys.platform == "darwin" else rusage.ru_maxrss
+    return round(kb / 1024, 1)
+
+
+def run_step(cmd: list[str], env: dict, timeout: float) -> dict:
+    """子プロセスを実行し、実時間・ピーク RSS・終了コードを返す。"""
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, env=env, stdin=subprocess.DEVNULL,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = t0 + timeout
+    while True:
+        pid, status, rusage = os.wait4(proc.pid, os.WNOHANG)
+        if pid:
+            break
+        if time.perf_counter() > deadline:
+            proc.kill()
+            _, status, rusage = os.wait4(proc.pid, 0)
+            proc.returncode = -9
+            return {"seconds": None, "peak_rss_mb": _maxrss_mb(rusage), "returncode": "timeout"}
+        time.sleep(0.005)
+    secs = time.perf_counter() - t0
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    err = proc.stderr.read().decode("utf-8", "replace").strip()
+    proc.stderr.close()
+    result = {"seconds": round(secs, 3), "peak_rss_mb": _maxrss_mb(rusage), "returncode": proc.returncode}
+    if proc.returncode:
+        result["stderr"] = err[-500:]
+    return result
+
+
+def setup_home(tmp: str, port: int) -> tuple[str, str]:
+    home = os.path.join(tmp, "home")
+    base = os.path.join(home, ".claude", "intelligence")
+    os.makedirs(base)
+    with open(os.path.join(base, ".turso-env"), "w") as f:
+        f.write(f"TURSO_URL=http://127.0.0.1:{port}\nTURSO_TOKEN=bench\n")
+    return home, os.path.join(base, "dev.db")
+
+
+def top_project(db: str) -> str:
+    conn = sqlite3.connect(db)
+    row = conn.execute("SELECT project FROM events GROUP BY project ORDER BY COUNT(*) DESC LIMIT 1").fetchone()
+    conn.close()
+    return row[0] if row else synth_db.PROJECTS[0]
+
+
+def bench_size(rows: int, seed: int, timeout: float, only: set[str] | None) -> list[dict]:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        server = hrana_server.serve(os.path.join(tmp, "remote.db"))
+        try:
+            home, db = setup_home(tmp, server.server_address[1])
+            env = dict(os.environ, HOME=home)
+            gen = run_step([sys.executable, os.path.join(SCRIPTS, "synth_db.py"), "--rows", str(rows),
+                            "--seed", str(seed), "--out", db], env, timeout)
+            results.append({"rows": rows, "name": "synth_db (generate)", **gen})
+            if gen["returncode"] != 0:
+                return results
+            project = top_project(db)
+            for name, cmd in STEPS:
+                if only and name.split()[0] not in only:
+                    continue
+                argv = [sys.executable, os.path.join(SCRIPTS, cmd[0])] + [project if a == "{project}" else a
+                                                                          for a in cmd[1:]]
+                results.append({"rows": rows, "name": name, **run_step(argv, env, timeout)})
+            results.append({"rows": rows, "name": "dev.db size", "db_mb": round(os.path.getsize(db) / 2 ** 20, 1)})
+        finally:
+            server.shutdown()
+            server.server_close()
+    return results
+
+
+def growth(results: list[dict]) -> list[dict]:
+    """隣り合うサイズ間の時間の伸び (log(t2/t1) / log(n2/n1))。"""
+    by_name: dict[str, list[dict]] = {}
+    for r in results:
+        if r.get("seconds"):
+            by_name.setdefault(r["name"], []).append(r)
+    out = []
+    for name, runs in by_name.items():
+        runs.sort(key=lambda r: r["rows"])
+        for a, b in zip(runs, runs[1:]):
+            if a["seconds"] < MIN_SECONDS:
+                continue
+            g = math.log(b["seconds"] / a["seconds"]) / math.log(b["rows"] / a["rows"])
+            out.append({"name": name, "from": a["rows"], "to": b["rows"], "growth": round(g, 2),
+                        "superlinear": g > GROWTH_LIMIT})
+    return out
+
+
+def compare(results: list[dict], baseline: dict) -> list[dict]:
+    old = {(r["rows"], r["name"]): r for r in baseline.get("results", []) if r.get("seconds")}
+    out = []
+    for r in results:
+        b = old.get((r["rows"], r["name"]))
+        if b and r.get("seconds"):
+            ratio = r["seconds"] / b["seconds"] if b["seconds"] else float("inf")
+            out.append({"rows": r["rows"], "name": r["name"], "before": b["seconds"], "after": r["seconds"],
+                        "ratio": round(ratio, 2),
+                        "regression": b["seconds"] >= MIN_SECONDS and ratio >= REGRESSION_LIMIT})
+    return out
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPTS, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> int:
+    args = sys.argv[1:]
+    sizes = [int(s) for s in (args[args.index("--sizes") + 1] if "--sizes" in args else "1000,10000,100000").split(",")]
+    seed = int(args[args.index("--seed") + 1]) if "--seed" in args else 7
+    timeout = float(args[args.index("--timeout") + 1]) if "--timeout" in args else 600
+    only = set(args[args.index("--only") + 1].split(",")) if "--only" in args else None
+
+    results = []
+    for rows in sizes:
+        if "--json" not in args:
+            print(f"  ... {rows:,} rows", file=sys.stderr)
+        results += bench_size(rows, seed, timeout, only)
+
+    report = {
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "seed": seed,
+        "sizes": sizes,
+        "results": results,
+        "growth": growth(results),
+    }
+    if "--baseline" in args:
+        with open(args[args.index("--baseline") + 1]) as f:
+            report["comparison"] = compare(results, json.load(f))
+    if "--out" in args:
+        with open(args[args.index("--out") + 1], "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = [r for r in results if r.get("returncode") not in (0, None)]
+    flagged = [g for g in report["growth"] if g["superlinear"]]
+    regressions = [c for c in report.get("comparison", []) if c["regression"]]
+
+    if "--json" in args:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"scale benchmark @ {report['commit'] or '?'} (python {report['python']}, sqlite {report['sqlite']})")
+        for rows in sizes:
+            print(f"\n  {rows:,} rows")
+            for r in results:
+                if r["rows"] != rows:
+                    continue
+                if "db_mb" in r:
+                    print(f"    {r['name']:<30} {r['db_mb']:>9.1f} MB")
+                elif r["seconds"] is None:
+                    print(f"    {r['name']:<30} {'timeout':>9}   rss {r['peak_rss_mb']:7.1f} MB")
+                else:
+                    rc = f"  exit {r['returncode']}: {r.get('stderr', '')[-120:]}" if r["returncode"] else ""
+                    print(f"    {r['name']:<30} {r['seconds']:8.2f}s   rss {r['peak_rss_mb']:7.1f} MB{rc}")
+        if report["growth"]:
+            print("\n  growth per 10x rows (1.0 = linear)")
+            for g in report["growth"]:
+                mark = "  << superlinear" if g["superlinear"] else ""
+                print(f"    {g['name']:<30} {g['from']:>9,} → {g['to']:<9,} {g['growth']:5.2f}{mark}")
+        if "comparison" in report:
+            print("\n  vs baseline")
+            for c in report["comparison"]:
+                mark = "  << regression" if c["regression"] else ""
+                print(f"    {c['name']:<30} {c['rows']:>9,}  {c['before']:8.2f}s → {c['after']:8.2f}s  "
+                      f"{c['ratio']:5.2f}x{mark}")
+        if "--out" in args:
+            print(f"\n  results written to {args[args.index('--out') + 1]}")
+    return 1 if failed or flagged or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
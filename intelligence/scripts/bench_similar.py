@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""DIS: similarity.find_similar_many (一括検索) と find_similar の1件ずつの呼び出しを比べるベンチマーク。
+
+synth_db.py で一時 dev.db を作り、solutions の error_pattern を崩した文 (レビュー指摘に相当) を --issues 件まとめて検索する。
+
+  1. loop:          find_similar を1件ずつ (従来の lookup_review_solutions)
+  2. many (python): find_similar_many の純 Python 採点
+  3. many (numpy):  find_similar_many の行列積採点 (NumPy がある時のみ。import の時間を含まない)
+
+どの方法も結果 (id と類似度) が一致しなければ exit 1。時間は --runs 回の中央値。
+
+Usage:
+  bench_similar.py [--rows 20000] [--issues 40] [--runs 5] [--seed 7] [--json]
+"""
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import dis_db
+import similarity
+import synth_db
+
+THRESHOLD = 0.4
+LIMIT = 2
+
+
+def _issues(db: str, n: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    conn = dis_db.connect(db)
+    patterns = [r[0] for r in conn.execute("SELECT error_pattern FROM solutions ORDER BY id")]
+    conn.close()
+    out = []
+    for _ in range(n):
+        words = rng.choice(patterns).split()
+        rng.shuffle(words)
+        out.append(" ".join(words[:max(3, len(words) - 2)]))
+    return out
+
+
+def _time(fn, runs: int) -> tuple[float, object]:
+    times, result = [], None
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return round(statistics.median(times), 2), result
+
+
+def _key(results: list[list[dict]]) -> list:
+    return [[(r["id"], r["similarity"]) for r in hits] for hits in results]
+
+
+def run(rows: int, issues: int, runs: int, seed: int) -> tuple[list[dict], dict]:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "dev.db")
+        with contextlib.redirect_stdout(io.StringIO()):
+            synth_db.generate(db, rows, seed)
+        similarity.DB = db
+        conn = dis_db.connect(db)
+        similarity.rebuild_index(conn)
+        conn.close()
+        texts = _issues(db, issues, seed)
+
+        methods = [
+            ("loop (find_similar x N)", lambda: [similarity.find_similar(t, THRESHOLD, LIMIT) for t in texts]),
+            ("many (python)", lambda: similarity.find_similar_many(texts, THRESHOLD, LIMIT, use_numpy=False)),
+        ]
+        if similarity._numpy() is not None:
+            methods.append(("many (numpy)",
+                            lambda: similarity.find_similar_many(texts, THRESHOLD, LIMIT, use_numpy=True)))
+        results, outputs = [], []
+        for name, fn in methods:
+            ms, out = _time(fn, runs)
+            results.append({"name": name, "median_ms": ms})
+            outputs.append(_key(out))
+        dis_db.close_shared()
+
+    base = results[0]["median_ms"]
+    for r in results:
+        r["speedup"] = round(base / r["median_ms"], 1) if r["median_ms"] else None
+    checks = {f"{r['name']} matches loop": out == outputs[0] for r, out in zip(results[1:], outputs[1:])}
+    checks["some issues matched"] = any(outputs[0])
+    return results, checks
+
+
+def main():
+    args = sys.argv[1:]
+    rows = int(args[args.index("--rows") + 1]) if "--rows" in args else 20000
+    issues = int(args[args.index("--issues") + 1]) if "--issues" in args else 40
+    runs = int(args[args.index("--runs") + 1]) if "--runs" in args else 5
+    seed = int(args[args.index("--seed") + 1]) if "--seed" in args else 7
+
+    results, checks = run(rows, issues, runs, seed)
+    ok = all(checks.values())
+    if "--json" in args:
+        print(json.dumps({"rows": rows, "issues": issues, "results": results, "checks": checks}, indent=2))
+    else:
+        print(f"similar benchmark: {rows:,} synthetic rows, {issues} issues, median of {runs} runs")
+        for r in results:
+            print(f"  {r['name']:<26} {r['median_ms']:9.2f} ms  x{r['speedup']}")
+        print()
+        for name, passed in checks.items():
+            print(f"  {'OK  ' if passed else 'FAIL'} {name}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""DIS: sync.py のスループットベンチマーク (オフライン)。
+
+hrana_server.py をローカルで起動し、合成データを持つ端末 A から push、空の端末 B へ pull する。
+接続の使い回し・並行ワーカー数・push のエンコーディング (1行1ステートメント / 複数行 INSERT + store_sql /
+gzip) の組み合わせごとに、時間・リクエスト数・送信バイト数と1行あたりの転送量を比較する。
+各構成の後、B の内容が A と一致しなければ exit 1。
+
+最後に、マイグレーション済みの2端末がオフラインで同じ (error_pattern, project) の solution と同じ url の
+industry_feeds を作ってから同期するケースを流す (id が同じ / 違う / pull の後に相手が先に push した場合)。
+同期がエラーなく終わり、changelog が空で、両端末とリモートがキーごとに1行・件数が合算された同じ内容に
+ならなければ exit 1。
+
+続けて、2端末がそれぞれイベントを記録して aggregate.py で solutions に数え、同期と集計を交互に繰り返すケースを流す。
+取り込んだ別端末のイベントや、id の衝突で移したイベントを数え直すと success_count が膨らむ。
+どの端末でも success_count が両端末のイベント数の合計と一致しなければ exit 1。
+
+Usage:
+  bench_sync.py [--rows 20000] [--workers 4] [--latency-ms 20] [--json]
+"""
+import contextlib
+import io
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import aggregate
+import dis_db
+import hrana_server
+import ingest
+import sync
+from normalize import normalize_error
+
+# 合成データの配分 (events は短い行が大量、test_sessions は error_output が大きい)
+MIX = {"events": 0.6, "solutions": 0.2, "feedback": 0.05, "questions": 0.05, "test_sessions": 0.1}
+
+
+def create_db(path: str):
+    conn = sqlite3.connect(path)
+    for table, cols in sync.TABLES.items():
+        rest = ", ".join(f"{c} TEXT DEFAULT (datetime('now'))" if c == "ts" else c for c in cols[1:])
+        conn.execute(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY AUTOINCREMENT, {rest})")
+    conn.commit()
+    conn.close()
+
+
+def fill(path: str, rows: int, seed: int = 7):
+    rng = random.Random(seed)
+    words = "error module type undefined cannot find import build failed test assert expected".split()
+
+    def text(n: int) -> str:
+        # 語彙だけだと gzip が効きすぎるので、実際の出力のようにパス・行番号・ハッシュを混ぜる
+        out = []
+        for _ in range(n):
+            r = rng.random()
+            if r < 0.15:
+                out.append(f"src/{rng.choice(words)}/{rng.getrandbits(20):x}.ts:{rng.randint(1, 999)}:{rng.randint(1, 80)}")
+            elif r < 0.2:
+                out.append(f"{rng.getrandbits(64):016x}")
+            else:
+                out.append(rng.choice(words))
+        return " ".join(out)
+
+    conn = sqlite3.connect(path)
+    for table, share in MIX.items():
+        cols = sync.TABLES[table][2:]  # id / ts は既定値
+        n = int(rows * share)
+        values = []
+        for _ in range(n):
+            row = []
+            for c in cols:
+                if c in ("error_output", "fix_history"):
+                    row.append(text(300))
+                elif c.endswith(("count", "iterations", "seconds")) or c in ("resolved", "frequency"):
+                    row.append(rng.randint(0, 20))
+                elif c == "score":
+                    row.append(round(rng.random() * 3, 3))
+                else:
+                    row.append(text(rng.randint(2, 12)))
+            values.append(row)
+        conn.executemany(
+            f"INSERT INTO {table}({','.join(cols)}) VALUES({','.join('?' for _ in cols)})", values)
+    conn.commit()
+    conn.close()
+
+
+def snapshot(path: str) -> dict[str, list]:
+    conn = sqlite3.connect(path)
+    data = {t: conn.execute(f"SELECT {','.join(c)} FROM {t} ORDER BY id").fetchall() for t, c in sync.TABLES.items()}
+    conn.close()
+    return data
+
+
+def run(label: str, rows: int, latency: float, workers: int, keepalive: bool = True,
+        encoding: str = "multirow", use_gzip: bool = False) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        a, b, remote = (os.path.join(tmp, n) for n in ("a.db", "b.db", "remote.db"))
+        create_db(a)
+        create_db(b)
+        fill(a, rows)
+        server = hrana_server.serve(remote, latency=latency)
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        result = {"name": label, "workers": workers, "keepalive": keepalive,
+                  "encoding": encoding, "gzip": use_gzip}
+        try:
+            for phase, db in (("push", a), ("pull", b)):
+                sync.DB = db
+                client = sync.HranaClient(url, "bench", pool_size=max(1, workers), keepalive=keepalive,
+                                          gzip=use_gzip)
+                t0 = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results = sync.run_sync(client, workers, encoding)
+                secs = time.perf_counter() - t0
+                client.close()
+                n = sum(r["pushed" if phase == "push" else "pulled"] for r in results)
+                result[phase] = {"rows": n, "seconds": round(secs, 3),
+                                 "rows_per_sec": round(n / secs) if secs else 0, **client.stats}
+                if phase == "push":
+                    result["push"]["bytes_per_row"] = round(sync.bytes_per_row(results), 1)
+                    result["push"]["tables"] = {r["table"]: round(sync.bytes_per_row([r]), 1)
+                                                for r in results if r["pushed"]}
+            result["consistent"] = snapshot(a) == snapshot(b)
+        finally:
+            server.shutdown()
+            server.server_close()
+    return result
+
+
+# 2端末が同じキーで作る solution: (error_pattern, project) → 端末ごとの (solution, success_count, fail_count)
+SAME_KEY = {
+    ("TypeError: cannot read properties of undefined (reading 'map')", "web"): (("fix A", 2, 0), ("fix B", 3, 1)),
+    ("Cannot find module '@/lib/db'", "web"): (("fix A", 1, 0), ("fix B", 4, 0)),
+}
+RACE_KEY = ("error TS2322: Type 'string' is not assignable to type 'number'", "api")
+
+
+def _add_solution(conn, pattern: str, project: str, fix: tuple, ts: str, row_id: int | None = None):
+    solution, ok, fail = fix
+    conn.execute("INSERT INTO solutions(id, ts, error_pattern, solution, project, success_count, fail_count) "
+                 "VALUES(?, ?, ?, ?, ?, ?, ?)", (row_id, ts, pattern, solution, project, ok, fail))
+
+
+def run_same_key(latency: float) -> dict:
+    """2端末が同じ一意キーの行をオフラインで作ってから同期する。"""
+    with tempfile.TemporaryDirectory() as tmp:
+        a, b, remote = (os.path.join(tmp, n) for n in ("a.db", "b.db", "remote.db"))
+        for path in (a, b):
+            conn = dis_db.connect(path)
+            sync.ensure_changelog(conn)
+            conn.close()
+        conn = dis_db.connect(a)
+        for pattern, project in SAME_KEY:
+            _add_solution(conn, pattern, project, SAME_KEY[pattern, project][0], "2026-01-01 10:00:00")
+        conn.execute("INSERT INTO industry_feeds(ts, source, title, url) VALUES('2026-01-01 10:00:00', 'hn', 'A', "
+                     "'https://example.com/post')")
+        conn.commit()
+        conn.close()
+        # B は同じキーの片方を別の id で作る (間に別の行が入る)
+        conn = dis_db.connect(b)
+        k1, k2 = SAME_KEY
+        _add_solution(conn, *k1, SAME_KEY[k1][1], "2026-01-01 11:00:00")
+        _add_solution(conn, "ReferenceError: window is not defined", "web", ("fix only B", 1, 0),
+                      "2026-01-01 11:00:00")
+        _add_solution(conn, *k2, SAME_KEY[k2][1], "2026-01-01 11:00:00")
+        conn.execute("INSERT INTO industry_feeds(ts, source, title, url, analyzed) VALUES('2026-01-01 11:00:00', "
+                     "'hn', 'B', 'https://example.com/post', 1)")
+        conn.commit()
+        conn.close()
+
+        server = hrana_server.serve(remote, latency=latency)
+        client = sync.HranaClient(f"http://127.0.0.1:{server.server_address[1]}", "bench")
+        results, errors, race_merges = [], [], []
+
+        def run_on(db: str):
+            sync.DB = db
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results.extend(sync.run_sync(client, 1))
+            except sqlite3.Error as e:
+                errors.append(f"{os.path.basename(db)}: {e}")
+
+        try:
+            for db in (a, b, a):
+                run_on(db)
+            # pull の後に A が同じキーを先に push した場合 (A の id は B より先に進んでいる)
+            conn = dis_db.connect(a)
+            _add_solution(conn, *RACE_KEY, ("fix A", 1, 0), "2026-01-02 10:00:00", row_id=100)
+            conn.commit()
+            conn.close()
+            run_on(a)
+            conn = dis_db.connect(b)
+            _add_solution(conn, *RACE_KEY, ("fix B", 2, 0), "2026-01-02 11:00:00")
+            conn.commit()
+            try:
+                sync.push_changes(conn, client, "solutions", merges=race_merges)
+            except sqlite3.Error as e:
+                errors.append(f"b.db push: {e}")
+            conn.close()
+            for db in (b, a, b):
+                run_on(db)
+        finally:
+            client.close()
+            server.shutdown()
+            server.server_close()
+
+        snaps = {n: snapshot(p) for n, p in (("a", a), ("b", b), ("remote", remote))}
+        pending = {}
+        for n, p in (("a", a), ("b", b)):
+            conn = dis_db.connect(p)
+            pending[n] = conn.execute("SELECT COUNT(*) FROM sync_changelog").fetchone()[0]
+            conn.close()
+
+    cols = sync.TABLES["solutions"]
+    counts = {}
+    for row in snaps["remote"]["solutions"]:
+        r = dict(zip(cols, row))
+        counts.setdefault((r["error_pattern"], r["project"]), []).append((r["success_count"], r["fail_count"]))
+    expected = {k: [(fa[1] + fb[1], fa[2] + fb[2])] for k, (fa, fb) in SAME_KEY.items()}
+    expected[RACE_KEY] = [(3, 0)]
+    feeds = [dict(zip(sync.TABLES["industry_feeds"], r)) for r in snaps["remote"]["industry_feeds"]]
+    checks = {
+        "sync finished without errors": not errors and all(r["ok"] for r in results),
+        "changelog empty on both machines": not any(pending.values()),
+        "one row per key, counts summed": all(counts.get(k) == v for k, v in expected.items()),
+        "industry_feeds url merged": len(feeds) == 1 and feeds[0]["analyzed"] == 1,
+        "a == b == remote": snaps["a"] == snaps["b"] == snaps["remote"],
+    }
+    return {"merged": sum(len(r["merged"]) for r in results) + len(race_merges), "errors": errors, "pending": pending,
+            "checks": checks}
+
+
+# 端末ごとのイベント: (error, project, 件数)
+EVENTS = {
+    "a": [("TypeError: Cannot read properties of undefined (reading 'map') at src/list.ts:12:5", "web", 3),
+          ("Error: connect ECONNREFUSED 127.0.0.1:5432", "api", 1)],
+    "b": [("TypeError: Cannot read properties of undefined (reading 'map') at src/list.ts:40:9", "web", 2),
+          ("SyntaxError: Unexpected token '<' in JSON at position 0", "web", 2)],
+}
+
+
+def _add_events(path: str, events: list[tuple], ts: str):
+    conn = dis_db.connect(path)
+    conn.executemany("INSERT INTO events(ts, type, cmd, error, project) VALUES(?, 'error', 'npm test', ?, ?)",
+                     [(ts, error, project) for error, project, n in events for _ in range(n)])
+    conn.commit()
+    conn.close()
+
+
+def run_aggregate(latency: float) -> dict:
+    """2端末で記録・集計・同期を交互に行い、各イベントが一度だけ数えられるかを見る。"""
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {n: os.path.join(tmp, f"{n}.db") for n in ("a", "b", "remote")}
+        for n in ("a", "b"):
+            conn = dis_db.connect(paths[n])
+            sync.ensure_changelog(conn)
+            conn.close()
+        ingest.SPOOL_DIR = os.path.join(tmp, "spool")  # 実環境のスプールを読まない
+        server = hrana_server.serve(paths["remote"], latency=latency)
+        client = sync.HranaClient(f"http://127.0.0.1:{server.server_address[1]}", "bench")
+        errors = []
+
+        def step(op: str, n: str):
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    if op == "aggregate":
+                        aggregate.DB = paths[n]
+                        aggregate.aggregate()
+                    else:
+                        sync.DB = paths[n]
+                        if not all(r["ok"] for r in sync.run_sync(client, 1)):
+                            errors.append(f"{n}: sync incomplete")
+            except sqlite3.Error as e:
+                errors.append(f"{n} {op}: {e}")
+
+        try:
+            # 両端末とも id 1.. でイベントを記録して集計済み (pull で B のイベントは大きい id へ移る)
+            _add_events(paths["a"], EVENTS["a"], "2026-01-01 10:00:00")
+            _add_events(paths["b"], EVENTS["b"], "2026-01-01 11:00:00")
+            step("aggregate", "a")
+            # solutions.ts は秒単位。同じ秒に同じ id で作った行は id 競合でなく同一行とみなされるので、秒をずらす
+            time.sleep(1.1)
+            for op, n in (("aggregate", "b"), ("sync", "a"), ("sync", "b"), ("sync", "a"),
+                          ("aggregate", "a"), ("aggregate", "b")):
+                step(op, n)
+            # 同期の後に A で記録したイベントは A だけが数える
+            _add_events(paths["a"], EVENTS["a"][:1], "2026-01-02 10:00:00")
+            for op, n in (("aggregate", "a"), ("sync", "a"), ("sync", "b"), ("aggregate", "b"), ("sync", "b"),
+                          ("sync", "a"), ("aggregate", "a")):
+                step(op, n)
+        finally:
+            client.close()
+            server.shutdown()
+            server.server_close()
+
+        expected: dict[tuple, int] = {}
+        for error, project, n in EVENTS["a"] + EVENTS["b"] + EVENTS["a"][:1]:
+            key = (normalize_error(error), project)
+            expected[key] = expected.get(key, 0) + n
+        counts, event_rows = {}, {}
+        for n, path in paths.items():
+            conn = dis_db.connect(path)
+            counts[n] = dict(((p, proj), c) for p, proj, c in conn.execute(
+                "SELECT error_pattern, project, success_count FROM solutions"))
+            event_rows[n] = conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+            conn.close()
+
+    total = sum(expected.values())
+    checks = {
+        "sync and aggregate finished without errors": not errors,
+        "every machine has every event": all(v == total for v in event_rows.values()),
+        "success_count == events across machines": all(c == expected for c in counts.values()),
+    }
+    return {"expected": {f"{p[:40]} ({proj})": c for (p, proj), c in expected.items()},
+            "counts": {n: sorted(c.values()) for n, c in counts.items()}, "errors": errors, "checks": checks}
+
+
+def main():
+    args = sys.argv[1:]
+    rows = int(args[args.index("--rows") + 1]) if "--rows" in args else 20000
+    workers = int(args[args.index("--workers") + 1]) if "--workers" in args else sync.WORKERS
+    latency = float(args[args.index("--latency-ms") + 1]) / 1000 if "--latency-ms" in args else 0.02
+
+    results = [
+        run("1 worker, new conn, row-at-a-time", rows, latency, 1, keepalive=False, encoding="row"),
+        run("1 worker, keep-alive, row-at-a-time", rows, latency, 1, encoding="row"),
+        run(f"{workers} workers, row-at-a-time", rows, latency, workers, encoding="row"),
+        run(f"{workers} workers, multi-row + store_sql", rows, latency, workers),
+        run(f"{workers} workers, multi-row + gzip", rows, latency, workers, use_gzip=True),
+    ]
+    same_key = run_same_key(latency)
+    aggregated = run_aggregate(latency)
+    ok = (all(r["consistent"] for r in results) and all(same_key["checks"].values())
+          and all(aggregated["checks"].values()))
+
+    if "--json" in args:
+        print(json.dumps({"rows": rows, "latency_ms": latency * 1000, "results": results, "same_key": same_key,
+                          "aggregate": aggregated},
+                         indent=2))
+    else:
+        print(f"sync benchmark: {rows} rows, {latency * 1000:.0f}ms simulated latency")
+        for r in results:
+            for phase in ("push", "pull"):
+                p = r[phase]
+                print(f"  {r['name']:<38} {phase}  {p['seconds']:7.2f}s  {p['rows_per_sec']:>8,} rows/s  "
+                      f"{p['requests']:>5} req  {p['connections']:>4} conn  {p['bytes_sent']:>12,} B")
+            per_table = "  ".join(f"{t}={b:,.0f}" for t, b in r["push"]["tables"].items()
+                                  if t in ("events", "test_sessions"))
+            print(f"  {'':<38} push {r['push']['bytes_per_row']:,.0f} B/row ({per_table})  "
+                  f"consistent={r['consistent']}")
+        print()
+        print(f"  same (error_pattern, project) on two machines: {same_key['merged']} rows merged")
+        for name, passed in same_key["checks"].items():
+            print(f"  {'OK  ' if passed else 'FAIL'} {name}")
+        for e in same_key["errors"]:
+            print(f"       {e}")
+        print()
+        print(f"  record + aggregate + sync on two machines: success_count {aggregated['counts']['remote']} "
+              f"(expected {sorted(aggregated['expected'].values())})")
+        for name, passed in aggregated["checks"].items():
+            print(f"  {'OK  ' if passed else 'FAIL'} {name}")
+        for e in aggregated["errors"]:
+            print(f"       {e}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
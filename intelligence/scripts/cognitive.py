@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+"""DIS: 関数単位の Cognitive Complexity 解析 (measure-quality の CLS)。
+
+Python は ast、TS/JS/Rust/Go/Swift はブレース対応のトークナイザ、その他 (Ruby など) と
+構文エラーの Python はインデントベースで、いずれもファイルを1パスで走査する。
+
+加算規則 (Sonar の Cognitive Complexity に準拠):
+  - if / for / while / switch / catch / match / 三項演算子: +1 + ネスト深さ
+  - else if / elif / else: +1 (ネスト加算なし)
+  - && / || / and / or: 演算子の種類が変わるごとに +1
+  - 制御構文の本体とネストした関数 (クロージャ・ラムダ) はネストを1段深くする
+ネストした関数の複雑度は外側の関数に加算する。クラス直下のメソッドはそれぞれ独立した関数。
+
+Usage:
+  cognitive.py <file>       # 関数ごとの内訳を表示
+  cognitive.py <file> --json
+"""
+import ast
+import json
+import re
+import sys
+from pathlib import Path
+
+MODULE = "<module>"
+
+BRACE_LANGS = {"typescript", "javascript", "rust", "go", "swift"}
+
+
+def _frame(name: str, start: int, end: int) -> dict:
+    return {"name": name, "start": start, "end": end, "cls": 0}
+
+
+def summarize(functions: list[dict], module: dict, max_nesting: int) -> dict:
+    """関数ごとの結果をファイル単位の CLS にまとめる。
+
+    トップレベルの処理に複雑度があれば <module> として内訳と最大値に含める。
+    """
+    breakdown = sorted(functions, key=lambda f: f["start"])
+    if module["cls"]:
+        breakdown.insert(0, module)
+    total = sum(f["cls"] for f in breakdown)
+    return {
+        "cls_total": total,
+        "cls_max": max((f["cls"] for f in breakdown), default=0),
+        "cls_avg": round(total / max(len(functions), 1), 2),
+        "functions": len(functions),
+        "max_nesting": max_nesting,
+        "function_cls": breakdown,
+    }
+
+
+# ── Python (ast) ────────────────────────────────────────────
+
+# 子を持たない (あるいは数える対象を含まない) ノード。走査を省く
+_PY_LEAVES = (ast.Constant, ast.Load, ast.Store, ast.Del, ast.operator, ast.boolop, ast.cmpop, ast.unaryop)
+
+
+class _PythonAnalyzer:
+    """ノード型ごとのハンドラで ast を1回だけ走査する。
+
+    identifiers を渡すと SE 用の識別子 (Name / FunctionDef / ClassDef / Attribute) も同じ走査で集める。
+    """
+
+    def __init__(self, source: str, identifiers: list | None = None):
+        self.module = _frame(MODULE, 1, source.count("\n") + 1)
+        self.functions: list[dict] = []
+        self.max_nesting = 0
+        self.ids = identifiers if identifiers is not None else []
+        self.handlers = {
+            ast.FunctionDef: self.visit_function, ast.AsyncFunctionDef: self.visit_function,
+            ast.ClassDef: self.visit_class, ast.Lambda: self.visit_lambda,
+            ast.If: self.visit_if, ast.For: self.visit_loop, ast.AsyncFor: self.visit_loop,
+            ast.While: self.visit_loop, ast.Try: self.visit_try, ast.IfExp: self.visit_ifexp,
+            ast.BoolOp: self.visit_boolop, ast.Name: self.visit_name, ast.Attribute: self.visit_attribute,
+        }
+        if hasattr(ast, "TryStar"):
+            self.handlers[ast.TryStar] = self.visit_try
+        if hasattr(ast, "Match"):
+            self.handlers[ast.Match] = self.visit_match
+        for leaf in _PY_LEAVES:
+            for cls in [leaf] + leaf.__subclasses__():
+                self.handlers[cls] = self.skip
+
+    def add(self, frame: dict, nesting: int, nested: bool = True):
+        frame["cls"] += 1 + (nesting if nested else 0)
+        if nested and nesting >= self.max_nesting:
+            self.max_nesting = nesting + 1
+
+    def visit(self, node, frame, nesting, scope):
+        handler = self.handlers.get(type(node))
+        if handler is not None:
+            handler(node, frame, nesting, scope)
+        else:
+            self.children(node, frame, nesting, scope)
+
+    def children(self, node, frame, nesting, scope):
+        for field in node._fields:
+            value = getattr(node, field, None)
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, ast.AST):
+                        self.visit(item, frame, nesting, scope)
+            elif isinstance(value, ast.AST):
+                self.visit(value, frame, nesting, scope)
+
+    def block(self, nodes, frame, nesting, scope):
+        for node in nodes:
+            self.visit(node, frame, nesting, scope)
+
+    def skip(self, node, frame, nesting, scope):
+        pass
+
+    def visit_name(self, node, frame, nesting, scope):
+        self.ids.append(node.id)
+
+    def visit_attribute(self, node, frame, nesting, scope):
+        self.ids.append(node.attr)
+        self.visit(node.value, frame, nesting, scope)
+
+    def visit_function(self, node, frame, nesting, scope):
+        if isinstance(node, ast.FunctionDef):
+            self.ids.append(node.name)
+        # デコレータ・引数・戻り値の注釈は外側で評価される
+        self.block(node.decorator_list, frame, nesting, scope)
+        self.visit(node.args, frame, nesting, scope)
+        if node.returns:
+            self.visit(node.returns, frame, nesting, scope)
+        if frame is self.module:
+            fn = _frame(".".join(scope + [node.name]), node.lineno, node.end_lineno)
+            self.functions.append(fn)
+            self.block(node.body, fn, 0, scope + [node.name])
+        else:
+            self.block(node.body, frame, nesting + 1, scope)
+
+    def visit_class(self, node, frame, nesting, scope):
+        self.ids.append(node.name)
+        self.block(node.decorator_list, frame, nesting, scope)
+        self.block(node.bases, frame, nesting, scope)
+        self.block(node.keywords, frame, nesting, scope)
+        self.block(node.body, frame, nesting, scope + [node.name])
+
+    def visit_lambda(self, node, frame, nesting, scope):
+        self.visit(node.args, frame, nesting, scope)
+        self.visit(node.body, frame, nesting + 1, scope)
+
+    def visit_if(self, node, frame, nesting, scope, elif_=False):
+        self.add(frame, nesting, nested=not elif_)
+        self.visit(node.test, frame, nesting, scope)
+        self.block(node.body, frame, nesting + 1, scope)
+        orelse = node.orelse
+        if not orelse:
+            return
+        # elif は親 if と同じ列に現れる (else: の中の if はインデントが深い)
+        if len(orelse) == 1 and isinstance(orelse[0], ast.If) and orelse[0].col_offset == node.col_offset:
+            self.visit_if(orelse[0], frame, nesting, scope, elif_=True)
+        else:
+            self.add(frame, nesting, nested=False)
+            self.block(orelse, frame, nesting + 1, scope)
+
+    def visit_loop(self, node, frame, nesting, scope):
+        self.add(frame, nesting)
+        if isinstance(node, ast.While):
+            self.visit(node.test, frame, nesting, scope)
+        else:
+            self.visit(node.target, frame, nesting, scope)
+            self.visit(node.iter, frame, nesting, scope)
+        self.block(node.body, frame, nesting + 1, scope)
+        if node.orelse:
+            self.add(frame, nesting, nested=False)
+            self.block(node.orelse, frame, nesting + 1, scope)
+
+    def visit_try(self, node, frame, nesting, scope):
+        self.block(node.body, frame, nesting, scope)
+        for handler in node.handlers:
+            self.add(frame, nesting)
+            if handler.type:
+                self.visit(handler.type, frame, nesting, scope)
+            self.block(handler.body, frame, nesting + 1, scope)
+        self.block(node.orelse, frame, nesting, scope)
+        self.block(node.finalbody, frame, nesting, scope)
+
+    def visit_match(self, node, frame, nesting, scope):
+        self.add(frame, nesting)
+        self.visit(node.subject, frame, nesting, scope)
+        for case in node.cases:
+            self.visit(case.pattern, frame, nesting, scope)
+            if case.guard:
+                self.visit(case.guard, frame, nesting, scope)
+            self.block(case.body, frame, nesting + 1, scope)
+
+    def visit_ifexp(self, node, frame, nesting, scope):
+        self.add(frame, nesting)
+        self.children(node, frame, nesting, scope)
+
+    def visit_boolop(self, node, frame, nesting, scope):
+        frame["cls"] += 1
+        self.block(node.values, frame, nesting, scope)
+
+    def run(self, tree) -> dict:
+        self.block(tree.body, self.module, 0, [])
+        return summarize(self.functions, self.module, self.max_nesting)
+
+
+def analyze_python(source: str, tree: ast.AST | None = None, identifiers: list | None = None) -> dict:
+    """Python の CLS。解析済みの tree を渡せば再パースしない (SE の計測と共有する)。"""
+    if tree is None:
+        try:
+            tree = ast.parse(source)
+        except (SyntaxError, ValueError):
+            return analyze_indent(source)
+    return _PythonAnalyzer(source, identifiers).run(tree)
+
+
+# ── Brace languages (TS/JS/Rust/Go/Swift) ───────────────────
+
+_STRINGS = {
+    # JS/TS はテンプレートリテラル、Go は raw string にバッククォートを使う
+    "default": r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`(?:\\.|[^`\\])*`',
+    # Rust の 'a はライフタイムなので文字リテラルだけを文字列として扱う
+    "rust": r'"(?:\\.|[^"\\])*"|\'(?:\\[^\']*|[^\'\\\n])\'',
+    "go": r'"(?:\\.|[^"\\\n])*"|\'(?:\\[^\']*|[^\'\\\n])\'|`[^`]*`',
+}
+
+CONTROL = {
+    "common": {"if", "for", "while", "do", "switch", "catch"},
+    "rust": {"if", "for", "while", "match", "loop"},
+    "go": {"if", "for", "switch", "select"},
+    "swift": {"if", "for", "while", "repeat", "switch", "catch", "guard"},
+}
+SCOPE_KEYWORDS = ("class", "struct", "impl", "trait", "interface", "enum", "namespace", "mod", "extension")
+_IDENT = r"[A-Za-z_$][\w$]*"
+
+
+FUNCTION_KEYWORD = {"typescript": "function", "javascript": "function", "rust": "fn", "go": "func", "swift": "func"}
+_WORD_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_$.")
+
+
+def _token_re(lang: str) -> re.Pattern:
+    """解析に必要なトークンだけを拾うパターン。
+
+    普通の識別子・数値・空白・改行はどの分岐にもマッチさせず finditer に読み飛ばさせる
+    (Python 側のループはキーワード・括弧・演算子の数だけ回る)。全分岐をリテラル文字で
+    始めているので re の先頭文字セット最適化が効き、走査自体も速い。キーワード直前の
+    単語境界は呼び出し側で確認し、関数名・代入先は必要になった時点でソースを遡って読む。
+    """
+    branches = _STRINGS.get(lang, _STRINGS["default"]).split("|")
+    branches += [r"//[^\n]*", r"/\*.*?\*/"]
+    branches += [FUNCTION_KEYWORD[lang] + r"\b\*?\s*(?P<fname>" + _IDENT + r")?"]
+    branches += [kw + r"\b[^{;]*" for kw in SCOPE_KEYWORDS]
+    branches += [r"else\s+if\b", r"else\b"]
+    branches += [kw + r"\b" for kw in sorted(CONTROL.get(lang, CONTROL["common"]))]
+    branches += [r"&&", r"\|\|", r"\{", r"\}", r"\(", r"\)", ";", ",", ":"]
+    if lang in ("typescript", "javascript", "swift"):
+        branches += [r"\?\?", r"\?\.", r"\?(?=\s*[^\s:),=;>\].?])"]     # 三項演算子のみ
+    if lang in ("typescript", "javascript"):
+        branches += [r"=>(?=\s*\{)"]
+    return re.compile("|".join(branches), re.S)
+
+
+# 固定の字面 → 種別。ここにない字面は文字列/コメント・関数宣言・スコープ宣言・else if
+_KINDS = {"&&": "logic", "||": "logic", "??": "skip", "?.": "skip", "?": "ternary", "=>": "arrow",
+          "else": "else", **{c: c for c in "{}();,:"}}
+_TOKEN_RES: dict[str, tuple[re.Pattern, dict]] = {}
+_CALL_NAME = re.compile(r"(" + _IDENT + r")\s*(?:<[^()]*>)?\s*$")
+_GO_RECEIVER = re.compile(r"\s*\([^)]*\)\s*(" + _IDENT + r")")
+_ASSIGN_NAME = re.compile(r"(" + _IDENT + r")\s*(?:=(?![=>])|:(?!:))")
+
+
+def _scope_name(decl: str) -> str:
+    """`class Foo extends Bar` → Foo、`impl<T> Trait for Type<T>` → Type。"""
+    depth, plain = 0, []
+    for ch in decl:
+        depth += (ch == "<") - (ch == ">")
+        plain.append(ch if depth == 0 and ch != ">" else " ")
+    ids = re.findall(_IDENT, "".join(plain))[1:]
+    if "for" in ids[:-1]:
+        return ids[ids.index("for") + 1]
+    return next((i for i in ids if i not in ("pub", "export", "abstract", "extends")), "")
+
+
+def analyze_braces(source: str, lang: str) -> dict:
+    """ブレース言語の1パス解析。`{` の直前に見た宣言/制御キーワードでブロックの種類を決める。"""
+    if lang not in _TOKEN_RES:
+        kinds = dict(_KINDS, **{kw: "kw" for kw in CONTROL.get(lang, CONTROL["common"])})
+        kinds[FUNCTION_KEYWORD[lang]] = "fn"
+        _TOKEN_RES[lang] = (_token_re(lang), kinds)
+    pattern, kinds = _TOKEN_RES[lang]
+    fn_keyword = FUNCTION_KEYWORD[lang]
+    js = lang in ("typescript", "javascript")
+    module = _frame(MODULE, 1, source.count("\n") + 1)
+    functions: list[dict] = []
+    max_nesting = 0
+
+    # blocks: (種類, 外側の関数フレーム, 外側のネスト深さ, 外側のスコープ, 外側の括弧深さ)
+    #   種類は func (トップレベル関数) / nested (関数内の関数) / ctrl / do / scope (class, impl など) / plain
+    blocks: list[tuple] = []
+    frame, nesting, scope, paren = module, 0, [], 0
+
+    pending = None       # 次の `{` が開くブロック: ("ctrl"|"do",) / ("func", 名前, 位置) / ("scope", 名前)
+    stmt_start = 0       # 現在の文の開始位置 (代入先の名前を遡って読む範囲)
+    params_at = -1       # 文中で最初に開いた括弧の位置 (JS/TS のメソッド省略記法 `name(...) {` の名前)
+    closed_params = False  # 文中で括弧が閉じた後か (`foo(a) {` / `foo(a): T {` の判定)
+    typed = False        # 括弧が閉じた後に `:` (戻り値の型注釈) があったか
+    last_logic = None
+    prev = ""
+    # 行番号は必要なとき (関数の開始・終了) だけ前回位置からの改行数で求める
+    line_pos, line_no = 0, 1
+
+    def line_at(pos: int) -> int:
+        nonlocal line_pos, line_no
+        line_no += source.count("\n", line_pos, pos)
+        line_pos = pos
+        return line_no
+
+    def reset_statement(pos: int):
+        nonlocal pending, stmt_start, params_at, closed_params, typed, last_logic
+        pending = last_logic = None
+        stmt_start, params_at = pos, -1
+        closed_params = typed = False
+
+    def assign_name(pos: int) -> str | None:
+        m_ = _ASSIGN_NAME.search(source, stmt_start, pos)
+        return m_.group(1) if m_ else None
+
+    for m in pattern.finditer(source):
+        text = m.group()
+        kind = kinds.get(text)
+        if kind is None:
+            c = text[0]
+            if c in "/\"'`":
+                continue
+            kind = "elseif" if c == "e" else "fn" if text.startswith(fn_keyword) else "scope"
+        elif kind == "skip":
+            continue
+        if kind in ("kw", "else", "elseif", "fn", "scope") and m.start() and source[m.start() - 1] in _WORD_CHARS:
+            continue            # foo.catch(...) や pseudo の do など、識別子の一部
+
+        if kind == "kw":
+            if text == "while" and prev == "}do":
+                pass                                   # do { } while (...) は do で数え済み
+            else:
+                frame["cls"] += 1 + nesting
+                max_nesting = max(max_nesting, nesting + 1)
+                pending = ("do",) if text == "do" else ("ctrl",)
+        elif kind in ("else", "elseif"):
+            frame["cls"] += 1
+            pending = ("ctrl",)
+        elif kind == "fn":
+            name = m.group("fname")
+            if lang == "go" and name is None:
+                name = _go_method_name(source, m.end())
+            pending = ("func", name or assign_name(m.start()), m.start())
+        elif kind == "scope":
+            if pending is None:
+                pending = ("scope", _scope_name(text))
+        elif kind == "arrow":
+            pending = ("func", assign_name(m.start()), m.start())
+        elif kind == "ternary":
+            frame["cls"] += 1 + nesting
+            max_nesting = max(max_nesting, nesting + 1)
+        elif kind == "logic":
+            if text != last_logic:
+                frame["cls"] += 1
+            last_logic = text
+        elif text == "(":
+            if paren == 0 and params_at < 0:
+                params_at = m.start()
+            paren += 1
+            last_logic = None
+        elif text == ")":
+            paren = max(paren - 1, 0)
+            closed_params = paren == 0
+            last_logic = None
+        elif text == ":":
+            typed = typed or closed_params
+        elif text == "{":
+            block, new_frame, new_nesting, new_scope = "plain", frame, nesting, scope
+            method = js and pending is None and closed_params and (prev == ")" or typed)
+            if pending and pending[0] in ("ctrl", "do"):
+                block, new_nesting = pending[0], nesting + 1
+            elif pending and pending[0] == "scope":
+                block = "scope"
+                new_scope = scope + [pending[1]] if pending[1] else scope
+            elif method and (call := _CALL_NAME.search(source, stmt_start, params_at)) is None:
+                pass
+            elif (pending and pending[0] == "func") or method:
+                name, start = (pending[1], pending[2]) if pending else (call.group(1), params_at)
+                if frame is module:
+                    block, new_nesting = "func", 0
+                    new_frame = _frame(".".join(scope + [name or "<anonymous>"]), line_at(start), 0)
+                    functions.append(new_frame)
+                else:
+                    block, new_nesting = "nested", nesting + 1
+            blocks.append((block, frame, nesting, scope, paren))
+            frame, nesting, scope, paren = new_frame, new_nesting, new_scope, 0
+            reset_statement(m.end())
+        elif text == "}":
+            if blocks:
+                block, outer_frame, outer_nesting, outer_scope, outer_paren = blocks.pop()
+                if block == "func":
+                    frame["end"] = line_at(m.start())
+                frame, nesting, scope, paren = outer_frame, outer_nesting, outer_scope, outer_paren
+                if block == "do":
+                    text = "}do"
+            reset_statement(m.end())
+        elif text == ";":
+            # for (;;) の括弧内と、Go の if/for の初期化文 (`;` を含む) では保留中の制御構文を維持する
+            if paren == 0 and not (lang == "go" and pending and pending[0] == "ctrl"):
+                reset_statement(m.end())
+        elif text == ",":
+            if paren == 0 and not closed_params and (not blocks or blocks[-1][0] in ("plain", "scope")):
+                stmt_start, params_at = m.end(), -1
+            last_logic = None
+        prev = text
+
+    for f in functions:
+        f["end"] = f["end"] or module["end"]
+    return summarize(functions, module, max_nesting)
+
+
+def _go_method_name(source: str, pos: int) -> str | None:
+    """`func (r *T) Name(...)` のレシーバを読み飛ばしてメソッド名を返す。"""
+    m = _GO_RECEIVER.match(source, pos)
+    return m.group(1) if m else None
+
+
+# ── Indent fallback (Ruby, 構文エラーの Python など) ───────
+
+_INDENT_CONTROL = re.compile(r"(if|unless|for|while|until|case|except|rescue|catch|match)\b")
+_INDENT_BRANCH = re.compile(r"(elif|elsif|else\s+if|else)\b")
+_INDENT_FUNC = re.compile(r"(?:async\s+)?(?:def|fn|func|function)\s+([\w.?!]+)")
+_INDENT_SCOPE = re.compile(r"(?:class|module)\s+([\w:]+)")
+_INDENT_LOGIC = re.compile(r"&&|\|\||\band\b|\bor\b")
+
+
+def analyze_indent(source: str) -> dict:
+    """インデントでブロックを判定する近似解析。ネストは実際のインデント段数で数える。"""
+    lines = source.split("\n")
+    module = _frame(MODULE, 1, len(lines))
+    functions: list[dict] = []
+    max_nesting = 0
+    # stack: (indent, 種類, 関数フレーム)
+    stack: list[tuple[int, str, dict]] = []
+
+    for lineno, line in enumerate(lines, 1):
+        stripped = line.strip()
+        if not stripped or stripped.startswith(("#", "//", "/*", "*", "--")):
+            continue
+        indent = len(line.expandtabs(4)) - len(line.expandtabs(4).lstrip())
+        while stack and stack[-1][0] >= indent:
+            _, kind, fr = stack.pop()
+            if kind == "func":
+                fr["end"] = lineno - 1
+        frame = next((fr for _, kind, fr in reversed(stack) if kind == "func"), module)
+        nesting = 0
+        for _, kind, _ in reversed(stack):
+            if kind == "func":
+                break
+            if kind in ("ctrl", "nested"):
+                nesting += 1
+
+        if m := _INDENT_FUNC.match(stripped):
+            if frame is module:
+                scope = [s for s in (fr for _, kind, fr in stack if kind == "scope")]
+                fn = _frame(".".join([s["name"] for s in scope] + [m.group(1)]), lineno, len(lines))
+                functions.append(fn)
+                stack.append((indent, "func", fn))
+            else:
+                stack.append((indent, "nested", frame))
+        elif m := _INDENT_SCOPE.match(stripped):
+            stack.append((indent, "scope", {"name": m.group(1)}))
+        elif _INDENT_BRANCH.match(stripped):
+            frame["cls"] += 1
+            stack.append((indent, "ctrl", frame))
+        elif _INDENT_CONTROL.match(stripped):
+            frame["cls"] += 1 + nesting
+            max_nesting = max(max_nesting, nesting + 1)
+            stack.append((indent, "ctrl", frame))
+
+        last = None
+        for op in _INDENT_LOGIC.findall(stripped):
+            op = {"and": "&&", "or": "||"}.get(op, op)
+            if op != last:
+                frame["cls"] += 1
+            last = op
+
+    for _, kind, fr in stack:
+        if kind == "func":
+            fr["end"] = len(lines)
+    return summarize(functions, module, max_nesting)
+
+
+def analyze(source: str, lang: str = "auto") -> dict:
+    """言語に応じた解析器で CLS と関数ごとの内訳を返す。"""
+    if lang == "python":
+        return analyze_python(source)
+    if lang in BRACE_LANGS:
+        return analyze_braces(source, lang)
+    return analyze_indent(source)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    path = sys.argv[1]
+    lang = {".py": "python", ".ts": "typescript", ".tsx": "typescript", ".js": "javascript",
+            ".jsx": "javascript", ".rs": "rust", ".go": "go", ".swift": "swift"}.get(Path(path).suffix.lower(), "auto")
+    result = analyze(open(path, encoding="utf-8", errors="replace").read(), lang)
+    if "--json" in sys.argv:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"{path}: CLS max={result['cls_max']} total={result['cls_total']} "
+              f"functions={result['functions']} nesting={result['max_nesting']}")
+        for f in sorted(result["function_cls"], key=lambda f: -f["cls"]):
+            print(f"  {f['cls']:>4}  {f['name']}  L{f['start']}-{f['end']}")
@@ -1,150 +1,100 @@
 #!/usr/bin/env python3
-"""DIS: 時間減衰によるスコア再計算。λ=0.01 (半減期約70日)。"""
+"""DIS: 時間減衰によるスコア再計算。λ=0.01 (半減期約70日)。
+
+各テーブルの減衰は DECAY_TABLES のレジストリに従い、1テーブル1本の set-based UPDATE
+(julianday で経過日数を計算) で適用する。アーカイブも同一トランザクション内で一括実行。
+アーカイブした行は削除せず dev-archive.db に移す (archive.py。検索・復元もそちら)。
+"""
 import math
 import sqlite3
 import os
+import time
 from datetime import datetime
 
+import archive
+import dis_db
+import migrate
+
 DB = os.path.expanduser("~/.claude/intelligence/dev.db")
 LAMBDA = 0.01  # 半減期 ≈ ln(2)/0.01 ≈ 69.3日
 ARCHIVE_THRESHOLD = 0.1
 
+# (table, score列, timestamp列, λ, アーカイブ追加条件)
+DECAY_TABLES = [
+    ("solutions", "score", "last_used", LAMBDA, ""),
+    ("patterns", "score", "last_seen", LAMBDA, "promoted_to_memory = 0"),
+    # feedback はより長く保持 (半減期約140日)
+    ("feedback", "score", "last_seen", 0.005, ""),
+    # test_sessions (半減期約87日)
+    ("test_sessions", "score", "ts", 0.008, ""),
+    # dev_sessions は長期保持 (半減期約116日)
+    ("dev_sessions", "score", "ts", 0.006, ""),
+    # questions は長期保持 (半減期約140日)、未解決の質問はアーカイブしない
+    ("questions", "score", "last_seen", 0.005, "status = 'resolved'"),
+    # bug_sessions (半減期約99日)
+    ("bug_sessions", "score", "ts", 0.007, ""),
+]
 
-def apply_decay():
-    conn = sqlite3.connect(DB)
-    cur = conn.cursor()
-    now = datetime.utcnow()
 
-    # solutions の減衰
-    cur.execute("SELECT id, score, last_used FROM solutions WHERE score > ?", (ARCHIVE_THRESHOLD,))
-    sol_count = 0
-    for sid, score, last_used in cur.fetchall():
-        if not last_used:
-            continue
-        try:
-            last_dt = datetime.fromisoformat(last_used)
-            days = (now - last_dt).days
-            new_score = score * math.exp(-LAMBDA * days)
-            cur.execute("UPDATE solutions SET score = ? WHERE id = ?", (round(new_score, 4), sid))
-            sol_count += 1
-        except (ValueError, TypeError):
-            continue
+def _exp(x):
+    return None if x is None else math.exp(x)
 
-    # patterns の減衰
-    cur.execute("SELECT id, score, last_seen FROM patterns WHERE score > ?", (ARCHIVE_THRESHOLD,))
-    pat_count = 0
-    for pid, score, last_seen in cur.fetchall():
-        if not last_seen:
-            continue
-        try:
-            last_dt = datetime.fromisoformat(last_seen)
-            days = (now - last_dt).days
-            new_score = score * math.exp(-LAMBDA * days)
-            cur.execute("UPDATE patterns SET score = ? WHERE id = ?", (round(new_score, 4), pid))
-            pat_count += 1
-        except (ValueError, TypeError):
-            continue
 
-    # feedback の減衰 (λ=0.005、半減期約140日 — フィードバックはより長く保持)
-    FB_LAMBDA = 0.005
-    cur.execute("SELECT id, score, last_seen FROM feedback WHERE score > ?", (ARCHIVE_THRESHOLD,))
-    fb_count = 0
-    for fid, score, last_seen in cur.fetchall():
-        if not last_seen:
-            continue
-        try:
-            last_dt = datetime.fromisoformat(last_seen)
-            days = (now - last_dt).days
-            new_score = score * math.exp(-FB_LAMBDA * days)
-            cur.execute("UPDATE feedback SET score = ? WHERE id = ?", (round(new_score, 4), fid))
-            fb_count += 1
-        except (ValueError, TypeError):
-            continue
+def decay_table(cur: sqlite3.Cursor, table: str, score_col: str, ts_col: str, lam: float, now: str) -> int:
+    """1テーブル分の減衰を1本のUPDATEで適用。更新行数を返す。
 
-    # test_sessions の減衰 (λ=0.008、半減期約87日)
-    TS_LAMBDA = 0.008
-    cur.execute("SELECT id, score, ts FROM test_sessions WHERE score > ?", (ARCHIVE_THRESHOLD,))
-    ts_count = 0
-    for tid, score, ts in cur.fetchall():
-        if not ts:
-            continue
-        try:
-            last_dt = datetime.fromisoformat(ts)
-            days = (now - last_dt).days
-            new_score = score * math.exp(-TS_LAMBDA * days)
-            cur.execute("UPDATE test_sessions SET score = ? WHERE id = ?", (round(new_score, 4), tid))
-            ts_count += 1
-        except (ValueError, TypeError):
-            continue
+    経過日数は整数日 (切り捨て)。timestamp が NULL または解釈不能な行は対象外。
+    """
+    cur.execute(
+        f"UPDATE {table} SET {score_col} = ROUND({score_col} * "
+        f"exp(-? * CAST(julianday(?) - julianday({ts_col}) AS INTEGER)), 4) "
+        f"WHERE {score_col} > ? AND julianday({ts_col}) IS NOT NULL",
+        (lam, now, ARCHIVE_THRESHOLD),
+    )
+    return cur.rowcount
 
-    # dev_sessions の減衰 (λ=0.006、半減期約116日 — 長期保持)
-    DS_LAMBDA = 0.006
-    cur.execute("SELECT id, score, ts FROM dev_sessions WHERE score > ?", (ARCHIVE_THRESHOLD,))
-    ds_count = 0
-    for did, score, ts in cur.fetchall():
-        if not ts:
-            continue
-        try:
-            last_dt = datetime.fromisoformat(ts)
-            days = (now - last_dt).days
-            new_score = score * math.exp(-DS_LAMBDA * days)
-            cur.execute("UPDATE dev_sessions SET score = ? WHERE id = ?", (round(new_score, 4), did))
-            ds_count += 1
-        except (ValueError, TypeError):
-            continue
 
-    # questions の減衰 (λ=0.005、半減期約140日 — 質問は長期保持)
-    Q_LAMBDA = 0.005
-    cur.execute("SELECT id, score, last_seen FROM questions WHERE score > ?", (ARCHIVE_THRESHOLD,))
-    q_count = 0
-    for qid, score, last_seen in cur.fetchall():
-        if not last_seen:
-            continue
-        try:
-            last_dt = datetime.fromisoformat(last_seen)
-            days = (now - last_dt).days
-            new_score = score * math.exp(-Q_LAMBDA * days)
-            cur.execute("UPDATE questions SET score = ? WHERE id = ?", (round(new_score, 4), qid))
-            q_count += 1
-        except (ValueError, TypeError):
-            continue
+def archive_table(cur: sqlite3.Cursor, table: str, score_col: str, predicate: str) -> int:
+    """しきい値を下回った行を dev-archive.db に移す (INSERT ... SELECT + DELETE)。移した行数を返す。"""
+    extra = f" AND {predicate}" if predicate else ""
+    return archive.move(cur, table, f"{score_col} < ? AND {score_col} > 0{extra}", (ARCHIVE_THRESHOLD,))
 
-    # bug_sessions の減衰 (λ=0.007、半減期約99日)
-    BUG_LAMBDA = 0.007
-    cur.execute("SELECT id, score, ts FROM bug_sessions WHERE score > ?", (ARCHIVE_THRESHOLD,))
-    bug_count = 0
-    for bid, score, ts in cur.fetchall():
-        if not ts:
-            continue
-        try:
-            last_dt = datetime.fromisoformat(ts)
-            days = (now - last_dt).days
-            new_score = score * math.exp(-BUG_LAMBDA * days)
-            cur.execute("UPDATE bug_sessions SET score = ? WHERE id = ?", (round(new_score, 4), bid))
-            bug_count += 1
-        except (ValueError, TypeError):
+
+def _decay_all(conn: sqlite3.Connection, registry: list[tuple], existing: set[str]) -> tuple[dict, dict, list]:
+    cur = conn.cursor()
+    now = datetime.utcnow().isoformat()
+    decayed, archived, timings = {}, {}, []
+    for table, score_col, ts_col, lam, predicate in registry:
+        if table not in existing:
             continue
+        t0 = time.perf_counter()
+        decayed[table] = decay_table(cur, table, score_col, ts_col, lam, now)
+        archived[table] = archive_table(cur, table, score_col, predicate)
+        timings.append((table, decayed[table], time.perf_counter() - t0))
+    return decayed, archived, timings
+
+
+def apply_decay(registry: list[tuple] = DECAY_TABLES):
+    conn = migrate.ensure(dis_db.connect(DB))
+    conn.create_function("exp", 1, _exp, deterministic=True)
+    archive.attach(conn, archive.path_for(DB))
+    cur = conn.cursor()
+
+    cur.execute("SELECT name FROM main.sqlite_master WHERE type='table'")
+    existing = {r[0] for r in cur.fetchall()}
+
+    # 全テーブルの減衰とアーカイブを1トランザクションで (失敗したら全体をロールバック)
+    try:
+        decayed, archived, timings = dis_db.write(conn, _decay_all, registry, existing)
+    finally:
+        conn.close()
 
-    # アーカイブ（低スコア削除）
-    cur.execute("DELETE FROM solutions WHERE score < ? AND score > 0", (ARCHIVE_THRESHOLD,))
-    archived_sol = cur.rowcount
-    cur.execute("DELETE FROM patterns WHERE score < ? AND score > 0 AND promoted_to_memory = 0", (ARCHIVE_THRESHOLD,))
-    archived_pat = cur.rowcount
-    cur.execute("DELETE FROM feedback WHERE score < ? AND score > 0", (ARCHIVE_THRESHOLD,))
-    archived_fb = cur.rowcount
-    cur.execute("DELETE FROM test_sessions WHERE score < ? AND score > 0", (ARCHIVE_THRESHOLD,))
-    archived_ts = cur.rowcount
-    cur.execute("DELETE FROM dev_sessions WHERE score < ? AND score > 0", (ARCHIVE_THRESHOLD,))
-    archived_ds = cur.rowcount
-    cur.execute("DELETE FROM questions WHERE score < ? AND score > 0 AND status = 'resolved'", (ARCHIVE_THRESHOLD,))
-    archived_q = cur.rowcount
-    cur.execute("DELETE FROM bug_sessions WHERE score < ? AND score > 0", (ARCHIVE_THRESHOLD,))
-    archived_bug = cur.rowcount
-
-    conn.commit()
-    conn.close()
-    print(f"Decay applied: {sol_count} solutions, {pat_count} patterns, {fb_count} feedback, {ts_count} test_sessions, {ds_count} dev_sessions, {q_count} questions, {bug_count} bug_sessions")
-    print(f"Archived: {archived_sol} solutions, {archived_pat} patterns, {archived_fb} feedback, {archived_ts} test_sessions, {archived_ds} dev_sessions, {archived_q} questions, {archived_bug} bug_sessions (score < {ARCHIVE_THRESHOLD})")
+    print("Decay applied: " + ", ".join(f"{n} {t}" for t, n in decayed.items()))
+    print("Archived: " + ", ".join(f"{n} {t}" for t, n in archived.items())
+          + f" (score < {ARCHIVE_THRESHOLD}, moved to {archive.path_for(DB)})")
+    for table, rows, secs in timings:
+        rate = rows / secs if secs > 0 else 0.0
+        print(f"  {table}: {rows} rows in {secs * 1000:.1f}ms ({rate:,.0f} rows/s)")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""DIS: 検索・取り込みを常駐プロセスで受けるデーモン (任意) とそのクライアント。
+
+record-*.sh の lookup や review-utils.sh は検索のたびに python3 を起動し、similarity / fts を import して
+dev.db を開き直す。デーモンは dev.db の共有接続 (sqlite3 の文キャッシュを含む)、similarity.IndexCache
+(solutions 件数・df・TF ベクトル)、fts のよくある語の判定結果を持ち続け、Unix ドメインソケットで答える。
+
+プロトコル: 1行1リクエストの JSON、応答も1行の JSON。1接続で続けて何件送ってもよい。
+  → {"op": "similar", "text": "...", "threshold": 0.3, "limit": 5}   (ranker は省略時 similarity.RANKER)
+  ← {"ok": true, "result": [...]}            (失敗時は {"ok": false, "error": "..."})
+op: ping / similar / similar_many (texts) / match (text, tables) / capture (raw) / drain / shutdown
+
+クライアント (similar / match / capture) はデーモンに繋がらなければ同じ処理をプロセス内で行う。
+起動していなくても結果は同じで、遅いだけ。クライアント側は標準ライブラリしか import しないので python3 -S で起動できる。
+デーモンは IDLE_SECONDS の間リクエストがなければ終了する。
+
+Usage:
+  dis_daemon.py start | stop | status
+  dis_daemon.py serve [--socket PATH] [--db PATH]              # フォアグラウンドで動かす
+  dis_daemon.py similar [--threshold 0.5] [--limit 5] [--ranker hybrid] [--archive] <text>   # JSON を表示
+  dis_daemon.py match --tables fts_feedback,fts_patterns <text>  # fts.py と同じ出力
+  dis_daemon.py capture < hook.json                            # ingest.py --capture と同じ
+"""
+import json
+import os
+import socket
+import sys
+import time
+
+DB = os.path.expanduser("~/.claude/intelligence/dev.db")
+SOCK = os.path.expanduser("~/.claude/intelligence/dis.sock")
+
+# 接続・応答を待つ時間 (秒)。フックを止めないよう短くする
+CLIENT_TIMEOUT = 5.0
+# この間リクエストがなければデーモンを終了する (秒)
+IDLE_SECONDS = 30 * 60
+# 1リクエストの上限 (bytes)。capture の hook JSON を含めても十分な大きさ
+MAX_REQUEST_BYTES = 4 * 1024 * 1024
+
+
+class Unavailable(Exception):
+    """デーモンに接続できない (起動していない・ソケットが古い)。"""
+
+
+# ── クライアント ──────────────────────────────────
+
+
+def request(op: str, sock_path: str | None = None, timeout: float = CLIENT_TIMEOUT, **params):
+    """デーモンに1件送って result を返す。繋がらなければ Unavailable、デーモン側の失敗は RuntimeError。"""
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.settimeout(timeout)
+    try:
+        try:
+            s.connect(sock_path or SOCK)
+        except OSError as e:
+            raise Unavailable(str(e)) from e
+        s.sendall(json.dumps({"op": op, **params}, ensure_ascii=False).encode("utf-8") + b"\n")
+        with s.makefile("rb") as f:
+            line = f.readline()
+    finally:
+        s.close()
+    if not line:
+        raise RuntimeError("daemon closed the connection")
+    reply = json.loads(line)
+    if not reply.get("ok"):
+        raise RuntimeError(reply.get("error", "daemon error"))
+    return reply.get("result")
+
+
+def similar(text: str, threshold: float = 0.5, limit: int = 5, sock_path: str | None = None,
+            ranker: str | None = None, archive: bool = False) -> list[dict]:
+    """similarity.find_similar と同じ結果。デーモンが答えられなければプロセス内で検索する。"""
+    try:
+        return request("similar", sock_path, text=text, threshold=threshold, limit=limit, ranker=ranker,
+                       archive=archive)
+    except (Unavailable, RuntimeError, OSError, ValueError):
+        # 検索は読み取りだけなので、送った後に失敗してもプロセス内でやり直してよい
+        import similarity
+        similarity.DB = DB
+        return similarity.find_similar(text, threshold, limit, ranker=ranker, archive=archive)
+
+
+def similar_many(texts: list[str], threshold: float = 0.5, limit: int = 5,
+                 sock_path: str | None = None, ranker: str | None = None) -> list[list[dict]]:
+    """similarity.find_similar_many と同じ結果 (texts と同じ順)。デーモンが答えられなければプロセス内で検索する。"""
+    try:
+        return request("similar_many", sock_path, texts=texts, threshold=threshold, limit=limit, ranker=ranker)
+    except (Unavailable, RuntimeError, OSError, ValueError):
+        import similarity
+        similarity.DB = DB
+        return similarity.find_similar_many(texts, threshold, limit, ranker=ranker)
+
+
+def match(text: str, tables: list[str], sock_path: str | None = None) -> list[str]:
+    """fts.match_query を索引ごとに呼んだ結果。デーモンが答えられなければプロセス内で作る。"""
+    try:
+        return request("match", sock_path, text=text, tables=tables)
+    except (Unavailable, RuntimeError, OSError, ValueError):
+        import dis_db
+        import fts
+        import migrate
+        conn = migrate.ensure(dis_db.connect(DB))
+        try:
+            return [fts.match_query(text, conn, table) for table in tables]
+        finally:
+            conn.close()
+
+
+def capture(raw: str, sock_path: str | None = None):
+    """ingest.capture と同じ。デーモンに繋がらなかった時だけプロセス内で追記する。
+
+    送った後の失敗 (タイムアウトなど) ではやり直さない (デーモンが追記済みかもしれず、二重に記録しないため)。
+    """
+    try:
+        return request("capture", sock_path, raw=raw)
+    except Unavailable:
+        import ingest
+        return ingest.capture(raw)
+    except (RuntimeError, OSError, ValueError):
+        return None
+
+
+# ── デーモン ──────────────────────────────────
+
+
+class _State:
+    """デーモンが持ち続けるもの。接続は dis_db.shared (1スレッドで順に処理する。drain だけ別スレッド)。"""
+
+    def __init__(self, db: str):
+        import similarity
+
+        similarity.DB = db
+        self.db = db
+        self.similarity = similarity
+        self.cache = similarity.IndexCache()
+        self.common: dict = {}
+        self.version = None
+        self.started = time.time()
+        self.requests = 0
+        self.drainer = None
+
+    def drain_later(self):
+        """スプールの drain を別スレッドで始めて、すぐ戻る (フックへの応答を drain で待たせない)。
+
+        実行中なら何もしない。その間に溜まった分は次の drain (Stop フック・aggregate.py) が取り込む。
+        """
+        import threading
+
+        if self.drainer is not None and self.drainer.is_alive():
+            return
+        self.drainer = threading.Thread(target=self._drain, name="drain", daemon=True)
+        self.drainer.start()
+
+    def _drain(self):
+        import dis_db
+        import ingest
+
+        # 共有接続はリクエスト処理のスレッド用なので、drain は自分の接続で書く
+        conn = dis_db.connect(self.db, timeout=30)
+        try:
+            ingest.drain(conn)
+        finally:
+            conn.close()
+
+    def wait(self):
+        """実行中の drain が終わるのを待つ (終了前に呼ぶ)。"""
+        if self.drainer is not None:
+            self.drainer.join()
+
+    def conn(self):
+        import dis_db
+
+        conn = dis_db.shared(self.db, init=self.similarity.ensure_index)
+        # 他の接続が commit していたら fts のよくある語の判定を捨てる (IndexCache は find_similar が見る)
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self.version:
+            self.version, self.common = version, {}
+        return conn
+
+    def handle(self, req: dict):
+        op = req.get("op")
+        if op == "ping":
+            return {"pid": os.getpid(), "db": self.db, "uptime": round(time.time() - self.started, 1),
+                    "requests": self.requests, "cached_terms": len(self.cache.df),
+                    "cached_vectors": len(self.cache.vectors), "cached_common": len(self.common)}
+        if op == "similar":
+            return self.similarity.find_similar(str(req.get("text", "")), float(req.get("threshold", 0.5)),
+                                                int(req.get("limit", 5)), self.cache, req.get("ranker"),
+                                                bool(req.get("archive")))
+        if op == "similar_many":
+            return self.similarity.find_similar_many([str(t) for t in req.get("texts", [])],
+                                                     float(req.get("threshold", 0.5)), int(req.get("limit", 5)),
+                                                     self.cache, ranker=req.get("ranker"))
+        if op == "match":
+            import fts
+
+            conn = self.conn()
+            return [fts.match_query(str(req.get("text", "")), conn, table, common=self.common)
+                    for table in req.get("tables", [])]
+        if op == "capture":
+            import ingest
+
+            # スプールが閾値を超えたら別プロセスを起動せず、デーモン内のスレッドで drain する
+            return ingest.capture(str(req.get("raw", "")), on_full=self.drain_later)
+        if op == "drain":
+            import ingest
+
+            return ingest.drain(self.conn())
+        raise ValueError(f"unknown op: {op!r}")
+
+
+def serve(sock_path: str | None = None, db: str | None = None, idle: float = IDLE_SECONDS):
+    """ソケットで待ち受ける (フォアグラウンド)。既に別のデーモンが動いていれば何もせず戻る。"""
+    import fcntl
+    import socketserver
+
+    sock_path = sock_path or SOCK
+    os.makedirs(os.path.dirname(sock_path), exist_ok=True)
+    # 起動の競合はロックファイルで防ぐ (古いソケットを消して bind し直すのはロックを取った1つだけ)
+    lock_fd = os.open(sock_path + ".lock", os.O_WRONLY | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(lock_fd)
+        return False
+    state = _State(db or DB)
+    stop = []
+
+    class Handler(socketserver.StreamRequestHandler):
+        timeout = CLIENT_TIMEOUT
+
+        def handle(self):
+            while True:
+                try:
+                    line = self.rfile.readline(MAX_REQUEST_BYTES)
+                except OSError:
+                    return
+                if not line.strip():
+                    return
+                state.requests += 1
+                try:
+                    req = json.loads(line)
+                    if req.get("op") == "shutdown":
+                        stop.append(True)
+                        result = None
+                    else:
+                        result = state.handle(req)
+                    reply = {"ok": True, "result": result}
+                except Exception as e:  # 1件の失敗でデーモンを落とさない
+                    reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                try:
+                    self.wfile.write(json.dumps(reply, ensure_ascii=False).encode("utf-8") + b"\n")
+                    self.wfile.flush()
+                except OSError:
+                    return
+                if stop:
+                    return
+
+    class Server(socketserver.UnixStreamServer):
+        def handle_timeout(self):
+            stop.append(True)
+
+    try:
+        if os.path.exists(sock_path):
+            os.unlink(sock_path)
+        # 自分のユーザーだけが繋げるように
+        old_umask = os.umask(0o077)
+        try:
+            server = Server(sock_path, Handler)
+        finally:
+            os.umask(old_umask)
+        server.timeout = idle
+        with server:
+            while not stop:
+                server.handle_request()
+        state.wait()
+        return True
+    finally:
+        try:
+            os.unlink(sock_path)
+        except FileNotFoundError:
+            pass
+        os.close(lock_fd)
+
+
+def start(sock_path: str | None = None, db: str | None = None, wait: float = 5.0) -> dict | None:
+    """デーモンをバックグラウンドで起動し、応答するまで待って ping の結果を返す。"""
+    import subprocess
+
+    try:
+        return request("ping", sock_path)
+    except (Unavailable, RuntimeError, OSError, ValueError):
+        pass
+    cmd = [sys.executable, os.path.abspath(__file__), "serve"]
+    cmd += ["--socket", sock_path] if sock_path else []
+    cmd += ["--db", db] if db else []
+    subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     start_new_session=True)
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        try:
+            return request("ping", sock_path)
+        except (Unavailable, RuntimeError, OSError, ValueError):
+            time.sleep(0.05)
+    return None
+
+
+_OPTIONS = ("--socket", "--db", "--threshold", "--limit", "--tables", "--ranker")
+# 値を取らないオプション
+_FLAGS = ("--archive",)
+
+
+def _opt(args: list[str], name: str, default=None):
+    return args[args.index(name) + 1] if name in args else default
+
+
+def _text(args: list[str]) -> str:
+    """_OPTIONS とその値・_FLAGS を除いた残り (検索文)。それ以外の "--" で始まる文はそのまま検索文として扱う。"""
+    words, skip = [], False
+    for a in args:
+        if skip:
+            skip = False
+        elif a in _OPTIONS:
+            skip = True
+        elif a != "--" and a not in _FLAGS:
+            words.append(a)
+    return " ".join(words)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    cmd = args[0] if args else ""
+    sock_path = _opt(args, "--socket")
+    DB = _opt(args, "--db", DB)
+    text = _text(args[1:])
+
+    if cmd == "serve":
+        sys.exit(0 if serve(sock_path, DB) else 1)
+    elif cmd == "start":
+        info = start(sock_path, DB if "--db" in args else None)
+        print(json.dumps(info) if info else "failed to start", file=sys.stdout if info else sys.stderr)
+        sys.exit(0 if info else 1)
+    elif cmd in ("stop", "status"):
+        try:
+            info = request("shutdown" if cmd == "stop" else "ping", sock_path)
+            print("stopped" if cmd == "stop" else json.dumps(info))
+        except (Unavailable, RuntimeError, OSError, ValueError):
+            print("not running")
+            sys.exit(1 if cmd == "status" else 0)
+    elif cmd == "similar":
+        results = similar(text or sys.stdin.read(), float(_opt(args, "--threshold", 0.5)),
+                          int(_opt(args, "--limit", 5)), sock_path, _opt(args, "--ranker"), "--archive" in args)
+        print(json.dumps(results, ensure_ascii=False))
+    elif cmd == "match":
+        for m in match(text or sys.stdin.read(), _opt(args, "--tables", "").split(","), sock_path):
+            print(m)
+    elif cmd == "capture":
+        capture(sys.stdin.read(), sock_path)
+    else:
+        print(__doc__.split("Usage:")[1].rstrip(), file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""DIS: dev.db への共通接続レイヤー。全スクリプトはここから接続する。
+
+- journal_mode=WAL: 読み取りが書き込みを待たない (DB ファイルに永続化されるので sqlite3 CLI にも効く)
+- synchronous=NORMAL: WAL では commit ごとの fsync を省いても壊れない (電源断で直近の commit を失うだけ)
+- busy_timeout: Stop フック同士など別プロセスが書き込み中なら、即 "database is locked" にせず待つ
+- mmap_size / cache_size: 検索・集計の読み取りを速くする
+- shared(): プロセス内で接続を使い回す (スレッドごとに1本)
+- write(): BEGIN IMMEDIATE で書き込みトランザクションを実行し、ロックが取れなければ間隔を伸ばして再試行
+
+Usage:
+  dis_db.py [--db PATH]   # WAL 化と設定の確認
+"""
+import atexit
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+
+DB = os.path.expanduser("~/.claude/intelligence/dev.db")
+
+# ロック解除を待つ最大時間 (ms)。フックが長く止まらない程度に抑える
+BUSY_TIMEOUT_MS = 5000
+
+# 接続ごとに設定する PRAGMA (busy_timeout は sqlite3.connect の timeout、journal_mode は configure() で扱う)
+PRAGMAS = (
+    ("synchronous", "NORMAL"),
+    ("cache_size", -16000),           # 負数は KiB 指定 (約16MB)
+    ("mmap_size", 256 * 1024 * 1024),
+    ("temp_store", "MEMORY"),
+)
+
+# write() がロック競合で再試行する回数と初回の待ち時間 (秒、毎回倍)
+WRITE_RETRIES = 4
+RETRY_DELAY = 0.05
+
+
+def connect(path: str | None = None, **kwargs) -> sqlite3.Connection:
+    """PRAGMA 設定済みの接続を返す。kwargs は sqlite3.connect にそのまま渡す (timeout は秒)。"""
+    kwargs.setdefault("timeout", BUSY_TIMEOUT_MS / 1000)
+    conn = sqlite3.connect(path or DB, **kwargs)
+    configure(conn)
+    return conn
+
+
+def configure(conn: sqlite3.Connection) -> sqlite3.Connection:
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name} = {value}")
+    try:
+        # 既に WAL なら何もしない。切り替えには排他ロックが要るので、取れなければ次回に回す
+        conn.execute("PRAGMA journal_mode = WAL")
+    except sqlite3.OperationalError:
+        pass
+    return conn
+
+
+# ── 接続の使い回し ──────────────────────────────────
+
+
+class SharedConnection(sqlite3.Connection):
+    """shared() が返す接続。close() は未 commit の変更を捨てるだけで、実際には閉じない。"""
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def _close(self):
+        super().close()
+
+
+_local = threading.local()
+_opened: list[SharedConnection] = []
+_opened_lock = threading.Lock()
+
+
+def shared(path: str | None = None, init=None) -> sqlite3.Connection:
+    """このスレッドで path に開いた接続を返す (なければ開き、init(conn) を1回だけ呼ぶ)。
+
+    呼び出し側は通常どおり close() してよい。実際の close はプロセス終了時にまとめて行う。
+    """
+    path = path or DB
+    conns = _local.__dict__.setdefault("conns", {})
+    conn = conns.get(path)
+    if conn is None:
+        conn = connect(path, factory=SharedConnection, check_same_thread=False)
+        with _opened_lock:
+            _opened.append(conn)
+        if init is not None:
+            init(conn)
+        conns[path] = conn
+    return conn
+
+
+@atexit.register
+def close_shared():
+    """shared() で開いた接続をすべて閉じる (WAL のチェックポイントもここで走る)。"""
+    with _opened_lock:
+        conns, _opened[:] = list(_opened), []
+    for conn in conns:
+        try:
+            conn._close()
+        except sqlite3.Error:
+            pass
+    _local.__dict__.pop("conns", None)
+
+
+# ── 書き込みトランザクション ──────────────────────────────────
+
+
+def is_busy(e: sqlite3.Error) -> bool:
+    msg = str(e).lower()
+    return "locked" in msg or "busy" in msg
+
+
+def write(conn: sqlite3.Connection, fn, *args, retries: int = WRITE_RETRIES):
+    """fn(conn, *args) を1つの書き込みトランザクションで実行して commit し、戻り値を返す。
+
+    BEGIN IMMEDIATE で最初に書き込みロックを取るので、読んでから書く途中で失敗することはない。
+    busy_timeout を待ってもロックが取れなければ、ロールバックして retries 回まで再試行する
+    (fn は再実行されるので、DB 以外に副作用を持たせないこと)。
+    """
+    if conn.in_transaction:
+        conn.commit()  # 呼び出し側の暗黙トランザクションを先に確定させる
+    delay = RETRY_DELAY
+    for attempt in range(retries + 1):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(conn, *args)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            return result
+        except sqlite3.OperationalError as e:
+            if not is_busy(e) or attempt == retries:
+                raise
+            time.sleep(delay * (1 + random.random()))
+            delay *= 2
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    path = args[args.index("--db") + 1] if "--db" in args else DB
+    if not os.path.exists(path):
+        print(f"{path} not found")
+        sys.exit(1)
+    conn = connect(path)
+    for name in ("journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size"):
+        print(f"{name} = {conn.execute(f'PRAGMA {name}').fetchone()[0]}")
+    conn.close()
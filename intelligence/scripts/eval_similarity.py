@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""DIS: similarity.py のランカー (RANKERS) をラベル付きの エラー → solution の組で評価する (オフライン)。
+
+既定では synth_db.py と同じ雛形から「エラーの種類」を --kinds 個作り、種類ごとに1件の solution を一時 DB に入れる。
+種類は雛形と識別子 (型名・プロパティ名・モジュール名など) で決まり、識別子だけが違う紛らわしい種類も多い。
+クエリは同じ種類のエラーをパス・行番号・件数を変えて作り直し、一部は前にコマンド出力を付けたり末尾を切ったりする。
+tsc の日本語ロケールの文面と、識別子を含まない日本語だけのエラーも混ぜる (tokenize では語が出ない)。
+
+--pairs に JSONL ({"query": エラー文, "pattern": 正解の error_pattern}) を渡すと、その組で評価する
+(solutions は pattern の重複を除いたもの)。
+
+ランカーごとに recall@k (正解が上位 k 件に入った割合)、MRR、1クエリのレイテンシ (中央値・p95) を出す。
+クエリを英語 (ASCII のみ) と日本語を含むものに分けた recall も出す。
+hybrid の recall@5 が tfidf を下回るか、日本語のクエリで RECALL_JA_MIN を下回れば exit 1 (--pairs の時は判定しない)。
+
+Usage:
+  eval_similarity.py [--kinds 2000] [--queries 500] [--seed 7] [--k 1,5,10] [--rankers tfidf,hybrid] [--json]
+  eval_similarity.py --pairs labelled.jsonl [--k 1,5,10] [--json]
+"""
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import dis_db
+import migrate
+import similarity
+import synth_db
+from normalize import normalize_error
+
+RECALL_JA_MIN = 0.8
+
+# tsc の日本語ロケール・日本語だけのエラー (synth_db.ERROR_TEMPLATES と同じ穴の名前)
+JA_TEMPLATES = [
+    "{path}({line},{col}): error TS2322: 型 '{type}' を型 '{type2}' に割り当てることはできません。",
+    "{path}:{line}:{col} - error TS2339: プロパティ '{ident}' は型 '{type}' に存在しません。",
+    "{path}:{line}:{col} - error TS2307: モジュール '{module}' またはそれに対応する型宣言が見つかりません。",
+    "{screen}画面の読み込みに失敗しました。{reason}",
+    "{screen}の保存中にエラーが発生しました: {reason}",
+    "{screen}の{action}に失敗しました ({reason})",
+]
+_SCREENS = "ログイン 設定 ユーザー一覧 注文詳細 決済 プロフィール 通知 検索結果 ダッシュボード 管理".split()
+_REASONS = ("タイムアウトしました 権限がありません 接続が拒否されました 入力値が不正です 認証の有効期限が切れました "
+            "サーバーが応答しません 重複したキーがあります 容量の上限を超えました").split()
+_ACTIONS = "更新 削除 登録 読み込み 送信 取得".split()
+_PREFIXES = ["$ npm run build\n> next build\n\n", "$ npx tsc --noEmit\n", "Error occurred while running tests:\n",
+             "ビルド中にエラーが発生しました:\n"]
+# 種類を決める穴 (それ以外の穴はクエリごとに変える雑音)
+_KEYS = ("type", "type2", "ident", "ident2", "module", "port", "token", "screen", "reason", "action")
+
+
+class _Kinds:
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.templates = [t for _, ts in synth_db.ERROR_TEMPLATES for t in ts] + JA_TEMPLATES
+
+    def key(self) -> tuple[str, dict]:
+        rng = self.rng
+        template = rng.choice(self.templates)
+        fills = {
+            "type": rng.choice(synth_db._TYPE_NAMES), "type2": rng.choice(synth_db._TYPE_NAMES),
+            "ident": rng.choice(synth_db._IDENTS), "ident2": rng.choice(synth_db._IDENTS),
+            "module": rng.choice(synth_db._MODULES), "port": rng.choice((3000, 3001, 5173, 8080)),
+            "token": rng.choice("<}u"), "screen": rng.choice(_SCREENS), "reason": rng.choice(_REASONS),
+            "action": rng.choice(_ACTIONS),
+        }
+        # 雛形に出てくる穴だけで種類を区別する
+        return template, {k: v for k, v in fills.items() if "{" + k + "}" in template}
+
+    def render(self, template: str, fills: dict) -> str:
+        rng = self.rng
+        project = rng.choice(synth_db.PROJECTS)
+        return template.format(
+            path=f"/home/dev/{project}/src/{rng.choice(synth_db._DIRS)}/{rng.choice(synth_db._IDENTS)}.ts",
+            line=rng.randint(1, 400), col=rng.randint(1, 80), dir=rng.choice(synth_db._DIRS), project=project,
+            n=rng.randint(1, 9), n2=rng.randint(1, 40), n3=rng.randint(10, 200),
+            **{k: fills.get(k, "") for k in _KEYS})
+
+    def query(self, template: str, fills: dict) -> str:
+        rng = self.rng
+        text = self.render(template, fills)
+        if rng.random() < 0.3:
+            text = rng.choice(_PREFIXES) + text
+        if rng.random() < 0.3:
+            text = text[:max(12, int(len(text) * 0.75))]
+        return text
+
+
+def synthetic(kinds: int, queries: int, seed: int) -> tuple[list[str], list[tuple[str, int]]]:
+    """(solutions の error_pattern, [(クエリ, 正解の index)])。"""
+    gen = _Kinds(seed)
+    seen, patterns, keys = set(), [], []
+    for _ in range(kinds * 20):
+        if len(patterns) >= kinds:
+            break
+        template, fills = gen.key()
+        sig = (template, tuple(sorted(fills.items())))
+        if sig in seen:
+            continue
+        seen.add(sig)
+        patterns.append(normalize_error(gen.render(template, fills)))
+        keys.append((template, fills))
+    cases = []
+    for _ in range(queries):
+        i = gen.rng.randrange(len(patterns))
+        cases.append((gen.query(*keys[i]), i))
+    return patterns, cases
+
+
+def from_pairs(path: str) -> tuple[list[str], list[tuple[str, int]]]:
+    patterns, index, cases = [], {}, []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            pair = json.loads(line)
+            pattern = pair["pattern"]
+            if pattern not in index:
+                index[pattern] = len(patterns)
+                patterns.append(pattern)
+            cases.append((pair["query"], index[pattern]))
+    return patterns, cases
+
+
+def build(path: str, patterns: list[str]) -> tuple[list[int], float]:
+    """solutions に patterns を入れてインデックスを作り、(各 pattern の solution id, 索引の秒数) を返す。"""
+    conn = migrate.ensure(dis_db.connect(path))
+    ids = []
+    for i, p in enumerate(patterns):
+        cur = conn.execute("INSERT INTO solutions(error_pattern, solution, project, score) VALUES(?, ?, 'eval', 1.0)",
+                           (p, f"fix #{i}"))
+        ids.append(cur.lastrowid)
+    conn.commit()
+    similarity.DB = path
+    t0 = time.perf_counter()
+    similarity.rebuild_index(conn)
+    secs = time.perf_counter() - t0
+    conn.close()
+    return ids, secs
+
+
+def evaluate(ranker: str, cases: list[tuple[str, int]], ids: list[int], ks: list[int]) -> dict:
+    hits = {k: 0 for k in ks}
+    by_lang = {"en": [0, 0], "ja": [0, 0]}
+    rr, times = 0.0, []
+    similarity.find_similar("warm up", 0.0, 1, ranker=ranker)
+    for query, answer in cases:
+        t0 = time.perf_counter()
+        found = [r["id"] for r in similarity.find_similar(query, 0.0, max(ks), ranker=ranker)]
+        times.append((time.perf_counter() - t0) * 1000)
+        rank = found.index(ids[answer]) + 1 if ids[answer] in found else None
+        for k in ks:
+            hits[k] += rank is not None and rank <= k
+        rr += 1 / rank if rank else 0.0
+        lang = by_lang["en" if query.isascii() else "ja"]
+        lang[0] += rank is not None and rank <= 5
+        lang[1] += 1
+    n = len(cases)
+    s = sorted(times)
+    return {
+        "ranker": ranker,
+        **{f"recall@{k}": round(hits[k] / n, 3) for k in ks},
+        "mrr": round(rr / n, 3),
+        "recall@5_en": round(by_lang["en"][0] / by_lang["en"][1], 3) if by_lang["en"][1] else None,
+        "recall@5_ja": round(by_lang["ja"][0] / by_lang["ja"][1], 3) if by_lang["ja"][1] else None,
+        "median_ms": round(statistics.median(s), 2),
+        "p95_ms": round(s[max(0, int(n * 0.95) - 1)], 2),
+    }
+
+
+def main():
+    args = sys.argv[1:]
+    kinds = int(args[args.index("--kinds") + 1]) if "--kinds" in args else 2000
+    queries = int(args[args.index("--queries") + 1]) if "--queries" in args else 500
+    seed = int(args[args.index("--seed") + 1]) if "--seed" in args else 7
+    ks = [int(k) for k in args[args.index("--k") + 1].split(",")] if "--k" in args else [1, 5, 10]
+    rankers = args[args.index("--rankers") + 1].split(",") if "--rankers" in args else list(similarity.RANKERS)
+    pairs = args[args.index("--pairs") + 1] if "--pairs" in args else None
+
+    patterns, cases = from_pairs(pairs) if pairs else synthetic(kinds, queries, seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        ids, index_secs = build(os.path.join(tmp, "dev.db"), patterns)
+        results = [evaluate(r, cases, ids, ks) for r in rankers]
+        dis_db.close_shared()
+
+    by_name = {r["ranker"]: r for r in results}
+    checks = {}
+    if not pairs and "tfidf" in by_name and "hybrid" in by_name and 5 in ks:
+        checks["hybrid recall@5 >= tfidf"] = by_name["hybrid"]["recall@5"] >= by_name["tfidf"]["recall@5"]
+        checks[f"hybrid recall@5 (ja) >= {RECALL_JA_MIN}"] = (by_name["hybrid"]["recall@5_ja"] or 0) >= RECALL_JA_MIN
+    ok = all(checks.values())
+
+    if "--json" in args:
+        print(json.dumps({"solutions": len(patterns), "queries": len(cases), "index_seconds": round(index_secs, 2),
+                          "results": results, "checks": checks}, indent=2, ensure_ascii=False))
+    else:
+        print(f"similarity eval: {len(patterns):,} solutions, {len(cases)} labelled queries "
+              f"(indexed in {index_secs:.1f}s)")
+        cols = [f"recall@{k}" for k in ks] + ["mrr", "recall@5_en", "recall@5_ja"]
+        print(f"  {'ranker':<8}" + "".join(f"{c:>12}" for c in cols) + f"{'median ms':>11}{'p95 ms':>9}")
+        for r in results:
+            print(f"  {r['ranker']:<8}" + "".join(f"{r[c] if r[c] is not None else '-':>12}" for c in cols)
+                  + f"{r['median_ms']:11.2f}{r['p95_ms']:9.2f}")
+        if checks:
+            print()
+            for name, passed in checks.items():
+                print(f"  {'OK  ' if passed else 'FAIL'} {name}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,37 @@
 #!/usr/bin/env python3
-"""DIS: AI業界ソースからRSS/HTMLを取得しSQLiteに保存。標準ライブラリのみ使用。"""
+"""DIS: AI業界ソースからRSS/HTMLを取得しSQLiteに保存。標準ライブラリのみ使用。
+
+全ソースをスレッドプールで並行に取得する (同じホストへは MAX_PER_HOST 本まで)。所要時間は最も遅いソース程度。
+ソースごとの ETag / Last-Modified を feed_cache (migrations/0011_feed_cache.sql) に保存して条件付き GET を送り、
+304 なら本文を読まない。本文の sha256 が前回と同じ場合 (検証子を返さないサーバー) もパースを省く。
+
+Usage:
+  fetch_sources.py [--workers 6]
+"""
+import hashlib
 import os
 import re
 import sqlite3
+import sys
+import threading
+import time
 import xml.etree.ElementTree as ET
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from html.parser import HTMLParser
-from urllib.error import URLError
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlparse
 from urllib.request import Request, urlopen
 
+import dis_db
+import migrate
+
 DB = os.path.expanduser("~/.claude/intelligence/dev.db")
 TIMEOUT = 10
 USER_AGENT = "DIS/1.0 (Claude Code Intelligence)"
+# 並行取得のスレッド数と、同じホスト (netloc) への同時接続数の上限
+WORKERS = 6
+MAX_PER_HOST = 2
 
 # ソース定義: (名前, URL, タイプ)
 SOURCES = [
@@ -57,15 +77,23 @@ class TitleExtractor(HTMLParser):
             self._current_text += data
 
 
-def fetch_url(url: str) -> str | None:
-    """URLからコンテンツを取得。"""
+def fetch_url(url: str, etag: str | None = None, last_modified: str | None = None) -> tuple[int, bytes | None, dict]:
+    """条件付き GET。(ステータス, 本文, レスポンスヘッダー) を返す。304 は本文 None。
+
+    接続エラー・タイムアウトは OSError (URLError を含む) のまま呼び出し側に投げる。
+    """
+    headers = {"User-Agent": USER_AGENT}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
     try:
-        req = Request(url, headers={"User-Agent": USER_AGENT})
-        with urlopen(req, timeout=TIMEOUT) as resp:
-            return resp.read().decode("utf-8", errors="replace")
-    except (URLError, TimeoutError, OSError) as e:
-        print(f"  SKIP {url}: {e}")
-        return None
+        with urlopen(Request(url, headers=headers), timeout=TIMEOUT) as resp:
+            return resp.status, resp.read(), resp.headers
+    except HTTPError as e:
+        if e.code == 304:
+            return 304, None, e.headers
+        raise
 
 
 def parse_rss(content: str) -> list[tuple[str, str, str]]:
@@ -101,14 +129,14 @@ def parse_html(content: str, base_url: str) -> list[tuple[str, str, str]]:
     except Exception:
         return []
 
+    parsed = urlparse(base_url)
+    origin = f"{parsed.scheme}://{parsed.netloc}"
     items = []
     seen_urls = set()
     for text, href in parser.items:
         # 相対URLを絶対URLに変換
         if href.startswith("/"):
-            from urllib.parse import urlparse
-            parsed = urlparse(base_url)
-            href = f"{parsed.scheme}://{parsed.netloc}{href}"
+            href = origin + href
         if href in seen_urls:
             continue
         seen_urls.add(href)
@@ -119,47 +147,111 @@ def parse_html(content: str, base_url: str) -> list[tuple[str, str, str]]:
     return items[:20]  # 最大20件
 
 
-def fetch_all():
-    conn = sqlite3.connect(DB)
-    cur = conn.cursor()
-    now = datetime.utcnow().isoformat()
-    total_new = 0
+def fetch_source(name: str, url: str, source_type: str, cached: dict | None,
+                 limits: dict[str, threading.Semaphore]) -> dict:
+    """1ソースを取得してパースする。status は new / not_modified / unchanged / error。"""
+    result = {"source": name, "url": url, "items": [], "etag": None, "last_modified": None, "body_hash": None}
+    # URL が変わっていたら前回の検証子・ハッシュは使わない
+    cached = cached if cached and cached["url"] == url else {}
+    t0 = time.perf_counter()
+    try:
+        with limits[urlparse(url).netloc]:
+            code, body, headers = fetch_url(url, cached.get("etag"), cached.get("last_modified"))
+    except (URLError, TimeoutError, OSError) as e:
+        return {**result, "status": "error", "error": str(e), "seconds": time.perf_counter() - t0}
+    result["seconds"] = time.perf_counter() - t0
+    # 304 で検証子が省かれていれば前回のものを使い続ける
+    result["etag"] = headers.get("ETag") or cached.get("etag")
+    result["last_modified"] = headers.get("Last-Modified") or cached.get("last_modified")
 
-    for source_name, url, source_type in SOURCES:
-        print(f"Fetching {source_name} ({url})...")
-        content = fetch_url(url)
-        if not content:
-            continue
+    if code == 304:
+        return {**result, "status": "not_modified", "body_hash": cached.get("body_hash")}
+    result["body_hash"] = hashlib.sha256(body).hexdigest()
+    if result["body_hash"] == cached.get("body_hash"):
+        return {**result, "status": "unchanged"}
 
-        if source_type == "rss":
-            items = parse_rss(content)
-        else:
-            items = parse_html(content, url)
+    content = body.decode("utf-8", errors="replace")
+    result["items"] = parse_rss(content) if source_type == "rss" else parse_html(content, url)
+    return {**result, "status": "new"}
+
+
+def _load_cache(conn: sqlite3.Connection) -> dict[str, dict]:
+    cur = conn.execute("SELECT source, url, etag, last_modified, body_hash FROM feed_cache")
+    return {r[0]: {"url": r[1], "etag": r[2], "last_modified": r[3], "body_hash": r[4]} for r in cur.fetchall()}
 
+
+def _store_items(conn: sqlite3.Connection, fetched: list[dict], now: str) -> tuple[dict[str, int], int]:
+    """取得済みの記事を industry_feeds に追加して feed_cache を更新し、({ソース: 新規件数}, 削除件数) を返す。
+
+    記事とキャッシュを同じトランザクションで書くので、保存していない本文の ETag が残ることはない。
+    """
+    cur = conn.cursor()
+    new_counts = {}
+    for r in fetched:
+        if r["status"] == "error":
+            continue
         new_count = 0
-        for title, link, summary in items:
+        for title, link, summary in r["items"]:
             try:
                 cur.execute(
                     """INSERT OR IGNORE INTO industry_feeds(source, title, url, summary, fetched_at)
                        VALUES(?, ?, ?, ?, ?)""",
-                    (source_name, title[:200], link, summary[:500], now),
+                    (r["source"], title[:200], link, summary[:500], now),
                 )
                 if cur.rowcount > 0:
                     new_count += 1
             except sqlite3.IntegrityError:
                 pass
-
-        total_new += new_count
-        print(f"  → {len(items)} found, {new_count} new")
+        new_counts[r["source"]] = new_count
+        cur.execute(
+            """INSERT INTO feed_cache(source, url, etag, last_modified, body_hash, checked_at, changed_at)
+               VALUES(?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(source) DO UPDATE SET url = excluded.url, etag = excluded.etag,
+                 last_modified = excluded.last_modified, body_hash = excluded.body_hash,
+                 checked_at = excluded.checked_at, changed_at = COALESCE(excluded.changed_at, changed_at)""",
+            (r["source"], r["url"], r["etag"], r["last_modified"], r["body_hash"], now,
+             now if r["status"] == "new" else None),
+        )
 
     # 90日以上古い分析済みエントリを削除
     cur.execute("DELETE FROM industry_feeds WHERE analyzed = 1 AND ts < datetime('now', '-90 days')")
-    cleaned = cur.rowcount
+    return new_counts, cur.rowcount
+
 
-    conn.commit()
-    conn.close()
-    print(f"\nTotal: {total_new} new entries added, {cleaned} old entries cleaned")
+def fetch_all(sources: list[tuple[str, str, str]] | None = None, workers: int = WORKERS) -> list[dict]:
+    """全ソースを並行に取得して保存し、ソースごとの結果を SOURCES の順で返す。"""
+    sources = sources or SOURCES
+    now = datetime.utcnow().isoformat()
+    conn = migrate.ensure(dis_db.connect(DB))
+    try:
+        cache = _load_cache(conn)
+        hosts = {urlparse(url).netloc for _, url, _ in sources}
+        limits = {host: threading.BoundedSemaphore(MAX_PER_HOST) for host in hosts}
+
+        # ネットワーク取得中は DB のロックを持たない (書き込みは最後に1トランザクション)
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(sources)))) as pool:
+            fetched = list(pool.map(lambda s: fetch_source(*s, cache.get(s[0]), limits), sources))
+        elapsed = time.perf_counter() - t0
+
+        new_counts, cleaned = dis_db.write(conn, _store_items, fetched, now)
+    finally:
+        conn.close()
+
+    for r in fetched:
+        if r["status"] == "error":
+            print(f"  SKIP {r['source']} ({r['url']}): {r['error']}")
+        elif r["status"] == "not_modified":
+            print(f"  {r['source']}: not modified (304)")
+        elif r["status"] == "unchanged":
+            print(f"  {r['source']}: unchanged (same body)")
+        else:
+            print(f"  {r['source']}: {len(r['items'])} found, {new_counts[r['source']]} new")
+    print(f"\nTotal: {sum(new_counts.values())} new entries added, {cleaned} old entries cleaned "
+          f"({len(sources)} sources in {elapsed:.1f}s)")
+    return fetched
 
 
 if __name__ == "__main__":
-    fetch_all()
+    args = sys.argv[1:]
+    fetch_all(workers=int(args[args.index("--workers") + 1]) if "--workers" in args else WORKERS)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""DIS: record-*.sh の lookup / search 用の FTS5 MATCH クエリ生成。
+
+索引 (fts_*、migrations/0012_fts_search.py) は trigram なので、文を語に分けて OR でつなぐ。
+英数字は3文字以上の語 (部分一致になるので "auth" で "authentication" も引ける)、
+日本語など空白で区切られない文字列は3文字ずつずらした断片にする。多く一致した行ほど bm25 が高い。
+SQLite 3.34 未満で索引が unicode61 で作られている時は、語の前方一致 ("auth"*) にし、
+日本語は句読点までの連なりの先頭3文字の前方一致にする (部分一致はできない)。
+
+--tables を渡すと、その索引で COMMON_ROWS 行を超えて一致する語 ("error" など) を落とす。
+ほぼ全行に一致する語は順位にほとんど効かないのに、一致した全行で bm25 を計算させて遅くするため。
+全部の語が落ちた時は、全語を AND で結んだ式にする (同じ内容の行だけを引く)。
+
+順位は bm25 (小さいほど関連が強い) に score を掛け合わせる。呼び出し側の SQL は次の形:
+  ORDER BY bm25(fts_x) * (1.0 + MIN(MAX(x.score, 0), 4) / 4.0)
+score 4 以上で関連度が最大2倍になり、score は関連度の順位を入れ替えるほどには効かない。
+
+Usage:
+  fts.py <text>                                    # MATCH 式を表示 (語がなければ空行)
+  fts.py --tables fts_feedback,fts_patterns <text>  # 索引ごとに1行 (よくある語を除いたもの)
+"""
+import os
+import re
+import sqlite3
+import sys
+
+import dis_db
+import migrate
+
+DB = os.path.expanduser("~/.claude/intelligence/dev.db")
+
+# 語数の上限 (長い要件文でもクエリが重くならないように)
+MAX_TERMS = 24
+MIN_LENGTH = 3
+# これより多くの行に一致する語は検索に使わない
+COMMON_ROWS = 2000
+
+_STOPWORDS = frozenset(
+    "the and for with from that this are was were not but you your has have had can will into when then "
+    "than also its use using add fix should must".split())
+_WORD = re.compile(r"[a-z0-9_]+")
+# 空白・ASCII・和文の句読点と括弧で区切った非 ASCII の連なり
+_RUN = re.compile(r"[^\x00-\x7f\s、。，．・「」『』（）【】〔〕［］｛｝〈〉《》！？：；／＼…　]+")
+_TOKENIZE = re.compile(r"tokenize\s*=\s*'(\w+)", re.IGNORECASE)
+
+
+def tokenizer(conn: sqlite3.Connection, table: str) -> str:
+    """索引 table の tokenize ("trigram" / "unicode61")。索引がなければ "trigram"。"""
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE name = ?", (table,)).fetchone()
+    if row is None:
+        return "trigram"
+    m = _TOKENIZE.search(row[0] or "")
+    return m.group(1).lower() if m else "unicode61"  # FTS5 の既定
+
+
+def terms(text: str, tokenize: str = "trigram") -> list[str]:
+    """text から検索語を出現順に重複なしで返す。"""
+    text = text.lower()
+    out = [w for w in _WORD.findall(text) if len(w) >= MIN_LENGTH and w not in _STOPWORDS]
+    for run in _RUN.findall(text):
+        if tokenize == "trigram":
+            out.extend(run[i:i + MIN_LENGTH] for i in range(len(run) - MIN_LENGTH + 1))
+        elif len(run) >= MIN_LENGTH:
+            out.append(run[:MIN_LENGTH])
+    seen = set()
+    return [t for t in out if not (t in seen or seen.add(t))]
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _prefix(term: str) -> str:
+    return _quote(term) + "*"
+
+
+def is_common(conn: sqlite3.Connection, table: str, term: str, phrase=_quote) -> bool:
+    """term が table で COMMON_ROWS 行を超えて一致するか。一致を先頭から数えるだけなので COMMON_ROWS 行で止まる。"""
+    row = conn.execute(f"SELECT 1 FROM {table} WHERE {table} MATCH ? LIMIT 1 OFFSET ?",
+                       (phrase(term), COMMON_ROWS)).fetchone()
+    return row is not None
+
+
+def match_query(text: str, conn: sqlite3.Connection | None = None, table: str | None = None,
+                max_terms: int = MAX_TERMS, common: dict | None = None) -> str:
+    """FTS5 の MATCH 式 ("語" OR "語" ...)。conn と table を渡すとよくある語を除く。語がなければ空文字列。
+
+    common ({(table, 語): bool}) を渡すと is_common の結果をそこに覚えて使い回す (dis_daemon.py 用)。
+    """
+    tokenize = tokenizer(conn, table) if conn is not None and table else "trigram"
+    phrase = _quote if tokenize == "trigram" else _prefix
+    words = terms(text, tokenize)
+    if conn is not None and table:
+        # 調べる語数も抑える (長文の断片を全部調べない)
+        words = words[:max_terms * 2]
+        if common is None:
+            common = {}
+        for t in words:
+            if (table, t) not in common:
+                common[(table, t)] = is_common(conn, table, t, phrase)
+        rare = [t for t in words if not common[(table, t)]]
+        if not rare:
+            return " AND ".join(phrase(t) for t in words[:max_terms])
+        words = rare
+    return " OR ".join(phrase(t) for t in words[:max_terms])
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    tables = args.pop(args.index("--tables") + 1).split(",") if "--tables" in args else []
+    if "--tables" in args:
+        args.remove("--tables")
+    text = " ".join(args) if args else sys.stdin.read()
+    if not tables:
+        print(match_query(text))
+    else:
+        conn = migrate.ensure(dis_db.connect(DB))
+        for table in tables:
+            print(match_query(text, conn, table))
+        conn.close()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""DIS: ローカル SQLite をバックエンドにした Hrana over HTTP (/v3/pipeline) の代替サーバー。
+
+Turso を使わずに sync.py の動作確認・スループット計測を行うためのもの。
+keep-alive (HTTP/1.1) と gzip (リクエスト本文 / Accept-Encoding) に対応し、
+リクエストは execute / store_sql / close_sql / close を扱う。store_sql の sql_id はパイプライン内で有効。
+各ステートメントは autocommit で実行する (Turso と同じ)。BEGIN / COMMIT は1回のパイプライン内で有効で、
+閉じられずに終わったトランザクションはロールバックする。
+
+Usage:
+  hrana_server.py [--port 8080] [--db /tmp/dis-remote.db] [--token TOKEN] [--latency-ms 0]
+  # .turso-env に TURSO_URL=http://127.0.0.1:8080 を書けば sync.py の接続先になる
+"""
+import gzip
+import json
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import dis_db
+
+
+def _decode(cell: dict):
+    t = cell.get("type")
+    if t == "null":
+        return None
+    if t == "integer":
+        return int(cell["value"])
+    if t == "float":
+        return float(cell["value"])
+    return cell.get("value")
+
+
+def _encode(v) -> dict:
+    if v is None:
+        return {"type": "null"}
+    if isinstance(v, int):
+        return {"type": "integer", "value": str(v)}
+    if isinstance(v, float):
+        return {"type": "float", "value": v}
+    return {"type": "text", "value": str(v)}
+
+
+class PipelineHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # ヘッダーと本文が別 send になるため、keep-alive 時に Nagle + 遅延 ACK で待たされないようにする
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+    def _conn(self) -> sqlite3.Connection:
+        """ハンドラスレッドごとの SQLite 接続。"""
+        local = self.server.local
+        if not hasattr(local, "conn"):
+            local.conn = dis_db.connect(self.server.db, timeout=30, isolation_level=None)
+        return local.conn
+
+    def _reply(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        if "gzip" in (self.headers.get("Accept-Encoding") or ""):
+            data = gzip.compress(data, compresslevel=6)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _execute(self, stmt: dict, stored: dict[int, str]) -> dict:
+        sql = stored[stmt["sql_id"]] if "sql_id" in stmt else stmt["sql"]
+        cur = self._conn().execute(sql, [_decode(a) for a in stmt.get("args", [])])
+        rows = [[_encode(v) for v in row] for row in cur.fetchall()]
+        return {
+            "cols": [{"name": d[0], "decltype": None} for d in cur.description or []],
+            "rows": rows,
+            "affected_row_count": max(cur.rowcount, 0),
+            "last_insert_rowid": str(cur.lastrowid) if cur.lastrowid else None,
+        }
+
+    def _rollback(self):
+        conn = self._conn()
+        if conn.in_transaction:
+            conn.rollback()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = self.rfile.read(length)
+        if self.path.rstrip("/") != "/v3/pipeline":
+            self._reply(404, {"error": "not found"})
+            return
+        if self.server.token and self.headers.get("Authorization") != f"Bearer {self.server.token}":
+            self._reply(401, {"error": "unauthorized"})
+            return
+        try:
+            if self.headers.get("Content-Encoding") == "gzip":
+                payload = gzip.decompress(payload)
+            requests = json.loads(payload)["requests"]
+        except (ValueError, KeyError, OSError):
+            self._reply(400, {"error": "invalid request body"})
+            return
+
+        results = []
+        stored: dict[int, str] = {}
+        for req in requests:
+            kind = req.get("type")
+            try:
+                if kind == "execute":
+                    result = self._execute(req["stmt"], stored)
+                    results.append({"type": "ok", "response": {"type": "execute", "result": result}})
+                elif kind == "store_sql":
+                    stored[req["sql_id"]] = req["sql"]
+                    results.append({"type": "ok", "response": {"type": "store_sql"}})
+                elif kind == "close_sql":
+                    stored.pop(req["sql_id"], None)
+                    results.append({"type": "ok", "response": {"type": "close_sql"}})
+                elif kind == "close":
+                    self._rollback()
+                    results.append({"type": "ok", "response": {"type": "close"}})
+                else:
+                    results.append({"type": "error", "error": {"message": f"unsupported request: {kind}"}})
+            except (sqlite3.Error, KeyError, ValueError) as e:
+                results.append({"type": "error", "error": {"message": str(e), "code": "SQLITE_ERROR"}})
+        self._rollback()
+        if self.server.latency:
+            time.sleep(self.server.latency)  # WAN の往復遅延を模擬
+        with self.server.stats_lock:
+            self.server.stats["requests"] += 1
+            self.server.stats["statements"] += len(requests)
+            self.server.stats["bytes_received"] += length
+        self._reply(200, {"baton": None, "base_url": None, "results": results})
+
+
+def serve(db: str, port: int = 0, token: str | None = None, latency: float = 0.0) -> ThreadingHTTPServer:
+    """バックグラウンドスレッドでサーバーを起動して返す。port=0 なら空きポート。
+
+    latency (秒) を指定すると各リクエストの応答をその分だけ遅らせる。
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), PipelineHandler)
+    server.daemon_threads = True
+    server.db = db
+    server.token = token
+    server.latency = latency
+    server.local = threading.local()
+    server.stats_lock = threading.Lock()
+    server.stats = {"requests": 0, "statements": 0, "bytes_received": 0}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    port = int(args[args.index("--port") + 1]) if "--port" in args else 8080
+    db = args[args.index("--db") + 1] if "--db" in args else "/tmp/dis-remote.db"
+    token = args[args.index("--token") + 1] if "--token" in args else None
+    latency = float(args[args.index("--latency-ms") + 1]) / 1000 if "--latency-ms" in args else 0.0
+    server = serve(db, port, token, latency)
+    print(f"Hrana stand-in on http://127.0.0.1:{server.server_address[1]} (db: {db})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
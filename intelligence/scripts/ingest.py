@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""DIS: エラーイベントの取り込み (capture-error フック用)。
+
+フックでは hook JSON を1回だけ parse して分類し、スプール (JSON Lines) に1行追記するだけで終わる。
+dev.db には触れないので、DB が大きい・sync / aggregate が書き込みロックを持っている時でも待たない。
+スプールは drain が1トランザクションで events に書き込む (Stop フック、またはスプールが
+SPOOL_MAX_BYTES を超えた時にバックグラウンドで起動)。
+
+Usage:
+  ingest.py --capture < hook.json   # PostToolUse (Bash) フックから
+  ingest.py --drain                 # スプール → events
+"""
+import json
+import os
+import re
+import sys
+import time
+
+DB = os.path.expanduser("~/.claude/intelligence/dev.db")
+SPOOL_DIR = os.path.expanduser("~/.claude/intelligence/spool")
+SPOOL = os.path.join(SPOOL_DIR, "events.jsonl")
+
+# このサイズを超えたらフック側からバックグラウンドで drain を起動する
+SPOOL_MAX_BYTES = 256 * 1024
+# エラー本文の上限 (bytes、旧 capture-error.sh の head -c 2000 と同じ)
+MAX_ERROR_BYTES = 2000
+
+# 記録しないコマンド (短いもの・git 系など)
+_SKIP_CMD = re.compile(r"^(git |ls |pwd|echo |cd )", re.MULTILINE)
+
+# エラータイプの自動分類 (上から順に判定)
+_CLASSIFY = [
+    ("build_error", re.compile(r"build|compile|module not found|cannot find", re.IGNORECASE)),
+    ("test_failure", re.compile(r"test|expect|assert|FAIL", re.IGNORECASE)),
+    ("lint_error", re.compile(r"lint|eslint|prettier", re.IGNORECASE)),
+    ("type_error", re.compile(r"type|typescript|tsc|TS[0-9]", re.IGNORECASE)),
+]
+
+
+def classify(error: str) -> str:
+    for name, pattern in _CLASSIFY:
+        if pattern.search(error):
+            return name
+    return "unknown"
+
+
+def _text(v) -> str:
+    if v is None or v is False:
+        return ""
+    return v if isinstance(v, str) else json.dumps(v, separators=(",", ":"))
+
+
+def parse_event(raw: str) -> dict | None:
+    """hook JSON → events の1行分。記録対象外なら None。"""
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return None
+    result = data.get("tool_result") or {}
+    if str(result.get("exit_code") or 0) == "0":
+        return None
+
+    cmd = _text((data.get("tool_input") or {}).get("command")).rstrip("\n")
+    if len(cmd) < 5 or _SKIP_CMD.search(cmd):
+        return None
+
+    stderr = result.get("stderr")
+    out = stderr if stderr is not None and stderr is not False else result.get("stdout")
+    error = _text(out).encode("utf-8")[:MAX_ERROR_BYTES].decode("utf-8", "ignore").rstrip("\n")
+    if not error:
+        return None
+
+    cwd = _text(data.get("cwd")).rstrip("\n")
+    return {
+        "ts": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()),
+        "type": classify(error),
+        "cmd": cmd,
+        "error": error,
+        "cwd": cwd,
+        "project": os.path.basename(cwd.rstrip("/")) or cwd,
+    }
+
+
+def _open_spool() -> int:
+    try:
+        return os.open(SPOOL, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    except FileNotFoundError:
+        os.makedirs(SPOOL_DIR, exist_ok=True)
+        return os.open(SPOOL, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+
+
+def append(event: dict) -> tuple[int, int]:
+    """スプールに1行追記 (O_APPEND の1回の write)。(追記後のファイルサイズ, 書いたバイト数) を返す。
+
+    drain はスプールを rename してから排他ロックを取るので、rename 前に開いたファイルへ
+    書いてしまわないよう、共有ロック取得後に inode を確かめて必要なら開き直す。
+    共有ロック同士は待たないので、フック同士が詰まることはない。
+    """
+    import fcntl
+
+    line = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+    while True:
+        fd = _open_spool()
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            try:
+                same = os.fstat(fd).st_ino == os.stat(SPOOL).st_ino
+            except FileNotFoundError:
+                same = False
+            if not same:
+                continue
+            os.write(fd, line)
+            return os.fstat(fd).st_size, len(line)
+        finally:
+            os.close(fd)
+
+
+def spawn_drain():
+    """drain をバックグラウンドで起動 (フックは待たない)。"""
+    import subprocess
+
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), "--drain"],
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     start_new_session=True)
+
+
+def capture(raw: str, on_full=spawn_drain) -> dict | None:
+    """hook JSON をスプールに追記する。スプールが SPOOL_MAX_BYTES を超えたら on_full() を呼ぶ。"""
+    event = parse_event(raw)
+    if event is None:
+        return None
+    size, written = append(event)
+    if size - written < SPOOL_MAX_BYTES <= size:
+        # 閾値をまたいだ追記だけが drain を起動する (後続のフックが何重にも起動しないように)
+        on_full()
+    return event
+
+
+# ── Drain ──────────────────────────────────
+
+# drain 済みファイル名の記録を残す日数 (クラッシュ後の二重取り込み防止用)
+DRAINED_KEEP_DAYS = 7
+
+
+def _claim_spool() -> list[str]:
+    """現在のスプールを一意な名前に rename し、処理待ちのファイル一覧 (前回失敗分を含む) を返す。"""
+    try:
+        os.rename(SPOOL, os.path.join(SPOOL_DIR, f"events.{time.time_ns()}.{os.getpid()}.draining"))
+    except FileNotFoundError:
+        pass
+    try:
+        names = os.listdir(SPOOL_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted(os.path.join(SPOOL_DIR, n) for n in names if n.endswith(".draining"))
+
+
+def _read_events(path: str) -> list[tuple]:
+    rows = []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            try:
+                e = json.loads(line)
+            except ValueError:
+                continue  # 書き込み途中でクラッシュした行
+            rows.append((e.get("ts"), e.get("type") or "unknown", e.get("cmd"), e.get("error"),
+                         e.get("cwd"), e.get("project")))
+    return rows
+
+
+def _insert_events(conn, rows: list[tuple], name: str):
+    conn.executemany("INSERT INTO events(ts, type, cmd, error, cwd, project) VALUES(?, ?, ?, ?, ?, ?)", rows)
+    conn.execute("INSERT INTO ingest_drained(name) VALUES(?)", (name,))
+
+
+def _prune_drained(conn):
+    conn.execute("DELETE FROM ingest_drained WHERE drained_at < datetime('now', ?)", (f"-{DRAINED_KEEP_DAYS} days",))
+
+
+def drain(conn=None) -> int:
+    """スプール済みイベントを events に書き込む。ファイルごとに1トランザクション。書き込み件数を返す。
+
+    ファイル名を ingest_drained に同じトランザクションで記録するので、commit 後・削除前に
+    落ちても次回は削除だけ行い、二重には取り込まない。DB がロック中なら次回に回す。
+    """
+    import fcntl
+    import sqlite3
+
+    import dis_db
+    import migrate
+
+    if not os.path.exists(SPOOL_DIR):
+        return 0
+    paths = _claim_spool()
+    if not paths:
+        return 0
+    own = conn is None
+    if own:
+        conn = dis_db.connect(DB, timeout=30)
+    total = 0
+    try:
+        migrate.ensure(conn)
+        for path in paths:
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # 別の drain が処理中
+                name = os.path.basename(path)
+                if conn.execute("SELECT 1 FROM ingest_drained WHERE name = ?", (name,)).fetchone() is None:
+                    rows = _read_events(path)
+                    try:
+                        dis_db.write(conn, _insert_events, rows, name)
+                    except sqlite3.OperationalError:
+                        break  # 再試行してもロックが取れない等。ファイルは残して次回
+                    total += len(rows)
+                os.unlink(path)
+            finally:
+                os.close(fd)
+        dis_db.write(conn, _prune_drained)
+    finally:
+        if own:
+            conn.close()
+    return total
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--drain":
+        n = drain()
+        if n:
+            print(f"Ingested {n} events")
+    else:
+        capture(sys.stdin.read())
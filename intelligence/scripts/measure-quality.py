@@ -2,19 +2,27 @@
 """DIS Quality Score (DQS) — コード品質の5軸統合計測。
 
 Usage:
-  measure-quality.py <file_or_dir> [--project <name>] [--json]
+  measure-quality.py <file_or_dir> [--project <name>] [--json]   # {"results": [...], "metrics_cache": {...}}
   measure-quality.py --diff          # git diff対象のみ計測
   measure-quality.py --baseline <dir> # ベースライン記録
+  measure-quality.py <dir> --jobs N  # N プロセスで並列計測 (0 = CPU数)
+  measure-quality.py <dir> --jsonl   # 完了順に1ファイル1行のJSONを逐次出力 (最終行は {"metrics_cache": ...})
+  measure-quality.py <dir> --progress # 進捗を stderr に表示
+
+CDI/SE/CLS は内容ハッシュをキーに ~/.claude/intelligence/cache/metrics-cache.db へキャッシュし、
+未変更ファイルは CRS/DRS のみ再計算する。各結果の metrics_cache が "hit" / "miss"、
+全体のヒット/ミス数は --json / --jsonl の metrics_cache ({"hits": n, "misses": m})。
 
 Metrics:
   CDI  — Code Density Index (gzip圧縮率)
   SE   — Structural Entropy (Shannon Entropy of identifiers)
-  CLS  — Cognitive Load Score (nesting depth + control flow)
+  CLS  — Cognitive Load Score (関数ごとの Cognitive Complexity の最大値、cognitive.py)
   CRS  — Change Risk Score (complexity × churn × 1/ownership)
   DQS  — DIS Quality Score (5軸統合)
 """
 import ast
 import gzip
+import hashlib
 import json
 import math
 import os
@@ -22,9 +30,15 @@ import re
 import sqlite3
 import subprocess
 import sys
+import time
 from collections import Counter
+from datetime import date
 from pathlib import Path
 
+import cognitive
+import dis_db
+import migrate
+
 DB = os.path.expanduser("~/.claude/intelligence/dev.db")
 
 # DQS weights
@@ -70,9 +84,9 @@ def extract_identifiers(source: str, lang: str) -> list[str]:
     return re.findall(r'\b[a-zA-Z_]\w{2,}\b', source)
 
 
-def measure_se(source: str, lang: str = "auto") -> float:
-    """Shannon Entropy of identifiers。低い=一貫性高い。"""
-    ids = extract_identifiers(source, lang)
+def measure_se(source: str, lang: str = "auto", identifiers: list[str] | None = None) -> float:
+    """Shannon Entropy of identifiers。低い=一貫性高い。identifiers を渡せば抽出を省く。"""
+    ids = identifiers if identifiers is not None else extract_identifiers(source, lang)
     if len(ids) < 2:
         return 0.0
     counts = Counter(ids)
@@ -87,82 +101,120 @@ def measure_se(source: str, lang: str = "auto") -> float:
 
 # ── CLS: Cognitive Load Score ───────────────────────────────
 
-CONTROL_FLOW_PATTERNS = re.compile(
-    r'\b(if|else\s+if|elif|for|while|do|switch|case|catch|except|'
-    r'try|finally|with|match)\b'
-)
-FLOW_BREAK_PATTERNS = re.compile(r'\b(break|continue|goto|return|throw|raise)\b')
+def measure_cls_file(source: str, lang: str = "auto") -> dict:
+    """ファイル全体のCognitive Load Score。関数ごとの内訳 (function_cls) 付き。解析は cognitive.py。"""
+    return cognitive.analyze(source, lang)
 
 
-def measure_cls_file(source: str) -> dict:
-    """ファイル全体のCognitive Load Score。"""
-    lines = source.split('\n')
-    total_cls = 0
-    max_cls = 0
-    func_count = 0
-    max_nesting = 0
+def measure_source(source: str, lang: str) -> dict:
+    """内容だけで決まる CDI / SE / CLS。Python は ast を1回だけ作り、CLS の走査で SE 用の識別子も集める。"""
+    if lang == "python":
+        try:
+            tree = ast.parse(source)
+        except (SyntaxError, ValueError):
+            tree = None
+        if tree is not None:
+            ids: list[str] = []
+            cls_data = cognitive.analyze_python(source, tree, ids)
+            return {"cdi": measure_cdi(source), "se": measure_se(source, lang, ids), **cls_data}
+    return {"cdi": measure_cdi(source), "se": measure_se(source, lang), **measure_cls_file(source, lang)}
 
-    current_nesting = 0
-    current_func_cls = 0
-    in_function = False
 
-    for line in lines:
-        stripped = line.strip()
-        if not stripped or stripped.startswith(('#', '//', '/*', '*', '--')):
-            continue
+# ── CRS: Change Risk Score ──────────────────────────────────
 
-        # Detect nesting level by indentation
-        indent = len(line) - len(line.lstrip())
-        nesting = indent // 2 if indent > 0 else 0  # rough estimate
-        max_nesting = max(max_nesting, nesting)
+# リポジトリ単位で1回だけ git log を走らせ、全ファイルの churn / 作者数を表にする。
+# 表は HEAD と日付をキーに CACHE_DIR へ保存し、同じリビジョンの再スキャンでは git を呼ばない。
+CHURN_DAYS = 30
+OWNERSHIP_DAYS = 90
+CACHE_DIR = os.path.expanduser("~/.claude/intelligence/cache")
 
-        # Function detection
-        if re.match(r'\s*(def |function |const \w+ = |async |export (default )?function|fn )', line):
-            if in_function:
-                max_cls = max(max_cls, current_func_cls)
-            func_count += 1
-            in_function = True
-            current_func_cls = 0
+_repo_roots: dict[str, str | None] = {}
+_histories: dict[str, dict] = {}
 
-        # Structural increments
-        structural = len(CONTROL_FLOW_PATTERNS.findall(stripped))
-        nesting_penalty = structural * max(0, nesting - 1)
-        flow_breaks = len(FLOW_BREAK_PATTERNS.findall(stripped))
 
-        line_cls = structural + nesting_penalty + flow_breaks
-        total_cls += line_cls
-        current_func_cls += line_cls
+def _git(args: list[str], cwd: str, timeout: int = 5) -> str:
+    return subprocess.run(["git", "-c", "core.quotepath=off"] + args,
+                          capture_output=True, text=True, timeout=timeout, cwd=cwd).stdout
 
-    if in_function:
-        max_cls = max(max_cls, current_func_cls)
 
-    return {
-        "cls_total": total_cls,
-        "cls_max": max_cls,
-        "cls_avg": round(total_cls / max(func_count, 1), 2),
-        "functions": func_count,
-        "max_nesting": max_nesting,
-    }
+def repo_root(filepath: str) -> str | None:
+    """ファイルが属する git リポジトリのルート (ディレクトリ単位でキャッシュ)。"""
+    d = os.path.dirname(os.path.abspath(filepath)) or "."
+    if d not in _repo_roots:
+        try:
+            root = _git(["rev-parse", "--show-toplevel"], d).strip()
+            _repo_roots[d] = os.path.realpath(root) if root else None
+        except Exception:
+            _repo_roots[d] = None
+    return _repo_roots[d]
 
 
-# ── CRS: Change Risk Score ──────────────────────────────────
+def _history_cache_path(root: str) -> str:
+    return os.path.join(CACHE_DIR, f"git-history-{hashlib.sha1(root.encode()).hexdigest()[:16]}.json")
+
+
+def collect_git_history(root: str) -> dict[str, list[int]]:
+    """1回の git log で {相対パス: [直近30日のchurn, 直近90日の作者数]} を作る。"""
+    out = _git(["log", f"--since={OWNERSHIP_DAYS} days ago", "--no-renames", "--numstat",
+                "--format=%x1e%aN%x1f%ct"], root, timeout=120)
+    churn_since = time.time() - CHURN_DAYS * 86400
+    churn: dict[str, int] = {}
+    authors: dict[str, set] = {}
+    for record in out.split("\x1e"):
+        if not record.strip():
+            continue
+        header, _, body = record.partition("\n")
+        author, _, ts = header.partition("\x1f")
+        recent = int(ts or 0) >= churn_since
+        for line in body.split("\n"):
+            parts = line.split("\t")
+            if len(parts) < 3:
+                continue
+            path = parts[2]
+            authors.setdefault(path, set()).add(author.strip())
+            if recent and parts[0] != "-":
+                churn[path] = churn.get(path, 0) + int(parts[0] or 0) + int(parts[1] or 0)
+    return {p: [churn.get(p, 0), len(a)] for p, a in authors.items()}
+
+
+def git_history(root: str) -> dict[str, list[int]]:
+    """リポジトリの churn/ownership 表。プロセス内 → HEAD キーのディスクキャッシュ → git log の順に引く。"""
+    if root in _histories:
+        return _histories[root]
+    head = _git(["rev-parse", "HEAD"], root).strip()
+    key = f"{head}:{date.today().isoformat()}"
+    path = _history_cache_path(root)
+    table = None
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+        if cached.get("key") == key:
+            table = cached["files"]
+    except (OSError, ValueError, KeyError):
+        pass
+    if table is None:
+        table = collect_git_history(root)
+        if head:
+            try:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "w") as f:
+                    json.dump({"key": key, "root": root, "files": table}, f)
+                os.replace(tmp, path)
+            except OSError:
+                pass
+    _histories[root] = table
+    return table
+
 
 def measure_crs(filepath: str) -> dict:
     """Git history-based Change Risk Score。"""
     try:
-        # Churn: 過去30日の変更行数
-        log = subprocess.run(
-            ["git", "log", "--since=30 days ago", "--numstat", "--format=", "--", filepath],
-            capture_output=True, text=True, timeout=5,
-            cwd=os.path.dirname(os.path.abspath(filepath)) or "."
-        )
-        added, removed = 0, 0
-        for line in log.stdout.strip().split('\n'):
-            parts = line.split('\t')
-            if len(parts) >= 2 and parts[0] != '-':
-                added += int(parts[0] or 0)
-                removed += int(parts[1] or 0)
-        churn = added + removed
+        root = repo_root(filepath)
+        if root is None:
+            raise ValueError("not a git repository")
+        rel = os.path.relpath(os.path.realpath(filepath), root)
+        churn, unique_authors = git_history(root).get(rel, [0, 0])
 
         # File size
         try:
@@ -172,12 +224,6 @@ def measure_crs(filepath: str) -> dict:
         normalized_churn = churn / max(loc, 1)
 
         # Ownership: 変更者数
-        authors = subprocess.run(
-            ["git", "log", "--since=90 days ago", "--format=%aN", "--", filepath],
-            capture_output=True, text=True, timeout=5,
-            cwd=os.path.dirname(os.path.abspath(filepath)) or "."
-        )
-        unique_authors = len(set(a.strip() for a in authors.stdout.strip().split('\n') if a.strip()))
         ownership = max(unique_authors, 1)
 
         return {
@@ -192,45 +238,65 @@ def measure_crs(filepath: str) -> dict:
 
 # ── DRS: DIS Reinforcement Score ────────────────────────────
 
-def measure_drs(project: str = "") -> float:
-    """DIS historyからRL報酬スコアを算出。"""
+# プロジェクト単位で全ファイル共通の値。1回の計測で1度だけ計算し、dev.db に DRS_TTL 秒キャッシュする。
+DRS_TTL = 300
+
+
+def _query_drs(cur: sqlite3.Cursor, project: str) -> float:
+    # 過去テスト成功率
+    cur.execute(
+        "SELECT COUNT(*), SUM(CASE WHEN status IN ('pass','fixed') THEN 1 ELSE 0 END) "
+        "FROM test_sessions WHERE project = ? AND ts >= datetime('now','-90 days')",
+        (project,))
+    row = cur.fetchone()
+    test_total, test_pass = (row[0] or 0), (row[1] or 0)
+    test_reward = test_pass / max(test_total, 1)
+
+    # 過去レビュースコア平均
+    cur.execute(
+        "SELECT AVG(final_score) FROM review_sessions "
+        "WHERE project = ? AND final_score IS NOT NULL AND ts >= datetime('now','-90 days')",
+        (project,))
+    avg_review = cur.fetchone()[0]
+    review_reward = (avg_review or 50) / 100.0
+
+    # 過去dev_sessions成功率
+    cur.execute(
+        "SELECT COUNT(*), SUM(CASE WHEN status='pass' THEN 1 ELSE 0 END) "
+        "FROM dev_sessions WHERE project = ? AND ts >= datetime('now','-90 days')",
+        (project,))
+    row = cur.fetchone()
+    dev_total, dev_pass = (row[0] or 0), (row[1] or 0)
+    history_reward = dev_pass / max(dev_total, 1)
+
+    # DRS = α×test + β×review + δ×history (entropy=0 at this stage)
+    drs = 0.35 * test_reward + 0.25 * review_reward + 0.15 * 0.5 + 0.25 * history_reward
+    return round(drs, 4)
+
+
+def measure_drs(project: str = "", ttl: int = DRS_TTL) -> float:
+    """DIS historyからRL報酬スコアを算出。ttl 秒以内に計算済みなら drs_cache の値を返す (ttl=0 で常に再計算)。"""
     if not os.path.exists(DB):
         return 0.5
     try:
-        conn = sqlite3.connect(DB)
+        conn = dis_db.shared(DB, init=migrate.ensure)
         cur = conn.cursor()
-
-        # 過去テスト成功率
-        cur.execute(
-            "SELECT COUNT(*), SUM(CASE WHEN status IN ('pass','fixed') THEN 1 ELSE 0 END) "
-            "FROM test_sessions WHERE project = ? AND ts >= datetime('now','-90 days')",
-            (project,))
-        row = cur.fetchone()
-        test_total, test_pass = (row[0] or 0), (row[1] or 0)
-        test_reward = test_pass / max(test_total, 1)
-
-        # 過去レビュースコア平均
-        cur.execute(
-            "SELECT AVG(final_score) FROM review_sessions "
-            "WHERE project = ? AND final_score IS NOT NULL AND ts >= datetime('now','-90 days')",
-            (project,))
-        avg_review = cur.fetchone()[0]
-        review_reward = (avg_review or 50) / 100.0
-
-        # 過去dev_sessions成功率
-        cur.execute(
-            "SELECT COUNT(*), SUM(CASE WHEN status='pass' THEN 1 ELSE 0 END) "
-            "FROM dev_sessions WHERE project = ? AND ts >= datetime('now','-90 days')",
-            (project,))
-        row = cur.fetchone()
-        dev_total, dev_pass = (row[0] or 0), (row[1] or 0)
-        history_reward = dev_pass / max(dev_total, 1)
-
+        if ttl > 0:
+            cur.execute("SELECT drs FROM drs_cache WHERE project = ? AND computed_at >= ?",
+                        (project, time.time() - ttl))
+            row = cur.fetchone()
+            if row:
+                conn.close()
+                return row[0]
+
+        drs = _query_drs(cur, project)
+        if ttl > 0:
+            cur.execute("INSERT INTO drs_cache(project, drs, computed_at) VALUES(?,?,?) "
+                        "ON CONFLICT(project) DO UPDATE SET drs = excluded.drs, computed_at = excluded.computed_at",
+                        (project, drs, time.time()))
+            conn.commit()
         conn.close()
-
-        # DRS = α×test + β×review + δ×history (entropy=0 at this stage)
-        drs = 0.35 * test_reward + 0.25 * review_reward + 0.15 * 0.5 + 0.25 * history_reward
-        return round(drs, 4)
+        return drs
     except Exception:
         return 0.5
 
@@ -244,27 +310,41 @@ def normalize(value: float, low: float, high: float) -> float:
     return max(0.0, min(1.0, (value - low) / (high - low)))
 
 
-def compute_dqs(cdi: float, se: float, cls_max: int, crs: float, drs: float) -> float:
+# 正規化レンジ (low, high)。CDI はそのまま、他は「低いほど良い」ので上限からの差で正規化する
+DQS_RANGES = {
+    "cdi": (0.3, 0.75),   # 0.55-0.75 が理想
+    "se": (2.0, 6.0),     # 2.0-6.0 typical range
+    "cls": (0, 30),       # 15以下が目標
+    "crs": (0.0, 2.0),    # 0-2.0 typical
+}
+
+
+def compute_dqs(cdi: float, se: float, cls_max: int, crs: float, drs: float,
+                ranges: dict = DQS_RANGES) -> float:
     """5軸統合DQS。0.0-1.0 (1.0=best)。"""
-    # CDI: 0.55-0.75 が理想。0.4以下/0.85以上はペナルティ
-    cdi_norm = normalize(cdi, 0.3, 0.75)
+    # CDI: 0.4以下/0.85以上はペナルティ
+    cdi_norm = normalize(cdi, *ranges["cdi"])
     if cdi > 0.80:
         cdi_norm *= 0.8  # 過圧縮ペナルティ
 
-    # SE: 低い方が良い (2.0-6.0 typical range)
-    se_norm = normalize(6.0 - se, 0.0, 4.0)
-
-    # CLS: 15以下が目標
-    cls_norm = normalize(30 - cls_max, 0, 30)
-
-    # CRS: 低い方が良い (0-2.0 typical)
-    crs_norm = normalize(2.0 - crs, 0.0, 2.0)
+    # SE / CLS / CRS: 低い方が良い
+    se_low, se_high = ranges["se"]
+    se_norm = normalize(se_high - se, 0.0, se_high - se_low)
+    cls_low, cls_high = ranges["cls"]
+    cls_norm = normalize(cls_high - cls_max, 0, cls_high - cls_low)
+    crs_low, crs_high = ranges["crs"]
+    crs_norm = normalize(crs_high - crs, 0.0, crs_high - crs_low)
 
     dqs = (W_CDI * cdi_norm + W_SE * se_norm + W_CLS * cls_norm +
            W_CRS * crs_norm + W_DRS * drs)
     return round(max(0.0, min(1.0, dqs)), 4)
 
 
+def scoring_context(project: str = "") -> dict:
+    """1回の計測で全ファイル共通の入力 (DRS・正規化レンジ)。ワーカーにはこれをそのまま渡す。"""
+    return {"project": project, "drs": measure_drs(project), "ranges": DQS_RANGES}
+
+
 def grade(dqs: float) -> str:
     if dqs >= 0.85:
         return "Excellent"
@@ -276,6 +356,81 @@ def grade(dqs: float) -> str:
         return "Poor"
 
 
+# ── Metrics Cache ───────────────────────────────────────────
+
+# CDI / SE / CLS はファイル内容と言語だけで決まるため、(内容sha256, 言語, METRICS_VERSION) をキーに
+# サイドカーDBへ保存する。計測ロジックを変えたら METRICS_VERSION を上げて旧エントリを無効化する。
+METRICS_VERSION = 2
+METRICS_CACHE_DB = os.path.join(CACHE_DIR, "metrics-cache.db")
+METRICS_CACHE_MAX = 20000  # 超えたら last_used の古い順に削除 (LRU)
+CACHED_METRICS = ("cdi", "se", "cls_total", "cls_max", "cls_avg", "functions", "max_nesting", "function_cls")
+
+
+def read_source(filepath: str) -> tuple[str, str]:
+    """(ソース文字列, 内容sha256) を返す。改行はテキストモードと同じく \\n に揃える。"""
+    raw = open(filepath, "rb").read()
+    source = raw.decode("utf-8", errors="replace").replace("\r\n", "\n").replace("\r", "\n")
+    return source, hashlib.sha256(raw).hexdigest()
+
+
+def _metrics_cache_conn() -> sqlite3.Connection:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    conn = dis_db.connect(METRICS_CACHE_DB)
+    conn.execute("""CREATE TABLE IF NOT EXISTS file_metrics (
+        sha TEXT NOT NULL,
+        lang TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        metrics_json TEXT NOT NULL,
+        last_used REAL NOT NULL,
+        PRIMARY KEY (sha, lang, version)
+    ) WITHOUT ROWID""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_file_metrics_lru ON file_metrics(last_used)")
+    return conn
+
+
+def load_cached_metrics(keys: set[tuple[str, str]]) -> dict[tuple[str, str], dict]:
+    """(内容sha256, 言語) のうちキャッシュ済みのものについて {キー: CDI/SE/CLS} を返す。キャッシュが使えなければ空。"""
+    if not keys:
+        return {}
+    try:
+        conn = _metrics_cache_conn()
+        found = {}
+        shas = sorted({sha for sha, _ in keys})
+        for i in range(0, len(shas), 500):
+            chunk = shas[i:i + 500]
+            rows = conn.execute(
+                f"SELECT sha, lang, metrics_json FROM file_metrics "
+                f"WHERE version = ? AND sha IN ({','.join('?' * len(chunk))})",
+                [METRICS_VERSION] + chunk).fetchall()
+            found.update({(sha, lang): json.loads(m) for sha, lang, m in rows})
+        conn.close()
+    except (sqlite3.Error, OSError, ValueError):
+        return {}
+    return {k: m for k, m in found.items() if k in keys}
+
+
+def save_cached_metrics(results: list[dict]):
+    """計測結果をキャッシュへ書き戻す (新規は追加、ヒット分は last_used を更新) し、上限を超えた分を削除。"""
+    now = time.time()
+    rows = [(r["content_sha"], r["lang"], METRICS_VERSION, json.dumps({k: r[k] for k in CACHED_METRICS}), now)
+            for r in results if r.get("content_sha")]
+    if not rows:
+        return
+    try:
+        conn = _metrics_cache_conn()
+        conn.executemany(
+            "INSERT INTO file_metrics(sha, lang, version, metrics_json, last_used) VALUES(?,?,?,?,?) "
+            "ON CONFLICT(sha, lang, version) DO UPDATE SET last_used = excluded.last_used",
+            rows)
+        conn.execute(
+            "DELETE FROM file_metrics WHERE (sha, lang, version) NOT IN (SELECT sha, lang, version "
+            "FROM file_metrics ORDER BY last_used DESC LIMIT ?)", (METRICS_CACHE_MAX,))
+        conn.commit()
+        conn.close()
+    except (sqlite3.Error, OSError):
+        pass
+
+
 # ── File Analysis ───────────────────────────────────────────
 
 def detect_lang(filepath: str) -> str:
@@ -287,55 +442,138 @@ def detect_lang(filepath: str) -> str:
     }.get(ext, "auto")
 
 
-def analyze_file(filepath: str, project: str = "") -> dict:
-    """単一ファイルのDQS計測。"""
+def analyze_file(filepath: str, ctx: dict | None = None, cached: dict | None = None,
+                 read: tuple[str, str] | None = None) -> dict:
+    """単一ファイルのDQS計測。cached (CDI/SE/CLS) があれば CRS だけ計算する。
+
+    ctx は scoring_context() の結果。省略時はその場で作る (単発呼び出し用)。
+    read は読み込み済みの read_source() の結果 (同じファイルを読み直さない)。
+    """
     try:
-        source = open(filepath, encoding="utf-8", errors="replace").read()
+        source, sha = read or read_source(filepath)
     except Exception as e:
         return {"error": str(e), "file": filepath}
 
     lang = detect_lang(filepath)
     loc = source.count('\n') + 1
 
-    cdi = measure_cdi(source)
-    se = measure_se(source, lang)
-    cls_data = measure_cls_file(source)
+    if cached is None:
+        metrics = measure_source(source, lang)
+    else:
+        metrics = {k: cached[k] for k in CACHED_METRICS}
+    if ctx is None:
+        ctx = scoring_context()
     crs_data = measure_crs(filepath)
-    drs = measure_drs(project)
+    drs = ctx["drs"]
 
-    dqs = compute_dqs(cdi, se, cls_data["cls_max"], crs_data["crs"], drs)
+    dqs = compute_dqs(metrics["cdi"], metrics["se"], metrics["cls_max"], crs_data["crs"], drs, ctx["ranges"])
 
     return {
         "file": filepath,
         "loc": loc,
         "lang": lang,
-        "cdi": cdi,
-        "se": se,
-        **cls_data,
+        **metrics,
         **crs_data,
         "drs": drs,
         "dqs": dqs,
         "grade": grade(dqs),
+        "content_sha": sha,
+        "metrics_cache": "miss" if cached is None else "hit",
     }
 
 
-def analyze_dir(dirpath: str, project: str = "") -> list[dict]:
-    """ディレクトリの全ソースファイルを計測。"""
-    extensions = {'.py', '.ts', '.tsx', '.js', '.jsx', '.rs', '.go', '.swift', '.rb'}
-    skip_dirs = {'node_modules', '.next', 'dist', '.git', '__pycache__', 'venv', '.venv'}
+def cache_stats(results: list[dict]) -> dict:
+    """メトリクスキャッシュのヒット/ミス数。"""
+    hits = sum(1 for r in results if r.get("metrics_cache") == "hit")
+    misses = sum(1 for r in results if r.get("metrics_cache") == "miss")
+    return {"hits": hits, "misses": misses}
+
+
+SOURCE_EXTENSIONS = {'.py', '.ts', '.tsx', '.js', '.jsx', '.rs', '.go', '.swift', '.rb'}
+SKIP_DIRS = {'node_modules', '.next', 'dist', '.git', '__pycache__', 'venv', '.venv'}
+# 1ワーカーに渡すファイル数 (プロセス間通信のオーバーヘッドを抑える)
+CHUNK_SIZE = 16
+
+
+def collect_files(dirpath: str) -> list[str]:
+    """計測対象のソースファイルをパス順に列挙。"""
+    files = []
+    for root, dirs, names in os.walk(dirpath):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+        for f in sorted(names):
+            if Path(f).suffix.lower() in SOURCE_EXTENSIONS:
+                files.append(os.path.join(root, f))
+    return files
+
+
+def _iter_chunk(files: list[str], ctx: dict):
+    """ファイル群を1回ずつ読み、内容ハッシュでキャッシュをまとめて引いてから順に計測する。"""
+    reads = {}
+    for fp in files:
+        try:
+            reads[fp] = read_source(fp)
+        except OSError:
+            continue  # analyze_file がエラー結果を返す
+    cached = load_cached_metrics({(sha, detect_lang(fp)) for fp, (_, sha) in reads.items()})
+    for fp in files:
+        read = reads.get(fp)
+        yield analyze_file(fp, ctx, cached.get((read[1], detect_lang(fp))) if read else None, read)
+
+
+def _init_worker(repo_roots: dict, histories: dict):
+    """ワーカープロセスの初期化。親が作った git 履歴の表を受け取り、ワーカーでは git log を走らせない。"""
+    _repo_roots.update(repo_roots)
+    _histories.update(histories)
+
+
+def _analyze_chunk(args: tuple) -> list[dict]:
+    """ワーカープロセスでファイル群を計測 (ProcessPoolExecutor から呼ばれる)。"""
+    files, ctx = args
+    return list(_iter_chunk(files, ctx))
+
+
+def analyze_files(files: list[str], project: str = "", jobs: int = 1, on_result=None) -> list[dict]:
+    """ファイル群を計測。jobs > 1 ならプロセスプールで並列実行。
+
+    on_result(result, done, total) は完了した順に呼ばれる (ストリーミング出力・進捗表示用)。
+    戻り値は実行順序に依存しないよう (dqs, file) でソート済み。
+    """
+    total = len(files)
     results = []
+    ctx = scoring_context(project)
+    chunks = [files[i:i + CHUNK_SIZE] for i in range(0, total, CHUNK_SIZE)]
+
+    def emit(chunk_results):
+        for r in chunk_results:
+            results.append(r)
+            if on_result:
+                on_result(r, len(results), total)
+
+    if jobs <= 1 or total <= CHUNK_SIZE:
+        for chunk in chunks:
+            for r in _iter_chunk(chunk, ctx):
+                emit([r])
+    else:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        # churn / 作者数の表はリポジトリごとに親で1回だけ作ってワーカーへ渡す
+        roots = {repo_root(fp) for fp in files} - {None}
+        histories = {root: git_history(root) for root in roots}
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(dict(_repo_roots), histories)) as pool:
+            futures = [pool.submit(_analyze_chunk, (chunk, ctx)) for chunk in chunks]
+            for fut in as_completed(futures):
+                emit(fut.result())
 
-    for root, dirs, files in os.walk(dirpath):
-        dirs[:] = [d for d in dirs if d not in skip_dirs]
-        for f in files:
-            if Path(f).suffix.lower() in extensions:
-                fp = os.path.join(root, f)
-                results.append(analyze_file(fp, project))
+    save_cached_metrics(results)
+    return sorted(results, key=lambda x: (x.get("dqs", 0), x.get("file", "")))
 
-    return sorted(results, key=lambda x: x.get("dqs", 0))
 
+def analyze_dir(dirpath: str, project: str = "", jobs: int = 1, on_result=None) -> list[dict]:
+    """ディレクトリの全ソースファイルを計測。"""
+    return analyze_files(collect_files(dirpath), project, jobs, on_result)
 
-def analyze_diff(project: str = "") -> list[dict]:
+
+def analyze_diff(project: str = "", jobs: int = 1, on_result=None) -> list[dict]:
     """git diff対象ファイルのみ計測。"""
     try:
         result = subprocess.run(
@@ -350,7 +588,7 @@ def analyze_diff(project: str = "") -> list[dict]:
     except Exception:
         return []
 
-    return [analyze_file(f, project) for f in files if os.path.exists(f)]
+    return analyze_files(sorted(f for f in files if os.path.exists(f)), project, jobs, on_result)
 
 
 # ── DB Recording ────────────────────────────────────────────
@@ -359,23 +597,9 @@ def record_measurement(project: str, results: list[dict]):
     """DQS計測結果をquality_metricsテーブルに記録。"""
     if not os.path.exists(DB):
         return
-    conn = sqlite3.connect(DB)
+    conn = dis_db.shared(DB, init=migrate.ensure)
     cur = conn.cursor()
 
-    # Ensure table exists
-    cur.execute("""CREATE TABLE IF NOT EXISTS quality_metrics (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        ts TEXT NOT NULL DEFAULT (datetime('now')),
-        project TEXT NOT NULL,
-        file TEXT NOT NULL,
-        loc INTEGER,
-        cdi REAL, se REAL, cls_max INTEGER, crs REAL, drs REAL, dqs REAL,
-        grade TEXT,
-        metrics_json TEXT
-    )""")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_qm_project ON quality_metrics(project)")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_qm_dqs ON quality_metrics(dqs)")
-
     for r in results:
         if "error" in r:
             continue
@@ -402,13 +626,30 @@ def format_result(r: dict) -> str:
             f"    CDI={r['cdi']:.2f}  SE={r['se']:.2f}  CLS={r['cls_max']}  "
             f"CRS={r['crs']:.3f}  DRS={r['drs']:.2f}\n"
             f"    LOC={r['loc']}  funcs={r['functions']}  nesting={r['max_nesting']}  "
-            f"churn={r['churn_30d']}")
+            f"churn={r['churn_30d']}" + _worst_function(r))
+
+
+def _worst_function(r: dict) -> str:
+    worst = max(r.get("function_cls", []), key=lambda f: f["cls"], default=None)
+    if not worst or not worst["cls"]:
+        return ""
+    return f"\n    worst: {worst['name']} (L{worst['start']}-{worst['end']}) CLS={worst['cls']}"
 
 
 def main():
     args = sys.argv[1:]
     output_json = "--json" in args
-    args = [a for a in args if a != "--json"]
+    output_jsonl = "--jsonl" in args
+    show_progress = "--progress" in args
+    args = [a for a in args if a not in ("--json", "--jsonl", "--progress")]
+
+    jobs = 1
+    if "--jobs" in args:
+        idx = args.index("--jobs")
+        jobs = int(args[idx + 1]) if idx + 1 < len(args) else 0
+        args = args[:idx] + args[idx+2:]
+        if jobs <= 0:
+            jobs = os.cpu_count() or 1
 
     project = ""
     if "--project" in args:
@@ -425,31 +666,43 @@ def main():
         except Exception:
             project = os.path.basename(os.getcwd())
 
+    def on_result(r, done, total):
+        # JSON Lines: 完了したファイルから1行ずつ出力 (呼び出し側が逐次読める)
+        if output_jsonl:
+            print(json.dumps(r), flush=True)
+        if show_progress:
+            print(f"[{done}/{total}] {r.get('file', '')}", file=sys.stderr, flush=True)
+
     if "--diff" in args:
-        results = analyze_diff(project)
+        results = analyze_diff(project, jobs, on_result)
     elif args:
         target = args[0]
         if os.path.isdir(target):
-            results = analyze_dir(target, project)
+            results = analyze_dir(target, project, jobs, on_result)
         elif os.path.isfile(target):
-            results = [analyze_file(target, project)]
+            results = analyze_files([target], project, 1, on_result)
         else:
             print(f"Not found: {target}", file=sys.stderr)
             sys.exit(1)
     else:
-        results = analyze_dir(".", project)
+        results = analyze_dir(".", project, jobs, on_result)
 
     # Record to DB
     if results:
         record_measurement(project, results)
 
-    if output_json:
-        print(json.dumps(results, indent=2))
+    stats = cache_stats(results)
+    if output_jsonl:
+        # 各ファイルの結果は on_result で出力済み。最後の1行はキャッシュの集計 (file を持たない)
+        print(json.dumps({"metrics_cache": stats}), flush=True)
+    elif output_json:
+        print(json.dumps({"results": results, "metrics_cache": stats}, indent=2))
     else:
         avg_dqs = sum(r.get("dqs", 0) for r in results if "error" not in r) / max(len(results), 1)
         print(f"{'=' * 50}")
         print(f"  DQS Report — {project}")
         print(f"  Files: {len(results)}  Avg DQS: {avg_dqs:.2f} [{grade(avg_dqs)}]")
+        print(f"  Metrics cache: {stats['hits']} hits / {stats['misses']} misses")
         print(f"{'=' * 50}")
         for r in results:
             print(format_result(r))
@@ -460,7 +713,8 @@ def main():
             if "error" in r:
                 continue
             if r["cls_max"] > 15:
-                print(f"  WARNING: {r['file']} CLS={r['cls_max']} > 15 — 関数分割を推奨")
+                hot = ", ".join(f"{f['name']}={f['cls']}" for f in r.get("function_cls", []) if f["cls"] > 15)
+                print(f"  WARNING: {r['file']} CLS={r['cls_max']} > 15 ({hot}) — 関数分割を推奨")
             if r["dqs"] < 0.50:
                 print(f"  WARNING: {r['file']} DQS={r['dqs']:.2f} — 再設計を推奨")
             if r.get("max_nesting", 0) > 4:
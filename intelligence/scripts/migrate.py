@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""DIS: dev.db のスキーマ移行。
+
+migrations/ の NNNN_name.sql / NNNN_name.py を番号順に適用し、適用済みの番号を schema_version に記録する。
+未適用分はまとめて1トランザクション (BEGIN IMMEDIATE) で適用するので、途中で失敗しても DB は元のまま。
+.py のマイグレーションは migrate(conn) を定義する (commit しないこと)。
+
+schema_version 導入前の DB (旧 init-db.sh で作成) には 0001 から全部を適用するため、
+0001〜0008 は既存のテーブル・カラムがあっても通るように書いてある。
+
+スクリプトは起動時に ensure(conn) を1回呼ぶ。最新なら schema_version を1回読むだけで終わる。
+
+Usage:
+  migrate.py [--db PATH] [--to N]   # 未適用分 (--to なら N まで) を適用
+  migrate.py --status               # 現在のバージョンと未適用の一覧
+"""
+import importlib.util
+import os
+import sqlite3
+import sys
+
+import dis_db
+
+DB = os.path.expanduser("~/.claude/intelligence/dev.db")
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+VERSION_DDL = """CREATE TABLE IF NOT EXISTS schema_version (
+  version INTEGER PRIMARY KEY,
+  name TEXT NOT NULL,
+  applied_at TEXT NOT NULL DEFAULT (datetime('now'))
+)"""
+
+
+def migrations() -> list[tuple[int, str, str]]:
+    """(番号, 名前, パス) を番号順に返す。"""
+    found = []
+    for fname in os.listdir(MIGRATIONS_DIR):
+        stem, ext = os.path.splitext(fname)
+        num, _, name = stem.partition("_")
+        if ext in (".sql", ".py") and num.isdigit():
+            found.append((int(num), name, os.path.join(MIGRATIONS_DIR, fname)))
+    return sorted(found)
+
+
+def latest_version() -> int:
+    found = migrations()
+    return found[-1][0] if found else 0
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0  # schema_version がまだない
+    return row[0] or 0
+
+
+# ── マイグレーションから使うヘルパー ──────────────────────────────────
+
+
+def add_column(conn: sqlite3.Connection, table: str, column: str, decl: str) -> bool:
+    """カラムがなければ追加。追加したら True。"""
+    cols = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+    if column in cols:
+        return False
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+    return True
+
+
+def _statements(sql: str):
+    """SQL スクリプトを1文ずつに分ける (executescript は途中で COMMIT してしまうため使わない)。"""
+    buf = ""
+    for line in sql.splitlines(keepends=True):
+        buf += line
+        if sqlite3.complete_statement(buf):
+            yield buf
+            buf = ""
+    if buf.strip() and not all(l.strip().startswith("--") for l in buf.splitlines() if l.strip()):
+        yield buf
+
+
+def run_script(conn: sqlite3.Connection, sql: str):
+    """SQL スクリプトを1文ずつ実行 (.py のマイグレーションから SQL をまとめて流す用)。"""
+    for stmt in _statements(sql):
+        conn.execute(stmt)
+
+
+def _run(conn: sqlite3.Connection, path: str):
+    if path.endswith(".sql"):
+        with open(path, encoding="utf-8") as f:
+            run_script(conn, f.read())
+        return
+    spec = importlib.util.spec_from_file_location(f"dis_migration_{os.path.basename(path)[:-3]}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.migrate(conn)
+
+
+def _apply_pending(conn: sqlite3.Connection, target: int | None) -> list[tuple[int, str]]:
+    conn.execute(VERSION_DDL)
+    # 別プロセスが先に適用していることがあるので、ロックを取ってから読み直す
+    current = current_version(conn)
+    applied = []
+    for num, name, path in migrations():
+        if num <= current or (target is not None and num > target):
+            continue
+        _run(conn, path)
+        conn.execute("INSERT INTO schema_version(version, name) VALUES(?, ?)", (num, name))
+        applied.append((num, name))
+    return applied
+
+
+def apply(conn: sqlite3.Connection, target: int | None = None) -> list[tuple[int, str]]:
+    """未適用のマイグレーションを1トランザクションで適用し、適用した (番号, 名前) を返す。
+
+    target を指定するとその番号までで止める (移行前後の比較用)。
+    """
+    return dis_db.write(conn, _apply_pending, target)
+
+
+def ensure(conn: sqlite3.Connection) -> sqlite3.Connection:
+    """スキーマが最新でなければ移行する。スクリプトの起動時に1回呼ぶ。"""
+    if current_version(conn) < latest_version():
+        apply(conn)
+    return conn
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    path = args[args.index("--db") + 1] if "--db" in args else DB
+    conn = dis_db.connect(path)
+    if "--status" in args:
+        current = current_version(conn)
+        print(f"Schema version: {current} (latest {latest_version()})")
+        for num, name, _ in migrations():
+            if num > current:
+                print(f"  pending: {num:04d}_{name}")
+    else:
+        applied = apply(conn, int(args[args.index("--to") + 1]) if "--to" in args else None)
+        for num, name in applied:
+            print(f"  applied: {num:04d}_{name}")
+        print(f"Schema version: {current_version(conn)}")
+    conn.close()
@@ -0,0 +1,179 @@
+-- 基本テーブル (init-db.sh v1〜v5 相当)。
+-- schema_version 導入前の DB にもそのまま適用できるよう IF NOT EXISTS で書く。
+
+CREATE TABLE IF NOT EXISTS events (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  ts TEXT NOT NULL DEFAULT (datetime('now')),
+  type TEXT NOT NULL,
+  cmd TEXT,
+  error TEXT,
+  cwd TEXT,
+  project TEXT,
+  resolved INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS solutions (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  ts TEXT NOT NULL DEFAULT (datetime('now')),
+  error_pattern TEXT NOT NULL,
+  solution TEXT NOT NULL,
+  files TEXT,
+  project TEXT,
+  success_count INTEGER DEFAULT 1,
+  fail_count INTEGER DEFAULT 0,
+  score REAL DEFAULT 1.0,
+  last_used TEXT
+);
+
+CREATE TABLE IF NOT EXISTS patterns (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  ts TEXT NOT NULL DEFAULT (datetime('now')),
+  pattern TEXT NOT NULL,
+  description TEXT NOT NULL,
+  solution TEXT NOT NULL,
+  frequency INTEGER DEFAULT 0,
+  score REAL DEFAULT 1.0,
+  promoted_to_memory INTEGER DEFAULT 0,
+  last_seen TEXT
+);
+
+CREATE TABLE IF NOT EXISTS sessions (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  ts TEXT NOT NULL DEFAULT (datetime('now')),
+  project TEXT,
+  files_changed INTEGER DEFAULT 0,
+  errors_encountered INTEGER DEFAULT 0,
+  errors_resolved INTEGER DEFAULT 0,
+  duration_turns INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS industry_feeds (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  ts TEXT NOT NULL DEFAULT (datetime('now')),
+  source TEXT NOT NULL,
+  title TEXT NOT NULL,
+  url TEXT NOT NULL UNIQUE,
+  summary TEXT,
+  fetched_at TEXT,
+  analyzed INTEGER DEFAULT 0,
+  relevant INTEGER DEFAULT 0,
+  action_taken TEXT
+);
+
+CREATE TABLE IF NOT EXISTS feedback (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  ts TEXT NOT NULL DEFAULT (datetime('now')),
+  category TEXT NOT NULL,
+  wrong_approach TEXT NOT NULL,
+  correct_approach TEXT NOT NULL,
+  context TEXT,
+  project TEXT,
+  scope TEXT DEFAULT 'project',
+  confirmation_count INTEGER DEFAULT 1,
+  score REAL DEFAULT 1.5,
+  last_seen TEXT DEFAULT (datetime('now'))
+);
+
+-- /test スキル
+CREATE TABLE IF NOT EXISTS test_sessions (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  ts TEXT NOT NULL DEFAULT (datetime('now')),
+  project TEXT NOT NULL,
+  perspective TEXT NOT NULL,
+  test_type TEXT NOT NULL,
+  target_files TEXT,
+  test_file TEXT,
+  iterations INTEGER DEFAULT 1,
+  max_iterations INTEGER DEFAULT 3,
+  status TEXT DEFAULT 'pending',
+  pass_count INTEGER DEFAULT 0,
+  fail_count INTEGER DEFAULT 0,
+  error_output TEXT,
+  error_pattern TEXT,
+  fix_history TEXT,
+  score REAL DEFAULT 1.0,
+  used_past_solutions TEXT,
+  duration_seconds INTEGER,
+  coverage_before REAL,
+  coverage_after REAL
+);
+
+-- /dev スキル (DQS カラムは 0002 で追加)
+CREATE TABLE IF NOT EXISTS dev_sessions (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  ts TEXT NOT NULL DEFAULT (datetime('now')),
+  project TEXT NOT NULL,
+  requirement TEXT NOT NULL,
+  phase TEXT DEFAULT 'prep',
+  status TEXT DEFAULT 'running',
+  files_changed TEXT,
+  lines_added INTEGER DEFAULT 0,
+  lines_removed INTEGER DEFAULT 0,
+  test_session_id INTEGER,
+  test_status TEXT,
+  review_score_initial INTEGER,
+  review_score_final INTEGER,
+  review_iterations INTEGER DEFAULT 0,
+  dis_solutions_used TEXT,
+  dis_feedback_used TEXT,
+  dis_patterns_used TEXT,
+  dis_new_feedback TEXT,
+  score REAL DEFAULT 1.0,
+  duration_seconds INTEGER,
+  total_iterations INTEGER DEFAULT 1
+);
+
+-- /que スキル
+CREATE TABLE IF NOT EXISTS questions (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  ts TEXT NOT NULL DEFAULT (datetime('now')),
+  project TEXT,
+  question TEXT NOT NULL,
+  context TEXT,
+  answer TEXT,
+  tags TEXT,
+  status TEXT DEFAULT 'open',
+  resolved_at TEXT,
+  score REAL DEFAULT 1.0,
+  last_seen TEXT DEFAULT (datetime('now'))
+);
+
+-- DQS 品質計測 (measure-quality.py)
+CREATE TABLE IF NOT EXISTS quality_metrics (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  ts TEXT NOT NULL DEFAULT (datetime('now')),
+  project TEXT NOT NULL,
+  file TEXT NOT NULL,
+  loc INTEGER,
+  cdi REAL,
+  se REAL,
+  cls_max INTEGER,
+  crs REAL,
+  drs REAL,
+  dqs REAL,
+  grade TEXT,
+  metrics_json TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_events_project ON events(project);
+CREATE INDEX IF NOT EXISTS idx_events_type ON events(type);
+CREATE INDEX IF NOT EXISTS idx_events_error ON events(error);
+CREATE INDEX IF NOT EXISTS idx_solutions_pattern ON solutions(error_pattern);
+CREATE INDEX IF NOT EXISTS idx_solutions_score ON solutions(score DESC);
+CREATE INDEX IF NOT EXISTS idx_patterns_score ON patterns(score DESC);
+CREATE INDEX IF NOT EXISTS idx_feeds_source ON industry_feeds(source);
+CREATE INDEX IF NOT EXISTS idx_feeds_analyzed ON industry_feeds(analyzed);
+CREATE INDEX IF NOT EXISTS idx_feedback_category ON feedback(category);
+CREATE INDEX IF NOT EXISTS idx_feedback_score ON feedback(score DESC);
+CREATE INDEX IF NOT EXISTS idx_feedback_project ON feedback(project);
+CREATE INDEX IF NOT EXISTS idx_test_project ON test_sessions(project);
+CREATE INDEX IF NOT EXISTS idx_test_error ON test_sessions(error_pattern);
+CREATE INDEX IF NOT EXISTS idx_test_score ON test_sessions(score DESC);
+CREATE INDEX IF NOT EXISTS idx_dev_project ON dev_sessions(project);
+CREATE INDEX IF NOT EXISTS idx_dev_status ON dev_sessions(status);
+CREATE INDEX IF NOT EXISTS idx_dev_score ON dev_sessions(score DESC);
+CREATE INDEX IF NOT EXISTS idx_questions_project ON questions(project);
+CREATE INDEX IF NOT EXISTS idx_questions_status ON questions(status);
+CREATE INDEX IF NOT EXISTS idx_questions_score ON questions(score DESC);
+CREATE INDEX IF NOT EXISTS idx_qm_project ON quality_metrics(project);
+CREATE INDEX IF NOT EXISTS idx_qm_dqs ON quality_metrics(dqs);
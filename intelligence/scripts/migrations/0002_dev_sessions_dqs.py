@@ -0,0 +1,9 @@
+"""dev_sessions に DQS カラムを追加 (旧 init-db.sh v5 の ALTER を済ませた DB もあるので有無を見る)。"""
+from migrate import add_column
+
+
+def migrate(conn):
+    add_column(conn, "dev_sessions", "dqs_before", "REAL")
+    add_column(conn, "dev_sessions", "dqs_after", "REAL")
+    add_column(conn, "dev_sessions", "dqs_delta", "REAL")
+    add_column(conn, "dev_sessions", "metrics_json", "TEXT")
@@ -0,0 +1,61 @@
+-- /bug (record-bug-session.sh) と tri-review (review-utils.sh) の記録先。
+-- これまで CREATE がどこにもなく、手動で作った DB でしか記録できなかった。
+
+CREATE TABLE IF NOT EXISTS bug_sessions (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  ts TEXT NOT NULL DEFAULT (datetime('now')),
+  project TEXT NOT NULL,
+  description TEXT NOT NULL,
+  phase TEXT DEFAULT 'triage',
+  status TEXT DEFAULT 'running',
+  severity TEXT,
+  bug_category TEXT,
+  reproduction_steps TEXT,
+  expected_behavior TEXT,
+  actual_behavior TEXT,
+  error_output TEXT,
+  error_pattern TEXT,
+  root_cause TEXT,
+  root_cause_file TEXT,
+  root_cause_line INTEGER,
+  hypothesis_history TEXT,
+  fix_description TEXT,
+  files_changed TEXT,
+  lines_added INTEGER DEFAULT 0,
+  lines_removed INTEGER DEFAULT 0,
+  fix_type TEXT,
+  test_session_id INTEGER,
+  verification_method TEXT,
+  verification_result TEXT,
+  dis_solutions_used TEXT,
+  dis_bugs_similar TEXT,
+  related_dev_session_id INTEGER,
+  score REAL DEFAULT 1.0,
+  duration_seconds INTEGER,
+  diagnosis_seconds INTEGER,
+  prevention_suggestion TEXT
+);
+
+CREATE TABLE IF NOT EXISTS review_sessions (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  ts TEXT NOT NULL DEFAULT (datetime('now')),
+  project TEXT,
+  mode TEXT,
+  initial_score INTEGER,
+  final_score INTEGER,
+  iterations INTEGER DEFAULT 1,
+  score_history TEXT,
+  issues_found INTEGER DEFAULT 0,
+  issues_fixed INTEGER DEFAULT 0,
+  critical_count INTEGER DEFAULT 0,
+  high_count INTEGER DEFAULT 0,
+  medium_count INTEGER DEFAULT 0,
+  low_count INTEGER DEFAULT 0,
+  status TEXT DEFAULT 'completed',
+  models_used TEXT,
+  duration_seconds INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS idx_bug_project ON bug_sessions(project);
+CREATE INDEX IF NOT EXISTS idx_bug_score ON bug_sessions(score DESC);
+CREATE INDEX IF NOT EXISTS idx_review_project ON review_sessions(project);
@@ -0,0 +1,30 @@
+-- similarity.py の転置インデックス。
+-- solution_terms: term → (solution_id, tf) の posting list。
+-- solutions への INSERT / error_pattern UPDATE はトリガーで solution_index_queue に積まれ、
+-- refresh_index() が差分だけ再トークナイズする。DELETE はトリガーで posting を即時削除。
+-- sqlite3 CLI (review skill, record-*.sh) からの書き込みもトリガー経由で追従する。
+
+CREATE TABLE IF NOT EXISTS solution_terms (
+  term TEXT NOT NULL,
+  solution_id INTEGER NOT NULL,
+  tf REAL NOT NULL,
+  PRIMARY KEY (term, solution_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_solution_terms_sid ON solution_terms(solution_id);
+CREATE TABLE IF NOT EXISTS solution_index_queue (
+  solution_id INTEGER PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS solution_index_meta (
+  key TEXT PRIMARY KEY,
+  value TEXT
+);
+CREATE TRIGGER IF NOT EXISTS trg_solutions_index_ins AFTER INSERT ON solutions BEGIN
+  INSERT OR IGNORE INTO solution_index_queue(solution_id) VALUES (new.id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_solutions_index_upd AFTER UPDATE OF error_pattern ON solutions BEGIN
+  INSERT OR IGNORE INTO solution_index_queue(solution_id) VALUES (new.id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_solutions_index_del AFTER DELETE ON solutions BEGIN
+  DELETE FROM solution_terms WHERE solution_id = old.id;
+  DELETE FROM solution_index_queue WHERE solution_id = old.id;
+END;
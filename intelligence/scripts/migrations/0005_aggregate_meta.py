@@ -0,0 +1,34 @@
+"""aggregate.py の high-water mark と solutions(error_pattern, project) の一意索引。
+
+既存の重複行はスコア最大の行に success_count を寄せてから一意索引を張る。
+"""
+
+
+def migrate(conn):
+    cur = conn.cursor()
+    cur.execute("""CREATE TABLE IF NOT EXISTS aggregate_meta (
+        table_name TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL DEFAULT 0,
+        last_run TEXT
+    )""")
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name='idx_solutions_pattern_project'")
+    if cur.fetchone() is not None:
+        return
+    cur.execute("""
+        SELECT error_pattern, project FROM solutions
+        WHERE project IS NOT NULL
+        GROUP BY error_pattern, project HAVING COUNT(*) > 1
+    """)
+    for pattern, project in cur.fetchall():
+        cur.execute(
+            "SELECT id, success_count FROM solutions WHERE error_pattern = ? AND project = ? "
+            "ORDER BY score DESC, id",
+            (pattern, project),
+        )
+        (keep_id, _), *dups = cur.fetchall()
+        cur.execute(
+            "UPDATE solutions SET success_count = success_count + ? WHERE id = ?",
+            (sum(c or 0 for _, c in dups), keep_id),
+        )
+        cur.executemany("DELETE FROM solutions WHERE id = ?", [(i,) for i, _ in dups])
+    cur.execute("CREATE UNIQUE INDEX idx_solutions_pattern_project ON solutions(error_pattern, project)")
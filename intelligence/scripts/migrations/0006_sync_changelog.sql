@@ -0,0 +1,24 @@
+-- sync.py の同期状態。同期対象テーブルのトリガーは .turso-env がある端末だけ
+-- sync.py --ensure-schema が張る (トリガーがなければ changelog は空のまま)。
+-- sync_changelog: 未 push のローカル変更 (1行につき最新の1件だけ残る)。
+-- push が確認されたエントリは削除する。version は単調増加。
+-- sync_state.applying = '1' の間 (pull の適用中) はトリガーが記録しない。
+
+CREATE TABLE IF NOT EXISTS sync_meta (
+  table_name TEXT PRIMARY KEY,
+  last_sync_id INTEGER DEFAULT 0,
+  last_sync_ts TEXT
+);
+CREATE TABLE IF NOT EXISTS sync_changelog (
+  version INTEGER PRIMARY KEY AUTOINCREMENT,
+  table_name TEXT NOT NULL,
+  row_id INTEGER NOT NULL,
+  op TEXT NOT NULL,
+  UNIQUE (table_name, row_id)
+);
+CREATE INDEX IF NOT EXISTS idx_sync_changelog_table ON sync_changelog(table_name, version);
+CREATE TABLE IF NOT EXISTS sync_state (
+  key TEXT PRIMARY KEY,
+  value TEXT
+);
+INSERT OR IGNORE INTO sync_state(key, value) VALUES ('applying', '0');
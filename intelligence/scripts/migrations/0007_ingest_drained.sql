@@ -0,0 +1,5 @@
+-- ingest.py が drain 済みのスプールファイル名 (クラッシュ後の二重取り込み防止用)
+CREATE TABLE IF NOT EXISTS ingest_drained (
+  name TEXT PRIMARY KEY,
+  drained_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
@@ -0,0 +1,6 @@
+-- measure-quality.py の DRS キャッシュ (プロジェクトごとに1行)
+CREATE TABLE IF NOT EXISTS drs_cache (
+  project TEXT PRIMARY KEY,
+  drs REAL NOT NULL,
+  computed_at REAL NOT NULL
+);
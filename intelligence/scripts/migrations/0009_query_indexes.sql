@@ -0,0 +1,43 @@
+-- query_audit.py の EXPLAIN QUERY PLAN 監査で全件スキャンになっていたクエリ用の複合・カバリング索引。
+-- 新しい索引の先頭カラムだけの索引は不要になるので削除する (書き込みのたびに更新されるため)。
+
+-- self-improve suggest/trend: project = ? AND ts = (SELECT MAX(ts) ... WHERE project = ?)、project = ? AND ts >= ?
+CREATE INDEX IF NOT EXISTS idx_qm_project_ts ON quality_metrics(project, ts);
+-- report: ts = (SELECT MAX(ts) FROM quality_metrics)、ts >= datetime('now', '-7 days')
+CREATE INDEX IF NOT EXISTS idx_qm_ts ON quality_metrics(ts);
+DROP INDEX IF EXISTS idx_qm_project;
+
+-- capture-session.sh: project = ? AND ts >= ? [AND resolved = 1] を索引だけで数える
+-- record-bug-session.sh lookup: project = ? ORDER BY ts DESC LIMIT 5
+CREATE INDEX IF NOT EXISTS idx_events_project_ts ON events(project, ts, resolved);
+-- report: 直近7日の件数と type 別の内訳
+CREATE INDEX IF NOT EXISTS idx_events_ts_type ON events(ts, type);
+DROP INDEX IF EXISTS idx_events_project;
+-- type だけで引くクエリはなく、残すと type 別集計が期間で絞らずにこの索引を全件読む
+DROP INDEX IF EXISTS idx_events_type;
+-- error 本文 (最大 2000 bytes) の索引。error で引くクエリはなく、events のサイズをほぼ倍にしていた
+DROP INDEX IF EXISTS idx_events_error;
+
+-- measure-quality DRS / self-improve: project = ? AND ts >= ? (test は status、review は final_score まで索引で読む)
+CREATE INDEX IF NOT EXISTS idx_dev_project_ts ON dev_sessions(project, ts);
+CREATE INDEX IF NOT EXISTS idx_test_project_ts ON test_sessions(project, ts, status);
+CREATE INDEX IF NOT EXISTS idx_review_project_ts ON review_sessions(project, ts, final_score);
+DROP INDEX IF EXISTS idx_dev_project;
+DROP INDEX IF EXISTS idx_test_project;
+DROP INDEX IF EXISTS idx_review_project;
+
+-- report: 直近7日のセッション集計
+CREATE INDEX IF NOT EXISTS idx_sessions_ts ON sessions(ts);
+
+-- industry-check スキル: analyzed = 0 ORDER BY ts DESC LIMIT 20 (並べ替えなし)、fetch_sources の古い既読削除
+CREATE INDEX IF NOT EXISTS idx_feeds_analyzed_ts ON industry_feeds(analyzed, ts);
+DROP INDEX IF EXISTS idx_feeds_analyzed;
+
+-- aggregate promote_feedback: pattern = ? / kb-maintain: error_pattern NOT IN (SELECT pattern FROM patterns)
+CREATE INDEX IF NOT EXISTS idx_patterns_pattern ON patterns(pattern);
+
+-- que スキル: ORDER BY ts DESC LIMIT 30
+CREATE INDEX IF NOT EXISTS idx_questions_ts ON questions(ts);
+
+-- error_pattern = ? は一意索引 idx_solutions_pattern_project (error_pattern, project) の先頭で引ける
+DROP INDEX IF EXISTS idx_solutions_pattern;
@@ -0,0 +1,203 @@
+-- report.py 用の集計テーブル。元テーブルへの書き込みと同じトランザクションでトリガーが更新するので、
+-- sqlite3 CLI (record-*.sh、スキル) や sync の pull で入った行も含めて常に最新になる。
+-- report は元テーブルを走査せず、ここから日単位 (date(ts)) で読む。
+-- トリガーは元テーブルへの書き込みを失敗させないよう、NULL になりうる値はすべて COALESCE / IS で受ける。
+
+-- events: 日・プロジェクト・種類ごとの件数
+CREATE TABLE IF NOT EXISTS rollup_events_daily (
+  day TEXT NOT NULL,
+  project TEXT NOT NULL,
+  type TEXT NOT NULL,
+  events INTEGER NOT NULL DEFAULT 0,
+  resolved INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, project, type)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS trg_rollup_events_ins AFTER INSERT ON events BEGIN
+  INSERT INTO rollup_events_daily(day, project, type, events, resolved)
+  VALUES (COALESCE(date(new.ts), ''), COALESCE(new.project, ''), COALESCE(new.type, ''), 1, new.resolved IS 1)
+  ON CONFLICT(day, project, type) DO UPDATE SET events = events + 1, resolved = resolved + excluded.resolved;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_rollup_events_del AFTER DELETE ON events BEGIN
+  UPDATE rollup_events_daily SET events = events - 1, resolved = resolved - (old.resolved IS 1)
+  WHERE day = COALESCE(date(old.ts), '') AND project = COALESCE(old.project, '') AND type = COALESCE(old.type, '');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_rollup_events_upd AFTER UPDATE OF ts, project, type, resolved ON events BEGIN
+  UPDATE rollup_events_daily SET events = events - 1, resolved = resolved - (old.resolved IS 1)
+  WHERE day = COALESCE(date(old.ts), '') AND project = COALESCE(old.project, '') AND type = COALESCE(old.type, '');
+  INSERT INTO rollup_events_daily(day, project, type, events, resolved)
+  VALUES (COALESCE(date(new.ts), ''), COALESCE(new.project, ''), COALESCE(new.type, ''), 1, new.resolved IS 1)
+  ON CONFLICT(day, project, type) DO UPDATE SET events = events + 1, resolved = resolved + excluded.resolved;
+END;
+
+-- sessions (Stop フック): 日・プロジェクトごとのエラー解決数
+CREATE TABLE IF NOT EXISTS rollup_sessions_daily (
+  day TEXT NOT NULL,
+  project TEXT NOT NULL,
+  sessions INTEGER NOT NULL DEFAULT 0,
+  errors_encountered INTEGER NOT NULL DEFAULT 0,
+  errors_resolved INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, project)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS trg_rollup_sessions_ins AFTER INSERT ON sessions BEGIN
+  INSERT INTO rollup_sessions_daily(day, project, sessions, errors_encountered, errors_resolved)
+  VALUES (COALESCE(date(new.ts), ''), COALESCE(new.project, ''), 1,
+          COALESCE(new.errors_encountered, 0), COALESCE(new.errors_resolved, 0))
+  ON CONFLICT(day, project) DO UPDATE SET sessions = sessions + 1,
+    errors_encountered = errors_encountered + excluded.errors_encountered,
+    errors_resolved = errors_resolved + excluded.errors_resolved;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_rollup_sessions_del AFTER DELETE ON sessions BEGIN
+  UPDATE rollup_sessions_daily SET sessions = sessions - 1,
+    errors_encountered = errors_encountered - COALESCE(old.errors_encountered, 0),
+    errors_resolved = errors_resolved - COALESCE(old.errors_resolved, 0)
+  WHERE day = COALESCE(date(old.ts), '') AND project = COALESCE(old.project, '');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_rollup_sessions_upd
+AFTER UPDATE OF ts, project, errors_encountered, errors_resolved ON sessions BEGIN
+  UPDATE rollup_sessions_daily SET sessions = sessions - 1,
+    errors_encountered = errors_encountered - COALESCE(old.errors_encountered, 0),
+    errors_resolved = errors_resolved - COALESCE(old.errors_resolved, 0)
+  WHERE day = COALESCE(date(old.ts), '') AND project = COALESCE(old.project, '');
+  INSERT INTO rollup_sessions_daily(day, project, sessions, errors_encountered, errors_resolved)
+  VALUES (COALESCE(date(new.ts), ''), COALESCE(new.project, ''), 1,
+          COALESCE(new.errors_encountered, 0), COALESCE(new.errors_resolved, 0))
+  ON CONFLICT(day, project) DO UPDATE SET sessions = sessions + 1,
+    errors_encountered = errors_encountered + excluded.errors_encountered,
+    errors_resolved = errors_resolved + excluded.errors_resolved;
+END;
+
+-- dev_sessions: 日・プロジェクトごとの件数・pass/fail・DQS 変化量 (status は完了時に UPDATE される)
+CREATE TABLE IF NOT EXISTS rollup_dev_daily (
+  day TEXT NOT NULL,
+  project TEXT NOT NULL,
+  sessions INTEGER NOT NULL DEFAULT 0,
+  passes INTEGER NOT NULL DEFAULT 0,
+  fails INTEGER NOT NULL DEFAULT 0,
+  dqs_delta_sum REAL NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, project)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS trg_rollup_dev_ins AFTER INSERT ON dev_sessions BEGIN
+  INSERT INTO rollup_dev_daily(day, project, sessions, passes, fails, dqs_delta_sum)
+  VALUES (COALESCE(date(new.ts), ''), COALESCE(new.project, ''), 1,
+          new.status IS 'pass', new.status IS 'fail', COALESCE(new.dqs_delta, 0))
+  ON CONFLICT(day, project) DO UPDATE SET sessions = sessions + 1, passes = passes + excluded.passes,
+    fails = fails + excluded.fails, dqs_delta_sum = dqs_delta_sum + excluded.dqs_delta_sum;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_rollup_dev_del AFTER DELETE ON dev_sessions BEGIN
+  UPDATE rollup_dev_daily SET sessions = sessions - 1, passes = passes - (old.status IS 'pass'),
+    fails = fails - (old.status IS 'fail'), dqs_delta_sum = dqs_delta_sum - COALESCE(old.dqs_delta, 0)
+  WHERE day = COALESCE(date(old.ts), '') AND project = COALESCE(old.project, '');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_rollup_dev_upd AFTER UPDATE OF ts, project, status, dqs_delta ON dev_sessions BEGIN
+  UPDATE rollup_dev_daily SET sessions = sessions - 1, passes = passes - (old.status IS 'pass'),
+    fails = fails - (old.status IS 'fail'), dqs_delta_sum = dqs_delta_sum - COALESCE(old.dqs_delta, 0)
+  WHERE day = COALESCE(date(old.ts), '') AND project = COALESCE(old.project, '');
+  INSERT INTO rollup_dev_daily(day, project, sessions, passes, fails, dqs_delta_sum)
+  VALUES (COALESCE(date(new.ts), ''), COALESCE(new.project, ''), 1,
+          new.status IS 'pass', new.status IS 'fail', COALESCE(new.dqs_delta, 0))
+  ON CONFLICT(day, project) DO UPDATE SET sessions = sessions + 1, passes = passes + excluded.passes,
+    fails = fails + excluded.fails, dqs_delta_sum = dqs_delta_sum + excluded.dqs_delta_sum;
+END;
+
+-- quality_metrics: 計測1回 (同じ project・ts のファイル群) ごとの合計。quality_metrics は追記のみなので
+-- INSERT だけ追う (DELETE は件数と合計を戻すが、最小・最大は戻せない)
+CREATE TABLE IF NOT EXISTS rollup_quality_runs (
+  project TEXT NOT NULL,
+  ts TEXT NOT NULL,
+  files INTEGER NOT NULL DEFAULT 0,
+  dqs_sum REAL NOT NULL DEFAULT 0,
+  dqs_min REAL,
+  dqs_max REAL,
+  cdi_sum REAL NOT NULL DEFAULT 0,
+  se_sum REAL NOT NULL DEFAULT 0,
+  cls_sum REAL NOT NULL DEFAULT 0,
+  crs_sum REAL NOT NULL DEFAULT 0,
+  high_cls INTEGER NOT NULL DEFAULT 0,  -- cls_max > 15
+  low_dqs INTEGER NOT NULL DEFAULT 0,   -- dqs < 0.50
+  PRIMARY KEY (project, ts)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_rollup_quality_ts ON rollup_quality_runs(ts);
+CREATE TRIGGER IF NOT EXISTS trg_rollup_quality_ins AFTER INSERT ON quality_metrics BEGIN
+  INSERT INTO rollup_quality_runs(project, ts, files, dqs_sum, dqs_min, dqs_max, cdi_sum, se_sum, cls_sum, crs_sum,
+                                  high_cls, low_dqs)
+  VALUES (new.project, new.ts, 1, COALESCE(new.dqs, 0), new.dqs, new.dqs, COALESCE(new.cdi, 0), COALESCE(new.se, 0),
+          COALESCE(new.cls_max, 0), COALESCE(new.crs, 0), COALESCE(new.cls_max > 15, 0), COALESCE(new.dqs < 0.50, 0))
+  ON CONFLICT(project, ts) DO UPDATE SET files = files + 1, dqs_sum = dqs_sum + excluded.dqs_sum,
+    dqs_min = COALESCE(MIN(dqs_min, excluded.dqs_min), dqs_min, excluded.dqs_min),
+    dqs_max = COALESCE(MAX(dqs_max, excluded.dqs_max), dqs_max, excluded.dqs_max),
+    cdi_sum = cdi_sum + excluded.cdi_sum, se_sum = se_sum + excluded.se_sum,
+    cls_sum = cls_sum + excluded.cls_sum, crs_sum = crs_sum + excluded.crs_sum,
+    high_cls = high_cls + excluded.high_cls, low_dqs = low_dqs + excluded.low_dqs;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_rollup_quality_del AFTER DELETE ON quality_metrics BEGIN
+  UPDATE rollup_quality_runs SET files = files - 1, dqs_sum = dqs_sum - COALESCE(old.dqs, 0),
+    cdi_sum = cdi_sum - COALESCE(old.cdi, 0), se_sum = se_sum - COALESCE(old.se, 0),
+    cls_sum = cls_sum - COALESCE(old.cls_max, 0), crs_sum = crs_sum - COALESCE(old.crs, 0),
+    high_cls = high_cls - COALESCE(old.cls_max > 15, 0), low_dqs = low_dqs - COALESCE(old.dqs < 0.50, 0)
+  WHERE project = old.project AND ts = old.ts;
+END;
+
+-- industry_feeds: ソースごとの件数と未分析数
+CREATE TABLE IF NOT EXISTS rollup_feeds (
+  source TEXT PRIMARY KEY,
+  feeds INTEGER NOT NULL DEFAULT 0,
+  unanalyzed INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS trg_rollup_feeds_ins AFTER INSERT ON industry_feeds BEGIN
+  INSERT INTO rollup_feeds(source, feeds, unanalyzed) VALUES (new.source, 1, new.analyzed IS NOT 1)
+  ON CONFLICT(source) DO UPDATE SET feeds = feeds + 1, unanalyzed = unanalyzed + excluded.unanalyzed;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_rollup_feeds_del AFTER DELETE ON industry_feeds BEGIN
+  UPDATE rollup_feeds SET feeds = feeds - 1, unanalyzed = unanalyzed - (old.analyzed IS NOT 1)
+  WHERE source = old.source;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_rollup_feeds_upd AFTER UPDATE OF source, analyzed ON industry_feeds BEGIN
+  UPDATE rollup_feeds SET feeds = feeds - 1, unanalyzed = unanalyzed - (old.analyzed IS NOT 1)
+  WHERE source = old.source;
+  INSERT INTO rollup_feeds(source, feeds, unanalyzed) VALUES (new.source, 1, new.analyzed IS NOT 1)
+  ON CONFLICT(source) DO UPDATE SET feeds = feeds + 1, unanalyzed = unanalyzed + excluded.unanalyzed;
+END;
+
+-- 全件数 (いまは feedback のみ)
+CREATE TABLE IF NOT EXISTS rollup_totals (
+  name TEXT PRIMARY KEY,
+  n INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS trg_rollup_feedback_ins AFTER INSERT ON feedback BEGIN
+  INSERT INTO rollup_totals(name, n) VALUES ('feedback', 1) ON CONFLICT(name) DO UPDATE SET n = n + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_rollup_feedback_del AFTER DELETE ON feedback BEGIN
+  UPDATE rollup_totals SET n = n - 1 WHERE name = 'feedback';
+END;
+
+-- 上位 N 件のランキングは索引を先頭から読むだけにする
+CREATE INDEX IF NOT EXISTS idx_solutions_success ON solutions(success_count DESC);
+CREATE INDEX IF NOT EXISTS idx_feedback_stability ON feedback(score * confirmation_count DESC);
+
+-- 既存データから作り直す (トリガーより前のデータ)
+DELETE FROM rollup_events_daily;
+INSERT INTO rollup_events_daily(day, project, type, events, resolved)
+  SELECT COALESCE(date(ts), ''), COALESCE(project, ''), COALESCE(type, ''), COUNT(*), SUM(resolved IS 1)
+  FROM events GROUP BY 1, 2, 3;
+DELETE FROM rollup_sessions_daily;
+INSERT INTO rollup_sessions_daily(day, project, sessions, errors_encountered, errors_resolved)
+  SELECT COALESCE(date(ts), ''), COALESCE(project, ''), COUNT(*),
+         SUM(COALESCE(errors_encountered, 0)), SUM(COALESCE(errors_resolved, 0))
+  FROM sessions GROUP BY 1, 2;
+DELETE FROM rollup_dev_daily;
+INSERT INTO rollup_dev_daily(day, project, sessions, passes, fails, dqs_delta_sum)
+  SELECT COALESCE(date(ts), ''), COALESCE(project, ''), COUNT(*), SUM(status IS 'pass'), SUM(status IS 'fail'),
+         SUM(COALESCE(dqs_delta, 0))
+  FROM dev_sessions GROUP BY 1, 2;
+DELETE FROM rollup_quality_runs;
+INSERT INTO rollup_quality_runs(project, ts, files, dqs_sum, dqs_min, dqs_max, cdi_sum, se_sum, cls_sum, crs_sum,
+                                high_cls, low_dqs)
+  SELECT project, ts, COUNT(*), SUM(COALESCE(dqs, 0)), MIN(dqs), MAX(dqs), SUM(COALESCE(cdi, 0)),
+         SUM(COALESCE(se, 0)), SUM(COALESCE(cls_max, 0)), SUM(COALESCE(crs, 0)),
+         SUM(COALESCE(cls_max > 15, 0)), SUM(COALESCE(dqs < 0.50, 0))
+  FROM quality_metrics GROUP BY project, ts;
+DELETE FROM rollup_feeds;
+INSERT INTO rollup_feeds(source, feeds, unanalyzed)
+  SELECT source, COUNT(*), SUM(analyzed IS NOT 1) FROM industry_feeds GROUP BY source;
+DELETE FROM rollup_totals WHERE name = 'feedback';
+INSERT INTO rollup_totals(name, n) SELECT 'feedback', COUNT(*) FROM feedback;
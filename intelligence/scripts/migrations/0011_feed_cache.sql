@@ -0,0 +1,13 @@
+-- fetch_sources.py の条件付き GET 用キャッシュ (ソースごとに1行)。
+-- etag / last_modified は次回の If-None-Match / If-Modified-Since に使い、304 なら本文を読まない。
+-- body_hash は前回パースした本文の sha256。検証子を返さないサーバーでも同じ本文ならパースを省く。
+-- url が変わったら検証子は使わない (別のページの ETag になるため)。
+CREATE TABLE IF NOT EXISTS feed_cache (
+  source TEXT PRIMARY KEY,
+  url TEXT NOT NULL,
+  etag TEXT,
+  last_modified TEXT,
+  body_hash TEXT,
+  checked_at TEXT,
+  changed_at TEXT
+);
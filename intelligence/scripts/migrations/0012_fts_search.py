@@ -0,0 +1,112 @@
+"""record-*.sh の lookup / search 用の FTS5 全文索引。元テーブルのテキスト列を写し、トリガーで同期する。
+
+要件・説明の文そのものを LIKE '%...%' で探していた (全件スキャンで、ほぼ一致しない) のを、
+fts.py が作る語の OR クエリと bm25 の順位で引く形に置き換える。
+
+tokenize='trigram': 日本語の文は空白で区切られないので、3文字単位で索引して部分一致で引く。
+trigram は SQLite 3.34 以降にしかないので、それより古い SQLite では unicode61 (空白・記号区切りの語) で作る
+(マイグレーションは全件1トランザクションなので、ここで失敗すると以降の移行がすべて戻ってしまう)。
+fts.py は索引の tokenize を見て MATCH 式を変える。
+外部コンテンツ (content=) ではなく本文も FTS 側に持つ。INSERT OR REPLACE などで元テーブルと
+ずれても、rowid 単位の置き換え・削除なので索引が壊れない。
+"""
+import sys
+
+from migrate import run_script
+
+TRIGRAM_SQLITE = (3, 34, 0)
+
+SQL = """
+-- feedback: record-dev-session.sh / record-bug-session.sh lookup
+CREATE VIRTUAL TABLE IF NOT EXISTS fts_feedback USING fts5(category, wrong_approach, correct_approach, tokenize='{tokenize}');
+CREATE TRIGGER IF NOT EXISTS trg_fts_feedback_ins AFTER INSERT ON feedback BEGIN
+  INSERT OR REPLACE INTO fts_feedback(rowid, category, wrong_approach, correct_approach)
+  VALUES (new.id, new.category, new.wrong_approach, new.correct_approach);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_fts_feedback_del AFTER DELETE ON feedback BEGIN
+  DELETE FROM fts_feedback WHERE rowid = old.id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_fts_feedback_upd AFTER UPDATE OF id, category, wrong_approach, correct_approach ON feedback BEGIN
+  DELETE FROM fts_feedback WHERE rowid = old.id;
+  INSERT OR REPLACE INTO fts_feedback(rowid, category, wrong_approach, correct_approach)
+  VALUES (new.id, new.category, new.wrong_approach, new.correct_approach);
+END;
+
+-- patterns: record-dev-session.sh lookup
+CREATE VIRTUAL TABLE IF NOT EXISTS fts_patterns USING fts5(pattern, solution, tokenize='{tokenize}');
+CREATE TRIGGER IF NOT EXISTS trg_fts_patterns_ins AFTER INSERT ON patterns BEGIN
+  INSERT OR REPLACE INTO fts_patterns(rowid, pattern, solution) VALUES (new.id, new.pattern, new.solution);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_fts_patterns_del AFTER DELETE ON patterns BEGIN
+  DELETE FROM fts_patterns WHERE rowid = old.id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_fts_patterns_upd AFTER UPDATE OF id, pattern, solution ON patterns BEGIN
+  DELETE FROM fts_patterns WHERE rowid = old.id;
+  INSERT OR REPLACE INTO fts_patterns(rowid, pattern, solution) VALUES (new.id, new.pattern, new.solution);
+END;
+
+-- questions: record-question.sh search / record-dev-session.sh lookup
+CREATE VIRTUAL TABLE IF NOT EXISTS fts_questions USING fts5(question, context, answer, tags, tokenize='{tokenize}');
+CREATE TRIGGER IF NOT EXISTS trg_fts_questions_ins AFTER INSERT ON questions BEGIN
+  INSERT OR REPLACE INTO fts_questions(rowid, question, context, answer, tags)
+  VALUES (new.id, new.question, new.context, new.answer, new.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_fts_questions_del AFTER DELETE ON questions BEGIN
+  DELETE FROM fts_questions WHERE rowid = old.id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_fts_questions_upd AFTER UPDATE OF id, question, context, answer, tags ON questions BEGIN
+  DELETE FROM fts_questions WHERE rowid = old.id;
+  INSERT OR REPLACE INTO fts_questions(rowid, question, context, answer, tags)
+  VALUES (new.id, new.question, new.context, new.answer, new.tags);
+END;
+
+-- dev_sessions: record-bug-session.sh lookup
+CREATE VIRTUAL TABLE IF NOT EXISTS fts_dev_sessions USING fts5(requirement, files_changed, tokenize='{tokenize}');
+CREATE TRIGGER IF NOT EXISTS trg_fts_dev_sessions_ins AFTER INSERT ON dev_sessions BEGIN
+  INSERT OR REPLACE INTO fts_dev_sessions(rowid, requirement, files_changed)
+  VALUES (new.id, new.requirement, new.files_changed);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_fts_dev_sessions_del AFTER DELETE ON dev_sessions BEGIN
+  DELETE FROM fts_dev_sessions WHERE rowid = old.id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_fts_dev_sessions_upd AFTER UPDATE OF id, requirement, files_changed ON dev_sessions BEGIN
+  DELETE FROM fts_dev_sessions WHERE rowid = old.id;
+  INSERT OR REPLACE INTO fts_dev_sessions(rowid, requirement, files_changed)
+  VALUES (new.id, new.requirement, new.files_changed);
+END;
+
+-- test_sessions: record-test-session.sh lookup
+CREATE VIRTUAL TABLE IF NOT EXISTS fts_test_sessions USING fts5(perspective, tokenize='{tokenize}');
+CREATE TRIGGER IF NOT EXISTS trg_fts_test_sessions_ins AFTER INSERT ON test_sessions BEGIN
+  INSERT OR REPLACE INTO fts_test_sessions(rowid, perspective) VALUES (new.id, new.perspective);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_fts_test_sessions_del AFTER DELETE ON test_sessions BEGIN
+  DELETE FROM fts_test_sessions WHERE rowid = old.id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_fts_test_sessions_upd AFTER UPDATE OF id, perspective ON test_sessions BEGIN
+  DELETE FROM fts_test_sessions WHERE rowid = old.id;
+  INSERT OR REPLACE INTO fts_test_sessions(rowid, perspective) VALUES (new.id, new.perspective);
+END;
+
+-- 既存の行を索引に入れる
+DELETE FROM fts_feedback;
+INSERT INTO fts_feedback(rowid, category, wrong_approach, correct_approach)
+  SELECT id, category, wrong_approach, correct_approach FROM feedback;
+DELETE FROM fts_patterns;
+INSERT INTO fts_patterns(rowid, pattern, solution) SELECT id, pattern, solution FROM patterns;
+DELETE FROM fts_questions;
+INSERT INTO fts_questions(rowid, question, context, answer, tags) SELECT id, question, context, answer, tags FROM questions;
+DELETE FROM fts_dev_sessions;
+INSERT INTO fts_dev_sessions(rowid, requirement, files_changed) SELECT id, requirement, files_changed FROM dev_sessions;
+DELETE FROM fts_test_sessions;
+INSERT INTO fts_test_sessions(rowid, perspective) SELECT id, perspective FROM test_sessions;
+"""
+
+
+def migrate(conn):
+    version = conn.execute("SELECT sqlite_version()").fetchone()[0]
+    tokenize = "trigram" if tuple(int(p) for p in version.split(".")) >= TRIGRAM_SQLITE else "unicode61"
+    if tokenize != "trigram":
+        print(f"SQLite {version} has no FTS5 trigram tokenizer (3.34+): fts_* indexes use unicode61 "
+              "(word prefix match, no substring match for Japanese)", file=sys.stderr)
+    run_script(conn, SQL.format(tokenize=tokenize))
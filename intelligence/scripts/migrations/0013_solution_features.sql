@@ -0,0 +1,35 @@
+-- similarity.py の hybrid ランカー (BM25 + 文字 trigram) 用の特徴量。refresh_index() が solution_terms と
+-- 同じタイミング (書き込み後のキュー処理) で計算して保存するので、検索時は読むだけ。
+--
+-- solution_features: solution ごとの文書長 (tokenize の語数、BM25 用) と、文字 trigram をハッシュした
+--   疎ベクトル (バケット番号 uint32 の昇順 + 重み float32 を連結した BLOB、L2 正規化済み)。
+-- solution_grams: バケット → solution の posting list (候補の絞り込み用)。
+-- solution_gram_df: バケットごとの文書頻度。solution_grams への追加・削除でトリガーが更新する。
+-- 既存の solutions は similarity.TOKENIZER_VERSION の更新で全件再インデックスされる。
+
+CREATE TABLE IF NOT EXISTS solution_features (
+  solution_id INTEGER PRIMARY KEY,
+  length INTEGER NOT NULL,
+  grams BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS solution_grams (
+  bucket INTEGER NOT NULL,
+  solution_id INTEGER NOT NULL,
+  PRIMARY KEY (bucket, solution_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_solution_grams_sid ON solution_grams(solution_id);
+CREATE TABLE IF NOT EXISTS solution_gram_df (
+  bucket INTEGER PRIMARY KEY,
+  df INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS trg_solution_grams_ins AFTER INSERT ON solution_grams BEGIN
+  INSERT INTO solution_gram_df(bucket, df) VALUES (new.bucket, 1)
+  ON CONFLICT(bucket) DO UPDATE SET df = df + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_solution_grams_del AFTER DELETE ON solution_grams BEGIN
+  UPDATE solution_gram_df SET df = df - 1 WHERE bucket = old.bucket;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_solutions_features_del AFTER DELETE ON solutions BEGIN
+  DELETE FROM solution_grams WHERE solution_id = old.id;
+  DELETE FROM solution_features WHERE solution_id = old.id;
+END;
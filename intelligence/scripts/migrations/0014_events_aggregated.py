@@ -0,0 +1,19 @@
+"""events.aggregated: aggregate.py が solutions に数えたイベントの印 (この端末だけの列、同期しない)。
+
+high-water mark (aggregate_meta.last_id) だけだと、sync で取り込んだ別端末のイベント (別端末が既に数えている) や
+sync.relocate_row で大きい id へ移したイベントを、id が mark より大きいというだけで数え直してしまう。
+pull で入った行 (sync_state.applying = '1') はトリガーで集計済みにする。
+既存の行は mark 以下を集計済みにする。
+"""
+from migrate import add_column
+
+
+def migrate(conn):
+    if add_column(conn, "events", "aggregated", "INTEGER NOT NULL DEFAULT 0"):
+        conn.execute("UPDATE events SET aggregated = 1 WHERE id <= COALESCE("
+                     "(SELECT last_id FROM aggregate_meta WHERE table_name = 'events'), 0)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_events_unaggregated ON events(id) WHERE aggregated = 0")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS trg_events_pulled AFTER INSERT ON events
+WHEN EXISTS (SELECT 1 FROM sync_state WHERE key = 'applying' AND value = '1') BEGIN
+  UPDATE events SET aggregated = 1 WHERE id = new.id;
+END""")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""DIS: エラーメッセージ正規化。aggregate / similarity / review で共通利用。
+
+パス・行番号・ハッシュ値・空白の置換はプリコンパイル済みパターンで処理し、
+同一エラーの再出現 (ビルドエラーは同じ文面が繰り返されやすい) は LRU キャッシュで返す。
+
+Usage:
+  normalize.py <error_text>       # 正規化結果を表示
+  normalize.py < errors.txt       # 1行1エラーとして一括正規化
+"""
+import hashlib
+import re
+import sys
+import threading
+from collections import OrderedDict
+
+MAX_LENGTH = 200
+CACHE_SIZE = 4096
+
+# 置換ルール (この順に適用): パス → 行:列 → "line N" → ハッシュ/UUID → 連続空白
+# 1本の交互パターンに結合すると CPython の re では位置ごとに全分岐を試すため逆に遅くなる
+# (bench_normalize.py 参照)。個別にプリコンパイルし、リテラルを含まない入力はスキップする。
+_PATH = re.compile(r"/[\w/.-]+\.(?:ts|tsx|js|jsx|py|rs|go)")
+_LINECOL = re.compile(r":\d+:\d+")
+_LINENO = re.compile(r"line \d+", re.IGNORECASE)
+_HASH = re.compile(r"[0-9a-f]{8,}")
+_SPACE = re.compile(r"\s+")
+
+
+def _normalize(error: str) -> str:
+    s = error
+    if "/" in s:
+        s = _PATH.sub("<path>", s)
+    if ":" in s:
+        s = _LINECOL.sub(":<line>", s)
+    s = _LINENO.sub("line <n>", s)
+    s = _HASH.sub("<hash>", s)
+    return _SPACE.sub(" ", s).strip()
+
+
+# raw エラー本文のダイジェスト → 正規化結果 (長さ制限前)。
+# デーモンの drain スレッドや sync のワーカーからも呼ばれるので、_cache / _stats の操作は _lock の中で行う
+_cache: "OrderedDict[bytes, str]" = OrderedDict()
+_stats = {"hits": 0, "misses": 0}
+_lock = threading.Lock()
+
+
+def _digest(error: str) -> bytes:
+    return hashlib.blake2b(error.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+def _cached(error: str) -> str:
+    key = _digest(error)
+    with _lock:
+        hit = _cache.get(key)
+        if hit is not None:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+            return hit
+        _stats["misses"] += 1
+    result = _normalize(error)  # 正規化はロックの外 (同じ本文を2スレッドが同時に処理しても結果は同じ)
+    with _lock:
+        _cache[key] = result
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def normalize_error(error: str, max_length: int | None = MAX_LENGTH) -> str:
+    """エラーメッセージからパス・行番号・一時的な値を除去して正規化。
+
+    max_length=None なら長さ制限なし (トークナイズ用)。
+    """
+    if not error:
+        return ""
+    s = _cached(error)
+    return s if max_length is None else s[:max_length]
+
+
+def normalize_many(errors: list[str], max_length: int | None = MAX_LENGTH) -> list[str]:
+    """複数エラーを一括正規化。バッチ内の重複は1回だけ処理する。"""
+    seen: dict[str, str] = {}
+    out = []
+    for e in errors:
+        r = seen.get(e)
+        if r is None:
+            r = seen[e] = normalize_error(e, max_length)
+        out.append(r)
+    return out
+
+
+def cache_info() -> dict:
+    with _lock:
+        return {"hits": _stats["hits"], "misses": _stats["misses"], "size": len(_cache), "max_size": CACHE_SIZE}
+
+
+def cache_clear():
+    with _lock:
+        _cache.clear()
+        _stats["hits"] = _stats["misses"] = 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        print(normalize_error(" ".join(sys.argv[1:])))
+    else:
+        for line in normalize_many(sys.stdin.read().splitlines()):
+            print(line)
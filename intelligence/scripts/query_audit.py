@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""DIS: スクリプト・スキルが dev.db に投げるクエリの EXPLAIN QUERY PLAN 監査。
+
+QUERIES に集めたクエリを1本ずつ EXPLAIN QUERY PLAN にかけ、全件スキャン ("SCAN table"。
+索引を頭から全部読む "SCAN table USING INDEX" も含む) を報告する。LIKE '%...%' や全件集計など、索引では
+避けられないものは QUERIES 側に理由を書いて許容する。許容外の全件スキャンがあれば終了コード 1。
+
+--db を省略すると合成 DB (synth_db.py、--rows 行) を一時ディレクトリに作って監査する。
+--compare は合成 DB をまず --baseline 番のスキーマ (既定は 0009_query_indexes の直前) で作って計測し、
+残りのマイグレーションを適用して同じクエリを計測し直す。
+
+DELETE / UPSERT は同じ WHERE の SELECT で代用する (計測で DB を書き換えないため)。
+プランは ANALYZE の統計で変わる (数十行のテーブルでは索引より全件を選ぶ) ので、合成 DB は十分な行数で作る。
+
+Usage:
+  query_audit.py [--db PATH] [--project NAME] [--verbose] [--json]
+  query_audit.py [--rows 100000] [--repeat 5] [--verbose] [--json]
+  query_audit.py --compare [--rows 100000] [--baseline 8] [--repeat 5] [--json]
+"""
+import json
+import os
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import dis_db
+import migrate
+import synth_db
+
+# 0009_query_indexes を適用する前のスキーマ
+BASELINE_VERSION = 8
+
+_LIKE = "LIKE '%...%' は索引を使えない"
+_ALL = "全件の集計・並べ替え (レポート用)"
+# record-*.sh の FTS5 検索 (fts.py が作る形の MATCH 式)
+_MATCH = '"render" OR "hook" OR "ーザー"'
+
+# (出典, SQL, パラメータ, 全件スキャンを許容する理由)
+# パラメータの "{project}" / "{cutoff}" / "{day}" は実行時に置き換える
+QUERIES = [
+    # ── hooks ──
+    ("capture-session.sh errors_total",
+     "SELECT COUNT(*) FROM events WHERE project = ? AND ts >= datetime('now', '-4 hours')",
+     ("{project}",), None),
+    ("capture-session.sh errors_resolved",
+     "SELECT COUNT(*) FROM events WHERE project = ? AND resolved = 1 AND ts >= datetime('now', '-4 hours')",
+     ("{project}",), None),
+
+    # ── aggregate.py ──
+    ("aggregate chunk",
+     "SELECT id, error, project FROM events WHERE id > ? ORDER BY id LIMIT 5000", (0,), None),
+    ("aggregate upsert (ON CONFLICT)",
+     "SELECT id FROM solutions WHERE error_pattern = ? AND project = ?", ("module not found", "{project}"), None),
+    ("aggregate promote_feedback",
+     "SELECT id, category, wrong_approach, correct_approach, project, scope, score, confirmation_count "
+     "FROM feedback WHERE score * confirmation_count >= 4", (), "式 (score * confirmation_count) の条件"),
+    ("aggregate promote_feedback (patterns)",
+     "SELECT id FROM patterns WHERE pattern = ?", ("[style] a → b",), None),
+
+    # ── self-improve.py ──
+    ("self-improve reward (test)",
+     "SELECT AVG(CASE WHEN status IN ('pass','fixed') THEN 1.0 ELSE 0.0 END) FROM test_sessions WHERE project = ?",
+     ("{project}",), None),
+    ("self-improve reward (history)",
+     "SELECT COUNT(*), SUM(CASE WHEN status='pass' THEN 1 ELSE 0 END) "
+     "FROM dev_sessions WHERE project = ? AND id < ? AND status != 'running'", ("{project}", 10 ** 9), None),
+    ("self-improve trend (daily DQS)",
+     "SELECT ts, AVG(dqs), COUNT(*), MIN(dqs), MAX(dqs) FROM quality_metrics WHERE project = ? AND ts >= ? "
+     "GROUP BY date(ts) ORDER BY ts", ("{project}", "{cutoff}"), None),
+    ("self-improve trend (dev_sessions)",
+     "SELECT COUNT(*), SUM(CASE WHEN status='pass' THEN 1 ELSE 0 END), "
+     "SUM(CASE WHEN status='fail' THEN 1 ELSE 0 END), AVG(dqs_delta), AVG(score) "
+     "FROM dev_sessions WHERE project = ? AND ts >= ?", ("{project}", "{cutoff}"), None),
+    ("self-improve trend (worst files)",
+     "SELECT file, dqs, cdi, se, cls_max, crs FROM quality_metrics WHERE project = ? "
+     "AND ts = (SELECT MAX(ts) FROM quality_metrics WHERE project = ?) ORDER BY dqs ASC LIMIT 5",
+     ("{project}", "{project}"), None),
+    ("self-improve suggest (split)",
+     "SELECT DISTINCT file, cls_max, metrics_json FROM quality_metrics WHERE project = ? AND cls_max > ? "
+     "AND ts = (SELECT MAX(ts) FROM quality_metrics WHERE project = ?) ORDER BY cls_max DESC LIMIT 10",
+     ("{project}", 15, "{project}"), None),
+    ("self-improve suggest (cohesion)",
+     "SELECT DISTINCT file, cdi, loc FROM quality_metrics WHERE project = ? AND cdi < 0.4 "
+     "AND ts = (SELECT MAX(ts) FROM quality_metrics WHERE project = ?) ORDER BY cdi ASC LIMIT 10",
+     ("{project}", "{project}"), None),
+    ("self-improve suggest (entropy)",
+     "SELECT DISTINCT file, se FROM quality_metrics WHERE project = ? AND se > 5.0 "
+     "AND ts = (SELECT MAX(ts) FROM quality_metrics WHERE project = ?) ORDER BY se DESC LIMIT 10",
+     ("{project}", "{project}"), None),
+    ("self-improve suggest (coupling)",
+     "SELECT DISTINCT file, crs FROM quality_metrics WHERE project = ? AND crs > 1.0 "
+     "AND ts = (SELECT MAX(ts) FROM quality_metrics WHERE project = ?) ORDER BY crs DESC LIMIT 10",
+     ("{project}", "{project}"), None),
+    ("self-improve suggest (low DQS)",
+     "SELECT DISTINCT file, dqs FROM quality_metrics WHERE project = ? AND dqs < 0.50 "
+     "AND ts = (SELECT MAX(ts) FROM quality_metrics WHERE project = ?) ORDER BY dqs ASC LIMIT 5",
+     ("{project}", "{project}"), None),
+
+    # ── measure-quality.py (DRS) ──
+    ("measure-quality DRS (test)",
+     "SELECT COUNT(*), SUM(CASE WHEN status IN ('pass','fixed') THEN 1 ELSE 0 END) "
+     "FROM test_sessions WHERE project = ? AND ts >= datetime('now','-90 days')", ("{project}",), None),
+    ("measure-quality DRS (review)",
+     "SELECT AVG(final_score) FROM review_sessions "
+     "WHERE project = ? AND final_score IS NOT NULL AND ts >= datetime('now','-90 days')", ("{project}",), None),
+    ("measure-quality DRS (dev)",
+     "SELECT COUNT(*), SUM(CASE WHEN status='pass' THEN 1 ELSE 0 END) "
+     "FROM dev_sessions WHERE project = ? AND ts >= datetime('now','-90 days')", ("{project}",), None),
+    ("measure-quality DRS cache",
+     "SELECT drs FROM drs_cache WHERE project = ? AND computed_at >= ?", ("{project}", 0), None),
+
+    # ── report.py (rollup_* から読む) ──
+    ("report events by type",
+     "SELECT type, SUM(events) FROM rollup_events_daily WHERE day >= ? "
+     "GROUP BY type HAVING SUM(events) > 0 ORDER BY SUM(events) DESC", ("{day}",), None),
+    ("report top patterns",
+     "SELECT error_pattern, success_count, score, project FROM solutions ORDER BY success_count DESC LIMIT 5",
+     (), None),
+    ("report sessions",
+     "SELECT SUM(sessions), SUM(errors_encountered), SUM(errors_resolved) FROM rollup_sessions_daily WHERE day >= ?",
+     ("{day}",), None),
+    ("report promotion candidates",
+     "SELECT error_pattern, success_count, score, project FROM solutions "
+     "WHERE score >= 3.0 AND success_count >= 3 ORDER BY score DESC LIMIT 10", (), None),
+    ("report feedback total",
+     "SELECT n FROM rollup_totals WHERE name = 'feedback'", (), None),
+    ("report feedback stability",
+     "SELECT category, wrong_approach, correct_approach, score, confirmation_count, score * confirmation_count "
+     "FROM feedback ORDER BY score * confirmation_count DESC LIMIT 5", (), None),
+    ("report feeds",
+     "SELECT source, feeds, unanalyzed FROM rollup_feeds WHERE feeds > 0 ORDER BY feeds DESC", (),
+     "ソース数だけの小さな集計テーブル"),
+    ("report DQS dashboard",
+     "SELECT project, MAX(files), SUM(dqs_sum) / SUM(files), MIN(dqs_min), MAX(dqs_max), SUM(cdi_sum) / SUM(files), "
+     "SUM(se_sum) / SUM(files), SUM(cls_sum) / SUM(files), SUM(crs_sum) / SUM(files) FROM rollup_quality_runs "
+     "WHERE ts >= ? AND files > 0 GROUP BY project ORDER BY SUM(dqs_sum) / SUM(files)", ("{day}",), None),
+    ("report dev trend",
+     "SELECT project, SUM(sessions), SUM(dqs_delta_sum) / SUM(sessions), SUM(passes), SUM(fails) "
+     "FROM rollup_dev_daily WHERE day >= ? GROUP BY project HAVING SUM(sessions) > 0", ("{day}",), None),
+    ("report alerts",
+     "SELECT SUM(high_cls), SUM(low_dqs) FROM rollup_quality_runs "
+     "WHERE ts = (SELECT MAX(ts) FROM rollup_quality_runs)", (), None),
+
+    # ── fetch_sources.py / ingest.py / similarity.py ──
+    ("fetch_sources prune (DELETE)",
+     "SELECT id FROM industry_feeds WHERE analyzed = 1 AND ts < datetime('now', '-90 days')", (), None),
+    ("ingest drained check",
+     "SELECT 1 FROM ingest_drained WHERE name = ?", ("events.1.1.draining",), None),
+    ("similarity candidates",
+     "SELECT DISTINCT solution_id FROM solution_terms WHERE term IN (?, ?, ?)", ("module", "found", "cannot"), None),
+    ("similarity hybrid candidates (grams)",
+     "SELECT solution_id FROM solution_grams WHERE bucket IN (?, ?, ?) "
+     "GROUP BY solution_id ORDER BY COUNT(*) DESC, solution_id LIMIT ?", (1, 2, 3, 200), None),
+    ("similarity hybrid features",
+     "SELECT solution_id, length, grams FROM solution_features WHERE solution_id IN (?, ?)", (1, 2), None),
+
+    # ── record-*.sh ──
+    ("record-test-session.sh complete",
+     "SELECT id FROM solutions WHERE error_pattern = ? LIMIT 1", ("module not found",), None),
+    ("record-test-session.sh lookup",
+     "SELECT t.id, t.perspective, t.test_type, t.status, t.iterations, t.score, t.error_pattern, t.fix_history "
+     "FROM fts_test_sessions JOIN test_sessions t ON t.id = fts_test_sessions.rowid "
+     "WHERE fts_test_sessions MATCH ? AND t.project = ? AND t.status IN ('pass', 'fixed', 'fail') "
+     "ORDER BY bm25(fts_test_sessions) * (1.0 + MIN(MAX(t.score, 0), 4) / 4.0), t.ts DESC LIMIT 5",
+     (_MATCH, "{project}"), None),
+    ("record-dev-session.sh lookup (dev)",
+     "SELECT id, requirement, status, score, files_changed, test_status, review_score_final, duration_seconds "
+     "FROM dev_sessions WHERE project = ? AND status IN ('pass', 'fixed', 'fail') ORDER BY score DESC, ts DESC LIMIT 5",
+     ("{project}",), None),
+    ("record-dev-session.sh lookup (feedback)",
+     "SELECT f.id, f.category, f.wrong_approach, f.correct_approach, f.score "
+     "FROM fts_feedback JOIN feedback f ON f.id = fts_feedback.rowid WHERE fts_feedback MATCH ? AND f.score > 0.5 "
+     "ORDER BY bm25(fts_feedback) * (1.0 + MIN(MAX(f.score, 0), 4) / 4.0) LIMIT 5", (_MATCH,), None),
+    ("record-dev-session.sh lookup (patterns)",
+     "SELECT p.id, p.pattern, p.solution, p.score "
+     "FROM fts_patterns JOIN patterns p ON p.id = fts_patterns.rowid WHERE fts_patterns MATCH ? AND p.score > 0.5 "
+     "ORDER BY bm25(fts_patterns) * (1.0 + MIN(MAX(p.score, 0), 4) / 4.0) LIMIT 5", (_MATCH,), None),
+    ("record-dev-session.sh lookup (questions)",
+     "SELECT q.id, q.question, q.answer, q.status, q.score "
+     "FROM fts_questions JOIN questions q ON q.id = fts_questions.rowid WHERE fts_questions MATCH ? AND q.score > 0.5 "
+     "ORDER BY bm25(fts_questions) * (1.0 + MIN(MAX(q.score, 0), 4) / 4.0) LIMIT 5", (_MATCH,), None),
+    ("record-bug-session.sh lookup (bugs)",
+     "SELECT id, description, status, score, severity, bug_category, root_cause, root_cause_file, fix_description, "
+     "prevention_suggestion FROM bug_sessions WHERE project = ? "
+     "AND status IN ('fixed', 'fixed_unverified', 'diagnosed', 'workaround', 'fail') ORDER BY score DESC, ts DESC LIMIT 5",
+     ("{project}",), None),
+    ("record-bug-session.sh lookup (feedback)",
+     "SELECT id, category, wrong_approach, correct_approach, score FROM ("
+     "SELECT f.id, f.category, f.wrong_approach, f.correct_approach, f.score, "
+     "bm25(fts_feedback) * (1.0 + MIN(MAX(f.score, 0), 4) / 4.0) AS relevance "
+     "FROM fts_feedback JOIN feedback f ON f.id = fts_feedback.rowid WHERE fts_feedback MATCH ? AND f.score > 0.5 "
+     "UNION ALL SELECT * FROM (SELECT id, category, wrong_approach, correct_approach, score, 0 AS relevance "
+     "FROM feedback WHERE category = 'bug_prevention' AND score > 0.5 ORDER BY score DESC LIMIT 5)) "
+     "GROUP BY id ORDER BY MIN(relevance), score DESC LIMIT 5", (_MATCH,), None),
+    ("record-bug-session.sh lookup (dev)",
+     "SELECT d.id, d.requirement, d.status, d.score, d.files_changed "
+     "FROM fts_dev_sessions JOIN dev_sessions d ON d.id = fts_dev_sessions.rowid "
+     "WHERE fts_dev_sessions MATCH ? AND d.project = ? "
+     "ORDER BY bm25(fts_dev_sessions) * (1.0 + MIN(MAX(d.score, 0), 4) / 4.0), d.ts DESC LIMIT 5",
+     (_MATCH, "{project}"), None),
+    ("record-bug-session.sh lookup (events)",
+     "SELECT id, type, error, cwd FROM events WHERE project = ? AND error IS NOT NULL AND error != '' "
+     "ORDER BY ts DESC LIMIT 5", ("{project}",), None),
+    ("record-question.sh add",
+     "SELECT id, score FROM questions WHERE question = ? AND project = ? LIMIT 1", ("why?", "{project}"), None),
+    ("record-question.sh search",
+     "SELECT q.id, q.question, q.answer, q.status, q.tags, q.score, q.project, q.ts "
+     "FROM fts_questions JOIN questions q ON q.id = fts_questions.rowid WHERE fts_questions MATCH ? "
+     "ORDER BY bm25(fts_questions) * (1.0 + MIN(MAX(q.score, 0), 4) / 4.0), q.ts DESC LIMIT 10",
+     (_MATCH,), None),
+    ("record-feedback.sh",
+     "SELECT id, score, confirmation_count FROM feedback "
+     "WHERE wrong_approach = ? AND correct_approach = ? AND project = ? LIMIT 1", ("a", "b", "{project}"), None),
+
+    # ── skills ──
+    ("industry-check skill",
+     "SELECT id, source, title, url, summary FROM industry_feeds WHERE analyzed = 0 ORDER BY ts DESC LIMIT 20",
+     (), None),
+    ("que skill (open)",
+     "SELECT id, question, status, score, project, ts FROM questions WHERE status = 'open' "
+     "ORDER BY score DESC, ts DESC LIMIT 20", (), None),
+    ("que skill (recent)",
+     "SELECT id, question, answer, status, score, project, ts FROM questions ORDER BY ts DESC LIMIT 30", (), None),
+    ("kb-lookup skill",
+     "SELECT error_pattern, solution, score FROM solutions WHERE error_pattern LIKE ? ORDER BY score DESC LIMIT 5",
+     ("%module%",), _LIKE),
+    ("kb-maintain skill (promote solutions)",
+     "SELECT error_pattern, solution, success_count, score * 1.5, last_used FROM solutions "
+     "WHERE score >= 3.0 AND success_count >= 3 AND error_pattern NOT IN (SELECT pattern FROM patterns)", (), None),
+    ("kb-maintain skill (promote patterns)",
+     "SELECT pattern, description, solution, score, frequency FROM patterns "
+     "WHERE score >= 5.0 AND frequency >= 5 AND promoted_to_memory = 0", (), None),
+    ("review skill",
+     "SELECT pattern, solution FROM patterns WHERE score >= 2.0 ORDER BY score DESC LIMIT 10", (), None),
+]
+
+
+def _bind(params: tuple, project: str, cutoff: str) -> tuple:
+    values = {"{project}": project, "{cutoff}": cutoff, "{day}": cutoff[:10]}
+    return tuple(values.get(p, p) if isinstance(p, str) else p for p in params)
+
+
+def plan(conn: sqlite3.Connection, sql: str, params: tuple) -> list[str]:
+    """EXPLAIN QUERY PLAN の detail を木構造のインデント付きで返す。"""
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    depth = {0: -1}
+    out = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        out.append("  " * depth[node] + detail)
+    return out
+
+
+_FTS_MATCH = re.compile(r"VIRTUAL TABLE INDEX \d+:M")
+
+
+def full_scans(sql: str, details: list[str]) -> list[str]:
+    """全行 (または索引の全エントリ) を読むテーブル。
+
+    "SCAN t" だけでなく "SCAN t USING [COVERING] INDEX i" も索引を頭から全部読むので数える。
+    ただし LIMIT 付きで並べ替え (TEMP B-TREE FOR ORDER BY) がなければ、索引順に読んで途中で止まるので除く。
+    FTS5 の MATCH ("SCAN fts VIRTUAL TABLE INDEX n:M...") は全文索引を引き、
+    "SCAN (subquery-N)" はサブクエリの結果を読むだけなので数えない。
+    """
+    stops_early = " LIMIT " in sql.upper() and not any("TEMP B-TREE FOR ORDER BY" in d for d in details)
+    scans = []
+    for d in details:
+        d = d.strip()
+        if not d.startswith("SCAN ") or "CONSTANT ROW" in d or _FTS_MATCH.search(d) or d[5:].startswith("("):
+            continue
+        if " USING " in d and stops_early:
+            continue
+        scans.append(d.split()[1] if d.split()[1] != "TABLE" else d.split()[2])
+    return scans
+
+
+def time_query(conn: sqlite3.Connection, sql: str, params: tuple, repeat: int) -> float:
+    """1回空打ちしてから repeat 回実行した中央値 (ms)。"""
+    conn.execute(sql, params).fetchall()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def audit(conn: sqlite3.Connection, project: str, repeat: int = 5) -> list[dict]:
+    cutoff = (datetime.utcnow() - timedelta(days=30)).strftime("%Y-%m-%d %H:%M:%S")
+    results = []
+    for source, sql, params, allowed in QUERIES:
+        bound = _bind(params, project, cutoff)
+        try:
+            details = plan(conn, sql, bound)
+        except sqlite3.OperationalError as e:
+            # --compare の移行前スキーマには後から追加したテーブルがない
+            results.append({"source": source, "error": str(e), "plan": [], "full_scans": [], "temp_btree": False,
+                            "allowed": allowed, "ms": None})
+            continue
+        results.append({
+            "source": source,
+            "plan": details,
+            "full_scans": full_scans(sql, details),
+            "temp_btree": any("TEMP B-TREE" in d for d in details),
+            "allowed": allowed,
+            "ms": round(time_query(conn, sql, bound, repeat), 3) if repeat else None,
+        })
+    return results
+
+
+def unexpected(results: list[dict]) -> list[dict]:
+    return [r for r in results if r["full_scans"] and not r["allowed"]]
+
+
+def _default_project(conn: sqlite3.Connection) -> str:
+    row = conn.execute("SELECT project FROM events WHERE project IS NOT NULL "
+                       "GROUP BY project ORDER BY COUNT(*) DESC LIMIT 1").fetchone()
+    return row[0] if row else ""
+
+
+def compare(path: str, rows: int, baseline: int, repeat: int) -> list[dict]:
+    """baseline のスキーマで計測 → 残りのマイグレーションを適用 → 再計測。"""
+    synth_db.generate(path, rows, target=baseline)
+    conn = dis_db.connect(path)
+    before = audit(conn, synth_db.PROJECTS[0], repeat)
+    migrate.apply(conn)
+    conn.execute("ANALYZE")
+    after = audit(conn, synth_db.PROJECTS[0], repeat)
+    conn.close()
+    return [{"source": b["source"], "before": b, "after": a} for b, a in zip(before, after)]
+
+
+# ── 表示 ──────────────────────────────────
+
+
+def _status(r: dict) -> str:
+    if not r["full_scans"]:
+        return "ok"
+    return "scan (allowed)" if r["allowed"] else "FULL SCAN"
+
+
+def print_audit(results: list[dict], verbose: bool):
+    for r in results:
+        if "error" in r:
+            print(f"  {'ERROR':<15} {'':>11}  {r['source']}: {r['error']}")
+            continue
+        status = _status(r)
+        ms = f"{r['ms']:9.3f}ms" if r["ms"] is not None else ""
+        print(f"  {status:<15} {ms}  {r['source']}")
+        if verbose or status == "FULL SCAN":
+            for d in r["plan"]:
+                print(f"      {d}")
+        if r["allowed"] and r["full_scans"]:
+            print(f"      ({r['allowed']})")
+    bad = unexpected(results)
+    print(f"\n{len(results)} queries, {len(bad)} unexpected full scans, "
+          f"{sum(r['temp_btree'] for r in results)} with temp b-tree")
+
+
+def print_compare(rows: list[dict]):
+    total_b = total_a = 0.0
+    print(f"  {'before':>10} {'after':>10} {'speedup':>8}  query")
+    for r in rows:
+        b, a = r["before"], r["after"]
+        if b["ms"] is None or a["ms"] is None:
+            before = "n/a" if b["ms"] is None else f"{b['ms']:.3f}ms"
+            after = "n/a" if a["ms"] is None else f"{a['ms']:.3f}ms"
+            print(f"  {before:>10} {after:>10} {'':>8}  {r['source']}")
+            continue
+        total_b += b["ms"]
+        total_a += a["ms"]
+        speedup = b["ms"] / a["ms"] if a["ms"] else float("inf")
+        mark = " *" if b["plan"] != a["plan"] else ""
+        print(f"  {b['ms']:8.3f}ms {a['ms']:8.3f}ms {speedup:7.1f}x  {r['source']}{mark}")
+        if b["full_scans"] and not b["allowed"]:
+            print(f"      before: {' / '.join(d.strip() for d in b['plan'])}")
+            print(f"      after:  {' / '.join(d.strip() for d in a['plan'])}")
+    print(f"  {total_b:8.3f}ms {total_a:8.3f}ms {total_b / total_a if total_a else 0:7.1f}x  total")
+    print("  (* = plan changed)")
+    print(f"\nunexpected full scans: before {len(unexpected([r['before'] for r in rows]))}, "
+          f"after {len(unexpected([r['after'] for r in rows]))}")
+
+
+def main() -> int:
+    args = sys.argv[1:]
+    rows = int(args[args.index("--rows") + 1]) if "--rows" in args else 100000
+    repeat = int(args[args.index("--repeat") + 1]) if "--repeat" in args else 5
+    as_json = "--json" in args
+
+    if "--compare" in args:
+        baseline = int(args[args.index("--baseline") + 1]) if "--baseline" in args else BASELINE_VERSION
+        with tempfile.TemporaryDirectory() as tmp:
+            result = compare(os.path.join(tmp, "synth.db"), rows, baseline, repeat)
+        after = [r["after"] for r in result]
+        if as_json:
+            print(json.dumps({"rows": rows, "baseline": baseline, "latest": migrate.latest_version(),
+                              "queries": result}, indent=2, ensure_ascii=False))
+        else:
+            print(f"query audit: synthetic DB ({rows:,} events), schema v{baseline} → v{migrate.latest_version()}, "
+                  f"median of {repeat}")
+            print_compare(result)
+        return 1 if unexpected(after) else 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if "--db" in args:
+            path = args[args.index("--db") + 1]
+            if not os.path.exists(path):
+                print(f"{path} not found")
+                return 1
+            conn = migrate.ensure(dis_db.connect(path))
+        else:
+            path = os.path.join(tmp, "synth.db")
+            synth_db.generate(path, rows)
+            conn = dis_db.connect(path)
+        project = args[args.index("--project") + 1] if "--project" in args else _default_project(conn)
+        results = audit(conn, project, repeat)
+        conn.close()
+
+    if as_json:
+        print(json.dumps({"db": path, "project": project, "queries": results}, indent=2, ensure_ascii=False))
+    else:
+        print(f"query audit: {path} (project={project!r}), median of {repeat}")
+        print_audit(results, "--verbose" in args)
+    return 1 if unexpected(results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,8 @@
 set -euo pipefail
 
 DB="$HOME/.claude/intelligence/dev.db"
+# 他の DIS プロセスが書き込み中ならロック解除を待つ (dev.db の WAL 化は dis_db.py が行う)
+sqlite3() { command sqlite3 -cmd ".timeout 5000" "$@"; }
 CMD="${1:?Usage: record-bug-session.sh <start|update-phase|complete|lookup> ...}"
 shift
 
@@ -139,7 +141,12 @@ case "$CMD" in
             '$(esc "$project")',
             1.0,
             datetime('now')
-          );" 2>/dev/null || true
+          )
+          ON CONFLICT(error_pattern, project) DO UPDATE SET
+            solution = excluded.solution,
+            files = excluded.files,
+            success_count = success_count + 1,
+            last_used = excluded.last_used;" 2>/dev/null || true
       fi
 
       # solutions UPDATE: 参照したsolutionのsuccess_count加算
@@ -182,35 +189,47 @@ case "$CMD" in
       ORDER BY score DESC, ts DESC
       LIMIT 5;")
 
-    # 2) similarity.py でsolutions検索
-    similar_solutions=$(python3 -c "
-import sys
-sys.path.insert(0, '$HOME/.claude/intelligence/scripts')
-from similarity import find_similar
-import json
-results = find_similar('$(esc "$description")', threshold=0.3, limit=5)
-print(json.dumps(results))
-" 2>/dev/null || echo "[]")
-
-    # 3) feedback テーブルから関連検索
-    related_feedback=$(json_or_empty "SELECT id, category, wrong_approach, correct_approach, score
-      FROM feedback
-      WHERE (wrong_approach LIKE '%$(esc "$description")%'
-        OR correct_approach LIKE '%$(esc "$description")%'
-        OR category LIKE '%$(esc "$description")%'
-        OR category = 'bug_prevention')
-        AND score > 0.5
-      ORDER BY score DESC
+    # 2) similarity.py でsolutions検索 (dis_daemon.py 経由、未起動ならプロセス内)
+    similar_solutions=$(python3 -S "$HOME/.claude/intelligence/scripts/dis_daemon.py" similar \
+      --threshold 0.3 --limit 5 "$description" 2>/dev/null || echo "[]")
+
+    # 3)〜4) は FTS5 索引 (fts_*) を bm25 × score の順で引く。fts.py が索引ごとの MATCH 式を作る (dis_daemon.py が起動していればそこで)
+    { read -r m_feedback; read -r m_dev; } < <(
+      python3 -S "$HOME/.claude/intelligence/scripts/dis_daemon.py" match \
+        --tables fts_feedback,fts_dev_sessions "$description" 2>/dev/null) || true
+
+    # 3) feedback テーブルから関連検索 (一致した行の後に bug_prevention の上位を並べる)
+    matched_feedback=""
+    if [ -n "$m_feedback" ]; then
+      matched_feedback="SELECT f.id, f.category, f.wrong_approach, f.correct_approach, f.score,
+          bm25(fts_feedback) * (1.0 + MIN(MAX(f.score, 0), 4) / 4.0) AS relevance
+        FROM fts_feedback JOIN feedback f ON f.id = fts_feedback.rowid
+        WHERE fts_feedback MATCH '$(esc "$m_feedback")'
+          AND f.score > 0.5
+        UNION ALL"
+    fi
+    related_feedback=$(json_or_empty "SELECT id, category, wrong_approach, correct_approach, score FROM (
+        $matched_feedback
+        SELECT * FROM (SELECT id, category, wrong_approach, correct_approach, score, 0 AS relevance
+          FROM feedback
+          WHERE category = 'bug_prevention'
+            AND score > 0.5
+          ORDER BY score DESC
+          LIMIT 5))
+      GROUP BY id
+      ORDER BY MIN(relevance), score DESC
       LIMIT 5;")
 
     # 4) dev_sessions テーブルから関連検索
-    related_dev=$(json_or_empty "SELECT id, requirement, status, score, files_changed
-      FROM dev_sessions
-      WHERE project = '$(esc "$project")'
-        AND (requirement LIKE '%$(esc "$description")%'
-          OR files_changed LIKE '%$(esc "$description")%')
-      ORDER BY score DESC, ts DESC
-      LIMIT 5;")
+    related_dev="[]"
+    if [ -n "$m_dev" ]; then
+      related_dev=$(json_or_empty "SELECT d.id, d.requirement, d.status, d.score, d.files_changed
+        FROM fts_dev_sessions JOIN dev_sessions d ON d.id = fts_dev_sessions.rowid
+        WHERE fts_dev_sessions MATCH '$(esc "$m_dev")'
+          AND d.project = '$(esc "$project")'
+        ORDER BY bm25(fts_dev_sessions) * (1.0 + MIN(MAX(d.score, 0), 4) / 4.0), d.ts DESC
+        LIMIT 5;")
+    fi
 
     # 5) events テーブルから最近のエラー
     recent_events=$(json_or_empty "SELECT id, type, error, cwd
@@ -4,10 +4,12 @@
 #   record-dev-session.sh start <project> <requirement>
 #   record-dev-session.sh update-phase <id> <phase> [files_changed_json] [lines_added] [lines_removed]
 #   record-dev-session.sh complete <id> <status> [files_changed_json] [lines_added] [lines_removed] [test_session_id] [test_status] [review_score_initial] [review_score_final] [review_iterations] [dis_solutions_json] [dis_feedback_json] [dis_patterns_json] [new_feedback_json] [duration_seconds]
-#   record-dev-session.sh lookup <project> <requirement>
+#   record-dev-session.sh lookup <project> <requirement> [--archive]   # --archive: dev-archive.db に退避した分も引く
 set -euo pipefail
 
 DB="$HOME/.claude/intelligence/dev.db"
+# 他の DIS プロセスが書き込み中ならロック解除を待つ (dev.db の WAL 化は dis_db.py が行う)
+sqlite3() { command sqlite3 -cmd ".timeout 5000" "$@"; }
 CMD="${1:?Usage: record-dev-session.sh <start|update-phase|complete|lookup> ...}"
 shift
 
@@ -147,7 +149,13 @@ conn.close()
     ;;
 
   lookup)
-    project="${1:?lookup: <project> <requirement>}"
+    archive_flag=""
+    args=()
+    for a in "$@"; do
+      if [ "$a" = "--archive" ]; then archive_flag="--archive"; else args+=("$a"); fi
+    done
+    set -- ${args[@]+"${args[@]}"}
+    project="${1:?lookup: <project> <requirement> [--archive]}"
     requirement="${2:?}"
 
     # Helper: sqlite3 -json が空結果時に [] を返すようにする
@@ -161,56 +169,69 @@ conn.close()
       ORDER BY score DESC, ts DESC
       LIMIT 5;")
 
-    # 2) similarity.py でsolutions検索
-    similar_solutions=$(python3 -c "
-import sys
-sys.path.insert(0, '$HOME/.claude/intelligence/scripts')
-from similarity import find_similar
-import json
-results = find_similar('$(esc "$requirement")', threshold=0.3, limit=5)
-print(json.dumps(results))
-" 2>/dev/null || echo "[]")
+    # 2) similarity.py でsolutions検索 (dis_daemon.py 経由、未起動ならプロセス内)
+    similar_solutions=$(python3 -S "$HOME/.claude/intelligence/scripts/dis_daemon.py" similar \
+      --threshold 0.3 --limit 5 $archive_flag "$requirement" 2>/dev/null || echo "[]")
+
+    # 3)〜6) は FTS5 索引 (fts_*) を bm25 × score の順で引く。fts.py が索引ごとの MATCH 式を作る (dis_daemon.py が起動していればそこで)
+    { read -r m_feedback; read -r m_patterns; read -r m_tests; read -r m_questions; } < <(
+      python3 -S "$HOME/.claude/intelligence/scripts/dis_daemon.py" match \
+        --tables fts_feedback,fts_patterns,fts_test_sessions,fts_questions "$requirement" 2>/dev/null) || true
 
     # 3) feedback テーブルから関連検索
-    related_feedback=$(json_or_empty "SELECT id, category, wrong_approach, correct_approach, score
-      FROM feedback
-      WHERE (wrong_approach LIKE '%$(esc "$requirement")%'
-        OR correct_approach LIKE '%$(esc "$requirement")%'
-        OR category LIKE '%$(esc "$requirement")%')
-        AND score > 0.5
-      ORDER BY score DESC
-      LIMIT 5;")
+    related_feedback="[]"
+    if [ -n "$m_feedback" ]; then
+      related_feedback=$(json_or_empty "SELECT f.id, f.category, f.wrong_approach, f.correct_approach, f.score
+        FROM fts_feedback JOIN feedback f ON f.id = fts_feedback.rowid
+        WHERE fts_feedback MATCH '$(esc "$m_feedback")'
+          AND f.score > 0.5
+        ORDER BY bm25(fts_feedback) * (1.0 + MIN(MAX(f.score, 0), 4) / 4.0)
+        LIMIT 5;")
+    fi
 
     # 4) patterns テーブルから関連検索
-    related_patterns=$(json_or_empty "SELECT id, pattern, solution, score
-      FROM patterns
-      WHERE (pattern LIKE '%$(esc "$requirement")%'
-        OR solution LIKE '%$(esc "$requirement")%')
-        AND score > 0.5
-      ORDER BY score DESC
-      LIMIT 5;")
+    related_patterns="[]"
+    if [ -n "$m_patterns" ]; then
+      related_patterns=$(json_or_empty "SELECT p.id, p.pattern, p.solution, p.score
+        FROM fts_patterns JOIN patterns p ON p.id = fts_patterns.rowid
+        WHERE fts_patterns MATCH '$(esc "$m_patterns")'
+          AND p.score > 0.5
+        ORDER BY bm25(fts_patterns) * (1.0 + MIN(MAX(p.score, 0), 4) / 4.0)
+        LIMIT 5;")
+    fi
 
     # 5) test_sessions テーブルから関連検索
-    related_tests=$(json_or_empty "SELECT id, perspective, test_type, status, score, error_pattern
-      FROM test_sessions
-      WHERE project = '$(esc "$project")'
-        AND perspective LIKE '%$(esc "$requirement")%'
-        AND status IN ('pass', 'fixed', 'fail')
-      ORDER BY score DESC
-      LIMIT 5;")
+    related_tests="[]"
+    if [ -n "$m_tests" ]; then
+      related_tests=$(json_or_empty "SELECT t.id, t.perspective, t.test_type, t.status, t.score, t.error_pattern
+        FROM fts_test_sessions JOIN test_sessions t ON t.id = fts_test_sessions.rowid
+        WHERE fts_test_sessions MATCH '$(esc "$m_tests")'
+          AND t.project = '$(esc "$project")'
+          AND t.status IN ('pass', 'fixed', 'fail')
+        ORDER BY bm25(fts_test_sessions) * (1.0 + MIN(MAX(t.score, 0), 4) / 4.0)
+        LIMIT 5;")
+    fi
 
     # 6) questions テーブルから関連検索
-    related_questions=$(json_or_empty "SELECT id, question, answer, status, score
-      FROM questions
-      WHERE (question LIKE '%$(esc "$requirement")%'
-        OR context LIKE '%$(esc "$requirement")%'
-        OR answer LIKE '%$(esc "$requirement")%')
-        AND score > 0.5
-      ORDER BY score DESC
-      LIMIT 5;")
+    related_questions="[]"
+    if [ -n "$m_questions" ]; then
+      related_questions=$(json_or_empty "SELECT q.id, q.question, q.answer, q.status, q.score
+        FROM fts_questions JOIN questions q ON q.id = fts_questions.rowid
+        WHERE fts_questions MATCH '$(esc "$m_questions")'
+          AND q.score > 0.5
+        ORDER BY bm25(fts_questions) * (1.0 + MIN(MAX(q.score, 0), 4) / 4.0)
+        LIMIT 5;")
+    fi
+
+    # 7) --archive: 退避した feedback / patterns / test_sessions / questions (archive.py が dev-archive.db の索引を引く)
+    archived=""
+    if [ -n "$archive_flag" ]; then
+      archived=", \"archived\": $(python3 "$HOME/.claude/intelligence/scripts/archive.py" search \
+        --tables fts_feedback,fts_patterns,fts_test_sessions,fts_questions "$requirement" 2>/dev/null || echo "{}")"
+    fi
 
     cat <<EOF
-{"past_dev_sessions": $past_dev, "related_solutions": $similar_solutions, "related_feedback": $related_feedback, "related_patterns": $related_patterns, "related_test_sessions": $related_tests, "related_questions": $related_questions}
+{"past_dev_sessions": $past_dev, "related_solutions": $similar_solutions, "related_feedback": $related_feedback, "related_patterns": $related_patterns, "related_test_sessions": $related_tests, "related_questions": $related_questions$archived}
 EOF
     ;;
 
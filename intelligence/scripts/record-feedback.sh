@@ -4,6 +4,8 @@
 set -euo pipefail
 
 DB="$HOME/.claude/intelligence/dev.db"
+# 他の DIS プロセスが書き込み中ならロック解除を待つ (dev.db の WAL 化は dis_db.py が行う)
+sqlite3() { command sqlite3 -cmd ".timeout 5000" "$@"; }
 
 category="${1:?Usage: record-feedback.sh <category> <wrong> <correct> [context] [project] [scope]}"
 wrong="${2:?}"
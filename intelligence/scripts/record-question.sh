@@ -3,10 +3,12 @@
 # Usage:
 #   record-question.sh ask <question> [project] [context] [tags_json]
 #   record-question.sh resolve <id> <answer>
-#   record-question.sh search <query> [project]
+#   record-question.sh search <query> [project] [--archive]   # --archive: dev-archive.db に退避した分も引く
 set -euo pipefail
 
 DB="$HOME/.claude/intelligence/dev.db"
+# 他の DIS プロセスが書き込み中ならロック解除を待つ (dev.db の WAL 化は dis_db.py が行う)
+sqlite3() { command sqlite3 -cmd ".timeout 5000" "$@"; }
 CMD="${1:?Usage: record-question.sh <ask|resolve|search> ...}"
 shift
 
@@ -59,35 +61,43 @@ case "$CMD" in
     ;;
 
   search)
-    query="${1:?search: <query> [project]}"
+    archive_flag=""
+    args=()
+    for a in "$@"; do
+      if [ "$a" = "--archive" ]; then archive_flag="--archive"; else args+=("$a"); fi
+    done
+    set -- ${args[@]+"${args[@]}"}
+    query="${1:?search: <query> [project] [--archive]}"
     project="${2:-}"
 
-    # 1) テキスト検索 (open + resolved)
+    # 1) テキスト検索 (open + resolved)。FTS5 索引を bm25 × score の順で引く
     project_filter=""
-    [ -n "$project" ] && project_filter="AND project = '$(esc "$project")'"
+    [ -n "$project" ] && project_filter="AND q.project = '$(esc "$project")'"
 
-    results=$(json_or_empty "SELECT id, question, answer, status, tags, score, project, ts
-      FROM questions
-      WHERE (question LIKE '%$(esc "$query")%'
-        OR context LIKE '%$(esc "$query")%'
-        OR answer LIKE '%$(esc "$query")%'
-        OR tags LIKE '%$(esc "$query")%')
-        $project_filter
-      ORDER BY score DESC, ts DESC
-      LIMIT 10;")
+    m_questions=$(python3 -S "$HOME/.claude/intelligence/scripts/dis_daemon.py" match --tables fts_questions "$query" 2>/dev/null || true)
+    results="[]"
+    if [ -n "$m_questions" ]; then
+      results=$(json_or_empty "SELECT q.id, q.question, q.answer, q.status, q.tags, q.score, q.project, q.ts
+        FROM fts_questions JOIN questions q ON q.id = fts_questions.rowid
+        WHERE fts_questions MATCH '$(esc "$m_questions")'
+          $project_filter
+        ORDER BY bm25(fts_questions) * (1.0 + MIN(MAX(q.score, 0), 4) / 4.0), q.ts DESC
+        LIMIT 10;")
+    fi
+
+    # 2) similarity.py でsolutions内の関連知見も検索 (dis_daemon.py 経由、未起動ならプロセス内)
+    similar=$(python3 -S "$HOME/.claude/intelligence/scripts/dis_daemon.py" similar \
+      --threshold 0.3 --limit 3 $archive_flag "$query" 2>/dev/null || echo "[]")
 
-    # 2) similarity.py でsolutions内の関連知見も検索
-    similar=$(python3 -c "
-import sys
-sys.path.insert(0, '$HOME/.claude/intelligence/scripts')
-from similarity import find_similar
-import json
-results = find_similar('$(esc "$query")', threshold=0.3, limit=3)
-print(json.dumps(results))
-" 2>/dev/null || echo "[]")
+    # 3) --archive: 退避した questions (archive.py が dev-archive.db の索引を引く)
+    archived=""
+    if [ -n "$archive_flag" ]; then
+      archived=", \"archived\": $(python3 "$HOME/.claude/intelligence/scripts/archive.py" search \
+        --tables fts_questions ${project:+--project "$project"} "$query" 2>/dev/null || echo "{}")"
+    fi
 
     cat <<EOF
-{"questions": $results, "related_solutions": $similar}
+{"questions": $results, "related_solutions": $similar$archived}
 EOF
     ;;
 
@@ -7,6 +7,8 @@
 set -euo pipefail
 
 DB="$HOME/.claude/intelligence/dev.db"
+# 他の DIS プロセスが書き込み中ならロック解除を待つ (dev.db の WAL 化は dis_db.py が行う)
+sqlite3() { command sqlite3 -cmd ".timeout 5000" "$@"; }
 CMD="${1:?Usage: record-test-session.sh <start|complete|lookup> ...}"
 shift
 
@@ -113,24 +115,23 @@ case "$CMD" in
     project="${1:?lookup: <project> <perspective>}"
     perspective="${2:?}"
 
-    # 1) 同一project+perspectiveの過去セッション
-    past_sessions=$(sqlite3 -json "$DB" "SELECT id, perspective, test_type, status, iterations, score, error_pattern, fix_history
-      FROM test_sessions
-      WHERE project = '$(esc "$project")'
-        AND perspective LIKE '%$(esc "$perspective")%'
-        AND status IN ('pass', 'fixed', 'fail')
-      ORDER BY score DESC, ts DESC
-      LIMIT 5;" 2>/dev/null || echo "[]")
-
-    # 2) similarity.py でエラーパターン検索
-    similar_json=$(python3 -c "
-import sys
-sys.path.insert(0, '$HOME/.claude/intelligence/scripts')
-from similarity import find_similar
-import json
-results = find_similar('$perspective', threshold=0.3, limit=5)
-print(json.dumps(results))
-" 2>/dev/null || echo "[]")
+    # 1) 同一projectの過去セッション (perspective を FTS5 索引で bm25 × score の順に引く)
+    m_tests=$(python3 -S "$HOME/.claude/intelligence/scripts/dis_daemon.py" match --tables fts_test_sessions "$perspective" 2>/dev/null || true)
+    past_sessions="[]"
+    if [ -n "$m_tests" ]; then
+      past_sessions=$(sqlite3 -json "$DB" "SELECT t.id, t.perspective, t.test_type, t.status, t.iterations, t.score, t.error_pattern, t.fix_history
+        FROM fts_test_sessions JOIN test_sessions t ON t.id = fts_test_sessions.rowid
+        WHERE fts_test_sessions MATCH '$(esc "$m_tests")'
+          AND t.project = '$(esc "$project")'
+          AND t.status IN ('pass', 'fixed', 'fail')
+        ORDER BY bm25(fts_test_sessions) * (1.0 + MIN(MAX(t.score, 0), 4) / 4.0), t.ts DESC
+        LIMIT 5;" 2>/dev/null || echo "[]")
+      past_sessions="${past_sessions:-[]}"
+    fi
+
+    # 2) similarity.py でエラーパターン検索 (dis_daemon.py 経由、未起動ならプロセス内)
+    similar_json=$(python3 -S "$HOME/.claude/intelligence/scripts/dis_daemon.py" similar \
+      --threshold 0.3 --limit 5 "$perspective" 2>/dev/null || echo "[]")
 
     # JSON出力
     cat <<EOF
@@ -1,164 +1,204 @@
 #!/usr/bin/env python3
-"""DIS: 開発インテリジェンスレポート生成。"""
-import sqlite3
+"""DIS: 開発インテリジェンスレポート生成。
+
+期間で絞る集計は rollup_* テーブル (migrations/0010_report_rollups.sql、トリガーで常に最新) から日単位で読み、
+上位 N 件のランキングは索引の先頭だけを読む。元テーブルを走査しないので、履歴の量によらずミリ秒で終わる。
+
+期間は日単位 (UTC の date(ts))。既定は直近7日 (今日を含む) で、dev_sessions のトレンドだけ直近30日。
+--since を指定するとすべての期間をその日以降にする。
+
+Usage:
+  report.py [--since YYYY-MM-DD | --since 30d] [--json]
+"""
+import json
 import os
-from datetime import datetime
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+import dis_db
+import migrate
 
 DB = os.path.expanduser("~/.claude/intelligence/dev.db")
 
+# 既定の集計期間 (日数、今日を含む)
+DEFAULT_DAYS = 7
+TREND_DAYS = 30
+
+
+def _days_ago(days: int) -> str:
+    return (datetime.utcnow() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+
 
-def generate_report():
-    conn = sqlite3.connect(DB)
+def parse_since(value: str) -> str:
+    """'30d' (今日を含む30日) または 'YYYY-MM-DD' → 開始日。"""
+    if value.endswith("d") and value[:-1].isdigit():
+        return _days_ago(int(value[:-1]))
+    return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+
+
+def _grade(dqs: float) -> str:
+    return "Excellent" if dqs >= 0.85 else "Good" if dqs >= 0.70 else "Needs Work" if dqs >= 0.50 else "Poor"
+
+
+def collect(conn: sqlite3.Connection, since: str | None = None) -> dict:
+    """レポートの全項目を dict で返す。since (YYYY-MM-DD) 省略時は既定の期間。"""
     cur = conn.cursor()
+    since_day = since or _days_ago(DEFAULT_DAYS)
+    trend_day = since or _days_ago(TREND_DAYS)
+
+    cur.execute("SELECT type, SUM(events) FROM rollup_events_daily WHERE day >= ? "
+                "GROUP BY type HAVING SUM(events) > 0 ORDER BY SUM(events) DESC", (since_day,))
+    by_type = cur.fetchall()
+
+    cur.execute("SELECT error_pattern, success_count, score, project FROM solutions "
+                "ORDER BY success_count DESC LIMIT 5")
+    top_patterns = cur.fetchall()
+
+    cur.execute("SELECT SUM(sessions), SUM(errors_encountered), SUM(errors_resolved) "
+                "FROM rollup_sessions_daily WHERE day >= ?", (since_day,))
+    sess, err, res = (v or 0 for v in cur.fetchone())
+
+    cur.execute("SELECT error_pattern, success_count, score, project FROM solutions "
+                "WHERE score >= 3.0 AND success_count >= 3 ORDER BY score DESC LIMIT 10")
+    candidates = cur.fetchall()
+
+    cur.execute("SELECT n FROM rollup_totals WHERE name = 'feedback'")
+    row = cur.fetchone()
+    cur.execute("SELECT category, wrong_approach, correct_approach, score, confirmation_count, "
+                "score * confirmation_count FROM feedback ORDER BY score * confirmation_count DESC LIMIT 5")
+    fb_entries = cur.fetchall()
+
+    cur.execute("SELECT source, feeds, unanalyzed FROM rollup_feeds WHERE feeds > 0 ORDER BY feeds DESC")
+    feeds = cur.fetchall()
+
+    # 計測1回ごとの合計を期間でまとめる。Files は期間中の計測1回あたりの最大ファイル数
+    cur.execute("""
+        SELECT project, MAX(files), SUM(dqs_sum) / SUM(files), MIN(dqs_min), MAX(dqs_max),
+               SUM(cdi_sum) / SUM(files), SUM(se_sum) / SUM(files), SUM(cls_sum) / SUM(files),
+               SUM(crs_sum) / SUM(files)
+        FROM rollup_quality_runs
+        WHERE ts >= ? AND files > 0
+        GROUP BY project ORDER BY SUM(dqs_sum) / SUM(files)
+    """, (since_day,))
+    quality = cur.fetchall()
+
+    cur.execute("SELECT project, SUM(sessions), SUM(dqs_delta_sum) / SUM(sessions), SUM(passes), SUM(fails) "
+                "FROM rollup_dev_daily WHERE day >= ? GROUP BY project HAVING SUM(sessions) > 0", (trend_day,))
+    dev = cur.fetchall()
+
+    # 最新の計測 (全プロジェクトで最も新しい ts)
+    cur.execute("SELECT SUM(high_cls), SUM(low_dqs) FROM rollup_quality_runs "
+                "WHERE ts = (SELECT MAX(ts) FROM rollup_quality_runs)")
+    high_cls, low_dqs = (v or 0 for v in cur.fetchone())
+
+    return {
+        "generated": datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC"),
+        "since": since_day,
+        "trend_since": trend_day,
+        "events": {"total": sum(c for _, c in by_type), "by_type": dict(by_type)},
+        "top_patterns": [{"pattern": p, "count": c, "score": s, "project": pr} for p, c, s, pr in top_patterns],
+        "sessions": {"total": sess, "errors_encountered": err, "errors_resolved": res,
+                     "resolution_rate": round(res / err * 100, 1) if err > 0 else 0},
+        "promotion_candidates": [{"pattern": p, "count": c, "score": s, "project": pr}
+                                 for p, c, s, pr in candidates],
+        "feedback": {
+            "total": row[0] if row else 0,
+            "top": [{"category": cat, "wrong": w, "correct": c, "score": s, "confirmed": n, "stability": st}
+                    for cat, w, c, s, n, st in fb_entries],
+        },
+        "feeds": {"unanalyzed": sum(u for _, _, u in feeds), "by_source": {s: n for s, n, _ in feeds}},
+        "quality": [{"project": p, "files": f, "dqs": round(d, 3), "dqs_min": round(lo, 3), "dqs_max": round(hi, 3),
+                     "cdi": round(cdi, 3), "se": round(se, 3), "cls": round(cls, 1), "crs": round(crs, 3),
+                     "grade": _grade(d)}
+                    for p, f, d, lo, hi, cdi, se, cls, crs in quality],
+        "dev_trend": [{"project": p, "sessions": n, "dqs_delta": round(d, 4), "pass": ps, "fail": fl}
+                      for p, n, d, ps, fl in dev],
+        "alerts": {"high_cls": high_cls, "low_dqs": low_dqs},
+    }
+
+
+def _period(day: str, days: int, since: str | None) -> str:
+    return f"since {day}" if since else f"last {days} days"
+
+
+def print_report(r: dict, since: str | None = None):
+    period = _period(r["since"], DEFAULT_DAYS, since)
 
     print("=" * 60)
     print("  Development Intelligence Report")
-    print(f"  Generated: {datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')}")
+    print(f"  Generated: {r['generated']}")
     print("=" * 60)
 
-    # 直近7日のイベント統計
-    cur.execute("SELECT COUNT(*) FROM events WHERE ts >= datetime('now', '-7 days')")
-    events_7d = cur.fetchone()[0]
-    cur.execute("SELECT type, COUNT(*) FROM events WHERE ts >= datetime('now', '-7 days') GROUP BY type ORDER BY COUNT(*) DESC")
-    type_counts = cur.fetchall()
-
-    print(f"\n## Events (last 7 days): {events_7d}")
-    for t, c in type_counts:
+    print(f"\n## Events ({period}): {r['events']['total']}")
+    for t, c in r["events"]["by_type"].items():
         print(f"  - {t}: {c}")
 
-    # TOP 5 頻出エラーパターン
-    cur.execute("""
-        SELECT error_pattern, success_count, score, project
-        FROM solutions ORDER BY success_count DESC LIMIT 5
-    """)
-    top_patterns = cur.fetchall()
     print("\n## Top 5 Error Patterns:")
-    for i, (pat, cnt, score, proj) in enumerate(top_patterns, 1):
-        print(f"  {i}. [{proj}] (count={cnt}, score={score:.2f})")
-        print(f"     {pat[:100]}")
-
-    # セッション統計
-    cur.execute("SELECT COUNT(*), SUM(errors_encountered), SUM(errors_resolved) FROM sessions WHERE ts >= datetime('now', '-7 days')")
-    sess = cur.fetchone()
-    total_sess = sess[0] or 0
-    total_err = sess[1] or 0
-    total_res = sess[2] or 0
-    resolve_rate = (total_res / total_err * 100) if total_err > 0 else 0
-
-    print(f"\n## Sessions (last 7 days): {total_sess}")
-    print(f"  - Errors encountered: {total_err}")
-    print(f"  - Errors resolved: {total_res}")
-    print(f"  - Resolution rate: {resolve_rate:.1f}%")
-
-    # 昇格候補
-    cur.execute("""
-        SELECT error_pattern, success_count, score, project
-        FROM solutions WHERE score >= 3.0 AND success_count >= 3
-        ORDER BY score DESC LIMIT 10
-    """)
-    candidates = cur.fetchall()
-    print(f"\n## Promotion Candidates (score>=3.0, freq>=3): {len(candidates)}")
-    for pat, cnt, score, proj in candidates:
-        print(f"  - [{proj}] score={score:.2f} count={cnt}")
-        print(f"    {pat[:100]}")
-
-    # フィードバック統計
-    cur.execute("SELECT COUNT(*) FROM feedback")
-    fb_total = cur.fetchone()[0]
-    cur.execute("""
-        SELECT category, wrong_approach, correct_approach, score, confirmation_count,
-               score * confirmation_count as stability
-        FROM feedback ORDER BY stability DESC LIMIT 5
-    """)
-    fb_entries = cur.fetchall()
-    print(f"\n## Feedback: {fb_total} entries")
-    for cat, wrong, correct, score, conf, stab in fb_entries:
-        status = " ** PROMOTE **" if stab >= 4 else ""
-        print(f"  - [{cat}] {wrong} → {correct} (score={score:.1f}, confirmed={conf}, stability={stab:.1f}){status}")
-
-    # 業界フィード統計
-    cur.execute("SELECT COUNT(*) FROM industry_feeds WHERE analyzed = 0")
-    unread = cur.fetchone()[0]
-    cur.execute("SELECT source, COUNT(*) FROM industry_feeds GROUP BY source ORDER BY COUNT(*) DESC")
-    feed_counts = cur.fetchall()
-    print(f"\n## Industry Feeds: {unread} unanalyzed")
-    for src, cnt in feed_counts:
+    for i, p in enumerate(r["top_patterns"], 1):
+        print(f"  {i}. [{p['project']}] (count={p['count']}, score={p['score']:.2f})")
+        print(f"     {p['pattern'][:100]}")
+
+    s = r["sessions"]
+    print(f"\n## Sessions ({period}): {s['total']}")
+    print(f"  - Errors encountered: {s['errors_encountered']}")
+    print(f"  - Errors resolved: {s['errors_resolved']}")
+    print(f"  - Resolution rate: {s['resolution_rate']:.1f}%")
+
+    print(f"\n## Promotion Candidates (score>=3.0, freq>=3): {len(r['promotion_candidates'])}")
+    for p in r["promotion_candidates"]:
+        print(f"  - [{p['project']}] score={p['score']:.2f} count={p['count']}")
+        print(f"    {p['pattern'][:100]}")
+
+    print(f"\n## Feedback: {r['feedback']['total']} entries")
+    for f in r["feedback"]["top"]:
+        status = " ** PROMOTE **" if f["stability"] >= 4 else ""
+        print(f"  - [{f['category']}] {f['wrong']} → {f['correct']} (score={f['score']:.1f}, "
+              f"confirmed={f['confirmed']}, stability={f['stability']:.1f}){status}")
+
+    print(f"\n## Industry Feeds: {r['feeds']['unanalyzed']} unanalyzed")
+    for src, cnt in r["feeds"]["by_source"].items():
         print(f"  - {src}: {cnt}")
 
-    # DQS品質ダッシュボード
-    try:
-        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='quality_metrics'")
-        if cur.fetchone():
-            cur.execute("""
-                SELECT project, COUNT(DISTINCT file), ROUND(AVG(dqs), 3),
-                       ROUND(MIN(dqs), 3), ROUND(MAX(dqs), 3),
-                       ROUND(AVG(cdi), 3), ROUND(AVG(se), 3),
-                       ROUND(AVG(cls_max), 1), ROUND(AVG(crs), 3)
-                FROM quality_metrics
-                WHERE ts >= datetime('now', '-7 days')
-                GROUP BY project ORDER BY AVG(dqs)
-            """)
-            qm_rows = cur.fetchall()
-            print(f"\n## DQS Quality Dashboard (last 7 days):")
-            if qm_rows:
-                for proj, files, avg_dqs, min_dqs, max_dqs, avg_cdi, avg_se, avg_cls, avg_crs in qm_rows:
-                    grade = "Excellent" if avg_dqs >= 0.85 else "Good" if avg_dqs >= 0.70 else "Needs Work" if avg_dqs >= 0.50 else "Poor"
-                    bar = "#" * int(avg_dqs * 20) + "-" * (20 - int(avg_dqs * 20))
-                    print(f"  [{proj}] DQS={avg_dqs:.3f} [{bar}] {grade}")
-                    print(f"    Files={files}  Range={min_dqs:.2f}-{max_dqs:.2f}")
-                    print(f"    CDI={avg_cdi:.3f}  SE={avg_se:.3f}  CLS={avg_cls:.0f}  CRS={avg_crs:.3f}")
-            else:
-                print("  No quality measurements yet. Run: python3 measure-quality.py <dir>")
-
-            # DQS trend (dev_sessions with dqs_delta)
-            cur.execute("""
-                SELECT project, COUNT(*),
-                       ROUND(AVG(CASE WHEN dqs_delta IS NOT NULL THEN dqs_delta ELSE 0 END), 4),
-                       SUM(CASE WHEN status='pass' THEN 1 ELSE 0 END),
-                       SUM(CASE WHEN status='fail' THEN 1 ELSE 0 END)
-                FROM dev_sessions
-                WHERE ts >= datetime('now', '-30 days')
-                GROUP BY project
-            """)
-            ds_rows = cur.fetchall()
-            if ds_rows:
-                print(f"\n## Dev Session Quality Trend (last 30 days):")
-                for proj, total, avg_delta, passes, fails in ds_rows:
-                    arrow = "^" if avg_delta > 0.01 else "v" if avg_delta < -0.01 else "="
-                    print(f"  [{proj}] {total} sessions (pass={passes}, fail={fails})"
-                          f"  DQS trend: {avg_delta:+.4f} {arrow}")
-    except Exception:
-        pass  # quality_metrics may not exist yet
-
-    # Self-improvement suggestions summary
-    try:
-        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='quality_metrics'")
-        if cur.fetchone():
-            cur.execute("""
-                SELECT COUNT(*) FROM quality_metrics
-                WHERE cls_max > 15
-                AND ts = (SELECT MAX(ts) FROM quality_metrics)
-            """)
-            high_cls = cur.fetchone()[0]
-            cur.execute("""
-                SELECT COUNT(*) FROM quality_metrics
-                WHERE dqs < 0.50
-                AND ts = (SELECT MAX(ts) FROM quality_metrics)
-            """)
-            low_dqs = cur.fetchone()[0]
-            if high_cls or low_dqs:
-                print(f"\n## Self-Improvement Alerts:")
-                if high_cls:
-                    print(f"  - {high_cls} files with CLS > 15 (function splitting needed)")
-                if low_dqs:
-                    print(f"  - {low_dqs} files with DQS < 0.50 (redesign needed)")
-                print(f"  Run: python3 self-improve.py suggest <project>")
-    except Exception:
-        pass
+    print(f"\n## DQS Quality Dashboard ({period}):")
+    if r["quality"]:
+        for q in r["quality"]:
+            bar = "#" * int(q["dqs"] * 20) + "-" * (20 - int(q["dqs"] * 20))
+            print(f"  [{q['project']}] DQS={q['dqs']:.3f} [{bar}] {q['grade']}")
+            print(f"    Files={q['files']}  Range={q['dqs_min']:.2f}-{q['dqs_max']:.2f}")
+            print(f"    CDI={q['cdi']:.3f}  SE={q['se']:.3f}  CLS={q['cls']:.0f}  CRS={q['crs']:.3f}")
+    else:
+        print("  No quality measurements yet. Run: python3 measure-quality.py <dir>")
+
+    if r["dev_trend"]:
+        print(f"\n## Dev Session Quality Trend ({_period(r['trend_since'], TREND_DAYS, since)}):")
+        for d in r["dev_trend"]:
+            arrow = "^" if d["dqs_delta"] > 0.01 else "v" if d["dqs_delta"] < -0.01 else "="
+            print(f"  [{d['project']}] {d['sessions']} sessions (pass={d['pass']}, fail={d['fail']})"
+                  f"  DQS trend: {d['dqs_delta']:+.4f} {arrow}")
+
+    a = r["alerts"]
+    if a["high_cls"] or a["low_dqs"]:
+        print(f"\n## Self-Improvement Alerts:")
+        if a["high_cls"]:
+            print(f"  - {a['high_cls']} files with CLS > 15 (function splitting needed)")
+        if a["low_dqs"]:
+            print(f"  - {a['low_dqs']} files with DQS < 0.50 (redesign needed)")
+        print(f"  Run: python3 self-improve.py suggest <project>")
 
-    conn.close()
     print("\n" + "=" * 60)
 
 
+def generate_report(since: str | None = None, as_json: bool = False):
+    conn = migrate.ensure(dis_db.connect(DB))
+    report = collect(conn, since)
+    conn.close()
+    if as_json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_report(report, since)
+
+
 if __name__ == "__main__":
-    generate_report()
+    args = sys.argv[1:]
+    generate_report(parse_since(args[args.index("--since") + 1]) if "--since" in args else None, "--json" in args)
@@ -17,10 +17,12 @@ Self-Improvement Loop:
 import json
 import math
 import os
-import sqlite3
 import sys
 from datetime import datetime, timedelta
 
+import dis_db
+import migrate
+
 DB = os.path.expanduser("~/.claude/intelligence/dev.db")
 
 # RL weights
@@ -31,7 +33,8 @@ DELTA = 0.25   # history reward
 
 
 def get_conn():
-    return sqlite3.connect(DB)
+    """プロセス内で使い回す dev.db の接続 (close() しても閉じない)。"""
+    return dis_db.shared(DB, init=migrate.ensure)
 
 
 # ── RL Reward Calculation ───────────────────────────────────
@@ -180,6 +183,25 @@ def analyze_trend(project: str, days: int = 30) -> dict:
 
 # ── Improvement Suggestions ─────────────────────────────────
 
+SPLIT_THRESHOLD = 15
+
+
+def hot_functions(metrics_json: str | None) -> list[dict]:
+    """quality_metrics.metrics_json の関数ごとの内訳から CLS がしきい値を超える関数を返す。"""
+    try:
+        breakdown = json.loads(metrics_json or "{}").get("function_cls", [])
+    except (json.JSONDecodeError, AttributeError):
+        return []
+    return sorted((f for f in breakdown if f.get("cls", 0) > SPLIT_THRESHOLD), key=lambda f: -f["cls"])
+
+
+def suggestion_target(s: dict) -> str:
+    """提案の対象 (関数単位なら file:function L開始-終了)。"""
+    if s.get("function"):
+        return f"{s['file']}:{s['function']} (L{s['lines']})"
+    return s["file"]
+
+
 def generate_suggestions(project: str) -> list[dict]:
     """DQSデータに基づくリファクタリング提案。"""
     conn = get_conn()
@@ -187,19 +209,28 @@ def generate_suggestions(project: str) -> list[dict]:
 
     suggestions = []
 
-    # 1. CLS > 15: 関数分割が必要
+    # 1. CLS > 15: 関数分割が必要 (計測結果に関数ごとの内訳があれば関数単位で提案)
     cur.execute(
-        "SELECT DISTINCT file, cls_max FROM quality_metrics "
-        "WHERE project = ? AND cls_max > 15 "
+        "SELECT DISTINCT file, cls_max, metrics_json FROM quality_metrics "
+        "WHERE project = ? AND cls_max > ? "
         "AND ts = (SELECT MAX(ts) FROM quality_metrics WHERE project = ?) "
         "ORDER BY cls_max DESC LIMIT 10",
-        (project, project))
-    for f, cls in cur.fetchall():
+        (project, SPLIT_THRESHOLD, project))
+    split = []
+    for f, cls, metrics_json in cur.fetchall():
+        hot = hot_functions(metrics_json)
+        if not hot:
+            split.append({"file": f, "cls": cls, "reason": f"Cognitive Load {cls} > 15"})
+        for fn in hot:
+            split.append({"file": f, "cls": fn["cls"], "function": fn["name"],
+                          "lines": f"{fn['start']}-{fn['end']}",
+                          "reason": f"Cognitive Load {fn['cls']} > 15 in {fn['name']}"})
+    for s in sorted(split, key=lambda x: -x["cls"])[:10]:
+        cls = s.pop("cls")
         suggestions.append({
             "type": "split_function",
             "priority": "HIGH" if cls > 25 else "MEDIUM",
-            "file": f,
-            "reason": f"Cognitive Load {cls} > 15",
+            **s,
             "action": "ネスト深い関数を extract method で分割",
             "expected_impact": round(min(0.15, (cls - 15) * 0.005), 4),
         })
@@ -278,7 +309,7 @@ def generate_suggestions(project: str) -> list[dict]:
             "INSERT OR IGNORE INTO feedback(category, wrong_approach, correct_approach, context, project, scope) "
             "VALUES(?, ?, ?, ?, ?, 'project')",
             ("refactoring",
-             f"{s['type']}: {s['file']} ({s['reason']})",
+             f"{s['type']}: {suggestion_target(s)} ({s['reason']})",
              s["action"],
              f"DQS auto-suggestion, priority={s['priority']}",
              project))
@@ -324,7 +355,7 @@ def print_suggestions(suggestions: list[dict]):
     print(f"  Improvement Suggestions ({len(suggestions)} items)")
     print(f"{'=' * 55}")
     for i, s in enumerate(suggestions, 1):
-        print(f"  [{s['priority']}] {s['file']}")
+        print(f"  [{s['priority']}] {suggestion_target(s)}")
         print(f"    Type: {s['type']}")
         print(f"    Reason: {s['reason']}")
         print(f"    Action: {s['action']}")
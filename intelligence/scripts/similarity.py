@@ -1,17 +1,25 @@
 #!/usr/bin/env python3
 """DIS: TF-IDF類似度スコアリング。新規エラーと既存solutionsのマッチング。"""
+import heapq
 import math
+import random
 import re
 import sqlite3
 import os
+import zlib
+from array import array
 from collections import Counter
 
+import dis_db
+import migrate
+from normalize import normalize_error
+
 DB = os.path.expanduser("~/.claude/intelligence/dev.db")
 
 
 def tokenize(text: str) -> list[str]:
-    """テキストをトークンに分割。"""
-    text = text.lower()
+    """テキストをトークンに分割。パス・行番号・ハッシュは normalize で畳んでから分割する。"""
+    text = normalize_error(text, max_length=None).lower()
     text = re.sub(r"[^a-z0-9_]", " ", text)
     return [t for t in text.split() if len(t) > 2]
 
@@ -46,33 +54,405 @@ def cosine_similarity(v1: dict[str, float], v2: dict[str, float]) -> float:
     return dot / (mag1 * mag2)
 
 
-def find_similar(error_text: str, threshold: float = 0.5, limit: int = 5) -> list[dict]:
-    """エラーテキストに類似する既存solutionsを検索。"""
-    conn = sqlite3.connect(DB)
+# ── 文字 trigram ────────────────────────────────────────
+# tokenize は ASCII の語しか残さないので、日本語のエラー文 (tsc の日本語ロケールなど) からは語が出ない。
+# hybrid ランカーは正規化した本文の文字 trigram も使う。trigram は crc32 で GRAM_DIM 次元にハッシュし、
+# (バケット番号の昇順 array('I'), 重みの array('f')) の疎ベクトルとして持つ。
+
+GRAM_DIM = 1 << 20
+_SPACES = re.compile(r"\s+")
+
+
+def char_grams(text: str) -> Counter:
+    """正規化・小文字化した text (前後に空白1つ) の文字 trigram → 出現回数 (キーはハッシュしたバケット番号)。"""
+    text = " " + _SPACES.sub(" ", normalize_error(text, max_length=None).lower()).strip() + " "
+    return Counter(zlib.crc32(text[i:i + 3].encode("utf-8")) % GRAM_DIM for i in range(len(text) - 2))
+
+
+def gram_vector(text: str) -> tuple[array, array]:
+    """文字 trigram の疎ベクトル。重みは 1 + log(回数) を L2 正規化したもの。"""
+    counts = char_grams(text)
+    buckets = sorted(counts)
+    weights = [1 + math.log(counts[b]) for b in buckets]
+    norm = math.sqrt(sum(w * w for w in weights)) or 1.0
+    return array("I", buckets), array("f", [w / norm for w in weights])
+
+
+def pack_grams(buckets: array, weights: array) -> bytes:
+    return buckets.tobytes() + weights.tobytes()
+
+
+def unpack_grams(blob: bytes) -> tuple[array, array]:
+    n = len(blob) // 8
+    buckets, weights = array("I"), array("f")
+    buckets.frombytes(blob[:n * 4])
+    weights.frombytes(blob[n * 4:])
+    return buckets, weights
+
+
+# ── 転置インデックス ────────────────────────────────────────
+# テーブル・トリガーは migrations/0004_solution_index.sql (語) と 0013_solution_features.sql (文書長・trigram) で作成する
+
+# tokenize / 特徴量の作り方を変えたら上げる (既存インデックスを再構築させる)
+TOKENIZER_VERSION = "3"
+
+# SQLite のバインド変数上限 (古いビルドは 999) を超えないようにチャンク分割
+_CHUNK = 500
+
+
+def _chunks(items: list, size: int = _CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def ensure_index(conn: sqlite3.Connection):
+    """スキーマを最新にし、初回または tokenize の仕様 (TOKENIZER_VERSION) が変わった時は既存solutionsを全件キューに積む。"""
+    migrate.ensure(conn)
     cur = conn.cursor()
-    cur.execute("SELECT id, error_pattern, solution, score FROM solutions ORDER BY score DESC LIMIT 200")
-    rows = cur.fetchall()
-    conn.close()
+    cur.execute("SELECT value FROM solution_index_meta WHERE key = 'tokenizer_version'")
+    row = cur.fetchone()
+    if row and row[0] == TOKENIZER_VERSION:
+        return
+    cur.execute("INSERT OR IGNORE INTO solution_index_queue(solution_id) SELECT id FROM solutions")
+    cur.execute(
+        "INSERT OR REPLACE INTO solution_index_meta(key, value) VALUES('tokenizer_version', ?)",
+        (TOKENIZER_VERSION,))
+    conn.commit()
+
+
+def index_solutions(cur: sqlite3.Cursor, rows: list[tuple]):
+    """(id, error_pattern) の行を posting list と特徴量 (文書長・trigram) に書き込む (既存分は置換)。"""
+    ids = [(r[0],) for r in rows]
+    cur.executemany("DELETE FROM solution_terms WHERE solution_id = ?", ids)
+    cur.executemany("DELETE FROM solution_grams WHERE solution_id = ?", ids)
+    postings, features, grams = [], [], []
+    for sid, pattern in rows:
+        tokens = tokenize(pattern or "")
+        for t, tf in compute_tf(tokens).items():
+            postings.append((t, sid, tf))
+        buckets, weights = gram_vector(pattern or "")
+        features.append((sid, len(tokens), pack_grams(buckets, weights)))
+        grams.extend((b, sid) for b in buckets)
+    cur.executemany("INSERT OR REPLACE INTO solution_terms(term, solution_id, tf) VALUES(?, ?, ?)", postings)
+    cur.executemany("INSERT OR REPLACE INTO solution_features(solution_id, length, grams) VALUES(?, ?, ?)", features)
+    cur.executemany("INSERT INTO solution_grams(bucket, solution_id) VALUES(?, ?)", grams)
+    cur.executemany("DELETE FROM solution_index_queue WHERE solution_id = ?", ids)
+
+
+def refresh_index(conn: sqlite3.Connection) -> int:
+    """キューに溜まった solutions だけを再インデックス。処理件数を返す。"""
+    cur = conn.cursor()
+    cur.execute("SELECT solution_id FROM solution_index_queue")
+    pending = [r[0] for r in cur.fetchall()]
+    if not pending:
+        return 0
+    for chunk in _chunks(pending):
+        cur.execute(
+            f"SELECT id, error_pattern FROM solutions WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+        rows = cur.fetchall()
+        index_solutions(cur, rows)
+        # solutions から既に消えている id はキューから外すだけ
+        cur.executemany("DELETE FROM solution_index_queue WHERE solution_id = ?", [(i,) for i in chunk])
+    conn.commit()
+    return len(pending)
+
+
+def rebuild_index(conn: sqlite3.Connection) -> int:
+    """インデックスを全件再構築。"""
+    ensure_index(conn)
+    cur = conn.cursor()
+    cur.execute("DELETE FROM solution_terms")
+    # df を先に空にしておけば、solution_grams の削除トリガーは何も更新しない
+    cur.execute("DELETE FROM solution_gram_df")
+    cur.execute("DELETE FROM solution_grams")
+    cur.execute("DELETE FROM solution_features")
+    cur.execute("DELETE FROM solution_index_queue")
+    cur.execute("INSERT INTO solution_index_queue(solution_id) SELECT id FROM solutions")
+    conn.commit()
+    return refresh_index(conn)
+
+
+class IndexCache:
+    """常駐プロセス (dis_daemon.py) 用に、solutions の件数・df・solution の TF ベクトルと特徴量を覚えておく。
+
+    他の接続が commit すると PRAGMA data_version が変わるので、その時は丸ごと捨てる。
+    自分の接続での solutions の追加・更新はキュー経由で refresh_index が拾うので、その件数で捨てる。
+    """
+
+    def __init__(self):
+        self.version = None
+        self.clear()
+
+    def clear(self):
+        self.n: int | None = None
+        self.df: dict[str, int] = {}
+        self.vectors: dict[int, dict[str, float]] = {}
+        # hybrid 用: (文書数, 平均文書長)、バケットごとの df、solution ごとの (文書長, バケット, 重み)
+        self.stats: tuple[int, float] | None = None
+        self.gram_df: dict[int, int] = {}
+        self.features: dict[int, tuple[int, array, array]] = {}
+
+    def validate(self, conn: sqlite3.Connection, refreshed: int):
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if refreshed or version != self.version:
+            self.version = version
+            self.clear()
 
-    if not rows:
-        return []
 
-    query_tokens = tokenize(error_text)
+def open_index(cache: IndexCache | None = None) -> sqlite3.Connection:
+    """dev.db の共有接続 (プロセス内で使い回す) を、インデックスを最新化して返す。
+
+    スキーマ・トークナイザのバージョン確認は接続を開いた時の1回だけ。
+    """
+    conn = dis_db.shared(DB, init=ensure_index)
+    refreshed = 0
+    try:
+        refreshed = refresh_index(conn)
+    except sqlite3.OperationalError:
+        # 書き込みロック中は前回までのインデックスで検索する
+        conn.rollback()
+    if cache is not None:
+        cache.validate(conn, refreshed)
+    return conn
+
+
+def _candidate_vectors(cur: sqlite3.Cursor, terms: list[str],
+                       cache: IndexCache | None = None) -> dict[int, dict[str, float]]:
+    """クエリと語を共有する solution の TF ベクトルを posting list から復元。"""
+    candidates = set()
+    for chunk in _chunks(terms):
+        cur.execute(
+            f"SELECT DISTINCT solution_id FROM solution_terms WHERE term IN ({','.join('?' * len(chunk))})",
+            chunk)
+        candidates.update(r[0] for r in cur.fetchall())
+    return _load_vectors(cur, candidates, cache)
+
+
+def _load_vectors(cur: sqlite3.Cursor, candidates: set[int],
+                  cache: IndexCache | None = None) -> dict[int, dict[str, float]]:
+    """solution ごとの TF ベクトル (id 順)。"""
+    known = cache.vectors if cache is not None else {}
+    vectors: dict[int, dict[str, float]] = {sid: known[sid] for sid in candidates if sid in known}
+    for chunk in _chunks(sorted(candidates - vectors.keys())):
+        cur.execute(
+            f"SELECT solution_id, term, tf FROM solution_terms WHERE solution_id IN ({','.join('?' * len(chunk))})",
+            chunk)
+        for sid, t, tf in cur.fetchall():
+            vectors.setdefault(sid, {})[t] = tf
+    if cache is not None:
+        cache.vectors.update(vectors)
+        # キャッシュの有無で順序 (= 同じ類似度の並び) が変わらないよう id 順にそろえる
+        vectors = {sid: vectors[sid] for sid in sorted(vectors)}
+    return vectors
+
+
+def _document_frequencies(cur: sqlite3.Cursor, terms: list[str],
+                          cache: IndexCache | None = None) -> dict[str, int]:
+    known = cache.df if cache is not None else {}
+    df = {t: known[t] for t in terms if t in known}
+    missing = [t for t in terms if t not in known]
+    for chunk in _chunks(missing):
+        cur.execute(
+            f"SELECT term, COUNT(*) FROM solution_terms WHERE term IN ({','.join('?' * len(chunk))}) GROUP BY term",
+            chunk)
+        df.update(cur.fetchall())
+    if cache is not None:
+        # 一致しなかった語も 0 として覚える
+        cache.df.update((t, df.get(t, 0)) for t in missing)
+    return df
+
+
+def _document_count(cur: sqlite3.Cursor, cache: IndexCache | None = None) -> int:
+    """IDF の文書数 (solutions の件数 + クエリ1件)。"""
+    if cache is not None and cache.n is not None:
+        return cache.n
+    cur.execute("SELECT COUNT(*) FROM solutions")
+    n = (cur.fetchone()[0] + 1) or 1
+    if cache is not None:
+        cache.n = n
+    return n
+
+
+# ── ランカー ────────────────────────────────────────
+# find_similar の採点方法は差し替えられる。ランカーは (cursor, テキスト, cache) を受け取り、
+# 候補の [(solution_id, 類似度 0〜1)] を id 順で返す関数で、RANKERS に名前で登録する。
+#   tfidf:  tokenize の語の TF-IDF コサイン (従来どおり)
+#   hybrid: 語の BM25 と文字 trigram のコサインの加重平均 (語が出ないクエリは trigram だけ)
+# eval_similarity.py で recall@k とレイテンシを比べられる。
+
+RANKER = "tfidf"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# hybrid の重み
+WORD_WEIGHT = 0.5
+GRAM_WEIGHT = 0.5
+# 候補は語・trigram それぞれで重なりの多い順にこの件数まで (採点はその和集合だけ)
+HYBRID_CANDIDATES = 200
+# 候補集めには df がこの割合以下の語・バケットを使い、trigram は df の小さい順に CANDIDATE_GRAMS 個まで
+COMMON_FRACTION = 0.2
+CANDIDATE_GRAMS = 48
+
+
+def _rank_tfidf(cur: sqlite3.Cursor, text: str, cache: IndexCache | None = None) -> list[tuple[int, float]]:
+    query_tokens = tokenize(text)
     if not query_tokens:
         return []
+    query_tf = compute_tf(query_tokens)
+    vectors = _candidate_vectors(cur, list(query_tf), cache)
+    if not vectors:
+        return []
+
+    # IDF はクエリも1文書として数える (全件スキャン時と同じ定義)
+    n = _document_count(cur, cache)
+    vocab = set(query_tf)
+    for vec in vectors.values():
+        vocab.update(vec)
+    df = _document_frequencies(cur, sorted(vocab), cache)
+    idf = {t: math.log(n / (1 + df.get(t, 0) + (1 if t in query_tf else 0))) for t in vocab}
+
+    query_tfidf = {t: tf * idf[t] for t, tf in query_tf.items()}
+    scored = []
+    for sid, vec in vectors.items():
+        doc_tfidf = {t: tf * idf[t] for t, tf in vec.items()}
+        scored.append((sid, cosine_similarity(query_tfidf, doc_tfidf)))
+    return scored
+
+
+def _index_stats(cur: sqlite3.Cursor, cache: IndexCache | None = None) -> tuple[int, float]:
+    """(特徴量のある solution 数, 平均文書長)。"""
+    if cache is not None and cache.stats is not None:
+        return cache.stats
+    n, avgdl = cur.execute("SELECT COUNT(*), AVG(length) FROM solution_features").fetchone()
+    stats = (n or 0, avgdl or 1.0)
+    if cache is not None:
+        cache.stats = stats
+    return stats
+
+
+def _gram_frequencies(cur: sqlite3.Cursor, buckets: list[int], cache: IndexCache | None = None) -> dict[int, int]:
+    known = cache.gram_df if cache is not None else {}
+    df = {b: known[b] for b in buckets if b in known}
+    missing = [b for b in buckets if b not in known]
+    for chunk in _chunks(missing):
+        cur.execute(f"SELECT bucket, df FROM solution_gram_df WHERE bucket IN ({','.join('?' * len(chunk))})", chunk)
+        df.update(cur.fetchall())
+    if cache is not None:
+        cache.gram_df.update((b, df.get(b, 0)) for b in missing)
+    return df
+
+
+def _load_features(cur: sqlite3.Cursor, sids: list[int],
+                   cache: IndexCache | None = None) -> dict[int, tuple[int, array, array]]:
+    known = cache.features if cache is not None else {}
+    features = {sid: known[sid] for sid in sids if sid in known}
+    missing = [sid for sid in sids if sid not in known]
+    for chunk in _chunks(missing):
+        cur.execute(
+            f"SELECT solution_id, length, grams FROM solution_features WHERE solution_id IN ({','.join('?' * len(chunk))})",
+            chunk)
+        for sid, length, blob in cur.fetchall():
+            features[sid] = (length, *unpack_grams(blob))
+    if cache is not None:
+        cache.features.update((sid, features[sid]) for sid in missing if sid in features)
+    return features
+
+
+def _top_overlap(cur: sqlite3.Cursor, table: str, column: str, keys: list) -> list[int]:
+    """keys のどれかを持つ solution を、持っている数の多い順に HYBRID_CANDIDATES 件。"""
+    if not keys:
+        return []
+    cur.execute(
+        f"SELECT solution_id FROM {table} WHERE {column} IN ({','.join('?' * len(keys))}) "
+        "GROUP BY solution_id ORDER BY COUNT(*) DESC, solution_id LIMIT ?", (*keys, HYBRID_CANDIDATES))
+    return [r[0] for r in cur.fetchall()]
+
 
-    doc_tokens = [tokenize(row[1]) for row in rows]
-    all_docs = [query_tokens] + doc_tokens
-    idf = compute_idf(all_docs)
+def _rare(keys: list, df: dict, n: int, limit: int) -> list:
+    """df が COMMON_FRACTION 以下のものを df の小さい順に limit 個。なければ最も珍しい1つ。"""
+    present = sorted((k for k in keys if df.get(k, 0) > 0), key=lambda k: (df[k], k))
+    rare = [k for k in present if df[k] <= max(1, n * COMMON_FRACTION)]
+    return rare[:limit] if rare else present[:1]
 
-    query_tfidf = {t: tf * idf.get(t, 0) for t, tf in compute_tf(query_tokens).items()}
+
+def _bm25_idf(n: int, df: int) -> float:
+    return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+
+def _rank_hybrid(cur: sqlite3.Cursor, text: str, cache: IndexCache | None = None) -> list[tuple[int, float]]:
+    terms = sorted(set(tokenize(text)))
+    counts = char_grams(text)
+    if not terms and not counts:
+        return []
+    n, avgdl = _index_stats(cur, cache)
+    if not n:
+        return []
+    df = _document_frequencies(cur, terms, cache)
+    gram_df = _gram_frequencies(cur, sorted(counts), cache)
+
+    candidates = set(_top_overlap(cur, "solution_terms", "term", _rare(terms, df, n, _CHUNK)))
+    candidates.update(_top_overlap(cur, "solution_grams", "bucket", _rare(list(counts), gram_df, n, CANDIDATE_GRAMS)))
+    if not candidates:
+        return []
+    features = _load_features(cur, sorted(candidates), cache)
+    vectors = _load_vectors(cur, candidates, cache) if terms else {}
+
+    # 語: BM25 を「各語が平均的な長さの文書に1回出た時」の値 (= idf の和) で割って 0〜1 に収める
+    idf = {t: _bm25_idf(n, df.get(t, 0)) for t in terms}
+    idf_total = sum(idf.values())
+    # trigram: クエリ側にだけ idf を掛ける (文書側は書き込み時に正規化済み)
+    query = {b: (1 + math.log(c)) * _bm25_idf(n, gram_df.get(b, 0)) for b, c in counts.items()}
+    norm = math.sqrt(sum(w * w for w in query.values())) or 1.0
+
+    scored = []
+    for sid in sorted(features):
+        length, buckets, weights = features[sid]
+        grams = sum(query.get(b, 0.0) * w for b, w in zip(buckets, weights)) / norm
+        if not terms:
+            scored.append((sid, grams))
+            continue
+        vec = vectors.get(sid, {})
+        k = BM25_K1 * (1 - BM25_B + BM25_B * length / avgdl)
+        bm25 = 0.0
+        for t in terms:
+            tf = vec.get(t)
+            if tf:
+                c = tf * length
+                bm25 += idf[t] * c * (BM25_K1 + 1) / (c + k)
+        words = min(1.0, bm25 / idf_total) if idf_total > 0 else 0.0
+        scored.append((sid, (WORD_WEIGHT * words + GRAM_WEIGHT * grams) / (WORD_WEIGHT + GRAM_WEIGHT)))
+    return scored
+
+
+RANKERS = {"tfidf": _rank_tfidf, "hybrid": _rank_hybrid}
+
+
+def find_similar(error_text: str, threshold: float = 0.5, limit: int = 5,
+                 cache: IndexCache | None = None, ranker: str | None = None, archive: bool = False) -> list[dict]:
+    """エラーテキストに類似する既存solutionsを検索。cache を渡すと df などを検索をまたいで使い回す。
+
+    ranker は RANKERS の名前 (省略時は RANKER)。archive=True なら dev-archive.db に退避した solutions も
+    (tfidf で) 採点して混ぜる。退避分には "archived": True が付く。
+    """
+    rank = RANKERS[ranker or RANKER]
+    if not error_text or not error_text.strip():
+        return []
+    conn = open_index(cache)
+    cur = conn.cursor()
+    scored = [(sid, sim) for sid, sim in rank(cur, error_text, cache) if sim >= threshold]
+
+    rows = {}
+    for chunk in _chunks([sid for sid, _ in scored]):
+        cur.execute(
+            f"SELECT id, error_pattern, solution, score FROM solutions WHERE id IN ({','.join('?' * len(chunk))})",
+            chunk)
+        rows.update((r[0], r) for r in cur.fetchall())
+    conn.close()
 
     results = []
-    for i, row in enumerate(rows):
-        doc_tf = compute_tf(doc_tokens[i])
-        doc_tfidf = {t: tf * idf.get(t, 0) for t, tf in doc_tf.items()}
-        sim = cosine_similarity(query_tfidf, doc_tfidf)
-        if sim >= threshold:
+    for sid, sim in scored:
+        row = rows.get(sid)
+        if row:
             results.append({
                 "id": row[0],
                 "pattern": row[1],
@@ -80,67 +460,375 @@ def find_similar(error_text: str, threshold: float = 0.5, limit: int = 5) -> lis
                 "score": row[3],
                 "similarity": round(sim, 3),
             })
+    if archive:
+        import archive as archived
+        results.extend(archived.find_similar(error_text, threshold, limit, archived.path_for(DB)))
 
-    results.sort(key=lambda x: x["similarity"], reverse=True)
+    results.sort(key=lambda x: (x["similarity"], x["score"] or 0), reverse=True)
     return results[:limit]
 
 
-def merge_similar_solutions(threshold: float = 0.7):
-    """類似度が高いsolution同士をマージ。"""
-    conn = sqlite3.connect(DB)
+# ── 複数クエリの一括検索 ────────────────────────────────────
+# レビューの指摘など、まとめて届くテキストを1回の候補取得・IDF 計算で採点する。
+# IDF はクエリごとに「クエリ自身も1文書」と数えるので、クエリに出る語 (idf_q) とそれ以外 (idf) の
+# 2通りを用意し、文書ベクトルのノルムは idf のノルムにクエリと共有する語の差分を足して求める。
+# 結果は find_similar を1件ずつ呼んだ時と同じ (浮動小数の丸め誤差を除く)。
+
+# NumPy がある時、クエリがこの件数以上なら行列積で採点する (import に時間がかかるので少ない時は使わない)
+NUMPY_MIN_QUERIES = 8
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _score_python(query_tfs: list[dict], vectors: dict[int, dict[str, float]], idf: dict[str, float],
+                  idf_q: dict[str, float], threshold: float) -> list[dict[int, float]]:
+    """クエリごとに {solution_id: 類似度} (threshold 以上)。語 → solution の posting を辿って共有語だけ足す。"""
+    postings: dict[str, list[tuple[int, float]]] = {}
+    base = {}
+    for sid, vec in vectors.items():
+        base[sid] = sum((tf * idf[t]) ** 2 for t, tf in vec.items())
+        for t, tf in vec.items():
+            if t in idf_q:
+                postings.setdefault(t, []).append((sid, tf))
+
+    out = []
+    for query_tf in query_tfs:
+        qnorm = math.sqrt(sum((tf * idf_q[t]) ** 2 for t, tf in query_tf.items()))
+        dot: dict[int, float] = {}
+        extra: dict[int, float] = {}
+        for t, qtf in query_tf.items():
+            w = idf_q[t]
+            diff = w * w - idf[t] ** 2
+            for sid, tf in postings.get(t, ()):
+                dot[sid] = dot.get(sid, 0.0) + qtf * tf * w * w
+                extra[sid] = extra.get(sid, 0.0) + tf * tf * diff
+        sims = {}
+        for sid, d in dot.items():
+            norm2 = base[sid] + extra[sid]
+            sim = d / (qnorm * math.sqrt(norm2)) if qnorm > 0 and norm2 > 0 else 0.0
+            if sim >= threshold:
+                sims[sid] = sim
+        out.append(sims)
+    return out
+
+
+def _score_numpy(np, query_tfs: list[dict], vectors: dict[int, dict[str, float]], idf: dict[str, float],
+                 idf_q: dict[str, float], threshold: float) -> list[dict[int, float]]:
+    """_score_python と同じ結果を、クエリ行列 × 文書の疎行列 (クエリの語の列だけ) の積で求める。
+
+    文書側は (行, 列, tf) の非ゼロ要素だけを持ち、行ごとの和を np.add.reduceat で取る (scipy は使わない)。
+    """
+    terms = sorted(idf_q)
+    col = {t: i for i, t in enumerate(terms)}
+    q = np.zeros((len(query_tfs), len(terms)))
+    for i, query_tf in enumerate(query_tfs):
+        for t, tf in query_tf.items():
+            q[i, col[t]] = tf
+
+    sids, base, starts, cols, vals = [], [], [], [], []
+    for sid, vec in vectors.items():
+        entries = [(col[t], tf) for t, tf in vec.items() if t in col]
+        if not entries:
+            continue
+        sids.append(sid)
+        base.append(sum((tf * idf[t]) ** 2 for t, tf in vec.items()))
+        starts.append(len(cols))
+        for c, tf in entries:
+            cols.append(c)
+            vals.append(tf)
+    if not sids:
+        return [{} for _ in query_tfs]
+    cols = np.array(cols)
+    vals = np.array(vals)
+    w = np.array([idf_q[t] for t in terms])
+    diff = w * w - np.array([idf[t] ** 2 for t in terms])
+
+    # (クエリ数 × 非ゼロ要素数) を文書ごとに足し合わせる
+    present = q[:, cols] > 0
+    dot = np.add.reduceat(q[:, cols] * (vals * w[cols] ** 2), starts, axis=1)
+    extra = np.add.reduceat(present * (vals * vals * diff[cols]), starts, axis=1)
+    shared = np.add.reduceat(present.astype(np.int32), starts, axis=1) > 0
+    qnorm = np.sqrt(((q * w) ** 2).sum(axis=1))[:, None]
+    norm2 = np.array(base)[None, :] + extra
+    ok = shared & (qnorm > 0) & (norm2 > 0)
+    sim = np.zeros_like(dot)
+    np.divide(dot, qnorm * np.sqrt(np.where(ok, norm2, 1.0)), out=sim, where=ok)
+    hit = shared & (sim >= threshold)
+    return [{sids[j]: float(sim[i, j]) for j in np.flatnonzero(hit[i])} for i in range(len(query_tfs))]
+
+
+def find_similar_many(texts: list[str], threshold: float = 0.5, limit: int = 5,
+                      cache: IndexCache | None = None, use_numpy: bool | None = None,
+                      ranker: str | None = None) -> list[list[dict]]:
+    """texts それぞれに類似する既存solutions (texts と同じ順のリスト)。
+
+    候補の TF ベクトル・df・文書数は全クエリ分をまとめて1回だけ引き、各クエリの上位 limit 件は heap で選ぶ。
+    use_numpy=None なら NumPy があり texts が NUMPY_MIN_QUERIES 件以上の時だけ使う。
+    tfidf 以外のランカーは1件ずつ採点する (df・特徴量は IndexCache で使い回す)。
+    """
+    if (ranker or RANKER) != "tfidf":
+        cache = cache if cache is not None else IndexCache()
+        return [find_similar(text, threshold, limit, cache, ranker) for text in texts]
+    query_tfs = [compute_tf(tokenize(text)) for text in texts]
+    terms = sorted({t for query_tf in query_tfs for t in query_tf})
+    if not terms:
+        return [[] for _ in texts]
+
+    conn = open_index(cache)
+    cur = conn.cursor()
+    vectors = _candidate_vectors(cur, terms, cache)
+    if not vectors:
+        conn.close()
+        return [[] for _ in texts]
+
+    n = _document_count(cur, cache)
+    vocab = set(terms)
+    for vec in vectors.values():
+        vocab.update(vec)
+    df = _document_frequencies(cur, sorted(vocab), cache)
+    idf = {t: math.log(n / (1 + df.get(t, 0))) for t in vocab}
+    idf_q = {t: math.log(n / (2 + df.get(t, 0))) for t in terms}
+
+    np = _numpy() if use_numpy or (use_numpy is None and len(texts) >= NUMPY_MIN_QUERIES) else None
+    if np is not None:
+        scored = _score_numpy(np, query_tfs, vectors, idf, idf_q, threshold)
+    else:
+        scored = _score_python(query_tfs, vectors, idf, idf_q, threshold)
+
+    rows = {}
+    for chunk in _chunks(sorted({sid for sims in scored for sid in sims})):
+        cur.execute(
+            f"SELECT id, error_pattern, solution, score FROM solutions WHERE id IN ({','.join('?' * len(chunk))})",
+            chunk)
+        rows.update((r[0], r) for r in cur.fetchall())
+    conn.close()
+
+    results = []
+    for sims in scored:
+        # id 順に並べてから選ぶ (同じ類似度・score の並びを find_similar とそろえる)
+        hits = ({"id": row[0], "pattern": row[1], "solution": row[2], "score": row[3],
+                 "similarity": round(sims[sid], 3)}
+                for sid in sorted(sims) if (row := rows.get(sid)))
+        results.append(heapq.nlargest(limit, hits, key=lambda x: (x["similarity"], x["score"] or 0)))
+    return results
+
+
+# ── MinHash / LSH ───────────────────────────────────────────
+# 全ペア比較 (O(n²)) の代わりに、トークン集合の MinHash シグネチャを band に分割し、
+# 同じ bucket に落ちたペアだけを TF-IDF コサインで精査する。
+# rows_per_band = num_perm / bands で Jaccard しきい値 ≈ (1/bands)^(1/rows_per_band)。
+# band 数はマージのしきい値から決める (lsh_bands)。固定の 32 band (2行) だと Jaccard 0.18 程度の
+# ペアまで候補になり、bucket が大きくなって精査するペアが増える。
+
+MERGE_THRESHOLD = 0.7
+MINHASH_PERM = 64
+# Jaccard がちょうどしきい値のペアを候補にする確率の下限
+LSH_RECALL = 0.95
+_MERSENNE = (1 << 61) - 1
+
+
+def lsh_bands(threshold: float, num_perm: int = MINHASH_PERM) -> int:
+    """num_perm を割り切る band 数のうち、1 band の行数が最大のもの。
+
+    Jaccard = threshold のペアが 1 - (1 - threshold^rows)^bands ≥ LSH_RECALL で候補になる範囲で選ぶ
+    (num_perm=64 なら threshold 0.7 → 16 band × 4行、0.9 → 8 × 8)。
+    """
+    best = num_perm
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows == 0 and 1 - (1 - threshold ** rows) ** (num_perm // rows) >= LSH_RECALL:
+            best = num_perm // rows
+    return best
+
+
+def _perm_params(num_perm: int, seed: int = 1) -> list[tuple[int, int]]:
+    rng = random.Random(seed)
+    return [(rng.randrange(1, _MERSENNE), rng.randrange(0, _MERSENNE)) for _ in range(num_perm)]
+
+
+def minhash_signatures(doc_tokens: list[list[str]], num_perm: int = MINHASH_PERM) -> list[tuple | None]:
+    """各文書のMinHashシグネチャ。トークンが無い文書は None。
+
+    置換ハッシュは語彙ごとに1回だけ計算し、文書シグネチャはその要素ごとの min で作る。
+    """
+    params = _perm_params(num_perm)
+    token_sigs: dict[str, tuple] = {}
+    sigs = []
+    for tokens in doc_tokens:
+        vecs = []
+        for t in set(tokens):
+            vec = token_sigs.get(t)
+            if vec is None:
+                h = zlib.crc32(t.encode())
+                vec = tuple((a * h + b) % _MERSENNE for a, b in params)
+                token_sigs[t] = vec
+            vecs.append(vec)
+        sigs.append(tuple(map(min, *vecs)) if len(vecs) > 1 else (vecs[0] if vecs else None))
+    return sigs
+
+
+def lsh_buckets(signatures: list[tuple | None], bands: int) -> tuple[dict, list[list]]:
+    """シグネチャを band ごとにハッシュし、(bucket → 文書index) と 文書ごとの bucket key を返す。
+
+    bucket key は (band, band の値) のハッシュ値 (シグネチャの切り出しを持ち続けない)。
+    衝突しても候補が増えるだけで、コサインで精査するので結果は変わらない。
+    """
+    buckets: dict[tuple, list[int]] = {}
+    doc_keys: list[list] = []
+    for idx, sig in enumerate(signatures):
+        keys = []
+        if sig is not None:
+            rows_per_band = len(sig) // bands
+            for b in range(bands):
+                key = hash((b, sig[b * rows_per_band:(b + 1) * rows_per_band]))
+                buckets.setdefault(key, []).append(idx)
+                keys.append(key)
+        doc_keys.append(keys)
+    return buckets, doc_keys
+
+
+def _unit(vec: dict[str, float]) -> dict[str, float]:
+    norm = math.sqrt(sum(v * v for v in vec.values()))
+    return {t: v / norm for t, v in vec.items()} if norm else {}
+
+
+def plan_merges(rows: list[tuple], threshold: float = MERGE_THRESHOLD,
+                num_perm: int = MINHASH_PERM, bands: int | None = None) -> list[dict]:
+    """マージ計画を作成。rows は (id, error_pattern, success_count, score) を score 降順で。
+
+    スコアが高い行を keeper とし、LSH 候補のうちコサイン類似度が threshold 以上の行を吸収させる。
+    bands を省略するとしきい値から決める (lsh_bands)。
+    """
+    bands = bands or lsh_bands(threshold, num_perm)
+    if num_perm % bands:
+        raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+    doc_tokens = [tokenize(row[1] or "") for row in rows]
+    # 語の並びが同じ行は同じベクトル (類似度 1.0) なので、LSH と精査は代表 (先頭 = score 最大の行) だけで行う
+    groups: dict[tuple, list[int]] = {}
+    for i, tokens in enumerate(doc_tokens):
+        groups.setdefault(tuple(tokens), []).append(i)
+    reps = list(groups.values())
+    buckets, rep_keys = lsh_buckets(minhash_signatures([doc_tokens[g[0]] for g in reps], num_perm), bands)
+    idf = compute_idf(doc_tokens)
+    # 単位ベクトルにしておき、ペアごとの類似度は共通する語の内積だけで出す (cosine_similarity と同じ値)
+    vectors = [_unit({t: tf * idf.get(t, 0) for t, tf in compute_tf(doc_tokens[g[0]]).items()}) for g in reps]
+    del doc_tokens, groups, idf
+
+    merged = set()
+    clusters = []
+    for g, group in enumerate(reps):
+        if g in merged:
+            continue
+        found = [(j, 1.0) for j in group[1:]] if vectors[g] and threshold <= 1.0 else []
+        candidates = set()
+        for key in rep_keys[g]:
+            candidates.update(buckets[key])
+        for h in candidates:
+            if h <= g or h in merged:
+                continue
+            a, b = sorted((vectors[g], vectors[h]), key=len)
+            sim = sum(v * b[t] for t, v in a.items() if t in b)
+            if sim >= threshold:
+                merged.add(h)
+                found.extend((j, sim) for j in reps[h])
+        if found:
+            i = group[0]
+            clusters.append({"id": rows[i][0], "pattern": rows[i][1], "score": rows[i][3], "members": [
+                {"id": rows[j][0], "pattern": rows[j][1], "success_count": rows[j][2], "score": rows[j][3],
+                 "similarity": round(sim, 3)} for j, sim in sorted(found)]})
+    return clusters
+
+
+def print_merge_report(clusters: list[dict]):
+    """マージ予定クラスタの一覧を表示 (dry-run用)。"""
+    total = sum(len(c["members"]) for c in clusters)
+    print(f"Merge plan: {len(clusters)} clusters, {total} solutions to merge")
+    for c in clusters:
+        print(f"[#{c['id']} score={c['score']:.2f}] {c['pattern'][:80]}")
+        for m in c["members"]:
+            print(f"  ← #{m['id']} (sim={m['similarity']:.2f}, count={m['success_count']}) {m['pattern'][:70]}")
+
+
+def merge_similar_solutions(threshold: float = MERGE_THRESHOLD, dry_run: bool = False,
+                            num_perm: int = MINHASH_PERM, bands: int | None = None) -> list[dict]:
+    """類似度が高いsolution同士をマージ。dry_run=True ならDBは変更せず計画だけ返す。"""
+    conn = dis_db.connect(DB)
+    ensure_index(conn)
     cur = conn.cursor()
     cur.execute("SELECT id, error_pattern, success_count, score FROM solutions ORDER BY score DESC")
     rows = cur.fetchall()
 
     if len(rows) < 2:
         conn.close()
-        return
-
-    doc_tokens = [tokenize(row[1]) for row in rows]
-    idf = compute_idf(doc_tokens)
+        return []
 
-    merged_ids = set()
-    merge_count = 0
+    clusters = plan_merges(rows, threshold, num_perm, bands)
 
-    for i in range(len(rows)):
-        if rows[i][0] in merged_ids:
-            continue
-        tf_i = compute_tf(doc_tokens[i])
-        tfidf_i = {t: tf * idf.get(t, 0) for t, tf in tf_i.items()}
+    if dry_run:
+        conn.close()
+        print_merge_report(clusters)
+        return clusters
 
-        for j in range(i + 1, len(rows)):
-            if rows[j][0] in merged_ids:
-                continue
-            tf_j = compute_tf(doc_tokens[j])
-            tfidf_j = {t: tf * idf.get(t, 0) for t, tf in tf_j.items()}
-
-            sim = cosine_similarity(tfidf_i, tfidf_j)
-            if sim >= threshold:
-                # jをiにマージ（スコアが高い方に統合）
-                cur.execute(
-                    "UPDATE solutions SET success_count = success_count + ?, score = score + ? WHERE id = ?",
-                    (rows[j][2], rows[j][3] * 0.5, rows[i][0]),
-                )
-                cur.execute("DELETE FROM solutions WHERE id = ?", (rows[j][0],))
-                merged_ids.add(rows[j][0])
-                merge_count += 1
+    # 吸収される行の success_count と score の半分を keeper に統合
+    cur.executemany(
+        "UPDATE solutions SET success_count = success_count + ?, score = score + ? WHERE id = ?",
+        [(sum(m["success_count"] or 0 for m in c["members"]),
+          sum((m["score"] or 0) * 0.5 for m in c["members"]),
+          c["id"]) for c in clusters],
+    )
+    cur.executemany("DELETE FROM solutions WHERE id = ?", [(m["id"],) for c in clusters for m in c["members"]])
 
     conn.commit()
     conn.close()
-    print(f"Merged {merge_count} similar solutions")
+    print(f"Merged {sum(len(c['members']) for c in clusters)} similar solutions")
+    return clusters
+
+
+def _opt(args: list[str], name: str, default, cast=float):
+    if name in args:
+        idx = args.index(name)
+        if idx + 1 < len(args):
+            return cast(args[idx + 1])
+    return default
 
 
 if __name__ == "__main__":
     import sys
     if len(sys.argv) > 1 and sys.argv[1] == "--merge":
-        merge_similar_solutions()
+        args = sys.argv[2:]
+        merge_similar_solutions(
+            threshold=_opt(args, "--threshold", MERGE_THRESHOLD),
+            dry_run="--dry-run" in args,
+            num_perm=_opt(args, "--perm", MINHASH_PERM, int),
+            bands=_opt(args, "--bands", None, int),
+        )
+    elif len(sys.argv) > 1 and sys.argv[1] == "--reindex":
+        conn = dis_db.connect(DB)
+        count = rebuild_index(conn)
+        conn.close()
+        print(f"Indexed {count} solutions")
     elif len(sys.argv) > 1:
-        results = find_similar(" ".join(sys.argv[1:]))
+        args = sys.argv[1:]
+        ranker = _opt(args, "--ranker", None, str)
+        if ranker:
+            i = args.index("--ranker")
+            del args[i:i + 2]
+        include_archive = "--archive" in args
+        if include_archive:
+            args.remove("--archive")
+        results = find_similar(" ".join(args), ranker=ranker, archive=include_archive)
         for r in results:
-            print(f"[sim={r['similarity']:.2f} score={r['score']:.1f}] {r['pattern'][:80]}")
+            print(f"[sim={r['similarity']:.2f} score={r['score']:.1f}]{' (archived)' if r.get('archived') else ''} "
+                  f"{r['pattern'][:80]}")
             print(f"  → {r['solution'][:120]}")
             print()
         if not results:
             print("No similar solutions found.")
     else:
-        print("Usage: similarity.py <error_text>  |  similarity.py --merge")
+        print("Usage: similarity.py [--ranker tfidf|hybrid] [--archive] <error_text>  |  similarity.py --reindex\n"
+              "       similarity.py --merge [--threshold 0.7] [--dry-run] [--perm 64] [--bands N]")
@@ -1,14 +1,39 @@
 #!/usr/bin/env python3
 """DIS: ローカルSQLite ↔ Turso クラウド双方向同期。
 標準ライブラリのみ使用。Turso HTTP API (Hrana over HTTP) で通信。
+
+変更はトリガーでローカルの sync_changelog に (table, rowid, op, version) として記録し、
+前回確認済みの version 以降の差分だけを送受信する。UPDATE / DELETE も伝播する。
+リモート側は sync_log に同じ形式で記録し、各端末は自分の origin 以外の変更を pull する。
+
+テーブルごとに pull → push をスレッドプールで並行実行し、HTTP は keep-alive 接続を使い回す。
+pull / push ともに追いつくまでページ単位で繰り返す。
+push は複数行 INSERT (位置引数) にまとめ、同じ SQL はパイプライン内で store_sql して参照する。
+id 以外の一意キー (solutions の error_pattern, project など) が別端末の行と重なったら、
+ローカル行をリモート行へ畳み込んで (件数は合算) 1行にする。REPLACE で黙って消さない。
+.turso-env に TURSO_GZIP=1 (または --gzip) でリクエスト本文を gzip 圧縮する。
+
+Usage:
+  sync.py [--workers 4] [--gzip]   # pull → push
+  sync.py --ensure-schema  # changelog テーブル・トリガーを作成 (init-db.sh から呼ぶ)
 """
+import gzip
+import http.client
 import json
 import os
+import queue
+import re
 import sqlite3
 import sys
-import urllib.request
+import threading
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import dis_db
+import migrate
+
 DB = os.path.expanduser("~/.claude/intelligence/dev.db")
 ENV_FILE = os.path.expanduser("~/.claude/intelligence/.turso-env")
 
@@ -47,9 +72,127 @@ TABLES = {
                    "tags", "status", "resolved_at", "score", "last_seen"],
 }
 
+# id 以外に一意キーを持つテーブル。別端末が同じキーの行を別 id で作ると、そのままでは id で upsert できない
+NATURAL_KEYS = {"solutions": ("error_pattern", "project"), "industry_feeds": ("url",)}
+# 同じキーの行を畳み込む時に合算する列 / 大きい方を取る列 (それ以外はリモートの値、NULL ならローカルの値)
+MERGE_SUM = {"solutions": ("success_count", "fail_count")}
+MERGE_MAX = {"solutions": ("score", "last_used"), "industry_feeds": ("analyzed", "relevant")}
+
+# 1ページで読む変更数 (pull / push とも、追いつくまでページを繰り返す)
+PAGE_SIZE = 500
+# 送信バッチの目標ペイロードサイズ (bytes)。失敗で半減、成功で 1.5 倍 (上限あり)
+BATCH_BYTES = 256 * 1024
+MIN_BATCH_BYTES = 16 * 1024
+MAX_BATCH_BYTES = 2 * 1024 * 1024
+# 並行同期するテーブル数
+WORKERS = 4
+# push の1ステートメントに載せる最大行数。バインド変数は古い SQLite の上限 (999) 内に収める
+MULTIROW_MAX = 100
+MAX_VARIABLES = 999
+
+# ── Change Tracking ──────────────────────────────────
+
+# sync_meta / sync_changelog / sync_state は migrations/0006_sync_changelog.sql で作成する。
+# sync_state.applying = '1' の間 (pull の適用中) はトリガーが記録しない。
+# op: I=未 push の新規行 / U=更新 / D=削除。
+# 未 push の新規行は更新されても I のまま、削除されたらエントリごと消す (リモートに存在しないため)。
+# UPDATE は同期する列 ({cols}) の変更だけ記録する (events.aggregated のような端末ごとの列は送らない)。
+TRIGGER_DDL = """
+CREATE TRIGGER IF NOT EXISTS trg_sync_{t}_ins AFTER INSERT ON {t}
+WHEN NOT EXISTS (SELECT 1 FROM sync_state WHERE key = 'applying' AND value = '1') BEGIN
+  INSERT OR REPLACE INTO sync_changelog(table_name, row_id, op) VALUES ('{t}', new.id, 'I');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_sync_{t}_upd AFTER UPDATE OF {cols} ON {t}
+WHEN NOT EXISTS (SELECT 1 FROM sync_state WHERE key = 'applying' AND value = '1') BEGIN
+  INSERT OR REPLACE INTO sync_changelog(table_name, row_id, op)
+    SELECT '{t}', old.id, 'D' WHERE old.id != new.id;
+  INSERT OR REPLACE INTO sync_changelog(table_name, row_id, op) VALUES ('{t}', new.id,
+    CASE WHEN EXISTS (SELECT 1 FROM sync_changelog
+                      WHERE table_name = '{t}' AND row_id = new.id AND op = 'I') THEN 'I' ELSE 'U' END);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_sync_{t}_del AFTER DELETE ON {t}
+WHEN NOT EXISTS (SELECT 1 FROM sync_state WHERE key = 'applying' AND value = '1') BEGIN
+  INSERT OR REPLACE INTO sync_changelog(table_name, row_id, op)
+    SELECT '{t}', old.id, 'D' WHERE NOT EXISTS (
+      SELECT 1 FROM sync_changelog WHERE table_name = '{t}' AND row_id = old.id AND op = 'I');
+  DELETE FROM sync_changelog WHERE table_name = '{t}' AND row_id = old.id AND op = 'I';
+END;
+"""
+
+# リモートの変更ログ。(table_name, row_id) ごとに最新の1件だけ残り、更新のたびに version が進む。
+REMOTE_DDL = ["""CREATE TABLE IF NOT EXISTS sync_log (
+  version INTEGER PRIMARY KEY AUTOINCREMENT,
+  table_name TEXT NOT NULL,
+  row_id INTEGER NOT NULL,
+  op TEXT NOT NULL,
+  origin TEXT NOT NULL,
+  UNIQUE (table_name, row_id)
+)""", "CREATE INDEX IF NOT EXISTS idx_sync_log_table ON sync_log(table_name, version)"]
+
+
+def local_tables(cur) -> list[str]:
+    """ローカルに存在する同期対象テーブル。"""
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    existing = {r[0] for r in cur.fetchall()}
+    return [t for t in TABLES if t in existing]
+
+
+def get_state(cur, key: str, default: str | None = None) -> str | None:
+    cur.execute("SELECT value FROM sync_state WHERE key = ?", (key,))
+    row = cur.fetchone()
+    return row[0] if row else default
+
+
+def set_state(cur, key: str, value):
+    cur.execute("INSERT OR REPLACE INTO sync_state(key, value) VALUES(?, ?)", (key, str(value)))
+
+
+def set_applying(cur, on: bool):
+    """pull した変更の適用中はトリガーを止める (リモートへのエコーを防ぐ)。
+
+    適用と同じトランザクション内で切り替えるので、途中で失敗しても rollback で '0' に戻る。
+    """
+    set_state(cur, "applying", "1" if on else "0")
+
+
+def ensure_changelog(conn: sqlite3.Connection) -> int:
+    """同期対象テーブルに changelog のトリガーを張る。
+
+    トリガーを新しく張るテーブルは、旧方式 (id の high-water mark) で未 push の行を
+    changelog に積んでおく。新規にトリガーを張ったテーブル数を返す。
+    """
+    migrate.ensure(conn)
+    cur = conn.cursor()
+    cur.execute("SELECT name, sql FROM sqlite_master WHERE type='trigger' AND name LIKE 'trg_sync_%'")
+    triggers = dict(cur.fetchall())
+    created = 0
+    for table in local_tables(cur):
+        ddl = TRIGGER_DDL.format(t=table, cols=", ".join(TABLES[table]))
+        if f"trg_sync_{table}_ins" in triggers:
+            # 全列の UPDATE を記録していた旧形式のトリガーを張り替える
+            if "UPDATE OF" not in (triggers.get(f"trg_sync_{table}_upd") or ""):
+                cur.execute(f"DROP TRIGGER IF EXISTS trg_sync_{table}_upd")
+                cur.executescript(ddl)
+            continue
+        cur.executescript(ddl)
+        cur.execute("SELECT last_sync_id FROM sync_meta WHERE table_name = ?", (table,))
+        row = cur.fetchone()
+        cur.execute(
+            f"INSERT OR IGNORE INTO sync_changelog(table_name, row_id, op) "
+            f"SELECT ?, id, 'I' FROM {table} WHERE id > ? ORDER BY id",
+            (table, (row[0] or 0) if row else 0))
+        created += 1
+    if get_state(cur, "origin") is None:
+        set_state(cur, "origin", uuid.uuid4().hex)
+    conn.commit()
+    return created
+
+
+# ── Turso HTTP ──────────────────────────────────
+
 
-def load_env() -> tuple[str, str]:
-    """Turso URL とトークンを .turso-env から読み込み。"""
+def load_env() -> tuple[str, str, bool]:
+    """Turso URL・トークン・gzip 指定を .turso-env から読み込み。"""
     env = {}
     with open(ENV_FILE) as f:
         for line in f:
@@ -64,220 +207,719 @@ def load_env() -> tuple[str, str]:
         sys.exit(1)
     # libsql:// → https:// 変換
     http_url = url.replace("libsql://", "https://")
-    return http_url, token
-
+    return http_url, token, env.get("TURSO_GZIP", "") in ("1", "true")
+
+
+class HranaClient:
+    """Turso HTTP API (/v3/pipeline) クライアント。
+
+    keep-alive 接続をプールして使い回す (TLS ハンドシェイクは接続ごとに1回だけ)。
+    スレッドから同時に呼んでよい。batch_bytes は送信バッチの目標サイズで、
+    失敗すると半分に、成功が続くと MAX_BATCH_BYTES まで広がる。
+    gzip=True ならリクエスト本文を圧縮し、圧縮されたレスポンスも受け付ける。
+    """
+
+    def __init__(self, http_url: str, token: str, pool_size: int = 4, timeout: float = 15,
+                 keepalive: bool = True, gzip: bool = False):
+        parts = urllib.parse.urlsplit(http_url)
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path.rstrip("/") + "/v3/pipeline"
+        self.token = token
+        self.timeout = timeout
+        self.keepalive = keepalive
+        self.gzip = gzip
+        self.batch_bytes = BATCH_BYTES
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "connections": 0, "bytes_sent": 0, "bytes_received": 0}
+
+    def _count(self, **kw):
+        with self._lock:
+            for k, v in kw.items():
+                self.stats[k] += v
+
+    def _connect(self):
+        self._count(connections=1)
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _release(self, conn):
+        if not self.keepalive:
+            conn.close()
+            return
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
 
-def turso_execute(http_url: str, token: str, statements: list[dict]) -> list[dict]:
-    """Turso HTTP API でステートメントを実行。"""
-    payload = json.dumps({"requests": statements}).encode()
-    req = urllib.request.Request(
-        f"{http_url}/v3/pipeline",
-        data=payload,
-        headers={
-            "Authorization": f"Bearer {token}",
+    def _post(self, conn, payload: bytes) -> tuple[bytes, int]:
+        headers = {
+            "Authorization": f"Bearer {self.token}",
             "Content-Type": "application/json",
-        },
-        method="POST",
-    )
-    try:
-        with urllib.request.urlopen(req, timeout=15) as resp:
-            return json.loads(resp.read().decode())
-    except Exception as e:
-        print(f"Turso API error: {e}")
+        }
+        if self.gzip:
+            headers["Content-Encoding"] = "gzip"
+            headers["Accept-Encoding"] = "gzip"
+        conn.request("POST", self.path, body=payload, headers=headers)
+        resp = conn.getresponse()
+        body = resp.read()
+        wire = len(body)
+        if resp.getheader("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        if resp.status != 200:
+            raise RuntimeError(f"HTTP {resp.status}: {body[:200].decode(errors='replace')}")
+        return body, wire
+
+    def execute(self, statements: list[dict], tally: dict | None = None) -> dict:
+        """ステートメント列を1リクエストで実行。通信エラー時は {}。
+
+        tally を渡すと、このリクエストの送信バイト数 (圧縮後) を tally["bytes_sent"] に加算する。
+        """
+        payload = json.dumps({"requests": statements}, separators=(",", ":")).encode()
+        if self.gzip:
+            payload = gzip.compress(payload, compresslevel=6)
+        if tally is not None:
+            tally["bytes_sent"] = tally.get("bytes_sent", 0) + len(payload)
+        # プール内の接続はサーバー側で切られていることがあるので、接続エラーは新しい接続で1回だけ再試行
+        for attempt in range(2):
+            conn = self._acquire() if attempt == 0 else self._connect()
+            try:
+                body, wire = self._post(conn, payload)
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                if attempt == 0 and not isinstance(e, TimeoutError):
+                    continue
+                self._count(requests=1, errors=1, bytes_sent=len(payload))
+                print(f"Turso API error: {e}")
+                return {}
+            except RuntimeError as e:
+                conn.close()
+                self._count(requests=1, errors=1, bytes_sent=len(payload))
+                print(f"Turso API error: {e}")
+                return {}
+            self._release(conn)
+            self._count(requests=1, bytes_sent=len(payload), bytes_received=wire)
+            return json.loads(body)
         return {}
 
+    def shrink(self):
+        self.batch_bytes = max(MIN_BATCH_BYTES, self.batch_bytes // 2)
+
+    def grow(self):
+        self.batch_bytes = min(MAX_BATCH_BYTES, self.batch_bytes * 3 // 2)
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def encode_value(v) -> dict:
+    """Python 値 → Hrana の値表現。"""
+    if v is None:
+        return {"type": "null"}
+    if isinstance(v, int):
+        return {"type": "integer", "value": str(v)}
+    if isinstance(v, float):
+        return {"type": "float", "value": v}
+    return {"type": "text", "value": str(v)}
+
+
+def decode_value(cell: dict):
+    """Hrana の値表現 → Python 値。"""
+    if cell["type"] == "null":
+        return None
+    if cell["type"] == "integer":
+        return int(cell["value"])
+    if cell["type"] == "float":
+        return float(cell["value"])
+    return cell["value"]
+
+
+def execute_stmt(sql: str, args=()) -> dict:
+    return {"type": "execute", "stmt": {"sql": sql, "args": [encode_value(a) for a in args]}}
+
+
+def store_repeated_sql(requests: list[dict]) -> tuple[list[dict], list[dict]]:
+    """パイプライン内で2回以上使う SQL を store_sql し、execute は sql_id で参照させる。
+
+    (先頭に置く store_sql リクエスト, 書き換えた requests) を返す。
+    """
+    counts: dict[str, int] = {}
+    for r in requests:
+        sql = r.get("stmt", {}).get("sql")
+        if sql is not None:
+            counts[sql] = counts.get(sql, 0) + 1
+    ids = {sql: i + 1 for i, sql in enumerate(sql for sql, n in counts.items() if n > 1)}
+    if not ids:
+        return [], requests
+    stores = [{"type": "store_sql", "sql_id": i, "sql": sql} for sql, i in ids.items()]
+    out = []
+    for r in requests:
+        sql = r.get("stmt", {}).get("sql")
+        if sql in ids:
+            r = {"type": "execute", "stmt": {"sql_id": ids[sql], "args": r["stmt"]["args"]}}
+        out.append(r)
+    return stores, out
+
+
+BEGIN = execute_stmt("BEGIN")
+COMMIT = execute_stmt("COMMIT")
+CLOSE = {"type": "close"}
+
+
+def result_ok(result: dict, i: int) -> bool:
+    try:
+        return result["results"][i]["type"] == "ok"
+    except (KeyError, IndexError, TypeError):
+        return False
 
-def push_table(local_cur, http_url: str, token: str, table: str, cols: list[str]):
-    """ローカルの新規レコードをTursoにpush。"""
-    local_cur.execute(f"SELECT last_sync_id FROM sync_meta WHERE table_name = ?", (table,))
-    row = local_cur.fetchone()
-    last_id = row[0] if row else 0
-
-    local_cur.execute(f"SELECT {','.join(cols)} FROM {table} WHERE id > ? ORDER BY id", (last_id,))
-    rows = local_cur.fetchall()
-    if not rows:
-        return 0
-
-    statements = []
-    max_id = last_id
-    for row in rows:
-        placeholders = ",".join(["?" for _ in cols])
-        col_names = ",".join(cols)
-        # Turso HTTP API format
-        args = []
-        for v in row:
-            if v is None:
-                args.append({"type": "null"})
-            elif isinstance(v, int):
-                args.append({"type": "integer", "value": str(v)})
-            elif isinstance(v, float):
-                args.append({"type": "float", "value": v})
-            else:
-                args.append({"type": "text", "value": str(v)})
-
-        stmt = {
-            "type": "execute",
-            "stmt": {
-                "sql": f"INSERT OR REPLACE INTO {table}({col_names}) VALUES({placeholders})",
-                "args": args,
-            },
-        }
-        statements.append(stmt)
-        if row[0] > max_id:
-            max_id = row[0]
-
-    # バッチ実行 (50件ずつ)
-    pushed = 0
-    for i in range(0, len(statements), 50):
-        batch = statements[i:i+50]
-        batch.append({"type": "close"})
-        result = turso_execute(http_url, token, batch)
-        if result:
-            pushed += len(batch) - 1  # close を除く
-
-    # sync_meta 更新
-    if pushed > 0:
-        now = datetime.utcnow().isoformat()
-        local_cur.execute(
-            "UPDATE sync_meta SET last_sync_id = ?, last_sync_ts = ? WHERE table_name = ?",
-            (max_id, now, table),
-        )
-
-    return pushed
-
-
-def pull_table(local_cur, http_url: str, token: str, table: str, cols: list[str]):
-    """Tursoからローカルにないレコードをpull。"""
-    local_cur.execute(f"SELECT MAX(id) FROM {table}")
-    local_max = local_cur.fetchone()[0] or 0
-
-    # リモートの max(id) を取得
-    result = turso_execute(http_url, token, [
-        {"type": "execute", "stmt": {"sql": f"SELECT MAX(id) FROM {table}", "args": []}},
-        {"type": "close"},
-    ])
-
-    if not result or "results" not in result:
-        return 0
 
+def result_rows(result: dict, i: int) -> list[list] | None:
+    """i 番目のステートメントの結果行 (デコード済み)。エラーなら None。"""
+    if not result_ok(result, i):
+        return None
     try:
-        remote_max_row = result["results"][0]["response"]["result"]["rows"]
-        remote_max = int(remote_max_row[0][0]["value"]) if remote_max_row and remote_max_row[0][0]["value"] else 0
-    except (KeyError, IndexError, TypeError, ValueError):
-        return 0
-
-    if remote_max <= local_max:
+        rows = result["results"][i]["response"]["result"]["rows"]
+    except (KeyError, TypeError):
+        return None
+    return [[decode_value(c) for c in row] for row in rows]
+
+
+def send_batched(client: HranaClient, groups: list[tuple], tally: dict | None = None) -> tuple[list, bool]:
+    """(key, [stmt, ...]) の列をペイロードのバイト数で区切って送る。
+
+    各バッチは BEGIN / COMMIT で囲み、リモート側のコミットをバッチ単位にまとめる。
+    バッチ内で繰り返す SQL は store_sql で1回だけ送る。
+    グループ内のステートメントが全て成功した key のリストと、全件成功したかを返す。
+    リクエスト自体が失敗したらバッチを縮めて再送し、COMMIT が失敗したら打ち切る。
+    """
+    sizes = [sum(len(json.dumps(s)) for s in stmts) for _, stmts in groups]
+    done, all_ok = [], True
+    i = 0
+    while i < len(groups):
+        j, size = i, 0
+        while j < len(groups) and (j == i or size + sizes[j] <= client.batch_bytes):
+            size += sizes[j]
+            j += 1
+        stmts = [s for _, group in groups[i:j] for s in group]
+        stores, requests = store_repeated_sql([BEGIN] + stmts + [COMMIT])
+        result = client.execute(stores + requests + [CLOSE], tally)
+        if not result:
+            if j - i > 1 and client.batch_bytes > MIN_BATCH_BYTES:
+                client.shrink()
+                continue
+            return done, False
+        if not result_ok(result, len(stores) + len(stmts) + 1):
+            return done, False
+        client.grow()
+        pos = len(stores) + 1
+        for key, stmts in groups[i:j]:
+            if all(result_ok(result, pos + k) for k in range(len(stmts))):
+                done.append(key)
+            else:
+                all_ok = False
+            pos += len(stmts)
+        i = j
+    return done, all_ok
+
+
+# ── Pull ──────────────────────────────────
+
+
+def upsert_sql(table: str, cols: list[str], rows: int = 1) -> str:
+    """push 用の id で upsert する INSERT。id 以外の一意キーが衝突したら (REPLACE と違い) 行を消さずにエラーにする。"""
+    per_row = "(" + ",".join("?" for _ in cols) + ")"
+    return (f"INSERT INTO {table}({','.join(cols)}) VALUES {','.join(per_row for _ in range(rows))} "
+            f"ON CONFLICT(id) DO UPDATE SET {','.join(f'{c}=excluded.{c}' for c in cols[1:])}")
+
+
+def forget_row(cur, table: str, row_id: int):
+    """applying 中に消した行を changelog に反映する (未 push の I はエントリごと消し、それ以外は D)。"""
+    cur.execute("SELECT op FROM sync_changelog WHERE table_name = ? AND row_id = ?", (table, row_id))
+    pending = cur.fetchone()
+    if pending and pending[0] == "I":
+        cur.execute("DELETE FROM sync_changelog WHERE table_name = ? AND row_id = ?", (table, row_id))
+    else:
+        cur.execute("INSERT OR REPLACE INTO sync_changelog(table_name, row_id, op) VALUES(?, ?, 'D')",
+                    (table, row_id))
+
+
+def merge_duplicate(cur, table: str, cols: list[str], values: list, merges: list | None = None) -> list:
+    """リモートの行 values と同じ一意キーを別 id で持つローカル行を values に畳み込み、ローカル行を消す。
+
+    畳み込んだら、リモートにも合算後の値を送るよう values の id を U で記録する。
+    applying 中 (トリガーが記録しない) に呼ぶ。書き込む値を返す。
+    """
+    key = NATURAL_KEYS.get(table)
+    row = dict(zip(cols, values))
+    if not key or any(row[c] is None for c in key):
+        return values  # NULL は一意索引で衝突しない
+    cur.execute(f"SELECT {','.join(cols)} FROM {table} WHERE {' AND '.join(f'{c} = ?' for c in key)} AND id != ?",
+                [row[c] for c in key] + [row["id"]])
+    local = cur.fetchone()
+    if local is None:
+        return values
+    local = dict(zip(cols, local))
+    for c in cols[1:]:
+        if c in MERGE_SUM.get(table, ()):
+            row[c] = (row[c] or 0) + (local[c] or 0)
+        elif c in MERGE_MAX.get(table, ()):
+            row[c] = max((v for v in (row[c], local[c]) if v is not None), default=None)
+        elif row[c] is None:
+            row[c] = local[c]
+    cur.execute(f"DELETE FROM {table} WHERE id = ?", (local["id"],))
+    forget_row(cur, table, local["id"])
+    cur.execute("INSERT OR REPLACE INTO sync_changelog(table_name, row_id, op) VALUES(?, ?, 'U')",
+                (table, row["id"]))
+    if merges is not None:
+        merges.append((local["id"], row["id"]))
+    return [row[c] for c in cols]
+
+
+def apply_row(cur, table: str, cols: list[str], values: list, merges: list | None = None):
+    """リモートの行を id で書き込む。同じ一意キーのローカル行があれば先に畳み込む。
+
+    ローカルは UPDATE → なければ INSERT にする (upsert の ON CONFLICT はトリガー内の INSERT OR IGNORE を上書きする)。
+    """
+    values = merge_duplicate(cur, table, cols, values, merges)
+    cur.execute(f"UPDATE {table} SET {','.join(f'{c} = ?' for c in cols[1:])} WHERE id = ?", (*values[1:], values[0]))
+    if cur.rowcount == 0:
+        cur.execute(f"INSERT INTO {table}({','.join(cols)}) VALUES({','.join('?' for _ in cols)})", values)
+
+
+def relocate_row(cur, table: str, cols: list[str], row_id: int, new_id: int):
+    """未 push の新規行をリモートと衝突しない id へ移す (autoincrement の競合解消)。
+
+    コピーを作ると一意キーが重なるので、消してから新しい id で入れ直す (索引のトリガーもそのまま追従する)。
+    同期しない列 (events.aggregated など) も元の値のまま移す。
+    """
+    names = [r[1] for r in cur.execute(f"PRAGMA table_info({table})").fetchall()]
+    cur.execute(f"SELECT {','.join(names)} FROM {table} WHERE id = ?", (row_id,))
+    row = cur.fetchone()
+    cur.execute("DELETE FROM sync_changelog WHERE table_name = ? AND row_id = ?", (table, row_id))
+    if row is None:
+        return
+    values = dict(zip(names, row), id=new_id)
+    cur.execute(f"DELETE FROM {table} WHERE id = ?", (row_id,))
+    cur.execute(f"INSERT INTO {table}({','.join(cols)}) VALUES({','.join('?' for _ in cols)})",
+                [values[c] for c in cols])
+    # 挿入時のトリガー (pull した行の印付けなど) の後で、同期しない列を戻す
+    local = [n for n in names if n not in cols]
+    if local:
+        cur.execute(f"UPDATE {table} SET {','.join(f'{n} = ?' for n in local)} WHERE id = ?",
+                    [values[n] for n in local] + [new_id])
+    cur.execute("INSERT OR REPLACE INTO sync_changelog(table_name, row_id, op) VALUES(?, ?, 'I')",
+                (table, new_id))
+
+
+def remote_max_id(client: HranaClient, table: str) -> int:
+    rows = result_rows(client.execute([execute_stmt(f"SELECT MAX(id) FROM {table}"), CLOSE]), 0)
+    return (rows[0][0] or 0) if rows else 0
+
+
+def apply_changes(conn, client: HranaClient, table: str, changes: list[tuple], merges: list | None = None) -> int:
+    """pull した変更 (row_id, op, values) を適用。適用件数を返す。
+
+    ローカルに未 push の変更がある行はローカルを優先する (この後の push でリモートを上書き)。
+    ただし未 push の新規行が別端末の行と同じ id を取っていた場合 (ts が異なる) は、
+    ローカル行を空き id へ移してからリモート行を取り込む。一意キーも同じなら、移した行はそのまま
+    リモート行へ畳み込まれる (merge_duplicate)。
+    """
+    cols = TABLES[table]
+    cur = conn.cursor()
+    # 先に読み取りだけで方針を決める (書き込みロック中に通信しない)
+    plan = []
+    for row_id, op, values in changes:
+        cur.execute("SELECT op FROM sync_changelog WHERE table_name = ? AND row_id = ?", (table, row_id))
+        pending = cur.fetchone()
+        if not pending:
+            plan.append((row_id, op, values, False))
+            continue
+        if op == "D" or pending[0] != "I":
+            continue
+        cur.execute(f"SELECT ts FROM {table} WHERE id = ?", (row_id,))
+        local = cur.fetchone()
+        if not local or local[0] != values[1]:
+            plan.append((row_id, op, values, True))
+    if not plan:
         return 0
+    next_id = None
+    if any(relocate for *_, relocate in plan):
+        cur.execute(f"SELECT MAX(id) FROM {table}")
+        next_id = max(cur.fetchone()[0] or 0, remote_max_id(client, table))
+
+    set_applying(cur, True)
+    for row_id, op, values, relocate in plan:
+        if relocate:
+            next_id += 1
+            relocate_row(cur, table, cols, row_id, next_id)
+        if op == "D":
+            cur.execute(f"DELETE FROM {table} WHERE id = ?", (row_id,))
+        else:
+            apply_row(cur, table, cols, values, merges)
+    set_applying(cur, False)
+    conn.commit()
+    return len(plan)
 
-    # ローカルにない分をpull
-    col_names = ",".join(cols)
-    result = turso_execute(http_url, token, [
-        {"type": "execute", "stmt": {
-            "sql": f"SELECT {col_names} FROM {table} WHERE id > ? ORDER BY id LIMIT 500",
-            "args": [{"type": "integer", "value": str(local_max)}],
-        }},
-        {"type": "close"},
-    ])
-
-    if not result or "results" not in result:
-        return 0
 
-    try:
-        rows = result["results"][0]["response"]["result"]["rows"]
-    except (KeyError, IndexError):
-        return 0
+def pull_changes(conn, client: HranaClient, table: str, merges: list | None = None) -> tuple[int, bool]:
+    """リモート sync_log から前回確認済み version 以降の他端末の変更を、追いつくまでページ単位で取り込む。
 
+    (適用件数, 最後まで成功したか) を返す。version はテーブルごとに記録する。
+    """
+    cur = conn.cursor()
+    origin = get_state(cur, "origin")
+    key = f"pulled_version:{table}"
+    cols = TABLES[table]
     pulled = 0
+    while True:
+        since = int(get_state(cur, key) or get_state(cur, "pulled_version") or 0)
+        # 自端末の変更は行データを JOIN しない (version を進めるためだけに読む)
+        result = client.execute([execute_stmt(
+            f"SELECT l.version, l.row_id, l.op, l.origin, {','.join('t.' + c for c in cols)} "
+            f"FROM sync_log l LEFT JOIN {table} t ON t.id = l.row_id AND l.origin != ? "
+            f"WHERE l.table_name = ? AND l.version > ? ORDER BY l.version LIMIT ?",
+            (origin, table, since, PAGE_SIZE)), CLOSE])
+        rows = result_rows(result, 0)
+        if rows is None:
+            return pulled, False
+        if not rows:
+            return pulled, True
+        changes = []
+        for version, row_id, op, row_origin, *values in rows:
+            if row_origin == origin or (op != "D" and values[0] is None):
+                continue  # 自端末の変更 / ログ取得後に削除された行 (D が後続の version で届く)
+            changes.append((row_id, op, values))
+        pulled += apply_changes(conn, client, table, changes, merges)
+        set_state(cur, key, rows[-1][0])
+        conn.commit()
+        if len(rows) < PAGE_SIZE:
+            return pulled, True
+
+
+def catch_up_table(conn, client: HranaClient, table: str, merges: list | None = None) -> int:
+    """旧方式 (id の high-water mark) で同期されたリモート行を取り込む。初回のみ実行。
+
+    sync_log に載っている行は pull_changes で届くので除外する。
+    """
+    cur = conn.cursor()
+    cols = TABLES[table]
+    cur.execute(f"SELECT MAX(id) FROM {table}")
+    last = cur.fetchone()[0] or 0
+    pulled = 0
+    while True:
+        rows = result_rows(client.execute([execute_stmt(
+            f"SELECT {','.join(cols)} FROM {table} WHERE id > ? AND id NOT IN "
+            f"(SELECT row_id FROM sync_log WHERE table_name = ?) ORDER BY id LIMIT ?", (last, table, PAGE_SIZE)),
+            CLOSE]), 0)
+        if not rows:
+            return pulled
+        set_applying(cur, True)
+        for values in rows:
+            try:
+                apply_row(cur, table, cols, values, merges)
+                pulled += 1
+            except sqlite3.Error:
+                continue
+        set_applying(cur, False)
+        conn.commit()
+        last = rows[-1][0]
+        if len(rows) < PAGE_SIZE:
+            return pulled
+
+
+# ── Push ──────────────────────────────────
+
+
+def _log_stmt(table: str, changes: list[tuple[int, str]], origin: str) -> dict:
+    """sync_log への複数行 INSERT。table / origin は番号付き引数で1回だけ送る。"""
+    values = ",".join(f"(?1,?{3 + 2 * i},?{4 + 2 * i},?2)" for i in range(len(changes)))
+    args = [table, origin] + [v for change in changes for v in change]
+    return execute_stmt(f"INSERT OR REPLACE INTO sync_log(table_name, row_id, op, origin) VALUES {values}", args)
+
+
+def row_groups(table: str, changes: list[tuple], origin: str) -> list[tuple]:
+    """1変更 = 1 INSERT / DELETE + 1 ログ行の送信グループ (旧形式、比較用)。"""
+    upsert = upsert_sql(table, TABLES[table])
+    groups = []
+    for version, row_id, op, row in changes:
+        data = execute_stmt(f"DELETE FROM {table} WHERE id = ?", (row_id,)) if op == "D" \
+            else execute_stmt(upsert, row)
+        groups.append(([version], [data, _log_stmt(table, [(row_id, op)], origin)]))
+    return groups
+
+
+def multirow_groups(table: str, changes: list[tuple], origin: str) -> list[tuple]:
+    """変更を複数行 INSERT / DELETE ... IN (...) にまとめた送信グループ。
+
+    1グループ = データ1ステートメント + ログ1ステートメント。同じ行数のチャンクは SQL が同一になり、
+    send_batched で store_sql にまとまる。削除を先に送る (消した行の一意キーを別の行が引き継いでいることがある)。
+    """
+    cols = TABLES[table]
+    size = max(1, min(MULTIROW_MAX, MAX_VARIABLES // len(cols), (MAX_VARIABLES - 2) // 2))
+    upserts = [c for c in changes if c[2] != "D"]
+    deletes = [c for c in changes if c[2] == "D"]
+    groups = []
+    for i in range(0, len(deletes), size):
+        chunk = deletes[i:i + size]
+        data = execute_stmt(f"DELETE FROM {table} WHERE id IN ({','.join('?' for _ in chunk)})",
+                            [c[1] for c in chunk])
+        groups.append(([c[0] for c in chunk], [data, _log_stmt(table, [(c[1], "D") for c in chunk], origin)]))
+    for i in range(0, len(upserts), size):
+        chunk = upserts[i:i + size]
+        data = execute_stmt(upsert_sql(table, cols, len(chunk)), [v for *_, row in chunk for v in row])
+        groups.append(([c[0] for c in chunk], [data, _log_stmt(table, [(c[1], c[2]) for c in chunk], origin)]))
+    return groups
+
+
+ENCODINGS = {"row": row_groups, "multirow": multirow_groups}
+
+
+def resolve_conflicts(conn, client: HranaClient, table: str, rows: list, merges: list | None = None) -> int:
+    """push できなかった行と同じ一意キーを別 id で持つリモート行を取り込み、ローカル行を畳み込む。
+
+    pull の後に別端末が同じキーの行を push した場合に起きる。取り込んだ行数を返す (0 なら原因は別)。
+    """
+    key = NATURAL_KEYS.get(table)
+    if not key or not rows:
+        return 0
+    cols = TABLES[table]
+    pos = [cols.index(c) for c in key]
+    wanted = {}
     for row in rows:
-        values = []
-        for cell in row:
-            if cell["type"] == "null":
-                values.append(None)
-            elif cell["type"] == "integer":
-                values.append(int(cell["value"]))
-            elif cell["type"] == "float":
-                values.append(float(cell["value"]))
-            else:
-                values.append(cell["value"])
-
-        placeholders = ",".join(["?" for _ in cols])
-        try:
-            local_cur.execute(
-                f"INSERT OR REPLACE INTO {table}({col_names}) VALUES({placeholders})",
-                values,
-            )
-            pulled += 1
-        except sqlite3.Error:
+        k = tuple(row[i] for i in pos)
+        if None not in k:
+            wanted[k] = row[0]
+    firsts = list({k[0] for k in wanted})
+    found = []
+    for i in range(0, len(firsts), MAX_VARIABLES):
+        chunk = firsts[i:i + MAX_VARIABLES]
+        result = result_rows(client.execute([execute_stmt(
+            f"SELECT {','.join(cols)} FROM {table} WHERE {key[0]} IN ({','.join('?' for _ in chunk)})", chunk),
+            CLOSE]), 0)
+        if result is None:
+            return 0
+        found.extend(result)
+    cur = conn.cursor()
+    remote = []
+    for values in found:
+        k = tuple(values[i] for i in pos)
+        if k not in wanted or wanted[k] == values[0]:
             continue
+        # ローカルで変更・削除済みの行はこちらの push が優先する
+        cur.execute("SELECT 1 FROM sync_changelog WHERE table_name = ? AND row_id = ?", (table, values[0]))
+        if cur.fetchone() is None:
+            remote.append(values)
+    if not remote:
+        return 0
+    set_applying(cur, True)
+    for values in remote:
+        apply_row(cur, table, cols, values, merges)
+    set_applying(cur, False)
+    conn.commit()
+    return len(remote)
 
-    return pulled
 
+def push_changes(conn, client: HranaClient, table: str, encoding: str = "multirow",
+                 tally: dict | None = None, merges: list | None = None) -> tuple[int, bool]:
+    """ローカル changelog の変更をリモートへ送り、確認できたエントリを削除。
 
-def ensure_remote_schema(http_url: str, token: str, local_cur):
-    """ローカルDBのスキーマをTursoにも適用 (CREATE TABLE IF NOT EXISTS)。"""
-    local_cur.execute("SELECT sql FROM sqlite_master WHERE type='table' AND sql IS NOT NULL")
+    (送信件数, 最後まで成功したか) を返す。encoding は "multirow" (既定) か "row" (1行1ステートメント)。
+    一意キーの衝突で送れなかった行はリモート行へ畳み込み (resolve_conflicts)、ページを読み直す。
+    """
+    cur = conn.cursor()
+    origin = get_state(cur, "origin")
+    cols = TABLES[table]
+    build = ENCODINGS[encoding]
+    pushed = 0
+    while True:
+        cur.execute("SELECT version, row_id, op FROM sync_changelog WHERE table_name = ? ORDER BY version LIMIT ?",
+                    (table, PAGE_SIZE))
+        entries = cur.fetchall()
+        if not entries:
+            return pushed, True
+
+        ids = [row_id for _, row_id, op in entries if op != "D"]
+        current = {}
+        for i in range(0, len(ids), PAGE_SIZE):
+            chunk = ids[i:i + PAGE_SIZE]
+            cur.execute(f"SELECT {','.join(cols)} FROM {table} WHERE id IN ({','.join('?' for _ in chunk)})", chunk)
+            current.update((row[0], row) for row in cur.fetchall())
+
+        acked, changes = [], []
+        for version, row_id, op in entries:
+            row = current.get(row_id)
+            if op != "D" and row is None:
+                acked.append((version,))  # 既に消えた行 (D が別に記録されている)
+                continue
+            changes.append((version, row_id, op, row))
+        done, ok = send_batched(client, build(table, changes, origin), tally)
+        versions = [v for key in done for v in key]
+        acked.extend((v,) for v in versions)
+        pushed += len(versions)
+
+        # 送信中に同じ行が再び変更されていれば version が変わっているので消えない
+        cur.executemany("DELETE FROM sync_changelog WHERE version = ?", acked)
+        conn.commit()
+        if not ok:
+            sent = set(versions)
+            failed = [row for version, _, op, row in changes if op != "D" and version not in sent]
+            if resolve_conflicts(conn, client, table, failed, merges):
+                continue
+            return pushed, False
+        if len(entries) < PAGE_SIZE:
+            return pushed, True
+
+
+def ensure_remote_schema(client: HranaClient, local_cur):
+    """同期対象テーブル (TABLES) とその索引のDDLをTursoにも適用 (IF NOT EXISTS)。
+
+    rollup_* / solution_terms / aggregate_meta / 各種キャッシュなどは各端末が作る派生データ・端末ごとの状態なので送らない。
+    """
+    tables = list(TABLES)
+    marks = ",".join("?" for _ in tables)
+    local_cur.execute(f"SELECT sql FROM sqlite_master WHERE type='table' AND sql IS NOT NULL AND name IN ({marks})",
+                      tables)
     ddl_stmts = []
     for (sql,) in local_cur.fetchall():
-        if not sql or "sqlite_" in sql:
-            continue
         # CREATE TABLE → CREATE TABLE IF NOT EXISTS
         safe_sql = sql.replace("CREATE TABLE ", "CREATE TABLE IF NOT EXISTS ", 1)
         ddl_stmts.append({"type": "execute", "stmt": {"sql": safe_sql, "args": []}})
-
-    # インデックスも送信
-    local_cur.execute("SELECT sql FROM sqlite_master WHERE type='index' AND sql IS NOT NULL")
+    # リモートの変更ログ (ローカルの sync_* は送らない)
+    for sql in REMOTE_DDL:
+        ddl_stmts.append({"type": "execute", "stmt": {"sql": sql, "args": []}})
+
+    # 同期対象テーブルのインデックスも送信 (自動索引 sqlite_autoindex_* は sql が NULL)。
+    # 端末ごとの列 (events.aggregated など) を使う索引はリモートの表にその列がないことがあるので送らない
+    local_only = set()
+    for table in tables:
+        local_cur.execute(f"PRAGMA table_info({table})")
+        local_only.update(row[1] for row in local_cur.fetchall() if row[1] not in TABLES[table])
+    local_cur.execute(f"SELECT sql FROM sqlite_master WHERE type='index' AND sql IS NOT NULL "
+                      f"AND tbl_name IN ({marks})", tables)
     for (sql,) in local_cur.fetchall():
-        if not sql:
+        if local_only & set(re.findall(r"\w+", sql)):
             continue
-        safe_sql = sql.replace("CREATE INDEX ", "CREATE INDEX IF NOT EXISTS ", 1)
+        safe_sql = re.sub(r"^CREATE (UNIQUE )?INDEX (?!IF NOT EXISTS)", r"CREATE \1INDEX IF NOT EXISTS ", sql)
         ddl_stmts.append({"type": "execute", "stmt": {"sql": safe_sql, "args": []}})
 
-    if ddl_stmts:
-        ddl_stmts.append({"type": "close"})
-        result = turso_execute(http_url, token, ddl_stmts)
-        ok = bool(result and "results" in result)
-        print(f"  Schema sync: {len(ddl_stmts)-1} DDL statements → {'OK' if ok else 'FAILED'}")
-    return len(ddl_stmts) - 1 if ddl_stmts else 0
+    ddl_stmts.append(CLOSE)
+    result = client.execute(ddl_stmts)
+    ok = bool(result and "results" in result)
+    print(f"  Schema sync: {len(ddl_stmts)-1} DDL statements → {'OK' if ok else 'FAILED'}")
+    return len(ddl_stmts) - 1
 
 
-def sync():
-    http_url, token = load_env()
-    conn = sqlite3.connect(DB)
-    cur = conn.cursor()
+# ── Engine ──────────────────────────────────
 
-    print(f"DIS Sync: {datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')}")
-    print(f"Remote: {http_url}")
-    print()
 
+def sync_table(client: HranaClient, table: str, catch_up: bool, encoding: str = "multirow") -> dict:
+    """1テーブル分の pull → push (id 競合の解消を push 前に済ませる)。ワーカースレッドで実行。"""
+    conn = dis_db.connect(DB, timeout=30)
+    tally: dict = {}
+    merges: list = []
+    try:
+        caught = catch_up_table(conn, client, table, merges) if catch_up else 0
+        pulled, pull_ok = pull_changes(conn, client, table, merges)
+        pushed, push_ok = push_changes(conn, client, table, encoding, tally, merges)
+        if pushed or pulled or caught:
+            conn.execute("UPDATE sync_meta SET last_sync_ts = ? WHERE table_name = ?",
+                         (datetime.utcnow().isoformat(), table))
+            conn.commit()
+    finally:
+        conn.close()
+    return {"table": table, "pushed": pushed, "pulled": pulled + caught, "ok": pull_ok and push_ok,
+            "push_bytes": tally.get("bytes_sent", 0), "merged": merges}
+
+
+def run_sync(client: HranaClient, workers: int = WORKERS, encoding: str = "multirow") -> list[dict]:
+    """全テーブルをスレッドプールで並行同期。テーブルごとの結果を返す。"""
+    conn = dis_db.connect(DB, timeout=30)
+    cur = conn.cursor()
+    ensure_changelog(conn)
     # Phase 0: DDL同期 (リモートにテーブルがなければ作成)
-    ensure_remote_schema(http_url, token, cur)
-
+    ensure_remote_schema(client, cur)
+    tables = local_tables(cur)
     # sync_meta に新テーブルのエントリがなければ追加
-    for table in TABLES:
-        cur.execute("SELECT 1 FROM sync_meta WHERE table_name = ?", (table,))
-        if not cur.fetchone():
-            cur.execute("INSERT INTO sync_meta(table_name, last_sync_id, last_sync_ts) VALUES(?, 0, '')", (table,))
+    cur.executemany("INSERT OR IGNORE INTO sync_meta(table_name, last_sync_id, last_sync_ts) VALUES(?, 0, '')",
+                    [(t,) for t in tables])
+    # 旧方式で同期済みのリモート行を初回だけ取り込む (sync_log には載っていないため)
+    catch_up = get_state(cur, "caught_up") is None
     conn.commit()
-    print()
 
-    total_pushed = 0
-    total_pulled = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(lambda t: sync_table(client, t, catch_up, encoding), tables))
 
-    for table, cols in TABLES.items():
-        pushed = push_table(cur, http_url, token, table, cols)
-        pulled = pull_table(cur, http_url, token, table, cols)
-        if pushed or pulled:
-            print(f"  {table}: pushed={pushed}, pulled={pulled}")
-        total_pushed += pushed
-        total_pulled += pulled
+    if catch_up and all(r["ok"] for r in results):
+        set_state(cur, "caught_up", datetime.utcnow().isoformat())
+        conn.commit()
+    conn.close()
+    return results
 
-    conn.commit()
+
+def bytes_per_row(results: list[dict]) -> float:
+    pushed = sum(r["pushed"] for r in results)
+    return sum(r["push_bytes"] for r in results) / pushed if pushed else 0.0
+
+
+def sync(workers: int = WORKERS, use_gzip: bool = False):
+    http_url, token, env_gzip = load_env()
+    client = HranaClient(http_url, token, pool_size=max(1, workers), gzip=use_gzip or env_gzip)
+
+    print(f"DIS Sync: {datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')}")
+    print(f"Remote: {http_url}")
+    print()
+
+    try:
+        results = run_sync(client, workers)
+    finally:
+        client.close()
+    print()
+
+    for r in results:
+        if r["pushed"] or r["pulled"] or not r["ok"]:
+            wire = f", {bytes_per_row([r]):.0f} B/row on wire" if r["pushed"] else ""
+            print(f"  {r['table']}: pushed={r['pushed']}, pulled={r['pulled']}{wire}"
+                  + ("" if r["ok"] else " (incomplete)"))
+        for local_id, remote_id in r["merged"]:
+            keys = ", ".join(NATURAL_KEYS[r["table"]])
+            print(f"  {r['table']}: merged local #{local_id} into #{remote_id} (same {keys})")
+    conn = dis_db.connect(DB)
+    pending = conn.execute("SELECT COUNT(*) FROM sync_changelog").fetchone()[0]
     conn.close()
 
-    print(f"\nTotal: pushed={total_pushed}, pulled={total_pulled}")
-    if total_pushed == 0 and total_pulled == 0:
+    total_pushed = sum(r["pushed"] for r in results)
+    total_pulled = sum(r["pulled"] for r in results)
+    s = client.stats
+    print(f"\nTotal: pushed={total_pushed}, pulled={total_pulled}" + (f", pending={pending}" if pending else ""))
+    print(f"HTTP: {s['requests']} requests over {s['connections']} connections, "
+          f"{s['bytes_sent']:,} bytes sent{' (gzip)' if client.gzip else ''}, {s['errors']} errors")
+    if total_pushed:
+        print(f"Push: {bytes_per_row(results):.0f} bytes on wire per row")
+    if total_pushed == 0 and total_pulled == 0 and not pending:
         print("Already in sync.")
 
 
 if __name__ == "__main__":
-    sync()
+    args = sys.argv[1:]
+    if args and args[0] == "--ensure-schema":
+        # Turso 未設定の端末では changelog を溜めない
+        if not os.path.exists(ENV_FILE):
+            sys.exit(0)
+        conn = dis_db.connect(DB)
+        n = ensure_changelog(conn)
+        conn.close()
+        print(f"Sync changelog ready ({n} tables newly tracked)")
+    else:
+        sync(int(args[args.index("--workers") + 1]) if "--workers" in args else WORKERS, "--gzip" in args)
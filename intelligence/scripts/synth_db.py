@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""DIS: ベンチマーク・クエリ監査用の合成 dev.db を生成する。
+
+スキーマは migrations/ で作り (--to で途中のバージョンに止められる)、全テーブルに実データに近い分布で行を入れる。
+- events.error は capture-error.sh が拾う種類 (ビルド・テスト・lint・型・その他) のテンプレートから作り、
+  type は ingest.classify で付ける (フックと同じ分類になる)
+- solutions.error_pattern は同じテンプレートのエラーを normalize したもの (aggregate が作る行と同じ形)
+- テンプレートの穴 (モジュール名・型名など) は偏りのある語彙から選ぶので、同じパターンが繰り返し出る
+- プロジェクトは偏りあり (上位数件に集中)、ts は直近 --days 日 (既定 180) に id 順で増加
+- quality_metrics は計測1回 = 同じ ts のファイル群 (プロジェクトごとに何度も計測)
+- events 以外の行数は rows に比例 (sessions 系は 1/20、solutions は 1/10 など)
+
+同じ seed なら同じ日のうちは同じ DB になる (ts の基準は当日 0:00 UTC。7日以内などの条件が効くよう現在日付に合わせる)。
+
+Usage:
+  synth_db.py --rows 100000 --out /tmp/dis-synth.db [--seed 7] [--days 180] [--to N]
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import dis_db
+import migrate
+from ingest import classify
+from normalize import normalize_error
+
+PROJECTS = [f"proj-{i}" for i in range(20)]
+# 上位プロジェクトほど行が多い (Zipf 風)
+PROJECT_WEIGHTS = [1 / (i + 1) for i in range(len(PROJECTS))]
+DAYS = 180
+
+_WORDS = ("error module type undefined cannot find import build failed test assert expected "
+          "received property null component render hook state async await promise").split()
+_STATUSES = ["pass", "fixed", "fail", "running"]
+
+# capture-error.sh が記録するエラーの雛形 (種類ごとの出現比率, 雛形)。{...} は _fill で埋める
+ERROR_TEMPLATES = [
+    (0.30, [
+        "{path}({line},{col}): error TS2322: Type '{type}' is not assignable to type '{type2}'.",
+        "{path}:{line}:{col} - error TS2339: Property '{ident}' does not exist on type '{type}'.",
+        "{path}:{line}:{col} - error TS2345: Argument of type '{type}' is not assignable to parameter of type '{type2}'.",
+        "TypeError: Cannot read properties of undefined (reading '{ident}')\n    at {ident2} ({path}:{line}:{col})",
+    ]),
+    (0.25, [
+        "Module not found: Error: Can't resolve '{module}' in '/home/dev/{project}/src/{dir}'",
+        "Cannot find module '{module}' or its corresponding type declarations.",
+        "Build failed with {n} errors:\n{path}:{line}:{col}: ERROR: Could not resolve \"{module}\"",
+        "error: could not compile `{module}` due to {n} previous errors",
+    ]),
+    (0.20, [
+        "FAIL {path}\n  ● {ident} › {ident2}\n    expect(received).toBe(expected)\n    Expected: {n}\n    Received: {n2}",
+        "AssertionError: expected {n} to equal {n2}\n    at Context.<anonymous> ({path}:{line}:{col})",
+        "Tests: {n} failed, {n2} passed, {n3} total",
+    ]),
+    (0.10, [
+        "{path}\n  {line}:{col}  error  '{ident}' is assigned a value but never used  no-unused-vars",
+        "[warn] {path}\n[warn] Code style issues found in the above file. Run Prettier with --write to fix.",
+    ]),
+    (0.15, [
+        "Error: listen EADDRINUSE: address already in use :::{port}",
+        "npm ERR! code ELIFECYCLE\nnpm ERR! errno {n}\nnpm ERR! {project}@0.1.0 dev: `next dev`",
+        "Error: connect ECONNREFUSED 127.0.0.1:{port}",
+        "SyntaxError: Unexpected token '{token}' in JSON at position {n3}",
+    ]),
+]
+_IDENTS = ("user session token config props state data items result response client handler router "
+           "schema payload options context cache query").split()
+_TYPE_NAMES = ("string number undefined null User Session Response ApiResult<User> Promise<void> "
+               "Record<string, unknown> ReactNode Config").split()
+_MODULES = ("react next zod @/lib/api @/components/Button lodash date-fns ./utils ../hooks/useAuth "
+            "@prisma/client axios serde tokio").split()
+_DIRS = ("app components lib hooks pages api utils server").split()
+
+# テーブルごとの行数 (rows に対する比率)
+SCALE = {
+    "events": 1.0,
+    "solutions": 0.1,
+    "patterns": 0.01,
+    "feedback": 0.01,
+    "sessions": 0.05,
+    "industry_feeds": 0.02,
+    "test_sessions": 0.05,
+    "dev_sessions": 0.05,
+    "questions": 0.02,
+    "review_sessions": 0.02,
+    "bug_sessions": 0.02,
+    "quality_metrics": 0.5,
+}
+
+
+class _Gen:
+    def __init__(self, seed: int, days: int = DAYS):
+        self.rng = random.Random(seed)
+        self.days = days
+        self.now = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def project(self) -> str:
+        return self.rng.choices(PROJECTS, PROJECT_WEIGHTS)[0]
+
+    def timestamps(self, n: int) -> list[str]:
+        """直近 days 日に散らばる n 個の ts (昇順)。"""
+        span = self.days * 86400
+        offsets = sorted(self.rng.randrange(span) for _ in range(n))
+        start = self.now - timedelta(seconds=span)
+        return [(start + timedelta(seconds=o)).strftime("%Y-%m-%d %H:%M:%S") for o in offsets]
+
+    def skewed(self, words: list[str]) -> str:
+        """先頭の語ほど選ばれやすい (同じパターンが繰り返し出るように)。"""
+        return words[min(len(words) - 1, int(self.rng.expovariate(4 / len(words))))]
+
+    def error(self, project: str) -> str:
+        rng = self.rng
+        templates = rng.choices([t for _, t in ERROR_TEMPLATES], [w for w, _ in ERROR_TEMPLATES])[0]
+        template = self.skewed(templates)
+        return template.format(
+            path=f"/home/dev/{project}/src/{self.skewed(_DIRS)}/{self.skewed(_IDENTS)}.ts",
+            line=rng.randint(1, 400), col=rng.randint(1, 80),
+            type=self.skewed(_TYPE_NAMES), type2=self.skewed(_TYPE_NAMES),
+            ident=self.skewed(_IDENTS), ident2=self.skewed(_IDENTS),
+            module=self.skewed(_MODULES), dir=self.skewed(_DIRS), project=project,
+            n=rng.randint(1, 9), n2=rng.randint(1, 40), n3=rng.randint(10, 200),
+            port=rng.choice((3000, 3001, 5173, 8080)), token=rng.choice("<}u"),
+        )
+
+    def text(self, lo: int, hi: int) -> str:
+        rng = self.rng
+        out = []
+        for _ in range(rng.randint(lo, hi)):
+            r = rng.random()
+            if r < 0.1:
+                out.append(f"src/{rng.choice(_WORDS)}/{rng.getrandbits(16):x}.ts:{rng.randint(1, 999)}")
+            else:
+                out.append(rng.choice(_WORDS))
+        return " ".join(out)
+
+
+_COMMANDS = ["npx tsc --noEmit", "npm run build", "npm test", "npx eslint .", "npm run dev", "cargo build"]
+
+
+def _events(g: _Gen, n: int):
+    for ts in g.timestamps(n):
+        p = g.project()
+        err = g.error(p)
+        yield (ts, classify(err), g.rng.choice(_COMMANDS), err, f"/home/dev/{p}", p, int(g.rng.random() < 0.3))
+
+
+def _solutions(g: _Gen, n: int):
+    # (error_pattern, project) は一意なので、重複したパターンは INSERT OR IGNORE で捨てる
+    for ts in g.timestamps(n):
+        p = g.project()
+        yield (ts, normalize_error(g.error(p)), g.text(5, 20), p, g.rng.randint(1, 30),
+               g.rng.randint(0, 5), round(g.rng.random() * 6, 3), ts)
+
+
+def _quality_metrics(g: _Gen, n: int):
+    # 1回の計測で 20〜80 ファイル。同じ ts を共有する
+    files_per_run = 50
+    for ts in g.timestamps(max(1, n // files_per_run)):
+        p = g.project()
+        for f in range(g.rng.randint(20, 80)):
+            dqs = round(g.rng.random(), 3)
+            yield (ts, p, f"src/mod{f}.ts", g.rng.randint(20, 900), round(g.rng.random(), 3),
+                   round(g.rng.random() * 8, 3), g.rng.randint(0, 40), round(g.rng.random() * 2, 3),
+                   round(g.rng.random(), 3), dqs, "ABCDF"[min(4, int((1 - dqs) * 5))], "{}")
+
+
+def _sessions_like(g: _Gen, n: int, make):
+    for ts in g.timestamps(n):
+        yield (ts, g.project()) + make(g)
+
+
+# (テーブル, カラム, 行ジェネレータ)
+def _plan(g: _Gen, rows: int):
+    n = {t: max(1, int(rows * s)) for t, s in SCALE.items()}
+    st = lambda g: g.rng.choice(_STATUSES)  # noqa: E731
+    return [
+        ("events", "ts, type, cmd, error, cwd, project, resolved", _events(g, n["events"])),
+        ("solutions", "ts, error_pattern, solution, project, success_count, fail_count, score, last_used",
+         _solutions(g, n["solutions"])),
+        ("patterns", "ts, pattern, description, solution, frequency, score, promoted_to_memory, last_seen",
+         ((ts, f"{g.text(3, 8)} #{i}", g.text(4, 10), g.text(4, 10), g.rng.randint(0, 20),
+           round(g.rng.random() * 8, 3), int(g.rng.random() < 0.1), ts)
+          for i, ts in enumerate(g.timestamps(n["patterns"])))),
+        ("feedback", "ts, project, category, wrong_approach, correct_approach, context, confirmation_count, score",
+         _sessions_like(g, n["feedback"], lambda g: (g.rng.choice(["style", "refactoring", "testing"]),
+                                                     g.text(3, 10), g.text(3, 10), g.text(3, 10),
+                                                     g.rng.randint(1, 6), round(g.rng.random() * 3, 3)))),
+        ("sessions", "ts, project, files_changed, errors_encountered, errors_resolved, duration_turns",
+         _sessions_like(g, n["sessions"], lambda g: (g.rng.randint(0, 30), g.rng.randint(0, 10),
+                                                     g.rng.randint(0, 10), g.rng.randint(1, 80)))),
+        ("industry_feeds", "ts, source, title, url, summary, fetched_at, analyzed",
+         ((ts, g.rng.choice(["anthropic", "openai", "deepmind"]), g.text(3, 8), f"https://example.com/{i}",
+           g.text(10, 30), ts, int(g.rng.random() < 0.8))
+          for i, ts in enumerate(g.timestamps(n["industry_feeds"])))),
+        ("test_sessions", "ts, project, perspective, test_type, status, error_pattern, score",
+         _sessions_like(g, n["test_sessions"], lambda g: (g.text(2, 6), "unit", st(g), g.text(3, 8),
+                                                          round(g.rng.random() * 3, 3)))),
+        ("dev_sessions", "ts, project, requirement, status, files_changed, score, dqs_delta",
+         _sessions_like(g, n["dev_sessions"], lambda g: (g.text(4, 12), st(g), "[]", round(g.rng.random() * 3, 3),
+                                                         round(g.rng.uniform(-0.1, 0.1), 4)))),
+        ("questions", "ts, project, question, context, answer, status, score",
+         _sessions_like(g, n["questions"], lambda g: (g.text(4, 12), g.text(4, 12), g.text(4, 20),
+                                                      g.rng.choice(["open", "resolved"]),
+                                                      round(g.rng.random() * 3, 3)))),
+        ("review_sessions", "ts, project, mode, initial_score, final_score, iterations, status",
+         _sessions_like(g, n["review_sessions"], lambda g: ("auto", g.rng.randint(40, 90), g.rng.randint(60, 100),
+                                                            g.rng.randint(1, 4), "completed"))),
+        ("bug_sessions", "ts, project, description, status, severity, score",
+         _sessions_like(g, n["bug_sessions"], lambda g: (g.text(4, 12), st(g), "medium",
+                                                         round(g.rng.random() * 3, 3)))),
+        ("quality_metrics", "ts, project, file, loc, cdi, se, cls_max, crs, drs, dqs, grade, metrics_json",
+         _quality_metrics(g, n["quality_metrics"])),
+    ]
+
+
+def generate(path: str, rows: int, seed: int = 7, target: int | None = None, days: int = DAYS) -> dict[str, int]:
+    """path に合成 DB を作る (既存ファイルは置き換え)。テーブルごとの行数を返す。"""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    conn = dis_db.connect(path)
+    migrate.apply(conn, target)
+    counts = {}
+    for table, cols, gen in _plan(_Gen(seed, days), rows):
+        sql = f"INSERT OR IGNORE INTO {table}({cols}) VALUES({','.join('?' * len(cols.split(',')))})"
+
+        def insert(conn, gen=gen, sql=sql):
+            cur = conn.executemany(sql, gen)
+            return cur.rowcount
+
+        counts[table] = dis_db.write(conn, insert)
+    # 合成データでトリガーが積んだキューは不要 (similarity のインデックスは使う側が再構築する)
+    conn.execute("DELETE FROM solution_index_queue")
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    return counts
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    rows = int(args[args.index("--rows") + 1]) if "--rows" in args else 100000
+    out = args[args.index("--out") + 1] if "--out" in args else "/tmp/dis-synth.db"
+    seed = int(args[args.index("--seed") + 1]) if "--seed" in args else 7
+    target = int(args[args.index("--to") + 1]) if "--to" in args else None
+    days = int(args[args.index("--days") + 1]) if "--days" in args else DAYS
+    t0 = time.perf_counter()
+    counts = generate(out, rows, seed, target, days)
+    print(f"Generated {out} in {time.perf_counter() - t0:.1f}s: "
+          + ", ".join(f"{t}={n:,}" for t, n in counts.items()))
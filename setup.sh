@@ -114,7 +114,7 @@ ok "Hooks installed"
 
 # Copy intelligence (scripts + init)
 cp "$SCRIPT_DIR/intelligence/init-db.sh" "$CLAUDE_HOME/intelligence/"
-cp "$SCRIPT_DIR/intelligence/scripts/"* "$CLAUDE_HOME/intelligence/scripts/"
+cp -r "$SCRIPT_DIR/intelligence/scripts/"* "$CLAUDE_HOME/intelligence/scripts/"
 ok "Intelligence scripts installed"
 
 # Copy skills